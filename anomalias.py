@@ -0,0 +1,117 @@
+"""
+Detección incremental de anomalías por aire acondicionado.
+
+Para cada aire se mantiene una media y una varianza con ponderación
+exponencial (EWMA) de la temperatura y la humedad. Cada lectura nueva se
+compara con el estado anterior (puntuación z) y después lo actualiza, con
+un coste constante por lectura y sin volver a leer el histórico.
+"""
+import math
+import os
+
+# Peso de la lectura nueva en la media y la varianza exponenciales
+ALFA = float(os.environ.get('ANOMALIAS_ALFA', 0.05))
+
+# Número de desviaciones estándar a partir del cual una lectura es anómala
+K_SIGMA = float(os.environ.get('ANOMALIAS_K', 3))
+
+# Lecturas necesarias antes de empezar a marcar anomalías
+LECTURAS_MINIMAS = int(os.environ.get('ANOMALIAS_LECTURAS_MINIMAS', 20))
+
+# Desviación mínima para que una serie muy estable no dispare alertas por décimas
+DESVIACION_MINIMA = {
+    'temperatura': 0.2,
+    'humedad': 1.0
+}
+
+VARIABLES = ('temperatura', 'humedad')
+
+
+def actualizar_ewma(media, varianza, valor, alfa=ALFA):
+    """
+    Actualiza una media y una varianza exponenciales con un valor nuevo.
+    
+    Args:
+        media: Media actual (None si es el primer valor)
+        varianza: Varianza actual
+        valor: Valor nuevo
+        alfa: Peso del valor nuevo
+    
+    Returns:
+        Tupla (media, varianza) actualizadas
+    """
+    if media is None:
+        return valor, 0.0
+    
+    diferencia = valor - media
+    incremento = alfa * diferencia
+    
+    return media + incremento, (1 - alfa) * (varianza + diferencia * incremento)
+
+
+def puntuacion_z(media, varianza, valor, variable):
+    """
+    Calcula cuántas desviaciones estándar se aleja un valor de la media.
+    
+    Args:
+        media: Media exponencial actual
+        varianza: Varianza exponencial actual
+        valor: Valor a evaluar
+        variable: 'temperatura' o 'humedad'
+    
+    Returns:
+        Puntuación z, o None si todavía no hay media
+    """
+    if media is None:
+        return None
+    
+    desviacion = max(math.sqrt(max(varianza, 0.0)), DESVIACION_MINIMA[variable])
+    return (valor - media) / desviacion
+
+
+def evaluar_lectura(estado, lectura_id, fecha, temperatura, humedad, alfa=ALFA, k=K_SIGMA):
+    """
+    Evalúa una lectura contra el estado de su aire y actualiza el estado.
+    
+    Args:
+        estado: Objeto EstadoAnomalia del aire
+        lectura_id: ID de la lectura
+        fecha: Fecha de la lectura
+        temperatura: Temperatura registrada
+        humedad: Humedad registrada
+        alfa: Peso de la lectura nueva
+        k: Número de desviaciones a partir del cual la lectura es anómala
+    
+    Returns:
+        True si la lectura es anómala
+    """
+    valores = {'temperatura': temperatura, 'humedad': humedad}
+    calentado = (estado.lecturas or 0) >= LECTURAS_MINIMAS
+    es_anomalia = False
+    
+    for variable in VARIABLES:
+        media = getattr(estado, f'{variable}_media')
+        varianza = getattr(estado, f'{variable}_varianza') or 0.0
+        
+        # La puntuación se calcula con el estado previo a la lectura
+        z = puntuacion_z(media, varianza, valores[variable], variable)
+        setattr(estado, f'{variable}_z', z)
+        
+        if calentado and z is not None and abs(z) > k:
+            es_anomalia = True
+        
+        media, varianza = actualizar_ewma(media, varianza, valores[variable], alfa)
+        setattr(estado, f'{variable}_media', media)
+        setattr(estado, f'{variable}_varianza', varianza)
+    
+    estado.lecturas = (estado.lecturas or 0) + 1
+    estado.ultima_lectura_id = lectura_id
+    estado.ultima_fecha = fecha
+    estado.ultima_temperatura = temperatura
+    estado.ultima_humedad = humedad
+    estado.es_anomalia = es_anomalia
+    
+    if es_anomalia:
+        estado.fecha_ultima_anomalia = fecha
+    
+    return es_anomalia
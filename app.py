@@ -3,19 +3,30 @@ import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime, time, timedelta
 import io
 import os
 import base64
+from contextlib import nullcontext
 
-from data_manager import DataManager
+from data_manager import DataManager, MARGEN_IDS_TARDIOS
 from database import init_db
 from utils import (
     crear_grafico_temperatura_humedad,
     crear_grafico_comparativo,
     crear_grafico_variacion,
-    generar_reporte_estadistico
+    generar_reporte_estadistico,
+    crear_mapa_calor,
+    actualizar_estadisticas_incrementales,
+    resumir_estadisticas_incrementales
 )
+from instrumentacion import (
+    ejecucion,
+    registro as registro_tiempos,
+    resumen_percentiles,
+    consultas_por_ejecucion
+)
+from perfilado import PERFILAR_SIEMPRE, perfilar, resumen_funciones, listar_capturas
 
 # Inicializar la base de datos
 init_db()
@@ -168,6 +179,10 @@ if st.session_state.logged_in:
             "Gestión de Usuarios",
             "Exportar Datos"
         ]
+        
+        # Tiempos de consultas y páginas, solo para administradores
+        if st.session_state.user_role == "admin":
+            paginas.append("Rendimiento")
     else:  # operador
         paginas = [
             "Dashboard",
@@ -177,6 +192,12 @@ if st.session_state.logged_in:
     
     pagina_seleccionada = st.sidebar.radio("Navegar a:", paginas)
     
+    # Captura de perfil de la página seleccionada (ver perfilado.py)
+    perfilar_pagina = PERFILAR_SIEMPRE or (
+        st.session_state.user_role == "admin"
+        and st.sidebar.toggle("Perfilar página", key="perfilar_pagina", help="Ejecuta la página con cProfile y muestra las funciones más lentas")
+    )
+    
     # Opción para cerrar sesión
     mostrar_logout()
 else:
@@ -189,12 +210,115 @@ else:
         st.stop()  # Detener la ejecución aquí
 
 # Función para mostrar el dashboard principal
+def mostrar_panel_en_vivo():
+    # Se ejecuta como fragmento: en cada refresco solo se consultan las lecturas
+    # con ID mayor que la última vista (y las confirmadas tarde dentro del margen
+    # de IDs por debajo) y se actualizan los acumulados
+    en_vivo = st.session_state.en_vivo
+    
+    nuevas_df = data_manager.obtener_lecturas_nuevas(en_vivo['ultimo_id'], vistas=en_vivo['vistas'])
+    
+    if not nuevas_df.empty:
+        en_vivo['acumulados'] = actualizar_estadisticas_incrementales(en_vivo['acumulados'], nuevas_df)
+        en_vivo['ultimo_id'] = max(en_vivo['ultimo_id'], int(nuevas_df['id'].max()))
+        corte = en_vivo['ultimo_id'] - MARGEN_IDS_TARDIOS
+        en_vivo['vistas'] = {i for i in en_vivo['vistas'].union(nuevas_df['id'].tolist()) if i > corte}
+        
+        lecturas_df = pd.concat([en_vivo['lecturas'], nuevas_df], ignore_index=True)
+        limite = datetime.now() - timedelta(hours=en_vivo['ventana_horas'])
+        en_vivo['lecturas'] = lecturas_df[lecturas_df['fecha'] >= limite].reset_index(drop=True)
+        
+    
+    stats = resumir_estadisticas_incrementales(en_vivo['acumulados'])
+    lecturas_df = en_vivo['lecturas']
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric(label="Total de Lecturas", value=stats['total_lecturas'], delta=len(nuevas_df) or None)
+    
+    with col2:
+        st.metric(label="Temperatura Promedio", value=f"{stats['temperatura']['promedio']} °C")
+    
+    with col3:
+        st.metric(label="Humedad Promedio", value=f"{stats['humedad']['promedio']} %")
+    
+    with col4:
+        ultima = lecturas_df['fecha'].max() if not lecturas_df.empty else None
+        st.metric(label="Última Lectura", value=ultima.strftime('%H:%M:%S') if ultima is not None else "-")
+    
+    if lecturas_df.empty:
+        st.info(f"No hay lecturas en las últimas {en_vivo['ventana_horas']} horas.")
+    else:
+        grafico_df = lecturas_df.assign(aire=lecturas_df['aire_id'].map(data_manager.obtener_catalogo_aires().nombres))
+        
+        fig = px.line(
+            grafico_df,
+            x='fecha',
+            y='temperatura',
+            color='aire',
+            title=f"Temperatura en las últimas {en_vivo['ventana_horas']} horas",
+            labels={'fecha': 'Fecha', 'temperatura': 'Temperatura (°C)', 'aire': 'Aire'}
+        )
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Última lectura de cada aire
+        ultimas_df = grafico_df.sort_values('fecha').groupby('aire_id').tail(1)
+        ultimas_display = ultimas_df[['aire', 'fecha', 'temperatura', 'humedad']].copy()
+        ultimas_display['fecha'] = ultimas_display['fecha'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        ultimas_display.columns = ['Aire', 'Fecha y Hora', 'Temperatura (°C)', 'Humedad (%)']
+        st.dataframe(ultimas_display.sort_values('Aire'), use_container_width=True, hide_index=True)
+    
+    st.caption(f"Actualizado a las {datetime.now().strftime('%H:%M:%S')} · {len(nuevas_df)} lecturas nuevas")
+
+def mostrar_dashboard_en_vivo():
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        intervalo = st.selectbox(
+            "Actualizar cada:",
+            options=[5, 10, 30, 60],
+            format_func=lambda s: f"{s} segundos"
+        )
+    
+    with col2:
+        ventana_horas = st.selectbox(
+            "Mostrar las últimas:",
+            options=[1, 6, 24],
+            index=2,
+            format_func=lambda h: f"{h} horas"
+        )
+    
+    # Carga inicial (una sola vez por sesión y ventana): acumulados de todo el
+    # histórico y las lecturas de la ventana hasta el mismo ID
+    en_vivo = st.session_state.get('en_vivo')
+    if en_vivo is None or en_vivo['ventana_horas'] != ventana_horas:
+        acumulados, ultimo_id = data_manager.obtener_acumulados_lecturas()
+        
+        st.session_state.en_vivo = {
+            'ventana_horas': ventana_horas,
+            'ultimo_id': ultimo_id,
+            'vistas': data_manager.obtener_ids_lecturas(max(ultimo_id - MARGEN_IDS_TARDIOS, 0), ultimo_id),
+            'acumulados': acumulados,
+            'lecturas': data_manager.obtener_lecturas_nuevas(
+                desde=datetime.now() - timedelta(hours=ventana_horas),
+                hasta_id=ultimo_id
+            )
+        }
+    
+    st.fragment(mostrar_panel_en_vivo, run_every=intervalo)()
+
 def mostrar_dashboard():
     st.title("Dashboard de Monitoreo de Aires Acondicionados")
     
-    # Obtener datos
+    # Modo pantalla de monitoreo: refresco automático solo con las lecturas nuevas
+    if st.toggle("Actualización automática", help="Consulta solo las lecturas nuevas cada pocos segundos"):
+        mostrar_dashboard_en_vivo()
+        return
+    
+    # Obtener datos (incluye las horas compactadas del histórico antiguo)
     aires_df = data_manager.obtener_aires()
-    lecturas_df = data_manager.obtener_lecturas()
+    lecturas_df = data_manager.obtener_lecturas(incluir_compactadas=True)
     
     # Estadísticas generales
     stats = data_manager.obtener_estadisticas_generales()
@@ -220,6 +344,65 @@ def mostrar_dashboard():
             value=f"{stats['humedad']['promedio']} %"
         )
     
+    # Alertas de umbral activas (con histéresis: no cambian con cada lectura que oscila en el límite)
+    alertas_df = data_manager.obtener_alertas_activas()
+    
+    if not alertas_df.empty:
+        st.subheader("Alertas de Umbral Activas")
+        
+        alertas_display = alertas_df[[
+            'nombre', 'umbral_nombre', 'variable', 'lado', 'estado',
+            'fecha_activacion', 'ultimo_valor', 'ultima_fecha'
+        ]].copy()
+        alertas_display['variable'] = alertas_display['variable'].str.capitalize()
+        alertas_display['lado'] = alertas_display['lado'].map({'max': 'Por encima del máximo', 'min': 'Por debajo del mínimo'})
+        alertas_display['estado'] = alertas_display['estado'].map({'activa': 'Activa', 'recuperando': 'Recuperándose'})
+        alertas_display.columns = [
+            'Aire', 'Umbral', 'Variable', 'Condición', 'Estado',
+            'Activa desde', 'Último Valor', 'Última Lectura'
+        ]
+        st.dataframe(alertas_display, use_container_width=True)
+    
+    # Anomalías detectadas en la última lectura de cada aire
+    anomalias_df = data_manager.obtener_anomalias_activas()
+    
+    if not anomalias_df.empty:
+        st.subheader("Anomalías Detectadas")
+        st.warning(f"{len(anomalias_df)} aire(s) con lecturas fuera de su comportamiento habitual")
+        
+        anomalias_display = anomalias_df[[
+            'nombre', 'fecha', 'temperatura', 'temperatura_esperada', 'temperatura_z',
+            'humedad', 'humedad_esperada', 'humedad_z'
+        ]].copy()
+        anomalias_display.columns = [
+            'Aire', 'Fecha', 'Temperatura (°C)', 'Temp. Esperada (°C)', 'Desviación Temp. (σ)',
+            'Humedad (%)', 'Hum. Esperada (%)', 'Desviación Hum. (σ)'
+        ]
+        st.dataframe(anomalias_display.round(2), use_container_width=True)
+    
+    # Ranking de aires según el tiempo estimado hasta su umbral de temperatura máxima
+    tendencias_df = data_manager.obtener_tendencias()
+    
+    if not tendencias_df.empty:
+        ranking_df = tendencias_df[np.isfinite(tendencias_df['horas_hasta_umbral'])]
+        
+        if not ranking_df.empty:
+            st.subheader("Tiempo Estimado hasta el Umbral de Temperatura")
+            st.caption(
+                "Tendencia de los últimos días proyectada hasta la temperatura máxima "
+                "configurada de cada aire."
+            )
+            
+            ranking_display = ranking_df[[
+                'nombre', 'ubicacion', 'temperatura_actual', 'pendiente_dia',
+                'umbral_temp_max', 'horas_hasta_umbral', 'fecha_estimada_umbral'
+            ]].head(10).copy()
+            ranking_display.columns = [
+                'Aire', 'Ubicación', 'Temperatura Actual (°C)', 'Tendencia (°C/día)',
+                'Umbral (°C)', 'Horas hasta Umbral', 'Fecha Estimada'
+            ]
+            st.dataframe(ranking_display.round(2), use_container_width=True)
+    
     # Filtros para gráficos
     st.subheader("Visualización de Datos")
     
@@ -227,7 +410,7 @@ def mostrar_dashboard():
     
     with col1:
         # Opción para mostrar datos de todos los aires o uno específico
-        aires_opciones = [("Todos los aires", None)] + [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+        aires_opciones = data_manager.obtener_catalogo_aires().opciones_con_todos()
         
         aire_seleccionado_nombre, aire_seleccionado_id = aires_opciones[0]
         if len(aires_opciones) > 1:
@@ -301,7 +484,7 @@ def mostrar_registro_lecturas():
         
         with st.form("formulario_lectura", clear_on_submit=True):
             # Seleccionar aire acondicionado
-            aire_options = [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+            aire_options = data_manager.obtener_catalogo_aires().opciones
             aire_nombre, aire_id = st.selectbox(
                 "Seleccionar Aire Acondicionado:",
                 options=aire_options,
@@ -373,120 +556,217 @@ def mostrar_registro_lecturas():
         # Mostrar últimas lecturas
         st.subheader("Últimas Lecturas Registradas")
         
-        lecturas_df = data_manager.obtener_lecturas()
+        # Solo las 10 más recientes, consultadas en la base de datos
+        lecturas_df, _ = data_manager.obtener_pagina_lecturas(tamano=10)
         
         if not lecturas_df.empty:
-            # Ordenar por fecha (más recientes primero)
-            lecturas_df = lecturas_df.sort_values(by='fecha', ascending=False)
-            
-            # Añadir información del nombre del aire
-            lecturas_con_info = lecturas_df.merge(
-                aires_df[['id', 'nombre']],
-                left_on='aire_id',
-                right_on='id',
-                suffixes=('', '_aire')
-            )
-            
             # Seleccionar y renombrar columnas para mostrar
-            lecturas_display = lecturas_con_info[['id', 'nombre', 'fecha', 'temperatura', 'humedad']].copy()
-            
-            # Formatear la fecha para incluir fecha y hora
-            lecturas_display['fecha'] = lecturas_display['fecha'].dt.strftime('%Y-%m-%d %H:%M')
-            
+            lecturas_display = lecturas_df[['id', 'nombre', 'fecha', 'temperatura', 'humedad']].copy()
             lecturas_display.columns = ['ID Lectura', 'Aire', 'Fecha y Hora', 'Temperatura (°C)', 'Humedad (%)']
             
-            # Mostrar tabla con las últimas 10 lecturas
-            st.dataframe(lecturas_display.head(10), use_container_width=True)
+            st.dataframe(
+                lecturas_display,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'Fecha y Hora': st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm")
+                }
+            )
         else:
             st.info("No hay lecturas registradas aún.")
     
     with tab2:
         st.subheader("Administrar Lecturas Existentes")
         
-        # Filtro por aire acondicionado
-        aire_filter_options = [("Todos los aires", None)] + [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
-        col1, col2 = st.columns([3, 1])
+        mensaje = st.session_state.pop('mensaje_lecturas', None)
+        if mensaje:
+            st.success(mensaje)
+        
+        # Filtros y orden: se aplican en la base de datos
+        col1, col2, col3 = st.columns([3, 2, 1])
         
         with col1:
             aire_filter_nombre, aire_filter_id = st.selectbox(
                 "Filtrar por Aire Acondicionado:",
-                options=aire_filter_options,
+                options=data_manager.obtener_catalogo_aires().opciones_con_todos(),
                 format_func=lambda x: x[0],
                 key="filtro_lecturas"
             )
         
         with col2:
-            if st.button("Aplicar Filtro", use_container_width=True):
-                st.rerun()
-                
-        # Mostrar lecturas según el filtro
-        lecturas_df = data_manager.obtener_lecturas()
+            rango = st.date_input(
+                "Rango de fechas (opcional):",
+                value=(),
+                key="filtro_fechas_lecturas"
+            )
         
-        if not lecturas_df.empty:
-            # Filtrar por aire_id si se seleccionó uno
-            if aire_filter_id is not None:
-                lecturas_df = lecturas_df[lecturas_df['aire_id'] == aire_filter_id]
-            
-            # Ordenar por fecha (más recientes primero)
-            lecturas_df = lecturas_df.sort_values(by='fecha', ascending=False)
-            
-            # Añadir información del nombre del aire
-            lecturas_con_info = lecturas_df.merge(
-                aires_df[['id', 'nombre']],
-                left_on='aire_id',
-                right_on='id',
-                suffixes=('', '_aire')
+        with col3:
+            tamano = st.selectbox("Filas por página:", options=[25, 50, 100, 200], index=1)
+        
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            orden = st.selectbox(
+                "Ordenar por:",
+                options=['fecha', 'id', 'temperatura', 'humedad'],
+                format_func=lambda x: {'fecha': 'Fecha', 'id': 'ID', 'temperatura': 'Temperatura', 'humedad': 'Humedad'}[x]
             )
+        
+        with col2:
+            descendente = st.toggle("Descendente", value=True)
+        
+        desde = datetime.combine(rango[0], datetime.min.time()) if rango else None
+        hasta = datetime.combine(rango[-1] + timedelta(days=1), datetime.min.time()) if rango else None
+        
+        # Cursores del inicio de cada página visitada; se reinician al cambiar el filtro
+        filtro = (aire_filter_id, desde, hasta, orden, descendente, tamano)
+        paginacion = st.session_state.get('paginacion_lecturas')
+        if paginacion is None or paginacion['filtro'] != filtro:
+            paginacion = {'filtro': filtro, 'cursores': [None]}
+            st.session_state.paginacion_lecturas = paginacion
+        
+        lecturas_df, siguiente = data_manager.obtener_pagina_lecturas(
+            aire_id=aire_filter_id,
+            desde=desde,
+            hasta=hasta,
+            orden=orden,
+            descendente=descendente,
+            tamano=tamano,
+            despues_de=paginacion['cursores'][-1]
+        )
+        pagina = len(paginacion['cursores'])
+        
+        if lecturas_df.empty and pagina == 1:
+            st.info("No hay lecturas registradas para el filtro seleccionado.")
+        else:
+            lecturas_display = lecturas_df[['id', 'nombre', 'fecha', 'temperatura', 'humedad']].copy()
+            lecturas_display.columns = ['ID Lectura', 'Aire', 'Fecha y Hora', 'Temperatura (°C)', 'Humedad (%)']
             
-            # Seleccionar y renombrar columnas para mostrar
-            lecturas_display = lecturas_con_info[['id', 'nombre', 'fecha', 'temperatura', 'humedad']].copy()
-            
-            # Formatear la fecha para incluir fecha y hora
-            lecturas_display['fecha'] = lecturas_display['fecha'].dt.strftime('%Y-%m-%d %H:%M')
+            st.caption("Selecciona filas de la tabla para eliminarlas.")
+            
+            # La selección es de la página visible: al cambiar de página empieza vacía
+            evento = st.dataframe(
+                lecturas_display,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    'Fecha y Hora': st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm:ss")
+                },
+                on_select="rerun",
+                selection_mode="multi-row",
+                key=f"tabla_lecturas_{pagina}_{hash(filtro)}"
+            )
             
-            lecturas_display.columns = ['ID Lectura', 'Aire', 'Fecha y Hora', 'Temperatura (°C)', 'Humedad (%)']
+            col1, col2, col3 = st.columns([1, 2, 1])
             
-            if not lecturas_display.empty:
-                # Mostrar todas las lecturas que cumplen con el filtro
-                st.dataframe(lecturas_display, use_container_width=True)
+            with col1:
+                if st.button("← Anterior", disabled=pagina == 1, use_container_width=True):
+                    paginacion['cursores'].pop()
+                    st.rerun()
                 
-                # Sección para eliminar lecturas
-                st.subheader("Eliminar Lectura")
+            with col2:
+                st.markdown(f"<div style='text-align: center'>Página {pagina}</div>", unsafe_allow_html=True)
+        
+            with col3:
+                if st.button("Siguiente →", disabled=siguiente is None, use_container_width=True):
+                    paginacion['cursores'].append(siguiente)
+                    st.rerun()
                 
-                # Crear opciones con detalles de cada lectura
-                lectura_options = [(f"ID: {row['ID Lectura']} - {row['Aire']} ({row['Fecha y Hora']}): {row['Temperatura (°C)']}°C, {row['Humedad (%)']}%", 
-                                 row['ID Lectura']) for _, row in lecturas_display.iterrows()]
+            # Sección para eliminar lecturas
+            st.subheader("Eliminar Lecturas")
                 
-                if lectura_options:
-                    lectura_seleccionada_texto, lectura_seleccionada_id = st.selectbox(
-                        "Seleccionar Lectura para eliminar:",
-                        options=lectura_options,
-                        format_func=lambda x: x[0]
-                    )
+            ids_seleccionados = lecturas_display['ID Lectura'].iloc[evento.selection.rows].tolist()
+                
+            col1, col2 = st.columns(2)
                     
-                    if st.button("Eliminar Lectura Seleccionada", type="primary"):
-                        confirmacion = st.warning(f"¿Estás seguro de eliminar esta lectura? Esta acción no se puede deshacer.")
+            with col1:
+                if st.button(
+                    f"Eliminar {len(ids_seleccionados)} lectura(s) seleccionada(s)",
+                    type="primary",
+                    disabled=not ids_seleccionados
+                ):
+                    st.session_state.lecturas_a_eliminar = ids_seleccionados
+            
+            with col2:
+                lectura_id = st.number_input("ID de la lectura:", min_value=1, step=1, value=None)
+                if st.button("Eliminar por ID", disabled=lectura_id is None):
+                    st.session_state.lecturas_a_eliminar = [int(lectura_id)]
+            
+            # Confirmación en una segunda ejecución de la página
+            lecturas_a_eliminar = st.session_state.get('lecturas_a_eliminar')
+            
+            if lecturas_a_eliminar:
+                st.warning(f"¿Estás seguro de eliminar {len(lecturas_a_eliminar)} lectura(s)? Esta acción no se puede deshacer.")
                         
-                        col1, col2 = st.columns(2)
+                col1, col2 = st.columns(2)
                         
-                        with col1:
-                            if st.button("Sí, eliminar", key="confirmar_eliminar_lectura"):
-                                eliminado = data_manager.eliminar_lectura(lectura_seleccionada_id)
-                                if eliminado:
-                                    st.success("Lectura eliminada exitosamente")
-                                else:
-                                    st.error("No se pudo eliminar la lectura")
-                                st.rerun()
+                with col1:
+                    if st.button("Sí, eliminar", key="confirmar_eliminar_lectura"):
+                        eliminadas = data_manager.eliminar_lecturas(lecturas_a_eliminar)
+                        del st.session_state.lecturas_a_eliminar
                         
-                        with col2:
-                            if st.button("Cancelar", key="cancelar_eliminar_lectura"):
-                                st.rerun()
-                else:
-                    st.info("No hay lecturas para seleccionar")
-            else:
-                st.info(f"No hay lecturas registradas para el filtro seleccionado.")
-        else:
-            st.info("No hay lecturas registradas aún.")
+                        if eliminadas:
+                            st.session_state.mensaje_lecturas = f"{eliminadas} lectura(s) eliminada(s) exitosamente"
+                            st.rerun()
+                        else:
+                            st.error("No se encontró ninguna lectura con ese ID")
+                        
+                with col2:
+                    if st.button("Cancelar", key="cancelar_eliminar_lectura"):
+                        del st.session_state.lecturas_a_eliminar
+                        st.rerun()
+        
+        # Eliminación de todas las lecturas de un aire en un intervalo
+        st.subheader("Eliminar por Rango")
+        
+        with st.expander("Eliminar las lecturas de un aire entre dos fechas"):
+            aire_rango_nombre, aire_rango_id = st.selectbox(
+                "Aire Acondicionado:",
+                options=data_manager.obtener_catalogo_aires().opciones,
+                format_func=lambda x: x[0],
+                key="aire_eliminar_rango"
+            )
+            
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                fecha_desde = st.date_input("Desde:", datetime.now().date(), key="fecha_desde_eliminar")
+                hora_desde = st.time_input("Hora inicial:", time(0, 0), key="hora_desde_eliminar")
+            
+            with col2:
+                fecha_hasta = st.date_input("Hasta:", datetime.now().date(), key="fecha_hasta_eliminar")
+                hora_hasta = st.time_input("Hora final:", time(23, 59), key="hora_hasta_eliminar")
+            
+            rango_desde = datetime.combine(fecha_desde, hora_desde)
+            # La hora final se incluye completa
+            rango_hasta = datetime.combine(fecha_hasta, hora_hasta) + timedelta(minutes=1)
+            
+            if st.button("Eliminar lecturas del rango", disabled=rango_desde >= rango_hasta):
+                st.session_state.rango_a_eliminar = (aire_rango_id, aire_rango_nombre, rango_desde, rango_hasta)
+            
+            rango_a_eliminar = st.session_state.get('rango_a_eliminar')
+            
+            if rango_a_eliminar:
+                aire_id, aire_nombre, inicio, fin = rango_a_eliminar
+                st.warning(
+                    f"¿Estás seguro de eliminar todas las lecturas de {aire_nombre} entre "
+                    f"{inicio:%Y-%m-%d %H:%M} y {fin - timedelta(minutes=1):%Y-%m-%d %H:%M}? "
+                    "Esta acción no se puede deshacer."
+                )
+                
+                col1, col2 = st.columns(2)
+                
+                with col1:
+                    if st.button("Sí, eliminar", key="confirmar_eliminar_rango"):
+                        eliminadas = data_manager.eliminar_lecturas_rango(aire_id, inicio, fin)
+                        del st.session_state.rango_a_eliminar
+                        st.session_state.mensaje_lecturas = f"{eliminadas} lectura(s) eliminada(s) del rango seleccionado"
+                        st.rerun()
+                
+                with col2:
+                    if st.button("Cancelar", key="cancelar_eliminar_rango"):
+                        del st.session_state.rango_a_eliminar
+                        st.rerun()
 
 # Función para la página de gestión de aires
 def mostrar_gestion_aires():
@@ -538,7 +818,7 @@ def mostrar_gestion_aires():
             st.subheader("Editar Aire Acondicionado")
             
             # Crear opciones para selectbox con nombres e IDs
-            aire_options = [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+            aire_options = data_manager.obtener_catalogo_aires().opciones
             
             aire_seleccionado_nombre, aire_seleccionado_id = st.selectbox(
                 "Seleccionar Aire Acondicionado a Editar:",
@@ -597,7 +877,7 @@ def mostrar_gestion_aires():
             st.subheader("Eliminar Aire Acondicionado")
             
             # Crear opciones para selectbox con nombres e IDs
-            aire_options = [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+            aire_options = data_manager.obtener_catalogo_aires().opciones
             
             aire_a_eliminar_nombre, aire_a_eliminar_id = st.selectbox(
                 "Seleccionar Aire para eliminar:",
@@ -648,7 +928,7 @@ def mostrar_registro_mantenimientos():
         
         with st.form("formulario_mantenimiento", clear_on_submit=True):
             # Seleccionar aire acondicionado
-            aire_options = [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+            aire_options = data_manager.obtener_catalogo_aires().opciones
             aire_nombre, aire_id = st.selectbox(
                 "Seleccionar Aire Acondicionado:",
                 options=aire_options,
@@ -717,7 +997,7 @@ def mostrar_registro_mantenimientos():
         col1, col2 = st.columns([3, 1])
         
         with col1:
-            aire_filter_options = [("Todos los aires", None)] + [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+            aire_filter_options = data_manager.obtener_catalogo_aires().opciones_con_todos()
             
             aire_filter_nombre, aire_filter_id = st.selectbox(
                 "Filtrar por Aire:",
@@ -734,12 +1014,9 @@ def mostrar_registro_mantenimientos():
         
         if not mantenimientos_df.empty:
             # Añadir información del nombre del aire
-            mantenimientos_con_info = mantenimientos_df.merge(
-                aires_df[['id', 'nombre']],
-                left_on='aire_id',
-                right_on='id',
-                suffixes=('', '_aire')
-            )
+            mantenimientos_con_info = mantenimientos_df.assign(
+                nombre=lambda df: df['aire_id'].map(data_manager.obtener_catalogo_aires().nombres)
+            ).dropna(subset=['nombre'])
             
             # Formatear la fecha
             mantenimientos_con_info['fecha'] = pd.to_datetime(mantenimientos_con_info['fecha']).dt.strftime('%Y-%m-%d %H:%M')
@@ -775,7 +1052,7 @@ def mostrar_registro_mantenimientos():
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        st.write(f"**Aire:** {aires_df[aires_df['id'] == mantenimiento.aire_id]['nombre'].values[0]}")
+                        st.write(f"**Aire:** {data_manager.obtener_catalogo_aires().nombre(mantenimiento.aire_id)}")
                         st.write(f"**Fecha:** {mantenimiento.fecha.strftime('%Y-%m-%d %H:%M')}")
                         st.write(f"**Tipo:** {mantenimiento.tipo_mantenimiento}")
                         st.write(f"**Técnico:** {mantenimiento.tecnico}")
@@ -813,15 +1090,34 @@ def mostrar_registro_mantenimientos():
         else:
             st.info("No hay mantenimientos registrados aún.")
 
+# Selector del rango de fechas de los percentiles (resúmenes diarios de cuantiles)
+def seleccionar_rango_cuantiles(key):
+    primer_dia, ultimo_dia = data_manager.obtener_rango_cuantiles()
+    
+    if primer_dia is None:
+        return None, None
+    
+    rango = st.date_input(
+        "Rango de fechas de los percentiles:",
+        value=(primer_dia, ultimo_dia),
+        min_value=primer_dia,
+        max_value=ultimo_dia,
+        key=key
+    )
+    
+    # Mientras se elige el rango, date_input devuelve solo la fecha inicial
+    if len(rango) == 2:
+        return rango[0], rango[1]
+    return rango[0], ultimo_dia
+
 # Función para la página de análisis y estadísticas
 def mostrar_analisis_estadisticas():
     st.title("Análisis y Estadísticas")
     
     # Obtener datos
     aires_df = data_manager.obtener_aires()
-    lecturas_df = data_manager.obtener_lecturas()
     
-    if aires_df.empty or lecturas_df.empty:
+    if aires_df.empty or not data_manager.hay_lecturas():
         st.warning("No hay suficientes datos para generar estadísticas. Asegúrate de tener aires acondicionados y lecturas registradas.")
         return
     
@@ -831,6 +1127,7 @@ def mostrar_analisis_estadisticas():
         "Análisis por Ubicación",
         "Variabilidad de Temperatura",
         "Variabilidad de Humedad",
+        "Patrones Horarios",
         "Reporte Completo"
     ]
     
@@ -839,12 +1136,17 @@ def mostrar_analisis_estadisticas():
         options=analisis_options
     )
     
+    # Solo los análisis que recorren todas las lecturas las cargan (incluye las horas
+    # compactadas del histórico antiguo); las variabilidades se agregan en la base de datos
+    if analisis_seleccionado in ["Estadísticas Generales", "Reporte Completo"]:
+        lecturas_df = data_manager.obtener_lecturas(incluir_compactadas=True)
+    
     if analisis_seleccionado == "Estadísticas Generales":
         # Mostrar estadísticas generales
         st.subheader("Estadísticas Generales por Aire Acondicionado")
         
         # Seleccionar aire acondicionado
-        aire_options = [("Todos los aires", None)] + [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+        aire_options = data_manager.obtener_catalogo_aires().opciones_con_todos()
         
         aire_seleccionado_nombre, aire_seleccionado_id = st.selectbox(
             "Seleccionar Aire Acondicionado:",
@@ -857,12 +1159,7 @@ def mostrar_analisis_estadisticas():
             stats_df = generar_reporte_estadistico(lecturas_df)
             
             # Añadir nombres de los aires
-            stats_df = stats_df.merge(
-                aires_df[['id', 'nombre']],
-                left_on='aire_id',
-                right_on='id',
-                how='left'
-            )
+            stats_df['nombre'] = stats_df['aire_id'].map(data_manager.obtener_catalogo_aires().nombres)
             
             # Seleccionar y renombrar columnas para mostrar
             stats_display = stats_df[[
@@ -894,7 +1191,7 @@ def mostrar_analisis_estadisticas():
             st.dataframe(stats_display, use_container_width=True)
         else:
             # Estadísticas para un aire específico
-            lecturas_aire = data_manager.obtener_lecturas_por_aire(aire_seleccionado_id)
+            lecturas_aire = data_manager.obtener_lecturas_por_aire(aire_seleccionado_id, incluir_compactadas=True)
             
             if lecturas_aire.empty:
                 st.info(f"No hay lecturas registradas para {aire_seleccionado_nombre}.")
@@ -963,6 +1260,10 @@ def mostrar_analisis_estadisticas():
         # Mostrar tabla de estadísticas por ubicación
         st.write("### Comparativa entre Ubicaciones")
         
+        # Percentiles del rango elegido, combinando los resúmenes diarios de cada aire
+        desde, hasta = seleccionar_rango_cuantiles("rango_cuantiles_ubicacion")
+        cuantiles_ubicacion_df = data_manager.obtener_cuantiles(desde, hasta, agrupar='ubicacion')
+        
         # Renombrar columnas para mostrar
         stats_display = stats_ubicacion_df[[
             'ubicacion',
@@ -994,6 +1295,23 @@ def mostrar_analisis_estadisticas():
         
         st.dataframe(stats_display, use_container_width=True)
         
+        if not cuantiles_ubicacion_df.empty:
+            st.write("### Percentiles por Ubicación")
+            
+            cuantiles_display = cuantiles_ubicacion_df.copy()
+            cuantiles_display.columns = [
+                'Ubicación',
+                'Lecturas',
+                'Temp. P50 (°C)',
+                'Temp. P95 (°C)',
+                'Temp. P99 (°C)',
+                'Humedad P50 (%)',
+                'Humedad P95 (%)',
+                'Humedad P99 (%)'
+            ]
+            
+            st.dataframe(cuantiles_display, use_container_width=True)
+        
         # Crear gráficos comparativos entre ubicaciones
         st.write("### Gráficos Comparativos por Ubicación")
         
@@ -1063,6 +1381,9 @@ def mostrar_analisis_estadisticas():
                 # Obtener estadísticas específicas de esta ubicación
                 ubicacion_stats = data_manager.obtener_estadisticas_por_ubicacion(ubicacion_seleccionada).iloc[0] if not data_manager.obtener_estadisticas_por_ubicacion(ubicacion_seleccionada).empty else None
                 
+                ubicacion_cuantiles = cuantiles_ubicacion_df[cuantiles_ubicacion_df['ubicacion'] == ubicacion_seleccionada]
+                ubicacion_cuantiles = ubicacion_cuantiles.iloc[0] if not ubicacion_cuantiles.empty else None
+                
                 if ubicacion_stats is not None:
                     col1, col2 = st.columns(2)
                     
@@ -1071,12 +1392,16 @@ def mostrar_analisis_estadisticas():
                         st.metric("Promedio", f"{ubicacion_stats['temperatura_promedio']} °C")
                         st.metric("Desviación Estándar", f"{ubicacion_stats['temperatura_std']} °C")
                         st.metric("Rango", f"{ubicacion_stats['temperatura_min']} - {ubicacion_stats['temperatura_max']} °C")
+                        if ubicacion_cuantiles is not None:
+                            st.metric("P50 / P95 / P99", f"{ubicacion_cuantiles['temperatura_p50']} / {ubicacion_cuantiles['temperatura_p95']} / {ubicacion_cuantiles['temperatura_p99']} °C")
                     
                     with col2:
                         st.write("### Humedad")
                         st.metric("Promedio", f"{ubicacion_stats['humedad_promedio']} %")
                         st.metric("Desviación Estándar", f"{ubicacion_stats['humedad_std']} %")
                         st.metric("Rango", f"{ubicacion_stats['humedad_min']} - {ubicacion_stats['humedad_max']} %")
+                        if ubicacion_cuantiles is not None:
+                            st.metric("P50 / P95 / P99", f"{ubicacion_cuantiles['humedad_p50']} / {ubicacion_cuantiles['humedad_p95']} / {ubicacion_cuantiles['humedad_p99']} %")
             else:
                 st.info(f"No hay aires acondicionados registrados en la ubicación {ubicacion_seleccionada}")
         else:
@@ -1093,13 +1418,13 @@ def mostrar_analisis_estadisticas():
             - Posibles problemas de instalación o mantenimiento en ubicaciones específicas
         - La desviación estándar alta en una ubicación específica puede indicar condiciones variables o inconsistentes.
         """)
-
+    
     elif analisis_seleccionado == "Variabilidad de Temperatura":
         # Mostrar análisis de variabilidad de temperatura
         st.subheader("Análisis de Variabilidad de Temperatura")
         
         # Seleccionar aire acondicionado
-        aire_options = [("Todos los aires", None)] + [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+        aire_options = data_manager.obtener_catalogo_aires().opciones_con_todos()
         
         aire_seleccionado_nombre, aire_seleccionado_id = st.selectbox(
             "Seleccionar Aire Acondicionado:",
@@ -1108,7 +1433,8 @@ def mostrar_analisis_estadisticas():
         )
         
         # Crear gráfico de variabilidad
-        fig_var = crear_grafico_variacion(lecturas_df, aire_seleccionado_id, 'temperatura')
+        variacion_df = data_manager.obtener_variacion('temperatura', aire_seleccionado_id)
+        fig_var = crear_grafico_variacion(None, aire_seleccionado_id, 'temperatura', variacion_df=variacion_df)
         st.plotly_chart(fig_var, use_container_width=True)
         
         # Explicación
@@ -1126,7 +1452,7 @@ def mostrar_analisis_estadisticas():
         st.subheader("Análisis de Variabilidad de Humedad")
         
         # Seleccionar aire acondicionado
-        aire_options = [("Todos los aires", None)] + [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+        aire_options = data_manager.obtener_catalogo_aires().opciones_con_todos()
         
         aire_seleccionado_nombre, aire_seleccionado_id = st.selectbox(
             "Seleccionar Aire Acondicionado:",
@@ -1135,7 +1461,8 @@ def mostrar_analisis_estadisticas():
         )
         
         # Crear gráfico de variabilidad
-        fig_var = crear_grafico_variacion(lecturas_df, aire_seleccionado_id, 'humedad')
+        variacion_df = data_manager.obtener_variacion('humedad', aire_seleccionado_id)
+        fig_var = crear_grafico_variacion(None, aire_seleccionado_id, 'humedad', variacion_df=variacion_df)
         st.plotly_chart(fig_var, use_container_width=True)
         
         # Explicación
@@ -1148,20 +1475,103 @@ def mostrar_analisis_estadisticas():
         - La variabilidad de la humedad puede verse afectada por factores externos como la ventilación o la ocupación del espacio.
         """)
     
+    elif analisis_seleccionado == "Patrones Horarios":
+        # Mostrar mapa de calor por hora del día
+        st.subheader("Patrones Horarios")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            variable = st.selectbox(
+                "Variable:",
+                options=["temperatura", "humedad"],
+                format_func=str.capitalize
+            )
+            
+            ambito = st.radio(
+                "Mostrar:",
+                options=["Todos los aires", "Un aire", "Una ubicación"],
+                horizontal=True
+            )
+        
+        with col2:
+            eje = st.radio(
+                "Columnas del mapa:",
+                options=["dia_semana", "fecha"],
+                format_func=lambda x: "Día de la semana" if x == "dia_semana" else "Fecha",
+                horizontal=True
+            )
+        
+        aire_seleccionado_id = None
+        ubicacion_seleccionada = None
+        
+        if ambito == "Un aire":
+            aire_options = data_manager.obtener_catalogo_aires().opciones
+            
+            aire_seleccionado_nombre, aire_seleccionado_id = st.selectbox(
+                "Seleccionar Aire Acondicionado:",
+                options=aire_options,
+                format_func=lambda x: x[0]
+            )
+        elif ambito == "Una ubicación":
+            ubicacion_seleccionada = st.selectbox(
+                "Seleccionar Ubicación:",
+                options=data_manager.obtener_ubicaciones()
+            )
+        
+        # Por fechas, una columna por día: se propone el último mes con lecturas
+        primer_dia, ultimo_dia = data_manager.obtener_rango_cuantiles()
+        desde, hasta = None, None
+        
+        if primer_dia is not None:
+            inicio = primer_dia if eje == "dia_semana" else max(primer_dia, ultimo_dia - timedelta(days=30))
+            
+            with col2:
+                rango = st.date_input(
+                    "Rango de fechas:",
+                    value=(inicio, ultimo_dia),
+                    min_value=primer_dia,
+                    max_value=ultimo_dia,
+                    key=f"rango_mapa_calor_{eje}"
+                )
+            
+            desde = rango[0]
+            hasta = rango[1] if len(rango) == 2 else ultimo_dia
+        
+        # La rejilla (horas × días) se agrega en la base de datos
+        mapa_df = data_manager.obtener_mapa_calor(
+            eje=eje,
+            aire_id=aire_seleccionado_id,
+            ubicacion=ubicacion_seleccionada,
+            desde=desde,
+            hasta=hasta
+        )
+        
+        fig_mapa = crear_mapa_calor(mapa_df, variable=variable, eje=eje)
+        st.plotly_chart(fig_mapa, use_container_width=True)
+        
+        # Explicación
+        st.write("""
+        **Interpretación:**
+        
+        - Cada celda muestra el promedio de las lecturas tomadas a esa hora en ese día de la semana (o fecha).
+        - Las filas corresponden a las horas de registro de lecturas.
+        - Un patrón repetido a la misma hora puede indicar una carga térmica diaria (ocupación, sol, equipos) o un problema de programación del aire.
+        """)
+    
     elif analisis_seleccionado == "Reporte Completo":
         # Generar reporte completo
         st.subheader("Reporte Estadístico Completo")
         
+        # Percentiles del rango elegido, combinando los resúmenes diarios de cada aire
+        desde, hasta = seleccionar_rango_cuantiles("rango_cuantiles_reporte")
+        cuantiles_df = data_manager.obtener_cuantiles(desde, hasta)
+        
         # Generar y mostrar el reporte
-        stats_df = generar_reporte_estadistico(lecturas_df)
+        stats_df = generar_reporte_estadistico(lecturas_df, cuantiles_df=cuantiles_df)
         
         # Añadir nombres de los aires
-        stats_df = stats_df.merge(
-            aires_df[['id', 'nombre']],
-            left_on='aire_id',
-            right_on='id',
-            how='left'
-        )
+        stats_df['nombre'] = stats_df['aire_id'].map(data_manager.obtener_catalogo_aires().nombres)
         
         # Seleccionar y renombrar columnas para mostrar
         stats_display = stats_df[[
@@ -1174,6 +1584,12 @@ def mostrar_analisis_estadisticas():
             'humedad_min',
             'humedad_max',
             'humedad_std',
+            'temperatura_p50',
+            'temperatura_p95',
+            'temperatura_p99',
+            'humedad_p50',
+            'humedad_p95',
+            'humedad_p99',
             'lecturas_totales'
         ]].copy()
         
@@ -1187,6 +1603,12 @@ def mostrar_analisis_estadisticas():
             'Humedad Mínima (%)',
             'Humedad Máxima (%)',
             'Humedad Desv. Estándar',
+            'Temp. P50 (°C)',
+            'Temp. P95 (°C)',
+            'Temp. P99 (°C)',
+            'Humedad P50 (%)',
+            'Humedad P95 (%)',
+            'Humedad P99 (%)',
             'Total Lecturas'
         ]
         
@@ -1244,7 +1666,7 @@ def mostrar_configuracion_umbrales():
             aire_id = None
             if not es_global:
                 if not aires_df.empty:
-                    aire_options = [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+                    aire_options = data_manager.obtener_catalogo_aires().opciones
                     aire_nombre, aire_id = st.selectbox(
                         "Seleccionar Aire Acondicionado:",
                         options=aire_options,
@@ -1348,7 +1770,7 @@ def mostrar_configuracion_umbrales():
             mostrar_especificas = st.checkbox("Mostrar configuraciones específicas", value=True)
             
             if mostrar_especificas and not aires_df.empty:
-                aire_filter_options = [("Todos los aires", None)] + [(f"{row['nombre']} (ID: {row['id']})", row['id']) for _, row in aires_df.iterrows()]
+                aire_filter_options = data_manager.obtener_catalogo_aires().opciones_con_todos()
                 
                 aire_filtro_nombre, aire_filtro = st.selectbox(
                     "Filtrar por Aire Acondicionado:",
@@ -1452,9 +1874,9 @@ def mostrar_configuracion_umbrales():
                         if umbral.es_global:
                             st.info("Esta es una configuración global que aplica a todos los aires acondicionados.")
                         else:
-                            aire_info = aires_df[aires_df['id'] == umbral.aire_id]
-                            if not aire_info.empty:
-                                st.info(f"Esta configuración aplica al aire: {aire_info.iloc[0]['nombre']}")
+                            aire_nombre = data_manager.obtener_catalogo_aires().nombre(umbral.aire_id)
+                            if aire_nombre is not None:
+                                st.info(f"Esta configuración aplica al aire: {aire_nombre}")
                             else:
                                 st.warning(f"Esta configuración aplica a un aire con ID {umbral.aire_id} que ya no existe.")
                         
@@ -1792,20 +2214,178 @@ def mostrar_exportar_datos():
         preview_df = lecturas_df.sort_values("fecha", ascending=False).head(5)
         st.dataframe(preview_df, use_container_width=True)
 
-# Ejecutar la página seleccionada
-if pagina_seleccionada == "Dashboard":
-    mostrar_dashboard()
-elif pagina_seleccionada == "Registro de Lecturas":
-    mostrar_registro_lecturas()
-elif pagina_seleccionada == "Gestión de Aires":
-    mostrar_gestion_aires()
-elif pagina_seleccionada == "Registro de Mantenimientos":
-    mostrar_registro_mantenimientos()
-elif pagina_seleccionada == "Análisis y Estadísticas":
-    mostrar_analisis_estadisticas()
-elif pagina_seleccionada == "Configuración de Umbrales":
-    mostrar_configuracion_umbrales()
-elif pagina_seleccionada == "Gestión de Usuarios":
-    mostrar_gestion_usuarios()
-elif pagina_seleccionada == "Exportar Datos":
-    mostrar_exportar_datos()
+# Función para la página de rendimiento (tiempos de consultas, páginas y gráficos)
+def mostrar_rendimiento():
+    st.title("Rendimiento")
+    
+    # Verificar que sea un administrador
+    if st.session_state.user_role != "admin":
+        st.warning("No tienes permiso para acceder a esta página.")
+        return
+    
+    registros_df = registro_tiempos.a_dataframe()
+    
+    if registros_df.empty:
+        st.info("Aún no hay mediciones. Navega por la aplicación para registrar tiempos.")
+        return
+    
+    consultas_df = registros_df[registros_df['tipo'] == 'consulta']
+    ejecuciones_df = consultas_por_ejecucion(registros_df)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Mediciones", len(registros_df))
+    with col2:
+        st.metric("Desde", registros_df['fecha'].min().strftime('%H:%M:%S'))
+    with col3:
+        st.metric(
+            "Consulta p95",
+            f"{np.percentile(consultas_df['duracion_ms'], 95):.1f} ms" if not consultas_df.empty else "-"
+        )
+    with col4:
+        st.metric(
+            "Consultas por ejecución (mediana)",
+            f"{ejecuciones_df['consultas'].median():.0f}" if not ejecuciones_df.empty else "-"
+        )
+    
+    columnas_ms = {
+        columna: st.column_config.NumberColumn(format="%.1f ms")
+        for columna in ('p50', 'p95', 'p99', 'maximo', 'total', 'duracion_ms', 'tiempo_consultas', 'tiempo_pagina')
+    }
+    
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Páginas", "Consultas", "Consultas por Ejecución", "Gráficos", "Perfiles"])
+    
+    with tab1:
+        st.subheader("Tiempo de renderizado por página")
+        st.dataframe(resumen_percentiles(registros_df, 'pagina'), use_container_width=True, hide_index=True, column_config=columnas_ms)
+    
+    with tab2:
+        st.subheader("Consultas más lentas")
+        lentas_df = consultas_df.nlargest(20, 'duracion_ms')[['fecha', 'duracion_ms', 'filas', 'pagina', 'nombre']]
+        st.dataframe(
+            lentas_df.rename(columns={'nombre': 'sentencia'}),
+            use_container_width=True,
+            hide_index=True,
+            column_config=columnas_ms
+        )
+        
+        st.subheader("Percentiles por sentencia")
+        st.dataframe(
+            resumen_percentiles(registros_df, 'consulta').rename(columns={'nombre': 'sentencia'}),
+            use_container_width=True,
+            hide_index=True,
+            column_config=columnas_ms
+        )
+    
+    with tab3:
+        st.subheader("Consultas en cada ejecución de página")
+        
+        if ejecuciones_df.empty:
+            st.info("No hay ejecuciones de página registradas.")
+        else:
+            resumen_df = ejecuciones_df.groupby('pagina').agg(
+                ejecuciones=('ejecucion', 'count'),
+                consultas_mediana=('consultas', 'median'),
+                consultas_max=('consultas', 'max'),
+                tiempo_consultas=('tiempo_consultas', 'median'),
+                tiempo_pagina=('tiempo_pagina', 'median')
+            ).reset_index()
+            st.dataframe(resumen_df, use_container_width=True, hide_index=True, column_config=columnas_ms)
+            
+            st.subheader("Últimas ejecuciones")
+            st.dataframe(ejecuciones_df.head(50), use_container_width=True, hide_index=True, column_config=columnas_ms)
+    
+    with tab4:
+        st.subheader("Tiempo de construcción de gráficos")
+        st.dataframe(resumen_percentiles(registros_df, 'grafico'), use_container_width=True, hide_index=True, column_config=columnas_ms)
+    
+    with tab5:
+        st.subheader("Capturas de perfil guardadas")
+        
+        capturas_df = listar_capturas()
+        
+        if capturas_df.empty:
+            st.info("No hay capturas. Activa \"Perfilar página\" en la barra lateral y visita una página.")
+        else:
+            archivo = st.selectbox("Captura", capturas_df['archivo'], key="captura_perfil")
+            ruta = capturas_df.loc[capturas_df['archivo'] == archivo, 'ruta'].iloc[0]
+            mostrar_resumen_perfil(ruta, "rendimiento")
+            
+            with open(ruta, 'rb') as archivo_perfil:
+                st.download_button("Descargar captura (.prof)", archivo_perfil.read(), file_name=archivo)
+    
+    if st.button("Vaciar mediciones"):
+        registro_tiempos.vaciar()
+        st.rerun()
+
+# Tabla con las funciones más lentas de una captura de perfil
+def mostrar_resumen_perfil(ruta, clave):
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        orden = st.selectbox(
+            "Ordenar por",
+            ['tiempo_acumulado_ms', 'tiempo_propio_ms', 'llamadas'],
+            format_func=lambda columna: {
+                'tiempo_acumulado_ms': "Tiempo acumulado",
+                'tiempo_propio_ms': "Tiempo propio",
+                'llamadas': "Llamadas"
+            }[columna],
+            key=f"orden_perfil_{clave}"
+        )
+    with col2:
+        solo_aplicacion = st.checkbox(
+            "Solo funciones de la aplicación",
+            help="Oculta las funciones de Streamlit, pandas, SQLAlchemy y demás librerías",
+            key=f"solo_aplicacion_perfil_{clave}"
+        )
+    
+    st.dataframe(
+        resumen_funciones(ruta, orden=orden, solo_aplicacion=solo_aplicacion),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            'tiempo_propio_ms': st.column_config.NumberColumn(format="%.1f ms"),
+            'tiempo_acumulado_ms': st.column_config.NumberColumn(format="%.1f ms")
+        }
+    )
+
+# Ejecutar la página seleccionada; cada ejecución se mide (ver instrumentacion.py)
+# y, si está activado, se perfila (ver perfilado.py)
+with ejecucion(pagina_seleccionada) as consultas_ejecucion, \
+        (perfilar(pagina_seleccionada) if perfilar_pagina else nullcontext()) as captura_perfil:
+    if pagina_seleccionada == "Dashboard":
+        mostrar_dashboard()
+    elif pagina_seleccionada == "Registro de Lecturas":
+        mostrar_registro_lecturas()
+    elif pagina_seleccionada == "Gestión de Aires":
+        mostrar_gestion_aires()
+    elif pagina_seleccionada == "Registro de Mantenimientos":
+        mostrar_registro_mantenimientos()
+    elif pagina_seleccionada == "Análisis y Estadísticas":
+        mostrar_analisis_estadisticas()
+    elif pagina_seleccionada == "Configuración de Umbrales":
+        mostrar_configuracion_umbrales()
+    elif pagina_seleccionada == "Gestión de Usuarios":
+        mostrar_gestion_usuarios()
+    elif pagina_seleccionada == "Exportar Datos":
+        mostrar_exportar_datos()
+    elif pagina_seleccionada == "Rendimiento":
+        mostrar_rendimiento()
+
+# Modo de depuración: consultas de esta ejecución y avisos de presupuesto o N+1
+if consultas_ejecucion is not None:
+    st.sidebar.caption(f"{consultas_ejecucion.total} consultas en esta ejecución")
+    for problema in consultas_ejecucion.problemas():
+        st.sidebar.warning(problema)
+
+# Resumen del perfil de esta ejecución
+if captura_perfil is not None:
+    st.divider()
+    
+    if captura_perfil.ruta is None:
+        st.info("Otra sesión está perfilando una página; esta ejecución no se perfiló.")
+    else:
+        with st.expander(f"Perfil de esta ejecución: {captura_perfil.ruta}", expanded=True):
+            mostrar_resumen_perfil(captura_perfil.ruta, "pagina")
@@ -0,0 +1,369 @@
+"""
+Benchmarks de DataManager y de los gráficos de utils sobre flotas sintéticas.
+
+Para cada escala se genera una vez (con flota_sintetica.py) una base SQLite
+en BENCHMARK_DIR (por defecto data/benchmarks) y se mide, con las cachés
+vacías, el tiempo de los métodos de consulta y estadísticas de
+DataManager, verificar_lectura_dentro_umbrales, exportar_datos y los
+constructores de gráficos. Cada escala se mide en un proceso aparte porque
+la base de datos se elige al importar database.py.
+
+Los resultados se añaden a resultados.csv con la fecha y el commit, y al
+final se comparan con la ejecución anterior de la misma escala para ver
+las mejoras y regresiones de un cambio.
+
+Uso:
+    python benchmark.py                                  # todas las escalas
+    python benchmark.py --escalas pequena mediana --repeticiones 5
+    python benchmark.py --comparar                       # solo comparar las dos últimas ejecuciones
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+DIRECTORIO = os.environ.get('BENCHMARK_DIR', os.path.join('data', 'benchmarks'))
+
+# Escalas de flota: parámetros de flota_sintetica.generar_flota
+ESCALAS = {
+    'pequena': {'aires': 5, 'ubicaciones': 2, 'dias': 90},
+    'mediana': {'aires': 20, 'ubicaciones': 5, 'dias': 365},
+    'grande': {'aires': 50, 'ubicaciones': 10, 'dias': 2 * 365}
+}
+
+# Fecha del último día de lecturas, fija para que la flota sea siempre la misma
+FECHA_FINAL = datetime(2025, 6, 30)
+
+SEMILLA = 0
+
+# Variación de la mediana a partir de la que se marca una regresión o mejora;
+# por debajo de UMBRAL_CAMBIO_MS la diferencia se considera ruido
+UMBRAL_CAMBIO = 0.2
+UMBRAL_CAMBIO_MS = 2.0
+
+
+def ruta_base(escala):
+    """Archivo SQLite de la flota de una escala."""
+    parametros = '_'.join(f"{clave}{valor}" for clave, valor in sorted(ESCALAS[escala].items()))
+    return os.path.abspath(os.path.join(DIRECTORIO, f"flota_{escala}_{parametros}_s{SEMILLA}.db"))
+
+
+def _casos(data_manager):
+    """Lista de (nombre, función sin argumentos) a medir."""
+    from utils import (
+        crear_grafico_temperatura_humedad,
+        crear_grafico_comparativo,
+        crear_grafico_variacion,
+        crear_mapa_calor,
+        generar_reporte_estadistico
+    )
+    
+    catalogo = data_manager.obtener_catalogo_aires()
+    aire_id = catalogo.ids[0]
+    
+    # Entradas de los gráficos, calculadas una sola vez
+    lecturas_df = data_manager.obtener_lecturas(incluir_compactadas=True)
+    variacion_df = data_manager.obtener_variacion('temperatura')
+    mapa_df = data_manager.obtener_mapa_calor()
+    
+    def exportar_csv():
+        rutas = data_manager.exportar_datos('csv')
+        for ruta in rutas:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+    
+    return [
+        ('obtener_lecturas', lambda: data_manager.obtener_lecturas()),
+        ('obtener_lecturas_por_aire', lambda: data_manager.obtener_lecturas_por_aire(aire_id)),
+        ('obtener_estadisticas_generales', data_manager.obtener_estadisticas_generales),
+        ('obtener_estadisticas_por_aire', lambda: data_manager.obtener_estadisticas_por_aire(aire_id)),
+        ('obtener_estadisticas_por_ubicacion', data_manager.obtener_estadisticas_por_ubicacion),
+        ('obtener_variacion', lambda: data_manager.obtener_variacion('temperatura')),
+        ('obtener_variacion_aire', lambda: data_manager.obtener_variacion('temperatura', aire_id=aire_id)),
+        ('obtener_mapa_calor', data_manager.obtener_mapa_calor),
+        ('obtener_cuantiles', data_manager.obtener_cuantiles),
+        ('verificar_lectura_dentro_umbrales', lambda: data_manager.verificar_lectura_dentro_umbrales(aire_id, 27.5, 50.0)),
+        ('exportar_datos_csv', exportar_csv),
+        ('crear_grafico_temperatura_humedad', lambda: crear_grafico_temperatura_humedad(lecturas_df, periodo='todo')),
+        ('crear_grafico_comparativo', lambda: crear_grafico_comparativo(lecturas_df, variable='temperatura')),
+        ('crear_grafico_variacion', lambda: crear_grafico_variacion(None, None, 'temperatura', variacion_df=variacion_df)),
+        ('crear_mapa_calor', lambda: crear_mapa_calor(mapa_df)),
+        ('generar_reporte_estadistico', lambda: generar_reporte_estadistico(lecturas_df))
+    ]
+
+
+def _filas(resultado):
+    return len(resultado) if isinstance(resultado, pd.DataFrame) else None
+
+
+def medir(data_manager, repeticiones=5, casos=None):
+    """
+    Mide cada caso con las cachés de lecturas vacías.
+    
+    Args:
+        data_manager: DataManager conectado a la flota
+        repeticiones: Mediciones por caso (después de una de calentamiento)
+        casos: Nombres de los casos a medir, o None para todos
+    
+    Returns:
+        Lista de diccionarios con caso, repeticiones, mediana_ms, minimo_ms, maximo_ms y filas
+    """
+    resultados = []
+    
+    for nombre, funcion in _casos(data_manager):
+        if casos and nombre not in casos:
+            continue
+        
+        tiempos = []
+        for repeticion in range(repeticiones + 1):
+            data_manager._invalidar_caches_lecturas()
+            data_manager._invalidar_instantanea_lecturas()
+            
+            inicio = time.perf_counter()
+            resultado = funcion()
+            duracion = (time.perf_counter() - inicio) * 1000
+            
+            # La primera ejecución calienta importaciones y cachés de Python
+            if repeticion:
+                tiempos.append(duracion)
+        
+        resultados.append({
+            'caso': nombre,
+            'repeticiones': repeticiones,
+            'mediana_ms': float(np.median(tiempos)),
+            'minimo_ms': float(np.min(tiempos)),
+            'maximo_ms': float(np.max(tiempos)),
+            'filas': _filas(resultado)
+        })
+    
+    return resultados
+
+
+def obtener_commit():
+    """Commit actual del repositorio, o None si no se puede obtener."""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ejecutar_proceso(script, argumentos, base, entorno=None):
+    """
+    Ejecuta un script en otro proceso con DATABASE_URL apuntando a una base
+    SQLite, en un directorio temporal (exportar_datos escribe en data/ del
+    directorio actual).
+    
+    Args:
+        script: Ruta del script
+        argumentos: Lista de argumentos del script
+        base: Archivo SQLite
+        entorno: Variables de entorno adicionales
+    
+    Returns:
+        Última línea de la salida del script (su resultado en JSON)
+    """
+    variables = dict(os.environ, DATABASE_URL=f"sqlite:///{base}", INSTRUMENTACION='False', **(entorno or {}))
+    variables.pop('DATABASE_READ_URL', None)
+    
+    with tempfile.TemporaryDirectory() as directorio:
+        proceso = subprocess.run(
+            [sys.executable, os.path.abspath(script), *argumentos],
+            env=variables, cwd=directorio, capture_output=True, text=True
+        )
+    
+    if proceso.returncode != 0:
+        raise RuntimeError(f"Falló {os.path.basename(script)} {' '.join(argumentos)}:\n{proceso.stderr}")
+    
+    return proceso.stdout.strip().splitlines()[-1]
+
+
+def preparar_flota(escala, regenerar=False):
+    """
+    Genera la flota de una escala si todavía no existe.
+    
+    Args:
+        escala: Nombre de la escala
+        regenerar: Si es True, la genera de nuevo aunque exista
+    
+    Returns:
+        Ruta del archivo SQLite de la flota
+    """
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    base = ruta_base(escala)
+    
+    if regenerar or not os.path.exists(base):
+        # Se genera en un archivo temporal para no dejar flotas a medias
+        temporal = f"{base}.tmp"
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        
+        print(f"[{escala}] Generando flota...", flush=True)
+        resumen = json.loads(ejecutar_proceso(__file__, ['--generar', escala], temporal))
+        os.replace(temporal, base)
+        print(f"[{escala}] " + ", ".join(f"{valor} {clave}" for clave, valor in resumen.items()), flush=True)
+    
+    return base
+
+
+def ejecutar(escalas, repeticiones=5, casos=None, regenerar=False):
+    """
+    Genera las flotas que falten, mide cada escala y guarda los resultados.
+    
+    Args:
+        escalas: Nombres de las escalas
+        repeticiones: Mediciones por caso
+        casos: Nombres de los casos a medir, o None para todos
+        regenerar: Si es True, genera de nuevo las flotas existentes
+    
+    Returns:
+        DataFrame con los resultados de esta ejecución
+    """
+    ejecucion = datetime.now()
+    commit = obtener_commit()
+    filas = []
+    
+    for escala in escalas:
+        base = preparar_flota(escala, regenerar)
+        
+        print(f"[{escala}] Midiendo...", flush=True)
+        argumentos = ['--medir', escala, '--repeticiones', str(repeticiones)]
+        if casos:
+            argumentos += ['--casos', *casos]
+        medicion = json.loads(ejecutar_proceso(__file__, argumentos, base))
+        
+        for resultado in medicion['resultados']:
+            filas.append({
+                'ejecucion': ejecucion.strftime('%Y-%m-%d %H:%M:%S'),
+                'commit': commit,
+                'python': platform.python_version(),
+                'escala': escala,
+                'aires': medicion['aires'],
+                'lecturas': medicion['lecturas'],
+                **resultado
+            })
+    
+    resultados_df = pd.DataFrame(filas)
+    
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    archivo = os.path.join(DIRECTORIO, 'resultados.csv')
+    resultados_df.to_csv(archivo, mode='a', header=not os.path.exists(archivo), index=False)
+    
+    return resultados_df
+
+
+def comparar(archivo=None):
+    """
+    Compara, para cada escala, la última ejecución con la anterior.
+    
+    Args:
+        archivo: CSV de resultados (por defecto el de BENCHMARK_DIR)
+    
+    Returns:
+        DataFrame con escala, caso, anterior_ms, actual_ms, cambio y estado
+        (regresión, mejora o igual)
+    """
+    archivo = archivo or os.path.join(DIRECTORIO, 'resultados.csv')
+    if not os.path.exists(archivo):
+        return pd.DataFrame()
+    
+    resultados_df = pd.read_csv(archivo)
+    comparaciones = []
+    
+    for escala, grupo in resultados_df.groupby('escala', sort=False):
+        ejecuciones = sorted(grupo['ejecucion'].unique())
+        if len(ejecuciones) < 2:
+            continue
+        
+        anterior = grupo[grupo['ejecucion'] == ejecuciones[-2]].set_index('caso')['mediana_ms']
+        actual = grupo[grupo['ejecucion'] == ejecuciones[-1]].set_index('caso')['mediana_ms']
+        
+        for caso in actual.index.intersection(anterior.index):
+            cambio = actual[caso] / anterior[caso] - 1 if anterior[caso] else 0.0
+            if abs(actual[caso] - anterior[caso]) < UMBRAL_CAMBIO_MS:
+                estado = 'igual'
+            elif cambio > UMBRAL_CAMBIO:
+                estado = 'regresión'
+            elif cambio < -UMBRAL_CAMBIO:
+                estado = 'mejora'
+            else:
+                estado = 'igual'
+            
+            comparaciones.append({
+                'escala': escala,
+                'caso': caso,
+                'anterior_ms': round(anterior[caso], 1),
+                'actual_ms': round(actual[caso], 1),
+                'cambio': f"{cambio:+.0%}",
+                'estado': estado
+            })
+    
+    return pd.DataFrame(comparaciones)
+
+
+def _proceso_escala(accion, escala, repeticiones, casos):
+    """Generación o medición de una escala dentro del proceso hijo; imprime el resultado en JSON."""
+    from flota_sintetica import generar_flota
+    
+    if accion == 'generar':
+        data_manager, resumen = generar_flota(**ESCALAS[escala], hasta=FECHA_FINAL, semilla=SEMILLA)
+        data_manager.cerrar()
+        print(json.dumps(resumen))
+        return
+    
+    from data_manager import DataManager
+    from database import session, Lectura, LecturaHoraria
+    from sqlalchemy import func
+    
+    data_manager = DataManager()
+    lecturas = (session.query(func.count(Lectura.id)).scalar()
+                + (session.query(func.sum(LecturaHoraria.cantidad)).scalar() or 0))
+    
+    print(json.dumps({
+        'aires': len(data_manager.obtener_catalogo_aires()),
+        'lecturas': lecturas,
+        'resultados': medir(data_manager, repeticiones, casos)
+    }))
+    data_manager.cerrar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de DataManager y utils sobre flotas sintéticas")
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=list(ESCALAS), help="Escalas a medir")
+    parser.add_argument('--repeticiones', type=int, default=5, help="Mediciones por caso")
+    parser.add_argument('--casos', nargs='+', help="Casos a medir (por defecto, todos)")
+    parser.add_argument('--regenerar', action='store_true', help="Generar de nuevo las flotas existentes")
+    parser.add_argument('--comparar', action='store_true', help="Solo comparar las dos últimas ejecuciones")
+    # Uso interno: generación y medición de una escala en un proceso aparte
+    parser.add_argument('--generar', choices=list(ESCALAS), help=argparse.SUPPRESS)
+    parser.add_argument('--medir', choices=list(ESCALAS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.generar or args.medir:
+        _proceso_escala('generar' if args.generar else 'medir', args.generar or args.medir,
+                        args.repeticiones, args.casos)
+        return
+    
+    if not args.comparar:
+        resultados_df = ejecutar(args.escalas, args.repeticiones, args.casos, args.regenerar)
+        print(resultados_df[['escala', 'caso', 'mediana_ms', 'minimo_ms', 'maximo_ms', 'filas']].to_string(index=False))
+    
+    comparacion_df = comparar()
+    if not comparacion_df.empty:
+        print("\nComparación con la ejecución anterior:")
+        print(comparacion_df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+Benchmarks de renderizado de las páginas de app.py con presupuestos.
+
+Complementa a benchmark.py: en lugar de métodos sueltos, mide la ejecución
+completa del script de Streamlit para cada página del menú, como la vería
+un administrador, con streamlit.testing (AppTest, sin navegador ni
+servidor). Usa las mismas flotas sintéticas por escala que benchmark.py.
+
+Para cada página se registra el tiempo de la primera visita, la mediana de
+las siguientes y el pico de memoria de Python (tracemalloc, en una
+ejecución aparte porque ralentiza la página). Si la mediana o el pico
+superan el presupuesto de la página en esa escala, el resultado se marca y
+el comando termina con código 1, así que se puede usar como prueba en CI.
+BENCHMARK_FACTOR_PRESUPUESTO multiplica todos los presupuestos para
+máquinas más lentas.
+
+Uso:
+    python benchmark_paginas.py                                  # todas las escalas
+    python benchmark_paginas.py --escalas pequena --paginas Dashboard "Exportar Datos"
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmark import DIRECTORIO, ESCALAS, ejecutar_proceso, obtener_commit, preparar_flota
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+# Presupuesto por defecto de una página en cada escala: (milisegundos, MB)
+PRESUPUESTO = {
+    'pequena': (1500, 50),
+    'mediana': (3000, 150),
+    'grande': (6000, 400)
+}
+
+# Páginas que cargan todas las lecturas: multiplicador de su presupuesto
+PRESUPUESTO_PAGINA = {
+    'Dashboard': 1.5,
+    'Análisis y Estadísticas': 2.0,
+    'Exportar Datos': 1.5
+}
+
+FACTOR_PRESUPUESTO = float(os.environ.get('BENCHMARK_FACTOR_PRESUPUESTO', 1.0))
+
+# Segundos máximos de una ejecución del script dentro de AppTest
+TIEMPO_MAXIMO = 300
+
+
+def presupuesto(escala, pagina):
+    """
+    Returns:
+        Tupla (milisegundos, MB) permitidos para una página en una escala
+    """
+    milisegundos, megabytes = PRESUPUESTO[escala]
+    factor = PRESUPUESTO_PAGINA.get(pagina, 1.0) * FACTOR_PRESUPUESTO
+    return milisegundos * factor, megabytes * factor
+
+
+def medir_paginas(repeticiones=3, paginas=None):
+    """
+    Renderiza cada página del menú de administrador con AppTest.
+    
+    Args:
+        repeticiones: Visitas medidas de cada página después de la primera
+        paginas: Nombres de las páginas a medir, o None para todas
+    
+    Returns:
+        Lista de diccionarios con pagina, primera_ms, mediana_ms, maximo_ms,
+        memoria_mb y error
+    """
+    from streamlit.testing.v1 import AppTest
+    
+    app = AppTest.from_file(APP, default_timeout=TIEMPO_MAXIMO)
+    app.session_state['logged_in'] = True
+    app.session_state['user_role'] = 'admin'
+    app.session_state['user_id'] = 1
+    app.session_state['user_name'] = 'Benchmark'
+    
+    # Primera ejecución: importaciones, DataManager y catálogo
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].message)
+    
+    menu = list(app.sidebar.radio[0].options)
+    resultados = []
+    
+    for pagina in (paginas or menu):
+        if pagina not in menu:
+            raise ValueError(f"La página {pagina!r} no está en el menú")
+        
+        tiempos = []
+        error = None
+        for repeticion in range(repeticiones + 1):
+            inicio = time.perf_counter()
+            app.sidebar.radio[0].set_value(pagina).run()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            
+            if app.exception:
+                error = app.exception[0].message
+                break
+        
+        # Pico de memoria en una visita aparte
+        tracemalloc.start()
+        tracemalloc.reset_peak()
+        antes = tracemalloc.get_traced_memory()[0]
+        app.sidebar.radio[0].set_value(pagina).run()
+        memoria = (tracemalloc.get_traced_memory()[1] - antes) / 1024 ** 2
+        tracemalloc.stop()
+        
+        siguientes = tiempos[1:] or tiempos
+        resultados.append({
+            'pagina': pagina,
+            'primera_ms': tiempos[0],
+            'mediana_ms': float(np.median(siguientes)),
+            'maximo_ms': float(np.max(siguientes)),
+            'memoria_mb': memoria,
+            'error': error
+        })
+    
+    return resultados
+
+
+def ejecutar(escalas, repeticiones=3, paginas=None, regenerar=False):
+    """
+    Mide las páginas en cada escala, compara con los presupuestos y guarda
+    los resultados en paginas.csv.
+    
+    Args:
+        escalas: Nombres de las escalas
+        repeticiones: Visitas medidas de cada página
+        paginas: Nombres de las páginas, o None para todas
+        regenerar: Si es True, genera de nuevo las flotas existentes
+    
+    Returns:
+        DataFrame con los resultados y las columnas presupuesto_ms,
+        presupuesto_mb y estado (ok, lenta, memoria o error)
+    """
+    ejecucion = datetime.now()
+    commit = obtener_commit()
+    filas = []
+    
+    for escala in escalas:
+        base = preparar_flota(escala, regenerar)
+        
+        print(f"[{escala}] Renderizando páginas...", flush=True)
+        argumentos = ['--medir', escala, '--repeticiones', str(repeticiones)]
+        if paginas:
+            argumentos += ['--paginas', *paginas]
+        resultados = json.loads(ejecutar_proceso(__file__, argumentos, base))
+        
+        for resultado in resultados:
+            presupuesto_ms, presupuesto_mb = presupuesto(escala, resultado['pagina'])
+            
+            if resultado['error']:
+                estado = 'error'
+            elif resultado['mediana_ms'] > presupuesto_ms:
+                estado = 'lenta'
+            elif resultado['memoria_mb'] > presupuesto_mb:
+                estado = 'memoria'
+            else:
+                estado = 'ok'
+            
+            filas.append({
+                'ejecucion': ejecucion.strftime('%Y-%m-%d %H:%M:%S'),
+                'commit': commit,
+                'python': platform.python_version(),
+                'escala': escala,
+                **resultado,
+                'presupuesto_ms': presupuesto_ms,
+                'presupuesto_mb': presupuesto_mb,
+                'estado': estado
+            })
+    
+    resultados_df = pd.DataFrame(filas)
+    
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    archivo = os.path.join(DIRECTORIO, 'paginas.csv')
+    resultados_df.to_csv(archivo, mode='a', header=not os.path.exists(archivo), index=False)
+    
+    return resultados_df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de renderizado de las páginas con presupuestos")
+    parser.add_argument('--escalas', nargs='+', choices=list(ESCALAS), default=list(ESCALAS), help="Escalas a medir")
+    parser.add_argument('--repeticiones', type=int, default=3, help="Visitas medidas de cada página")
+    parser.add_argument('--paginas', nargs='+', help="Páginas a medir (por defecto, todas las del menú)")
+    parser.add_argument('--regenerar', action='store_true', help="Generar de nuevo las flotas existentes")
+    # Uso interno: medición de una escala en un proceso aparte
+    parser.add_argument('--medir', choices=list(ESCALAS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.medir:
+        print(json.dumps(medir_paginas(args.repeticiones, args.paginas)))
+        return
+    
+    resultados_df = ejecutar(args.escalas, args.repeticiones, args.paginas, args.regenerar)
+    
+    columnas = ['escala', 'pagina', 'primera_ms', 'mediana_ms', 'presupuesto_ms', 'memoria_mb', 'presupuesto_mb', 'estado']
+    print(resultados_df[columnas].round(1).to_string(index=False))
+    
+    fuera = resultados_df[resultados_df['estado'] != 'ok']
+    if not fuera.empty:
+        for _, fila in fuera.iterrows():
+            detalle = f": {fila['error']}" if fila['estado'] == 'error' else ""
+            print(f"FUERA DE PRESUPUESTO [{fila['escala']}] {fila['pagina']} ({fila['estado']}){detalle}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
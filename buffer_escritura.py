@@ -0,0 +1,129 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BufferEscritura:
+    """
+    Agrupa escrituras individuales en commits por lotes (group commit).
+    
+    Las lecturas encoladas se escriben desde un hilo propio en un solo commit
+    cuando se reúnen max_lote elementos o cuando la más antigua lleva
+    max_espera segundos en la cola. Cada llamador recibe un Future que se
+    resuelve con el ID de su lectura solo después de que su lote se haya
+    confirmado en la base de datos. Si el commit del lote falla, cada lectura
+    se reintenta por separado y solo fallan los Future de las que no se
+    puedan escribir.
+    """
+    
+    def __init__(self, escribir_lote, max_lote=500, max_espera=0.002):
+        """
+        Args:
+            escribir_lote: Función que recibe una lista de lecturas, las confirma
+                en la base de datos y devuelve sus IDs en el mismo orden
+            max_lote: Número máximo de lecturas por commit
+            max_espera: Segundos máximos que una lectura espera su commit
+        """
+        self.escribir_lote = escribir_lote
+        self.max_lote = max_lote
+        self.max_espera = max_espera
+        
+        self._cola = queue.Queue()
+        self._cerrado = False
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._bucle, name="buffer-escritura", daemon=True)
+        self._hilo.start()
+    
+    def encolar(self, lectura):
+        """
+        Encola una lectura para el próximo commit de grupo.
+        
+        Args:
+            lectura: Diccionario con aire_id, fecha, temperatura y humedad
+        
+        Returns:
+            Future que se resuelve con el ID de la lectura
+        """
+        futuro = Future()
+        
+        with self._lock:
+            if self._cerrado:
+                raise RuntimeError("El buffer de escritura está cerrado")
+            self._cola.put((lectura, futuro))
+        
+        return futuro
+    
+    def vaciar(self):
+        """Espera a que todas las lecturas encoladas hasta ahora estén confirmadas."""
+        marca = Future()
+        
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cola.put((None, marca))
+        
+        marca.result()
+    
+    def cerrar(self):
+        """Deja de aceptar lecturas, confirma las pendientes y detiene el hilo."""
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._cola.put(None)
+        
+        self._hilo.join()
+    
+    def _bucle(self):
+        while True:
+            elemento = self._cola.get()
+            if elemento is None:
+                return
+            
+            grupo = [elemento]
+            limite = time.monotonic() + self.max_espera
+            terminar = False
+            
+            # Reunir más lecturas hasta completar el lote o agotar el plazo; una
+            # marca de vaciar() confirma en el acto lo reunido hasta entonces
+            while len(grupo) < self.max_lote and elemento[0] is not None:
+                restante = limite - time.monotonic()
+                try:
+                    elemento = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if elemento is None:
+                    terminar = True
+                    break
+                grupo.append(elemento)
+            
+            self._confirmar_grupo(grupo)
+            
+            if terminar:
+                return
+    
+    def _confirmar_grupo(self, grupo):
+        lecturas = [lectura for lectura, _ in grupo if lectura is not None]
+        futuros = [futuro for lectura, futuro in grupo if lectura is not None]
+        
+        if lecturas:
+            try:
+                ids = self.escribir_lote(lecturas)
+            except Exception:
+                # Una lectura no válida no debe hacer fallar las del resto de
+                # llamadores: cada una se reintenta en su propio commit y solo
+                # falla el Future de la que vuelva a fallar
+                for lectura, futuro in zip(lecturas, futuros):
+                    try:
+                        futuro.set_result(self.escribir_lote([lectura])[0])
+                    except Exception as e:
+                        futuro.set_exception(e)
+            else:
+                for futuro, lectura_id in zip(futuros, ids):
+                    futuro.set_result(lectura_id)
+        
+        # Las marcas de vaciar() se resuelven cuando todo lo anterior está confirmado
+        for lectura, futuro in grupo:
+            if lectura is None:
+                futuro.set_result(None)
@@ -0,0 +1,61 @@
+"""
+Catálogo en memoria de los aires acondicionados.
+
+Las páginas necesitan el nombre y la ubicación de los aires para etiquetas,
+selectores y tablas. En lugar de consultar la tabla y unir DataFrames en
+cada renderizado, DataManager guarda una instantánea inmutable con
+búsquedas por diccionario (id → nombre, id → ubicación, ubicación → ids) y
+la sustituye por otra, con una versión nueva, cada vez que se crea,
+modifica o elimina un aire.
+"""
+import pandas as pd
+
+COLUMNAS = ['id', 'nombre', 'ubicacion', 'fecha_instalacion']
+
+
+class CatalogoAires:
+    """
+    Instantánea de los aires acondicionados.
+    
+    Args:
+        aires: Lista de diccionarios con id, nombre, ubicacion y fecha_instalacion
+        version: Número de versión del catálogo
+    """
+    
+    def __init__(self, aires, version=0):
+        aires = sorted(aires, key=lambda aire: aire['id'])
+        
+        self.version = version
+        self.ids = [aire['id'] for aire in aires]
+        self.nombres = {aire['id']: aire['nombre'] for aire in aires}
+        self.ubicaciones = {aire['id']: aire['ubicacion'] for aire in aires}
+        
+        self.aires_por_ubicacion = {}
+        for aire in aires:
+            self.aires_por_ubicacion.setdefault(aire['ubicacion'], []).append(aire['id'])
+        
+        # Opciones de los selectores: (etiqueta, id)
+        self.opciones = [(f"{aire['nombre']} (ID: {aire['id']})", aire['id']) for aire in aires]
+        
+        self._aires_df = pd.DataFrame(aires, columns=COLUMNAS)
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    def __contains__(self, aire_id):
+        return aire_id in self.nombres
+    
+    def nombre(self, aire_id, defecto=None):
+        """Nombre de un aire, o defecto si no existe."""
+        return self.nombres.get(aire_id, defecto)
+    
+    def opciones_con_todos(self, etiqueta="Todos los aires"):
+        """Opciones de selector con una primera opción (etiqueta, None)."""
+        return [(etiqueta, None)] + self.opciones
+    
+    def a_dataframe(self):
+        """
+        Returns:
+            DataFrame con id, nombre, ubicacion y fecha_instalacion
+        """
+        return self._aires_df.copy()
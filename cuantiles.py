@@ -0,0 +1,145 @@
+"""
+Resúmenes de cuantiles (t-digest) fusionables.
+
+Un t-digest resume una distribución con unos pocos centroides (media y
+peso), pequeños en las colas y grandes en el centro, de modo que los
+percentiles extremos (p95, p99) se estiman con precisión ocupando un
+tamaño fijo. Dos resúmenes se fusionan juntando sus centroides y
+volviendo a comprimir, así que un resumen por aire y día se puede
+combinar en cualquier rango de fechas sin leer las lecturas.
+
+La compresión agrupa los centroides ordenados según la función de escala
+k1 (k = δ/2π · asen(2q - 1)): cada grupo abarca como máximo una unidad de k.
+"""
+import os
+
+import numpy as np
+
+# Parámetro δ: el resumen guarda unos δ/2 centroides
+COMPRESION = float(os.environ.get('CUANTILES_COMPRESION', 100))
+
+# Percentiles mostrados en los informes
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+class TDigest:
+    """
+    Resumen de cuantiles de una variable.
+    
+    Args:
+        compresion: Parámetro δ del t-digest
+    """
+    
+    def __init__(self, compresion=COMPRESION):
+        self.compresion = compresion
+        self.medias = np.empty(0)
+        self.pesos = np.empty(0)
+        self.minimo = np.inf
+        self.maximo = -np.inf
+    
+    @property
+    def total(self):
+        return float(self.pesos.sum())
+    
+    def agregar(self, valores, pesos=None):
+        """
+        Añade valores al resumen.
+        
+        Args:
+            valores: Secuencia de valores
+            pesos: Opcional, número de observaciones que representa cada valor
+        """
+        valores = np.asarray(valores, dtype=float)
+        if valores.size == 0:
+            return
+        
+        if pesos is None:
+            pesos = np.ones(valores.size)
+        
+        self.minimo = min(self.minimo, valores.min())
+        self.maximo = max(self.maximo, valores.max())
+        self._comprimir(
+            np.concatenate([self.medias, valores]),
+            np.concatenate([self.pesos, np.asarray(pesos, dtype=float)])
+        )
+    
+    def fusionar(self, *otros):
+        """
+        Añade al resumen los centroides de otros resúmenes, con una sola
+        compresión para todos.
+        
+        Args:
+            otros: TDigest a fusionar
+        """
+        otros = [otro for otro in otros if otro.pesos.size]
+        if not otros:
+            return
+        
+        self.minimo = min([self.minimo] + [otro.minimo for otro in otros])
+        self.maximo = max([self.maximo] + [otro.maximo for otro in otros])
+        self._comprimir(
+            np.concatenate([self.medias] + [otro.medias for otro in otros]),
+            np.concatenate([self.pesos] + [otro.pesos for otro in otros])
+        )
+    
+    def _comprimir(self, medias, pesos):
+        orden = np.argsort(medias, kind='stable')
+        medias = medias[orden]
+        pesos = pesos[orden]
+        
+        total = pesos.sum()
+        
+        # Cuantil en el centro de cada centroide y su grupo según la escala k1
+        q = (np.cumsum(pesos) - pesos / 2) / total
+        k = self.compresion / (2 * np.pi) * np.arcsin(2 * q - 1)
+        grupos = np.floor(k - k[0]).astype(np.int64)
+        
+        # Renumerar los grupos de forma consecutiva y sumar por grupo
+        _, grupos = np.unique(grupos, return_inverse=True)
+        pesos_grupo = np.bincount(grupos, weights=pesos)
+        
+        self.medias = np.bincount(grupos, weights=medias * pesos) / pesos_grupo
+        self.pesos = pesos_grupo
+    
+    def cuantil(self, q):
+        """
+        Estima el cuantil q (entre 0 y 1).
+        
+        Returns:
+            Valor estimado, o None si el resumen está vacío
+        """
+        if self.pesos.size == 0:
+            return None
+        if self.pesos.size == 1:
+            return float(self.medias[0])
+        
+        total = self.pesos.sum()
+        
+        # Interpolar entre los centros de los centroides, con el mínimo y el
+        # máximo como extremos
+        posiciones = np.concatenate([[0.0], np.cumsum(self.pesos) - self.pesos / 2, [total]])
+        valores = np.concatenate([[self.minimo], self.medias, [self.maximo]])
+        
+        return float(np.interp(q * total, posiciones, valores))
+    
+    def a_bytes(self):
+        """
+        Serializa el resumen para guardarlo en la base de datos.
+        """
+        cabecera = np.array([self.compresion, self.minimo, self.maximo], dtype='<f8')
+        centroides = np.column_stack([self.medias, self.pesos]).astype('<f8').ravel()
+        return np.concatenate([cabecera, centroides]).tobytes()
+    
+    @classmethod
+    def desde_bytes(cls, datos):
+        """
+        Reconstruye un resumen serializado con a_bytes.
+        """
+        valores = np.frombuffer(datos, dtype='<f8')
+        digest = cls(compresion=valores[0])
+        digest.minimo = valores[1]
+        digest.maximo = valores[2]
+        centroides = valores[3:].reshape(-1, 2)
+        digest.medias = centroides[:, 0].copy()
+        digest.pesos = centroides[:, 1].copy()
+        return digest
@@ -2,14 +2,49 @@ import pandas as pd
 import os
 import numpy as np
 import io
-from datetime import datetime
-from database import session, AireAcondicionado, Lectura, Mantenimiento, UmbralConfiguracion, Usuario, init_db
+from datetime import datetime, timedelta
+from database import session, Session, SessionReplica, AireAcondicionado, Lectura, LecturaHoraria, EstadoAnomalia, EstadoAlerta, CuantilesDiarios, Mantenimiento, UmbralConfiguracion, Usuario, GeneracionLecturas, init_db, truncar_fecha, extraer_fecha, insertar_con_conflicto, normalizar_fecha, incrementar_generacion_lecturas
 from cryptography.fernet import Fernet
 import hashlib
-from sqlalchemy import func, distinct
+import atexit
+import threading
+import weakref
+from types import SimpleNamespace
+from sqlalchemy import delete, event, func, insert, or_, select, tuple_
+from buffer_escritura import BufferEscritura
+from anomalias import evaluar_lectura
+from histeresis import evaluar_estado, lado_superado, HISTERESIS, LIMITES
+import tendencias
+from notificaciones import DespachadorAlertas, crear_salidas_desde_entorno
+from cuantiles import TDigest, PERCENTILES
+from catalogo import CatalogoAires
+from replica import EnrutadorConsultas, solo_lectura
+import instantanea
+from instantanea import InstantaneaLecturas, columnas_desde_filas, columnas_a_dataframe
+
+# Qué hacer con una lectura cuyo (aire_id, fecha) ya está guardado: fallar,
+# conservar la guardada o sustituir su temperatura y humedad
+MODOS_INSERCION = ('insertar', 'ignorar', 'actualizar')
+
+# Con varios escritores a la vez (buffer de escritura, servidor de ingesta,
+# sesiones de Streamlit) una lectura con un ID menor puede confirmarse después
+# que otra con un ID mayor. Las consultas incrementales por ID vuelven a revisar
+# este número de IDs por debajo de su cursor para no perderla
+MARGEN_IDS_TARDIOS = int(os.environ.get('LECTURAS_MARGEN_IDS_TARDIOS', 5000))
+
+# Enrutadores de consultas de las instancias vivas de DataManager. Un único
+# listener para todo el proceso: registrarlo por instancia acumulaba uno más
+# (y mantenía viva la instancia) cada vez que se creaba un DataManager
+_enrutadores_consultas = weakref.WeakSet()
+
+@event.listens_for(Session, 'after_commit')
+def _registrar_escritura(sesion):
+    # Cada commit en la principal abre la ventana de escritura (ver replica.py)
+    for enrutador in list(_enrutadores_consultas):
+        enrutador.registrar_escritura()
 
 class DataManager:
-    def __init__(self):
+    def __init__(self, buffer_escritura=None):
         self.data_dir = "data"
         self.aires_file = os.path.join(self.data_dir, "aires_acondicionados.csv")
         self.lecturas_file = os.path.join(self.data_dir, "lecturas.csv")
@@ -21,8 +56,53 @@ class DataManager:
         # Inicializar la base de datos
         init_db()
         
+        # Consultas de solo lectura en la réplica (si DATABASE_READ_URL está
+        # configurada); cada commit en la principal las devuelve un tiempo a ella
+        self.consultas = EnrutadorConsultas(session, SessionReplica)
+        _enrutadores_consultas.add(self.consultas)
+        
+        # Instantánea en disco de las lecturas: obtener_lecturas solo consulta
+        # las posteriores a ella (ver instantanea.py)
+        self.instantanea_lecturas = None
+        self._instantanea_comprobada = False
+        self._lock_instantanea = threading.Lock()
+        if instantanea.HABILITADA:
+            self.instantanea_lecturas = InstantaneaLecturas(
+                os.environ.get('INSTANTANEA_LECTURAS_DIR', os.path.join(self.data_dir, 'instantanea_lecturas')),
+                instantanea.identificar_base(session.get_bind().url)
+            )
+            self.instantanea_lecturas.abrir()
+        
+        # Catálogo de aires en memoria; se vuelve a cargar tras escribir aires
+        self._catalogo_aires = None
+        self._version_catalogo = 0
+        
         # Migrar datos de CSV a base de datos si es necesario
         self.migrar_datos_si_necesario()
+        
+        # Resúmenes de cuantiles de las lecturas anteriores a su introducción
+        if session.query(CuantilesDiarios.id).first() is None and self.hay_lecturas():
+            self.reconstruir_cuantiles()
+        
+        # Ajustes de tendencia por (ventana, modelo), válidos mientras no lleguen lecturas nuevas
+        # (ver _ajustar_tendencias)
+        self._cache_tendencias = {}
+        
+        # Sumas de los mapas de calor por filtro, con el ID de la última lectura incluida
+        self._cache_mapas_calor = {}
+        
+        # Modo de escritura agrupada de lecturas (opcional)
+        self.buffer_lecturas = None
+        if buffer_escritura is None:
+            buffer_escritura = os.environ.get('BUFFER_LECTURAS', 'False').lower() == 'true'
+        if buffer_escritura:
+            self.activar_buffer_escritura()
+        
+        # Envío de alertas de umbrales (si hay alguna salida configurada)
+        self.despachador_alertas = None
+        salidas = crear_salidas_desde_entorno()
+        if salidas:
+            self.activar_alertas(salidas)
     
     def migrar_datos_si_necesario(self):
         # Verificar si hay datos en la base de datos
@@ -53,6 +133,8 @@ class DataManager:
                     session.add(aire)
                 session.commit()
             
+            self._invalidar_catalogo_aires()
+            
             # Migrar lecturas si existen
             if os.path.exists(self.lecturas_file):
                 lecturas_df = pd.read_csv(self.lecturas_file)
@@ -72,40 +154,182 @@ class DataManager:
                         session.add(lectura)
                     session.commit()
     
+    def obtener_catalogo_aires(self):
+        """
+        Obtiene el catálogo en memoria de los aires (nombres, ubicaciones y
+        opciones de selección). Se carga con una consulta la primera vez y tras
+        cada alta, modificación o baja de un aire.
+        
+        Returns:
+            CatalogoAires
+        """
+        catalogo = self._catalogo_aires
+        
+        if catalogo is None:
+            # Sesión propia: también se usa desde el hilo del buffer de escritura
+            with Session() as sesion:
+                aires = [
+                    {
+                        'id': aire.id,
+                        'nombre': aire.nombre,
+                        'ubicacion': aire.ubicacion,
+                        'fecha_instalacion': aire.fecha_instalacion
+                    }
+                    for aire in sesion.query(AireAcondicionado).all()
+                ]
+            
+            self._version_catalogo += 1
+            catalogo = CatalogoAires(aires, version=self._version_catalogo)
+            self._catalogo_aires = catalogo
+        
+        return catalogo
+    
+    def _invalidar_catalogo_aires(self):
+        self._catalogo_aires = None
+    
     def obtener_aires(self):
-        # Consultar todos los aires de la base de datos
-        aires = session.query(AireAcondicionado).all()
+        # Los aires se sirven desde el catálogo en memoria
+        return self.obtener_catalogo_aires().a_dataframe()
+    
+    @solo_lectura
+    def obtener_lecturas(self, incluir_compactadas=False):
+        """
+        Obtiene todas las lecturas.
         
-        # Convertir a DataFrame
-        aires_data = [
-            {
-                'id': aire.id,
-                'nombre': aire.nombre,
-                'ubicacion': aire.ubicacion,
-                'fecha_instalacion': aire.fecha_instalacion
-            }
-            for aire in aires
-        ]
+        Args:
+            incluir_compactadas: Si es True, añade una fila por cada hora compactada
+                por la política de retención (ver compactar_lecturas)
+        
+        Returns:
+            DataFrame con las lecturas
+        """
+        sesion = self.consultas.sesion
+        
+        if self.instantanea_lecturas is not None:
+            lecturas_df = self._lecturas_desde_instantanea()
+        else:
+            # Consultar todas las lecturas de la base de datos
+            lecturas = sesion.query(Lectura).all()
+            
+            # Convertir a DataFrame
+            lecturas_data = [
+                {
+                    'id': lectura.id,
+                    'aire_id': lectura.aire_id,
+                    'fecha': lectura.fecha,
+                    'temperatura': lectura.temperatura,
+                    'humedad': lectura.humedad
+                }
+                for lectura in lecturas
+            ]
+            
+            lecturas_df = pd.DataFrame(lecturas_data)
+        
+        if incluir_compactadas:
+            lecturas_df = self._agregar_lecturas_compactadas(lecturas_df)
         
-        return pd.DataFrame(aires_data)
+        return lecturas_df
     
-    def obtener_lecturas(self):
-        # Consultar todas las lecturas de la base de datos
-        lecturas = session.query(Lectura).all()
+    def _lecturas_desde_instantanea(self):
+        """
+        Todas las lecturas: las de la instantánea en disco, sin copiarlas, más
+        la cola de lecturas con id posterior, que se consulta a la base de datos.
+        """
+        # Siempre en la base de datos principal, la que identifica la instantánea:
+        # una réplica con retraso la validaría o reconstruiría sin las últimas lecturas
+        sesion = session
+        columnas_lectura = (Lectura.id, Lectura.aire_id, Lectura.fecha, Lectura.temperatura, Lectura.humedad)
+        instantanea_lecturas = self.instantanea_lecturas
+        generacion_actual = select(GeneracionLecturas.generacion).scalar_subquery()
+        
+        with self._lock_instantanea:
+            if instantanea_lecturas.disponible and not self._instantanea_comprobada:
+                # Una vez por proceso, un recuento completo: detecta lecturas
+                # eliminadas fuera de DataManager, que no cambian la generación
+                en_base = sesion.query(func.count(Lectura.id)).filter(
+                    Lectura.id <= instantanea_lecturas.max_id
+                ).scalar()
+                if en_base != instantanea_lecturas.filas:
+                    instantanea_lecturas.invalidar()
+            self._instantanea_comprobada = True
+            
+            if instantanea_lecturas.disponible:
+                # La instantánea solo sirve si no se ha eliminado, compactado ni
+                # actualizado ninguna lectura desde que se creó (generación) y no
+                # se ha confirmado tarde ninguna por debajo de su último id
+                guardadas = instantanea_lecturas.leer()
+                corte = instantanea_lecturas.max_id - MARGEN_IDS_TARDIOS
+                en_margen = len(guardadas['id']) - int(np.searchsorted(guardadas['id'], corte, side='right'))
+                
+                generacion, en_base = sesion.query(generacion_actual, func.count(Lectura.id)).filter(
+                    Lectura.id > corte, Lectura.id <= instantanea_lecturas.max_id
+                ).one()
+                if (generacion or 0) != instantanea_lecturas.generacion or en_base != en_margen:
+                    instantanea_lecturas.invalidar()
+            
+            if not instantanea_lecturas.disponible:
+                generacion, = sesion.query(generacion_actual).one()
+                columnas = columnas_desde_filas(sesion.query(*columnas_lectura).order_by(Lectura.id).all())
+                instantanea_lecturas.escribir(columnas, generacion or 0)
+            else:
+                cola = columnas_desde_filas(
+                    sesion.query(*columnas_lectura)
+                    .filter(Lectura.id > instantanea_lecturas.max_id)
+                    .order_by(Lectura.id)
+                    .all()
+                )
+                
+                if len(cola['id']) >= instantanea.MINIMO_ANEXAR and instantanea_lecturas.anexar(cola):
+                    columnas = instantanea_lecturas.leer()
+                else:
+                    columnas = guardadas if not len(cola['id']) else {
+                        columna: np.concatenate([guardadas[columna], cola[columna]]) for columna in guardadas
+                    }
+        
+        # Sin lecturas, el mismo DataFrame vacío que sin instantánea
+        if not len(columnas['id']):
+            return pd.DataFrame()
         
-        # Convertir a DataFrame
-        lecturas_data = [
+        return columnas_a_dataframe(columnas)
+    
+    def _agregar_lecturas_compactadas(self, lecturas_df, aire_id=None):
+        sesion = self.consultas.sesion
+        
+        # Las horas compactadas se devuelven como una lectura con los promedios y
+        # columnas extra (cantidad, mínimos, máximos y sumas de cuadrados) que
+        # utils usa para ponderar las estadísticas
+        query = sesion.query(LecturaHoraria)
+        
+        if aire_id is not None:
+            query = query.filter(LecturaHoraria.aire_id == aire_id)
+        
+        horas = query.all()
+        
+        if not horas:
+            return lecturas_df
+        
+        compactadas_df = pd.DataFrame([
             {
-                'id': lectura.id,
-                'aire_id': lectura.aire_id,
-                'fecha': lectura.fecha,
-                'temperatura': lectura.temperatura,
-                'humedad': lectura.humedad
+                'id': None,
+                'aire_id': h.aire_id,
+                'fecha': h.hora,
+                'temperatura': h.temperatura_promedio,
+                'humedad': h.humedad_promedio,
+                'cantidad': h.cantidad,
+                'temperatura_min': h.temperatura_min,
+                'temperatura_max': h.temperatura_max,
+                'temperatura_suma_cuadrados': h.temperatura_suma_cuadrados,
+                'humedad_min': h.humedad_min,
+                'humedad_max': h.humedad_max,
+                'humedad_suma_cuadrados': h.humedad_suma_cuadrados
             }
-            for lectura in lecturas
-        ]
+            for h in horas
+        ])
         
-        return pd.DataFrame(lecturas_data)
+        if lecturas_df.empty:
+            return compactadas_df
+        
+        return pd.concat([compactadas_df, lecturas_df], ignore_index=True)
     
     def agregar_aire(self, nombre, ubicacion, fecha_instalacion):
         # Crear nuevo aire acondicionado en la base de datos
@@ -117,51 +341,1079 @@ class DataManager:
         
         session.add(nuevo_aire)
         session.commit()
+        self._invalidar_catalogo_aires()
+        
+        return nuevo_aire.id
+        
+    def actualizar_aire(self, aire_id, nombre, ubicacion, fecha_instalacion):
+        """
+        Actualiza la información de un aire acondicionado.
+        
+        Args:
+            aire_id: ID del aire acondicionado a actualizar
+            nombre: Nuevo nombre
+            ubicacion: Nueva ubicación
+            fecha_instalacion: Nueva fecha de instalación
+            
+        Returns:
+            True si se actualizó correctamente, False en caso contrario
+        """
+        aire = session.query(AireAcondicionado).filter(AireAcondicionado.id == aire_id).first()
+        
+        if aire:
+            aire.nombre = nombre
+            aire.ubicacion = ubicacion
+            aire.fecha_instalacion = fecha_instalacion
+            
+            session.commit()
+            self._invalidar_catalogo_aires()
+            return True
+        
+        return False
+    
+    def activar_buffer_escritura(self, max_lote=None, max_espera=None):
+        """
+        Activa el modo de escritura agrupada para agregar_lectura.
+        
+        Las lecturas se confirman en grupos de hasta max_lote lecturas o cada
+        max_espera segundos, en una sesión propia del hilo de escritura.
+        
+        Args:
+            max_lote: Número máximo de lecturas por commit (por defecto BUFFER_LECTURAS_MAX_LOTE o 500)
+            max_espera: Segundos máximos de espera por commit (por defecto BUFFER_LECTURAS_MAX_ESPERA_MS o 2 ms)
+        """
+        if self.buffer_lecturas is not None:
+            return
+        
+        if max_lote is None:
+            max_lote = int(os.environ.get('BUFFER_LECTURAS_MAX_LOTE', 500))
+        if max_espera is None:
+            max_espera = float(os.environ.get('BUFFER_LECTURAS_MAX_ESPERA_MS', 2)) / 1000
+        
+        self._sesion_buffer = Session()
+        self.buffer_lecturas = BufferEscritura(
+            self._escribir_lote_buffer,
+            max_lote=max_lote,
+            max_espera=max_espera
+        )
+        
+        # Confirmar las lecturas pendientes al terminar el proceso
+        atexit.register(self.cerrar)
+    
+    def activar_alertas(self, salidas, intervalo_resumen=None, ventana_deduplicacion=None, max_envios_hora=None):
+        """
+        Activa el envío de las alertas de umbral que se activen al insertar lecturas.
+        
+        Args:
+            salidas: Lista de salidas (ver notificaciones.py)
+            intervalo_resumen: Segundos entre resúmenes (por defecto ALERTAS_INTERVALO_RESUMEN o 300)
+            ventana_deduplicacion: Segundos en que se agrupan las repeticiones (por defecto ALERTAS_VENTANA_DEDUPLICACION o 3600)
+            max_envios_hora: Resúmenes máximos por destinatario y hora (por defecto ALERTAS_MAX_ENVIOS_HORA o 4)
+        """
+        if self.despachador_alertas is not None:
+            return
+        
+        if intervalo_resumen is None:
+            intervalo_resumen = float(os.environ.get('ALERTAS_INTERVALO_RESUMEN', 300))
+        if ventana_deduplicacion is None:
+            ventana_deduplicacion = float(os.environ.get('ALERTAS_VENTANA_DEDUPLICACION', 3600))
+        if max_envios_hora is None:
+            max_envios_hora = int(os.environ.get('ALERTAS_MAX_ENVIOS_HORA', 4))
+        
+        self.despachador_alertas = DespachadorAlertas(
+            salidas,
+            intervalo_resumen=intervalo_resumen,
+            ventana_deduplicacion=ventana_deduplicacion,
+            max_envios_hora=max_envios_hora
+        )
+        
+        atexit.register(self.cerrar)
+    
+    def _escribir_lote_buffer(self, lecturas):
+        # Se ejecuta en el hilo del buffer, con su propia sesión. Mismo modo que
+        # agregar_lectura sin buffer: una lectura repetida no hace fallar el lote
+        try:
+            ids, alertas, actualizadas = self._insertar_lecturas(self._sesion_buffer, lecturas, 'actualizar')
+            self._sesion_buffer.commit()
+        except:
+            self._sesion_buffer.rollback()
+            raise
+        
+        if actualizadas:
+            self._invalidar_instantanea_lecturas()
+            self._invalidar_caches_lecturas()
+        self._notificar_alertas(alertas)
+        
+        return ids
+    
+    def vaciar_buffer_escritura(self):
+        """
+        Espera a que todas las lecturas encoladas estén confirmadas.
+        """
+        if self.buffer_lecturas is not None:
+            self.buffer_lecturas.vaciar()
+    
+    def cerrar(self):
+        """
+        Confirma las lecturas pendientes, envía las alertas pendientes y
+        detiene los hilos de escritura y de alertas.
+        """
+        if self.buffer_lecturas is not None:
+            self.buffer_lecturas.cerrar()
+            self._sesion_buffer.close()
+            self.buffer_lecturas = None
+        
+        if self.despachador_alertas is not None:
+            self.despachador_alertas.cerrar()
+            self.despachador_alertas = None
+    
+    def agregar_lectura(self, aire_id, fecha, temperatura, humedad, esperar=True):
+        """
+        Agrega una nueva lectura. Si el aire ya tiene una lectura en esa fecha,
+        se sustituyen su temperatura y humedad.
+        
+        Args:
+            aire_id: ID del aire acondicionado
+            fecha: Fecha y hora de la lectura (datetime o date; con zona horaria
+                se guarda en la hora local)
+            temperatura: Temperatura registrada
+            humedad: Humedad registrada
+            esperar: En modo buffer, si es False devuelve un Future en lugar de esperar el commit
+        
+        Returns:
+            ID de la lectura, o un Future con el ID si esperar=False en modo buffer
+        """
+        if self.buffer_lecturas is not None:
+            futuro = self.buffer_lecturas.encolar({
+                'aire_id': aire_id,
+                'fecha': fecha,
+                'temperatura': temperatura,
+                'humedad': humedad
+            })
+            return futuro.result() if esperar else futuro
+        
+        return self.agregar_lecturas_lote([{
+            'aire_id': aire_id,
+            'fecha': fecha,
+            'temperatura': temperatura,
+            'humedad': humedad
+        }], modo='actualizar')[0]
+    
+    def agregar_lecturas_lote(self, lecturas, modo='insertar'):
+        """
+        Inserta varias lecturas en una sola transacción.
+        
+        (aire_id, fecha) es único. Con modo 'ignorar' o 'actualizar' la
+        inserción es idempotente (INSERT ... ON CONFLICT, sin consultar antes
+        qué lecturas existen), así que un lote se puede reintentar sin duplicar
+        lecturas.
+        
+        Args:
+            lecturas: Lista de diccionarios con aire_id, fecha (como en
+                agregar_lectura), temperatura y humedad
+            modo: Si una lectura ya existe, 'insertar' falla (IntegrityError),
+                'ignorar' conserva la guardada y 'actualizar' sustituye su
+                temperatura y humedad por las nuevas
+        
+        Returns:
+            Lista con los IDs de las lecturas, en el mismo orden; con modo
+            'ignorar', None para las que ya existían
+        """
+        if modo not in MODOS_INSERCION:
+            raise ValueError(f"Modo de inserción desconocido: {modo}")
+        
+        if not lecturas:
+            return []
+        
+        try:
+            ids, alertas, actualizadas = self._insertar_lecturas(session, lecturas, modo)
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        
+        if actualizadas:
+            self._invalidar_instantanea_lecturas()
+            self._invalidar_caches_lecturas()
+        self._notificar_alertas(alertas)
+        
+        return ids
+    
+    def _insertar_lecturas(self, sesion, lecturas, modo='insertar'):
+        # Devuelve los IDs, los eventos de alerta y el número de lecturas existentes actualizadas.
+        # Las fechas se guardan como datetime sin zona: normalizadas, las claves
+        # (aire_id, fecha) coinciden con las que devuelve RETURNING
+        lecturas = [dict(lectura, fecha=normalizar_fecha(lectura['fecha'])) for lectura in lecturas]
+        
+        if modo == 'insertar':
+            # Un único INSERT multi-fila en lugar de un add + commit por lectura
+            ids = sesion.scalars(
+                insert(Lectura).returning(Lectura.id, sort_by_parameter_order=True),
+                lecturas
+            ).all()
+            
+            alertas = self._tras_insertar_lecturas(sesion, [
+                dict(lectura, id=lectura_id) for lectura, lectura_id in zip(lecturas, ids)
+            ])
+            
+            return list(ids), alertas, 0
+        
+        # Una lectura por (aire_id, fecha): PostgreSQL no admite que una sentencia
+        # con ON CONFLICT modifique dos veces la misma fila. Al ignorar se queda la
+        # primera del lote, al actualizar la última
+        unicas = {}
+        for lectura in lecturas:
+            clave = (lectura['aire_id'], lectura['fecha'])
+            if modo == 'actualizar' or clave not in unicas:
+                unicas[clave] = lectura
+        
+        # RETURNING solo devuelve las filas escritas y no en el orden de los
+        # parámetros: los IDs se asocian por (aire_id, fecha)
+        clave_unica = ['aire_id', 'fecha']
+        columnas_devueltas = (Lectura.id, Lectura.aire_id, Lectura.fecha)
+        
+        sentencia = insertar_con_conflicto(Lectura).on_conflict_do_nothing(index_elements=clave_unica)
+        insertadas = {
+            (fila.aire_id, fila.fecha): fila.id
+            for fila in sesion.execute(sentencia.returning(*columnas_devueltas), list(unicas.values()))
+        }
+        
+        actualizadas = {}
+        existentes = [lectura for clave, lectura in unicas.items() if clave not in insertadas]
+        if modo == 'actualizar' and existentes:
+            sentencia = insertar_con_conflicto(Lectura)
+            sentencia = sentencia.on_conflict_do_update(
+                index_elements=clave_unica,
+                set_={'temperatura': sentencia.excluded.temperatura, 'humedad': sentencia.excluded.humedad}
+            )
+            actualizadas = {
+                (fila.aire_id, fila.fecha): fila.id
+                for fila in sesion.execute(sentencia.returning(*columnas_devueltas), existentes)
+            }
+        
+        # Las lecturas nuevas alimentan las estructuras derivadas como en una
+        # inserción normal. Las actualizadas, como las atrasadas, no alteran los
+        # estados de anomalías y alertas; sus resúmenes de cuantiles se rehacen
+        alertas = self._tras_insertar_lecturas(sesion, [
+            dict(lectura, id=insertadas[clave]) for clave, lectura in unicas.items() if clave in insertadas
+        ])
+        if actualizadas:
+            self._reconstruir_cuantiles_dias(sesion, {(aire_id, fecha.date()) for aire_id, fecha in actualizadas})
+            incrementar_generacion_lecturas(sesion)
+        
+        ids_por_clave = {**insertadas, **actualizadas}
+        ids = [ids_por_clave.get((lectura['aire_id'], lectura['fecha'])) for lectura in lecturas]
+        
+        return ids, alertas, len(actualizadas)
+    
+    def _invalidar_instantanea_lecturas(self):
+        # Tras el commit, y con el lock para no cruzarse con una reconstrucción
+        # que haya leído los valores anteriores
+        if self.instantanea_lecturas is not None:
+            with self._lock_instantanea:
+                self.instantanea_lecturas.invalidar()
+    
+    def _notificar_alertas(self, alertas):
+        # Solo encola las alertas recién activadas: el envío ocurre en el hilo del despachador
+        if self.despachador_alertas is not None:
+            activadas = [alerta for alerta in alertas if alerta['evento'] == 'activada']
+            if activadas:
+                self.despachador_alertas.encolar(activadas)
+    
+    def _tras_insertar_lecturas(self, sesion, lecturas):
+        # Estructuras derivadas que se mantienen en la misma transacción que el INSERT;
+        # devuelve los eventos de alerta para notificarlos tras el commit
+        self._actualizar_anomalias(sesion, lecturas)
+        self._actualizar_cuantiles(sesion, lecturas)
+        return self._actualizar_estados_alerta(sesion, lecturas)
+    
+    def _crear_filas_derivadas(self, sesion, modelo, columnas, filas):
+        # Crea las filas de estado que faltan y las devuelve bloqueadas (FOR UPDATE).
+        # Con INSERT ... ON CONFLICT DO NOTHING, si otro escritor crea la misma fila
+        # a la vez no hay IntegrityError que deshaga la inserción de las lecturas
+        sesion.execute(insertar_con_conflicto(modelo).on_conflict_do_nothing(index_elements=columnas), filas)
+        
+        return sesion.query(modelo).filter(
+            tuple_(*(getattr(modelo, columna) for columna in columnas)).in_(
+                [tuple(fila[columna] for columna in columnas) for fila in filas]
+            )
+        ).with_for_update().all()
+    
+    def _actualizar_estados_alerta(self, sesion, lecturas):
+        # Un SELECT de los umbrales activos y otro de los estados de los aires
+        # afectados; después, una transición en memoria por lectura, umbral y variable
+        aires_ids = {lectura['aire_id'] for lectura in lecturas}
+        
+        umbrales = sesion.query(UmbralConfiguracion).filter(
+            UmbralConfiguracion.notificar_activo == True,
+            (UmbralConfiguracion.es_global == True) | UmbralConfiguracion.aire_id.in_(aires_ids)
+        ).all()
+        
+        if not umbrales:
+            return []
+        
+        globales = [u for u in umbrales if u.es_global]
+        por_aire = {}
+        for umbral in umbrales:
+            if not umbral.es_global:
+                por_aire.setdefault(umbral.aire_id, []).append(umbral)
+        
+        estados = {
+            (estado.aire_id, estado.umbral_id, estado.variable): estado
+            for estado in sesion.query(EstadoAlerta).filter(
+                EstadoAlerta.aire_id.in_(aires_ids)
+            ).with_for_update().all()
+        }
+        
+        nuevos = [
+            {'aire_id': aire_id, 'umbral_id': umbral.id, 'variable': variable, 'estado': 'normal'}
+            for aire_id in aires_ids
+            for umbral in globales + por_aire.get(aire_id, [])
+            for variable in LIMITES
+            if (aire_id, umbral.id, variable) not in estados
+        ]
+        if nuevos:
+            for estado in self._crear_filas_derivadas(
+                sesion, EstadoAlerta, ['aire_id', 'umbral_id', 'variable'], nuevos
+            ):
+                estados[(estado.aire_id, estado.umbral_id, estado.variable)] = estado
+        
+        eventos = []
+        for lectura in sorted(lecturas, key=lambda l: l['fecha']):
+            for umbral in globales + por_aire.get(lectura['aire_id'], []):
+                for variable, (columna_min, columna_max) in LIMITES.items():
+                    estado = estados[(lectura['aire_id'], umbral.id, variable)]
+                    
+                    if estado.ultima_fecha is not None and lectura['fecha'] < estado.ultima_fecha:
+                        # Las lecturas atrasadas no alteran el estado de la alerta
+                        continue
+                    
+                    lado = estado.lado
+                    evento = evaluar_estado(
+                        estado,
+                        lectura[variable],
+                        lectura['fecha'],
+                        getattr(umbral, columna_min),
+                        getattr(umbral, columna_max),
+                        HISTERESIS[variable]
+                    )
+                    
+                    if evento is not None:
+                        # Una alerta resuelta se refiere al límite que se había superado
+                        lado_evento = lado if evento == 'resuelta' else estado.lado
+                        eventos.append(self._evento_alerta(evento, lectura, umbral, variable, lado_evento))
+        
+        if eventos:
+            catalogo = self.obtener_catalogo_aires()
+            for evento in eventos:
+                evento['aire_nombre'] = catalogo.nombre(evento['aire_id'])
+        
+        return eventos
+    
+    def _evento_alerta(self, evento, lectura, umbral, variable, lado):
+        valor = lectura[variable]
+        unidad = '°C' if variable == 'temperatura' else '%'
+        limite = umbral.temp_max if variable == 'temperatura' else umbral.hum_max
+        if lado == 'min':
+            limite = umbral.temp_min if variable == 'temperatura' else umbral.hum_min
+        
+        columna_min, columna_max = LIMITES[variable]
+        lado_actual = lado_superado(valor, getattr(umbral, columna_min), getattr(umbral, columna_max))
+        
+        if evento == 'activada':
+            posicion = 'por encima del máximo' if lado == 'max' else 'por debajo del mínimo'
+            mensaje = f"{variable.capitalize()} ({valor}{unidad}) {posicion} ({limite}{unidad})"
+        elif lado_actual is not None:
+            # Resuelta porque pasó directamente al límite contrario
+            posicion = 'por encima del máximo' if lado_actual == 'max' else 'por debajo del mínimo'
+            mensaje = f"{variable.capitalize()} ({valor}{unidad}) pasó al otro límite: ahora {posicion}"
+        else:
+            mensaje = f"{variable.capitalize()} ({valor}{unidad}) de nuevo dentro de límites"
+        
+        return {
+            'evento': evento,
+            'tipo': variable,
+            'umbral_id': umbral.id,
+            'umbral_nombre': umbral.nombre,
+            'valor': valor,
+            'limite': limite,
+            'mensaje': mensaje,
+            'aire_id': lectura['aire_id'],
+            'lectura_id': lectura['id'],
+            'fecha': lectura['fecha']
+        }
+    
+    def obtener_alertas_activas(self):
+        """
+        Obtiene las alertas de umbral activas (incluidas las que se están recuperando).
+        
+        Returns:
+            DataFrame con el aire, el umbral, la variable y desde cuándo está activa
+        """
+        estados = session.query(EstadoAlerta, AireAcondicionado.nombre, UmbralConfiguracion.nombre).join(
+            AireAcondicionado, AireAcondicionado.id == EstadoAlerta.aire_id
+        ).join(
+            UmbralConfiguracion, UmbralConfiguracion.id == EstadoAlerta.umbral_id
+        ).filter(EstadoAlerta.estado.in_(['activa', 'recuperando'])).all()
+        
+        alertas_data = [
+            {
+                'aire_id': estado.aire_id,
+                'nombre': nombre_aire,
+                'umbral_id': estado.umbral_id,
+                'umbral_nombre': nombre_umbral,
+                'variable': estado.variable,
+                'lado': estado.lado,
+                'estado': estado.estado,
+                'fecha_activacion': estado.fecha_activacion,
+                'ultima_fecha': estado.ultima_fecha,
+                'ultimo_valor': estado.ultimo_valor
+            }
+            for estado, nombre_aire, nombre_umbral in estados
+        ]
+        
+        return pd.DataFrame(alertas_data)
+    
+    def _actualizar_anomalias(self, sesion, lecturas):
+        # Un único SELECT de los estados de los aires afectados y una actualización
+        # en memoria por lectura
+        aires_ids = {lectura['aire_id'] for lectura in lecturas}
+        
+        estados = {
+            estado.aire_id: estado
+            for estado in sesion.query(EstadoAnomalia).filter(
+                EstadoAnomalia.aire_id.in_(aires_ids)
+            ).with_for_update().all()
+        }
+        
+        nuevos = [{'aire_id': aire_id, 'lecturas': 0} for aire_id in aires_ids if aire_id not in estados]
+        if nuevos:
+            for estado in self._crear_filas_derivadas(sesion, EstadoAnomalia, ['aire_id'], nuevos):
+                estados[estado.aire_id] = estado
+        
+        for lectura in sorted(lecturas, key=lambda l: l['fecha']):
+            estado = estados[lectura['aire_id']]
+            
+            if estado.ultima_fecha is not None and lectura['fecha'] <= estado.ultima_fecha:
+                # Las lecturas atrasadas no alteran el estado del flujo
+                continue
+            
+            evaluar_lectura(
+                estado,
+                lectura['id'],
+                lectura['fecha'],
+                lectura['temperatura'],
+                lectura['humedad']
+            )
+    
+    def _actualizar_cuantiles(self, sesion, lecturas):
+        # Un SELECT de los resúmenes de los (aire, día) afectados y una
+        # compresión por resumen con todas sus lecturas nuevas
+        grupos = {}
+        for lectura in lecturas:
+            if lectura['aire_id'] is not None:
+                grupos.setdefault((lectura['aire_id'], lectura['fecha'].date()), []).append(lectura)
+        
+        if not grupos:
+            return
+        
+        existentes = {
+            (resumen.aire_id, resumen.dia): resumen
+            for resumen in sesion.query(CuantilesDiarios).filter(
+                CuantilesDiarios.aire_id.in_({aire_id for aire_id, _ in grupos}),
+                CuantilesDiarios.dia.in_({dia for _, dia in grupos})
+            ).with_for_update().all()
+        }
+        
+        vacio = TDigest().a_bytes()
+        nuevos = [
+            {'aire_id': aire_id, 'dia': dia, 'cantidad': 0, 'temperatura_digest': vacio, 'humedad_digest': vacio}
+            for aire_id, dia in grupos if (aire_id, dia) not in existentes
+        ]
+        if nuevos:
+            for resumen in self._crear_filas_derivadas(sesion, CuantilesDiarios, ['aire_id', 'dia'], nuevos):
+                existentes[(resumen.aire_id, resumen.dia)] = resumen
+        
+        for (aire_id, dia), lecturas_dia in grupos.items():
+            resumen = existentes[(aire_id, dia)]
+            temperatura = TDigest.desde_bytes(resumen.temperatura_digest)
+            humedad = TDigest.desde_bytes(resumen.humedad_digest)
+            
+            temperatura.agregar([lectura['temperatura'] for lectura in lecturas_dia])
+            humedad.agregar([lectura['humedad'] for lectura in lecturas_dia])
+            
+            resumen.temperatura_digest = temperatura.a_bytes()
+            resumen.humedad_digest = humedad.a_bytes()
+            resumen.cantidad += len(lecturas_dia)
+    
+    def _reconstruir_cuantiles(self, sesion, aire_id, desde=None, hasta=None):
+        # Rehace los resúmenes diarios de un aire desde las lecturas guardadas; las
+        # horas compactadas aportan su promedio con el peso de su cantidad
+        filtro_dias = []
+        filtro_lecturas = [Lectura.aire_id == aire_id]
+        filtro_horas = [LecturaHoraria.aire_id == aire_id]
+        
+        if desde is not None:
+            inicio = datetime.combine(desde, datetime.min.time())
+            filtro_dias.append(CuantilesDiarios.dia >= desde)
+            filtro_lecturas.append(Lectura.fecha >= inicio)
+            filtro_horas.append(LecturaHoraria.hora >= inicio)
+        
+        if hasta is not None:
+            fin = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+            filtro_dias.append(CuantilesDiarios.dia <= hasta)
+            filtro_lecturas.append(Lectura.fecha < fin)
+            filtro_horas.append(LecturaHoraria.hora < fin)
+        
+        sesion.query(CuantilesDiarios).filter(
+            CuantilesDiarios.aire_id == aire_id, *filtro_dias
+        ).delete(synchronize_session='fetch')
+        
+        lecturas_df = pd.DataFrame(
+            sesion.query(Lectura.fecha, Lectura.temperatura, Lectura.humedad).filter(*filtro_lecturas).all(),
+            columns=['fecha', 'temperatura', 'humedad']
+        )
+        lecturas_df['cantidad'] = 1
+        for columna in ('temperatura', 'humedad'):
+            lecturas_df[f'{columna}_min'] = lecturas_df[columna]
+            lecturas_df[f'{columna}_max'] = lecturas_df[columna]
+        
+        horas_df = pd.DataFrame(
+            sesion.query(
+                LecturaHoraria.hora,
+                LecturaHoraria.temperatura_promedio,
+                LecturaHoraria.humedad_promedio,
+                LecturaHoraria.cantidad,
+                LecturaHoraria.temperatura_min,
+                LecturaHoraria.temperatura_max,
+                LecturaHoraria.humedad_min,
+                LecturaHoraria.humedad_max
+            ).filter(*filtro_horas).all(),
+            columns=['fecha', 'temperatura', 'humedad', 'cantidad',
+                     'temperatura_min', 'temperatura_max', 'humedad_min', 'humedad_max']
+        )
+        
+        partes = [df for df in (lecturas_df, horas_df) if not df.empty]
+        if not partes:
+            return 0
+        
+        datos = pd.concat(partes, ignore_index=True)
+        datos['dia'] = pd.to_datetime(datos['fecha']).dt.date
+        
+        for dia, grupo in datos.groupby('dia'):
+            digests = {}
+            for columna in ('temperatura', 'humedad'):
+                digest = TDigest()
+                digest.agregar(grupo[columna].to_numpy(), grupo['cantidad'].to_numpy())
+                # Los extremos reales de las horas compactadas, no solo su promedio
+                digest.minimo = min(digest.minimo, grupo[f'{columna}_min'].min())
+                digest.maximo = max(digest.maximo, grupo[f'{columna}_max'].max())
+                digests[columna] = digest.a_bytes()
+            
+            sesion.add(CuantilesDiarios(
+                aire_id=aire_id,
+                dia=dia,
+                cantidad=int(grupo['cantidad'].sum()),
+                temperatura_digest=digests['temperatura'],
+                humedad_digest=digests['humedad']
+            ))
+        
+        return datos['dia'].nunique()
+    
+    def reconstruir_cuantiles(self, aires_ids=None, desde=None, hasta=None):
+        """
+        Recalcula los resúmenes de cuantiles diarios desde las lecturas guardadas.
+        Se usa para generar los resúmenes de datos anteriores a su introducción.
+        
+        Args:
+            aires_ids: Opcional, lista de IDs de aires (por defecto todos)
+            desde: Opcional, primer día a recalcular
+            hasta: Opcional, último día a recalcular
+        
+        Returns:
+            Número de resúmenes diarios generados
+        """
+        if aires_ids is None:
+            aires_ids = self.obtener_catalogo_aires().ids
+        
+        total = 0
+        
+        # Una transacción por aire para no tener en memoria todas las lecturas a la vez
+        for aire_id in aires_ids:
+            try:
+                total += self._reconstruir_cuantiles(session, aire_id, desde, hasta)
+                session.commit()
+            except:
+                session.rollback()
+                raise
+        
+        return total
+    
+    def reconstruir_estados(self, aires_ids, tamano_lote=10000):
+        """
+        Recalcula los estados de anomalías y de alertas de los aires volviendo a
+        procesar sus lecturas en orden de ID, sin notificar los eventos. Se usa
+        cuando se han eliminado lecturas que ya estaban incluidas en los estados.
+        
+        Args:
+            aires_ids: Lista de IDs de aires
+            tamano_lote: Lecturas procesadas por consulta
+        
+        Returns:
+            Número de lecturas procesadas
+        """
+        total = 0
+        
+        # Una transacción por aire, como reconstruir_cuantiles
+        for aire_id in aires_ids:
+            try:
+                total += self._reconstruir_estados(session, aire_id, tamano_lote)
+                session.commit()
+            except:
+                session.rollback()
+                raise
+        
+        return total
+    
+    def _reconstruir_estados(self, sesion, aire_id, tamano_lote=10000):
+        # Rehace los estados de un aire en la transacción de la sesión; las
+        # lecturas se leen por lotes con paginación por ID
+        sesion.query(EstadoAnomalia).filter(EstadoAnomalia.aire_id == aire_id).delete()
+        sesion.query(EstadoAlerta).filter(EstadoAlerta.aire_id == aire_id).delete()
+        
+        total = 0
+        ultimo_id = 0
+        while True:
+            lecturas = [
+                fila._asdict() for fila in sesion.query(
+                    Lectura.id, Lectura.aire_id, Lectura.fecha, Lectura.temperatura, Lectura.humedad
+                ).filter(
+                    Lectura.aire_id == aire_id, Lectura.id > ultimo_id
+                ).order_by(Lectura.id).limit(tamano_lote)
+            ]
+            if not lecturas:
+                break
+            
+            self._actualizar_anomalias(sesion, lecturas)
+            self._actualizar_estados_alerta(sesion, lecturas)
+            total += len(lecturas)
+            ultimo_id = lecturas[-1]['id']
+        
+        return total
+    
+    @solo_lectura
+    def obtener_cuantiles(self, desde=None, hasta=None, aires_ids=None, agrupar='aire'):
+        """
+        Obtiene los percentiles de temperatura y humedad de un rango de fechas
+        combinando los resúmenes diarios, sin leer las lecturas.
+        
+        Args:
+            desde: Opcional, primer día del rango (incluido)
+            hasta: Opcional, último día del rango (incluido)
+            aires_ids: Opcional, lista de IDs de aires
+            agrupar: 'aire' o 'ubicacion'
+        
+        Returns:
+            DataFrame con aire_id (o ubicacion), lecturas y las columnas
+            temperatura_p50, temperatura_p95, temperatura_p99 y sus equivalentes de humedad
+        """
+        sesion = self.consultas.sesion
+        
+        clave = 'aire_id' if agrupar == 'aire' else 'ubicacion'
+        columnas = [clave, 'lecturas'] + [
+            f'{variable}_p{int(q * 100)}'
+            for variable in ('temperatura', 'humedad')
+            for q in PERCENTILES
+        ]
+        
+        query = sesion.query(
+            CuantilesDiarios.aire_id,
+            AireAcondicionado.ubicacion,
+            CuantilesDiarios.cantidad,
+            CuantilesDiarios.temperatura_digest,
+            CuantilesDiarios.humedad_digest
+        ).join(AireAcondicionado, AireAcondicionado.id == CuantilesDiarios.aire_id)
+        
+        if desde is not None:
+            query = query.filter(CuantilesDiarios.dia >= desde)
+        if hasta is not None:
+            query = query.filter(CuantilesDiarios.dia <= hasta)
+        if aires_ids is not None:
+            query = query.filter(CuantilesDiarios.aire_id.in_(aires_ids))
+        
+        grupos = {}
+        for fila in query.all():
+            grupo = grupos.setdefault(getattr(fila, clave), {'lecturas': 0, 'temperatura': [], 'humedad': []})
+            grupo['lecturas'] += fila.cantidad
+            grupo['temperatura'].append(TDigest.desde_bytes(fila.temperatura_digest))
+            grupo['humedad'].append(TDigest.desde_bytes(fila.humedad_digest))
+        
+        resultados = []
+        for valor_clave, grupo in sorted(grupos.items(), key=lambda item: str(item[0])):
+            resultado = {clave: valor_clave, 'lecturas': grupo['lecturas']}
+            
+            for variable in ('temperatura', 'humedad'):
+                digest = TDigest()
+                digest.fusionar(*grupo[variable])
+                for q in PERCENTILES:
+                    resultado[f'{variable}_p{int(q * 100)}'] = round(digest.cuantil(q), 2)
+            
+            resultados.append(resultado)
+        
+        return pd.DataFrame(resultados, columns=columnas)
+    
+    @solo_lectura
+    def obtener_rango_cuantiles(self):
+        """
+        Obtiene el primer y el último día con resúmenes de cuantiles.
+        
+        Returns:
+            Tupla (primer_dia, ultimo_dia), con None si no hay resúmenes
+        """
+        sesion = self.consultas.sesion
+        
+        return sesion.query(func.min(CuantilesDiarios.dia), func.max(CuantilesDiarios.dia)).one()
+    
+    def obtener_anomalias_activas(self):
+        """
+        Obtiene los aires cuya última lectura se ha marcado como anómala.
+        
+        Returns:
+            DataFrame con el aire, la última lectura y sus puntuaciones z
+        """
+        estados = session.query(EstadoAnomalia, AireAcondicionado.nombre).join(
+            AireAcondicionado, AireAcondicionado.id == EstadoAnomalia.aire_id
+        ).filter(EstadoAnomalia.es_anomalia == True).all()
+        
+        anomalias_data = [
+            {
+                'aire_id': estado.aire_id,
+                'nombre': nombre,
+                'fecha': estado.ultima_fecha,
+                'temperatura': estado.ultima_temperatura,
+                'temperatura_esperada': estado.temperatura_media,
+                'temperatura_z': estado.temperatura_z,
+                'humedad': estado.ultima_humedad,
+                'humedad_esperada': estado.humedad_media,
+                'humedad_z': estado.humedad_z
+            }
+            for estado, nombre in estados
+        ]
+        
+        return pd.DataFrame(anomalias_data)
+    
+    def _ajustar_tendencias(self, ventana_dias, modelo):
+        # La versión del ajuste en caché es el último ID de lectura y el número de
+        # lecturas de los últimos MARGEN_IDS_TARDIOS IDs: cualquier lectura nueva la
+        # cambia, también una confirmada tarde con un ID menor que el último. Los
+        # borrados y actualizaciones limpian la caché explícitamente
+        ultimo_id = select(func.max(Lectura.id)).scalar_subquery()
+        version = tuple(session.query(ultimo_id, func.count(Lectura.id)).filter(
+            Lectura.id > ultimo_id - MARGEN_IDS_TARDIOS
+        ).one())
+        clave = (ventana_dias, modelo)
+        
+        en_cache = self._cache_tendencias.get(clave)
+        if en_cache is not None and en_cache[0] == version:
+            return en_cache[1]
+        
+        ultima_fecha = session.query(func.max(Lectura.fecha)).scalar()
+        
+        if ultima_fecha is None:
+            ajuste = None
+        else:
+            filas = session.query(Lectura.aire_id, Lectura.fecha, Lectura.temperatura).filter(
+                Lectura.fecha >= ultima_fecha - timedelta(days=ventana_dias)
+            ).all()
+            
+            aires_ids, fechas, temperaturas = zip(*filas)
+            aires, grupos = np.unique(np.array(aires_ids), return_inverse=True)
+            
+            # Horas desde epoch; cada grupo se centra en su última lectura
+            horas_absolutas = np.array(fechas, dtype='datetime64[s]').astype(np.int64) / 3600.0
+            referencias = np.full(len(aires), -np.inf)
+            np.maximum.at(referencias, grupos, horas_absolutas)
+            
+            ajuste = tendencias.ajustar_tendencias(
+                grupos,
+                horas_absolutas - referencias[grupos],
+                np.array(temperaturas, dtype=float),
+                referencias,
+                modelo
+            )
+            ajuste['aire_id'] = aires
+            ajuste['ultima_fecha'] = np.rint(referencias * 3600).astype(np.int64).astype('datetime64[s]')
+        
+        self._cache_tendencias[clave] = (version, ajuste)
+        return ajuste
+    
+    def obtener_umbrales_temperatura_efectivos(self):
+        """
+        Obtiene el umbral efectivo de temperatura máxima de cada aire: el menor
+        temp_max entre sus umbrales específicos y los globales activos.
+        
+        Returns:
+            Diccionario {aire_id: temp_max} y umbral global (None si no hay)
+        """
+        umbrales = session.query(
+            UmbralConfiguracion.aire_id,
+            UmbralConfiguracion.es_global,
+            func.min(UmbralConfiguracion.temp_max)
+        ).filter(
+            UmbralConfiguracion.notificar_activo == True
+        ).group_by(UmbralConfiguracion.aire_id, UmbralConfiguracion.es_global).all()
+        
+        globales = [temp_max for aire_id, es_global, temp_max in umbrales if es_global]
+        umbral_global = min(globales) if globales else None
+        
+        por_aire = {}
+        for aire_id, es_global, temp_max in umbrales:
+            if not es_global and aire_id is not None:
+                por_aire[aire_id] = min(temp_max, umbral_global) if umbral_global is not None else temp_max
+        
+        return por_aire, umbral_global
+    
+    def obtener_tendencias(self, ventana_dias=None, modelo=None):
+        """
+        Ajusta la tendencia de temperatura de cada aire y proyecta cuándo
+        alcanzará su umbral efectivo de temperatura máxima.
+        
+        Args:
+            ventana_dias: Días de lecturas recientes usados en el ajuste
+            modelo: 'lineal' o 'estacional' (ciclo diario)
+            
+        Returns:
+            DataFrame ordenado por horas hasta el umbral, con la pendiente en °C/día
+        """
+        ventana_dias = ventana_dias or tendencias.VENTANA_DIAS
+        modelo = modelo or tendencias.MODELO
+        
+        ajuste = self._ajustar_tendencias(ventana_dias, modelo)
+        
+        if ajuste is None:
+            return pd.DataFrame()
+        
+        # Los umbrales se aplican en cada llamada: cambiarlos no obliga a reajustar
+        por_aire, umbral_global = self.obtener_umbrales_temperatura_efectivos()
+        umbral_defecto = np.nan if umbral_global is None else umbral_global
+        umbrales = np.array(
+            [por_aire.get(aire_id, umbral_defecto) for aire_id in ajuste['aire_id'].tolist()],
+            dtype=float
+        )
+        
+        horas = tendencias.horas_hasta_umbral(ajuste, umbrales)
+        
+        tendencias_df = pd.DataFrame({
+            'aire_id': ajuste['aire_id'],
+            'lecturas': ajuste['lecturas'],
+            'ultima_fecha': ajuste['ultima_fecha'],
+            'temperatura_actual': ajuste['nivel'],
+            'pico_diario': ajuste['tendencia'] + ajuste['amplitud'],
+            'pendiente_dia': ajuste['pendiente'] * 24,
+            'residuo': ajuste['residuo'],
+            'umbral_temp_max': umbrales,
+            'horas_hasta_umbral': horas
+        })
+        
+        tendencias_df = tendencias_df[tendencias_df['lecturas'] >= tendencias.LECTURAS_MINIMAS]
+        
+        finitas = np.isfinite(tendencias_df['horas_hasta_umbral'])
+        tendencias_df['fecha_estimada_umbral'] = tendencias_df['ultima_fecha'] + pd.to_timedelta(
+            tendencias_df['horas_hasta_umbral'].where(finitas), unit='h'
+        ).dt.floor('min')
+        
+        catalogo = self.obtener_catalogo_aires()
+        tendencias_df['nombre'] = tendencias_df['aire_id'].map(catalogo.nombres)
+        tendencias_df['ubicacion'] = tendencias_df['aire_id'].map(catalogo.ubicaciones)
+        
+        return tendencias_df.sort_values('horas_hasta_umbral', na_position='last').reset_index(drop=True)
+    
+    def obtener_lecturas_nuevas(self, ultimo_id=0, desde=None, hasta_id=None, vistas=None):
+        """
+        Obtiene las lecturas con ID mayor que ultimo_id, en orden de ID.
+        
+        Args:
+            ultimo_id: Último ID de lectura ya conocido
+            desde: Si se indica, solo lecturas con fecha posterior o igual
+            hasta_id: Si se indica, solo lecturas con ID menor o igual
+            vistas: Si se indica, IDs ya conocidos de los últimos MARGEN_IDS_TARDIOS
+                por debajo de ultimo_id; también se devuelven las lecturas de ese
+                margen que no estén entre ellos (confirmadas tarde con un ID menor)
+            
+        Returns:
+            DataFrame con las lecturas nuevas
+        """
+        ultimo_id = ultimo_id or 0
+        condicion = Lectura.id > ultimo_id
+        
+        if vistas is not None:
+            # Un recuento del margen basta para saber si apareció alguna tardía;
+            # solo entonces se piden excluyendo las ya vistas
+            corte = max(ultimo_id - MARGEN_IDS_TARDIOS, 0)
+            vistas_margen = [i for i in vistas if corte < i <= ultimo_id]
+            en_margen = session.query(func.count(Lectura.id)).filter(
+                Lectura.id > corte, Lectura.id <= ultimo_id
+            ).scalar()
+            if en_margen > len(vistas_margen):
+                condicion = (Lectura.id > corte) & Lectura.id.notin_(vistas_margen)
+        
+        query = session.query(
+            Lectura.id, Lectura.aire_id, Lectura.fecha, Lectura.temperatura, Lectura.humedad
+        ).filter(condicion)
+        
+        if desde is not None:
+            query = query.filter(Lectura.fecha >= desde)
+        if hasta_id is not None:
+            query = query.filter(Lectura.id <= hasta_id)
+        
+        lecturas = query.order_by(Lectura.id).all()
+        
+        lecturas_df = pd.DataFrame(
+            lecturas,
+            columns=['id', 'aire_id', 'fecha', 'temperatura', 'humedad']
+        )
+        
+        # Mantener el tipo de fecha aunque no haya filas, para concatenar con lo ya cargado
+        lecturas_df['fecha'] = pd.to_datetime(lecturas_df['fecha'])
         
-        return nuevo_aire.id
+        return lecturas_df
+    
+    def obtener_ids_lecturas(self, desde_id, hasta_id):
+        """
+        Obtiene los IDs de las lecturas en (desde_id, hasta_id].
         
-    def actualizar_aire(self, aire_id, nombre, ubicacion, fecha_instalacion):
+        Returns:
+            Conjunto de IDs
         """
-        Actualiza la información de un aire acondicionado.
+        return {
+            fila[0] for fila in session.query(Lectura.id).filter(
+                Lectura.id > desde_id, Lectura.id <= hasta_id
+            )
+        }
+    
+    def obtener_pagina_lecturas(self, aire_id=None, desde=None, hasta=None, orden='fecha',
+                                descendente=True, tamano=50, despues_de=None):
+        """
+        Obtiene una página de lecturas con paginación por clave: cada página
+        continúa a partir de la última fila de la anterior (WHERE + LIMIT, sin
+        OFFSET), así que el coste depende del tamaño de página y no de la
+        posición ni del total de lecturas.
         
         Args:
-            aire_id: ID del aire acondicionado a actualizar
-            nombre: Nuevo nombre
-            ubicacion: Nueva ubicación
-            fecha_instalacion: Nueva fecha de instalación
+            aire_id: Opcional, ID del aire acondicionado
+            desde: Opcional, fecha y hora mínima (incluida)
+            hasta: Opcional, fecha y hora máxima (excluida)
+            orden: 'fecha', 'id', 'temperatura' o 'humedad' (con el ID como
+                desempate; fecha e ID usan índice)
+            descendente: Si es True, de mayor a menor
+            tamano: Lecturas por página
+            despues_de: Cursor devuelto por la página anterior, o None para la primera
             
         Returns:
-            True si se actualizó correctamente, False en caso contrario
+            Tupla (DataFrame con id, aire_id, nombre, fecha, temperatura y humedad;
+            cursor de la página siguiente o None si es la última)
         """
-        aire = session.query(AireAcondicionado).filter(AireAcondicionado.id == aire_id).first()
+        if orden not in ('fecha', 'id', 'temperatura', 'humedad'):
+            raise ValueError(f"Orden de lecturas desconocido: {orden}")
         
-        if aire:
-            aire.nombre = nombre
-            aire.ubicacion = ubicacion
-            aire.fecha_instalacion = fecha_instalacion
+        columna = getattr(Lectura, orden)
+        
+        query = session.query(
+            Lectura.id, Lectura.aire_id, Lectura.fecha, Lectura.temperatura, Lectura.humedad
+        )
+        
+        if aire_id is not None:
+            query = query.filter(Lectura.aire_id == aire_id)
+        if desde is not None:
+            query = query.filter(Lectura.fecha >= desde)
+        if hasta is not None:
+            query = query.filter(Lectura.fecha < hasta)
+        
+        if despues_de is not None:
+            valor, ultimo_id = despues_de
             
-            session.commit()
-            return True
+            # (columna, id) estrictamente después del cursor, escrito de forma que el
+            # índice de la columna sirva para acotar el rango
+            if orden == 'id':
+                query = query.filter(Lectura.id < ultimo_id if descendente else Lectura.id > ultimo_id)
+            elif descendente:
+                query = query.filter(columna <= valor, or_(columna < valor, Lectura.id < ultimo_id))
+            else:
+                query = query.filter(columna >= valor, or_(columna > valor, Lectura.id > ultimo_id))
         
-        return False
-    
-    def agregar_lectura(self, aire_id, fecha, temperatura, humedad):
-        # Crear nueva lectura en la base de datos
-        nueva_lectura = Lectura(
-            aire_id=aire_id,
-            fecha=fecha,
-            temperatura=temperatura,
-            humedad=humedad
+        if descendente:
+            query = query.order_by(columna.desc(), Lectura.id.desc())
+        else:
+            query = query.order_by(columna.asc(), Lectura.id.asc())
+        
+        # Una fila de más indica si hay página siguiente sin contar el total
+        lecturas = query.limit(tamano + 1).all()
+        siguiente = None
+        
+        if len(lecturas) > tamano:
+            lecturas = lecturas[:tamano]
+            siguiente = (getattr(lecturas[-1], orden), lecturas[-1].id)
+        
+        lecturas_df = pd.DataFrame(
+            lecturas,
+            columns=['id', 'aire_id', 'fecha', 'temperatura', 'humedad']
         )
+        lecturas_df['fecha'] = pd.to_datetime(lecturas_df['fecha'])
+        lecturas_df.insert(2, 'nombre', lecturas_df['aire_id'].map(self.obtener_catalogo_aires().nombres))
         
-        session.add(nueva_lectura)
-        session.commit()
+        return lecturas_df, siguiente
+    
+    def obtener_acumulados_lecturas(self):
+        """
+        Obtiene los acumulados de todas las lecturas (incluidas las horas compactadas)
+        hasta el último ID, como punto de partida de unas estadísticas incrementales.
+        
+        Returns:
+            Tupla (acumulados, último ID); los acumulados tienen el formato de
+            utils.actualizar_estadisticas_incrementales
+        """
+        ultimo_id = session.query(func.max(Lectura.id)).scalar() or 0
+        
+        crudas = session.query(
+            func.count(Lectura.id),
+            func.sum(Lectura.temperatura), func.min(Lectura.temperatura), func.max(Lectura.temperatura),
+            func.sum(Lectura.humedad), func.min(Lectura.humedad), func.max(Lectura.humedad)
+        ).filter(Lectura.id <= ultimo_id).one()
+        
+        compactadas = session.query(
+            func.sum(LecturaHoraria.cantidad),
+            func.sum(LecturaHoraria.temperatura_promedio * LecturaHoraria.cantidad),
+            func.min(LecturaHoraria.temperatura_min), func.max(LecturaHoraria.temperatura_max),
+            func.sum(LecturaHoraria.humedad_promedio * LecturaHoraria.cantidad),
+            func.min(LecturaHoraria.humedad_min), func.max(LecturaHoraria.humedad_max)
+        ).one()
+        
+        def combinar(valores, funcion):
+            valores = [v for v in valores if v is not None]
+            return funcion(valores) if valores else None
+        
+        acumulados = {
+            'total_lecturas': (crudas[0] or 0) + (compactadas[0] or 0),
+            'temperatura': {
+                'suma': combinar([crudas[1], compactadas[1]], sum) or 0.0,
+                'minimo': combinar([crudas[2], compactadas[2]], min),
+                'maximo': combinar([crudas[3], compactadas[3]], max)
+            },
+            'humedad': {
+                'suma': combinar([crudas[4], compactadas[4]], sum) or 0.0,
+                'minimo': combinar([crudas[5], compactadas[5]], min),
+                'maximo': combinar([crudas[6], compactadas[6]], max)
+            }
+        }
         
-        return nueva_lectura.id
+        return acumulados, ultimo_id
     
-    def obtener_lecturas_por_aire(self, aire_id):
+    @solo_lectura
+    def obtener_lecturas_por_aire(self, aire_id, incluir_compactadas=False):
+        sesion = self.consultas.sesion
+        
         # Consultar lecturas de un aire específico
-        lecturas = session.query(Lectura).filter(Lectura.aire_id == aire_id).all()
+        lecturas = sesion.query(Lectura).filter(Lectura.aire_id == aire_id).all()
         
         # Convertir a DataFrame
         lecturas_data = [
@@ -175,7 +1427,12 @@ class DataManager:
             for lectura in lecturas
         ]
         
-        return pd.DataFrame(lecturas_data)
+        lecturas_df = pd.DataFrame(lecturas_data)
+        
+        if incluir_compactadas:
+            lecturas_df = self._agregar_lecturas_compactadas(lecturas_df, aire_id=aire_id)
+        
+        return lecturas_df
         
     def eliminar_lectura(self, lectura_id):
         """
@@ -187,18 +1444,163 @@ class DataManager:
         Returns:
             True si se eliminó correctamente, False en caso contrario
         """
-        lectura = session.query(Lectura).filter(Lectura.id == lectura_id).first()
+        return self.eliminar_lecturas([lectura_id]) > 0
+    
+    def eliminar_lecturas(self, ids, tamano_lote=5000):
+        """
+        Elimina varias lecturas por su ID.
+        
+        Cada bloque de tamano_lote IDs se borra con una sola sentencia DELETE, todo
+        en la misma transacción; después, en ella, se rehacen los resúmenes de
+        cuantiles de los días afectados y los estados de anomalías y alertas de
+        los aires afectados, que ya no cuentan las lecturas eliminadas.
+        
+        Args:
+            ids: IDs de las lecturas a eliminar
+            tamano_lote: IDs por sentencia DELETE
+            
+        Returns:
+            Número de lecturas eliminadas
+        """
+        ids = sorted({int(lectura_id) for lectura_id in ids})
+        eliminadas = 0
+        dias = set()
         
-        if lectura:
-            session.delete(lectura)
+        try:
+            for inicio in range(0, len(ids), tamano_lote):
+                filas = session.execute(
+                    delete(Lectura)
+                    .where(Lectura.id.in_(ids[inicio:inicio + tamano_lote]))
+                    .returning(Lectura.aire_id, Lectura.fecha)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                eliminadas += len(filas)
+                dias.update((aire_id, fecha.date()) for aire_id, fecha in filas if aire_id is not None)
+            
+            self._reconstruir_cuantiles_dias(session, dias)
+            for aire_id in sorted({aire_id for aire_id, _ in dias}):
+                self._reconstruir_estados(session, aire_id)
+            if eliminadas:
+                incrementar_generacion_lecturas(session)
             session.commit()
-            return True
+        except:
+            session.rollback()
+            raise
         
-        return False
+        if eliminadas:
+            self._invalidar_caches_lecturas()
+        
+        return eliminadas
     
-    def obtener_estadisticas_por_aire(self, aire_id):
-        # Consultar estadísticas de un aire específico desde la base de datos
-        result = session.query(
+    def eliminar_lecturas_rango(self, aire_id, desde, hasta, tamano_lote=5000):
+        """
+        Elimina las lecturas de un aire entre dos fechas, incluidas las horas
+        compactadas que caen por completo dentro del rango.
+        
+        Las lecturas se borran en lotes de tamano_lote filas, cada uno con una
+        sentencia DELETE y en su propia transacción junto con la reconstrucción
+        de los cuantiles de sus días, para no mantener bloqueos largos en rangos
+        muy grandes; si el proceso se interrumpe puede repetirse. Los estados de
+        anomalías y alertas del aire se rehacen una vez, en la transacción del
+        último lote.
+        
+        Args:
+            aire_id: ID del aire
+            desde: Fecha y hora inicial (incluida)
+            hasta: Fecha y hora final (excluida)
+            tamano_lote: Lecturas por sentencia DELETE
+            
+        Returns:
+            Número de lecturas eliminadas, contando las de las horas compactadas
+        """
+        eliminadas = 0
+        
+        while True:
+            lote = select(Lectura.id).where(
+                Lectura.aire_id == aire_id,
+                Lectura.fecha >= desde,
+                Lectura.fecha < hasta
+            ).limit(tamano_lote)
+            
+            try:
+                filas = session.execute(
+                    delete(Lectura)
+                    .where(Lectura.id.in_(lote.scalar_subquery()))
+                    .returning(Lectura.fecha)
+                    .execution_options(synchronize_session=False)
+                ).all()
+                self._reconstruir_cuantiles_dias(session, {(aire_id, fecha.date()) for fecha, in filas})
+                if filas:
+                    incrementar_generacion_lecturas(session)
+                
+                ultimo_lote = len(filas) < tamano_lote
+                if ultimo_lote and eliminadas + len(filas):
+                    self._reconstruir_estados(session, aire_id)
+                session.commit()
+            except:
+                session.rollback()
+                raise
+            
+            eliminadas += len(filas)
+            if ultimo_lote:
+                break
+        
+        # Horas compactadas que empiezan y terminan dentro del rango
+        try:
+            filas = session.execute(
+                delete(LecturaHoraria)
+                .where(
+                    LecturaHoraria.aire_id == aire_id,
+                    LecturaHoraria.hora >= desde,
+                    LecturaHoraria.hora <= hasta - timedelta(hours=1)
+                )
+                .returning(LecturaHoraria.hora, LecturaHoraria.cantidad)
+                .execution_options(synchronize_session=False)
+            ).all()
+            self._reconstruir_cuantiles_dias(session, {(aire_id, hora.date()) for hora, _ in filas})
+            session.commit()
+        except:
+            session.rollback()
+            raise
+        
+        eliminadas += sum(cantidad for _, cantidad in filas)
+        
+        if eliminadas:
+            self._invalidar_caches_lecturas()
+        
+        return eliminadas
+    
+    def _reconstruir_cuantiles_dias(self, sesion, dias):
+        # Un t-digest no permite quitar valores: se rehacen los resúmenes de los
+        # días afectados, agrupando los días consecutivos de cada aire
+        for aire_id in sorted({aire_id for aire_id, _ in dias}):
+            dias_aire = sorted(dia for otro_id, dia in dias if otro_id == aire_id)
+            inicio = fin = dias_aire[0]
+            
+            for dia in dias_aire[1:]:
+                if dia - fin > timedelta(days=1):
+                    self._reconstruir_cuantiles(sesion, aire_id, inicio, fin)
+                    inicio = dia
+                fin = dia
+            
+            self._reconstruir_cuantiles(sesion, aire_id, inicio, fin)
+    
+    @solo_lectura
+    def _estadisticas_lecturas(self, aires_ids=None):
+        """
+        Calcula las estadísticas de temperatura y humedad de las lecturas,
+        incluyendo las horas compactadas por la política de retención.
+        
+        Args:
+            aires_ids: Lista de IDs de aires a incluir, o None para todos
+            
+        Returns:
+            Objeto con temp_avg, temp_min, temp_max, temp_std, hum_avg, hum_min,
+            hum_max, hum_std y total_lecturas (None si no hay lecturas)
+        """
+        sesion = self.consultas.sesion
+        
+        query = sesion.query(
             func.avg(Lectura.temperatura).label('temp_avg'),
             func.min(Lectura.temperatura).label('temp_min'),
             func.max(Lectura.temperatura).label('temp_max'),
@@ -206,8 +1608,429 @@ class DataManager:
             func.avg(Lectura.humedad).label('hum_avg'),
             func.min(Lectura.humedad).label('hum_min'),
             func.max(Lectura.humedad).label('hum_max'),
-            func.stddev(Lectura.humedad).label('hum_std')
-        ).filter(Lectura.aire_id == aire_id).first()
+            func.stddev(Lectura.humedad).label('hum_std'),
+            func.count(Lectura.id).label('total_lecturas')
+        )
+        
+        query_compactadas = sesion.query(
+            func.sum(LecturaHoraria.cantidad).label('cantidad'),
+            func.sum(LecturaHoraria.temperatura_promedio * LecturaHoraria.cantidad).label('temp_suma'),
+            func.sum(LecturaHoraria.temperatura_suma_cuadrados).label('temp_cuadrados'),
+            func.min(LecturaHoraria.temperatura_min).label('temp_min'),
+            func.max(LecturaHoraria.temperatura_max).label('temp_max'),
+            func.sum(LecturaHoraria.humedad_promedio * LecturaHoraria.cantidad).label('hum_suma'),
+            func.sum(LecturaHoraria.humedad_suma_cuadrados).label('hum_cuadrados'),
+            func.min(LecturaHoraria.humedad_min).label('hum_min'),
+            func.max(LecturaHoraria.humedad_max).label('hum_max')
+        )
+        
+        if aires_ids is not None:
+            query = query.filter(Lectura.aire_id.in_(aires_ids))
+            query_compactadas = query_compactadas.filter(LecturaHoraria.aire_id.in_(aires_ids))
+        
+        crudo = query.first()
+        compactado = query_compactadas.first()
+        
+        # Sin datos compactados, el resultado es directamente el de las lecturas
+        if not compactado.cantidad:
+            return crudo
+        
+        n1 = crudo.total_lecturas or 0
+        n2 = compactado.cantidad
+        n = n1 + n2
+        
+        resultado = {'total_lecturas': n}
+        
+        for prefijo in ('temp', 'hum'):
+            media2 = getattr(compactado, f'{prefijo}_suma') / n2
+            m2_2 = max(getattr(compactado, f'{prefijo}_cuadrados') - n2 * media2 ** 2, 0)
+            minimo = getattr(compactado, f'{prefijo}_min')
+            maximo = getattr(compactado, f'{prefijo}_max')
+            
+            if n1:
+                # Combinar medias y sumas de cuadrados de las desviaciones de ambos grupos
+                media1 = getattr(crudo, f'{prefijo}_avg')
+                m2_1 = (getattr(crudo, f'{prefijo}_std') or 0) ** 2 * (n1 - 1)
+                delta = media2 - media1
+                media = media1 + delta * n2 / n
+                m2 = m2_1 + m2_2 + delta ** 2 * n1 * n2 / n
+                minimo = min(minimo, getattr(crudo, f'{prefijo}_min'))
+                maximo = max(maximo, getattr(crudo, f'{prefijo}_max'))
+            else:
+                media = media2
+                m2 = m2_2
+            
+            resultado[f'{prefijo}_avg'] = media
+            resultado[f'{prefijo}_min'] = minimo
+            resultado[f'{prefijo}_max'] = maximo
+            resultado[f'{prefijo}_std'] = (m2 / (n - 1)) ** 0.5 if n > 1 else None
+        
+        return SimpleNamespace(**resultado)
+    
+    def _sumas_por_aire(self):
+        """
+        Cantidad, sumas, sumas de cuadrados, mínimos y máximos de temperatura y
+        humedad de cada aire, incluyendo las horas compactadas. Con las sumas se
+        pueden combinar varios aires sin volver a consultar.
+        
+        Returns:
+            DataFrame con aire_id, cantidad y temp_/hum_ suma, cuadrados, min y max
+        """
+        sesion = self.consultas.sesion
+        
+        crudas = sesion.query(
+            Lectura.aire_id,
+            func.count(Lectura.id).label('cantidad'),
+            func.sum(Lectura.temperatura).label('temp_suma'),
+            func.sum(Lectura.temperatura * Lectura.temperatura).label('temp_cuadrados'),
+            func.min(Lectura.temperatura).label('temp_min'),
+            func.max(Lectura.temperatura).label('temp_max'),
+            func.sum(Lectura.humedad).label('hum_suma'),
+            func.sum(Lectura.humedad * Lectura.humedad).label('hum_cuadrados'),
+            func.min(Lectura.humedad).label('hum_min'),
+            func.max(Lectura.humedad).label('hum_max')
+        ).group_by(Lectura.aire_id).all()
+        
+        compactadas = sesion.query(
+            LecturaHoraria.aire_id,
+            func.sum(LecturaHoraria.cantidad).label('cantidad'),
+            func.sum(LecturaHoraria.temperatura_promedio * LecturaHoraria.cantidad).label('temp_suma'),
+            func.sum(LecturaHoraria.temperatura_suma_cuadrados).label('temp_cuadrados'),
+            func.min(LecturaHoraria.temperatura_min).label('temp_min'),
+            func.max(LecturaHoraria.temperatura_max).label('temp_max'),
+            func.sum(LecturaHoraria.humedad_promedio * LecturaHoraria.cantidad).label('hum_suma'),
+            func.sum(LecturaHoraria.humedad_suma_cuadrados).label('hum_cuadrados'),
+            func.min(LecturaHoraria.humedad_min).label('hum_min'),
+            func.max(LecturaHoraria.humedad_max).label('hum_max')
+        ).group_by(LecturaHoraria.aire_id).all()
+        
+        columnas = ['aire_id', 'cantidad', 'temp_suma', 'temp_cuadrados', 'temp_min', 'temp_max',
+                    'hum_suma', 'hum_cuadrados', 'hum_min', 'hum_max']
+        
+        return pd.DataFrame(
+            [tuple(fila) for fila in crudas] + [tuple(fila) for fila in compactadas],
+            columns=columnas
+        ).astype({columna: float for columna in columnas[1:]})
+    
+    def hay_lecturas(self):
+        """
+        Indica si hay alguna lectura, cruda o compactada, sin cargarlas.
+        """
+        return (
+            session.query(Lectura.id).first() is not None
+            or session.query(LecturaHoraria.id).first() is not None
+        )
+    
+    @solo_lectura
+    def obtener_variacion(self, variable='temperatura', aire_id=None):
+        """
+        Calcula en la base de datos el promedio y la desviación estándar de una
+        variable por mes (para un aire) o por aire (para todos), incluyendo las
+        horas compactadas. Solo se transfiere el resultado agregado.
+        
+        Args:
+            variable: 'temperatura' o 'humedad'
+            aire_id: ID del aire acondicionado, o None para agrupar por aire
+            
+        Returns:
+            DataFrame con mes_año (o aire_id), promedio, desviacion y lecturas
+        """
+        sesion = self.consultas.sesion
+        
+        columna = getattr(Lectura, variable)
+        promedio_horario = getattr(LecturaHoraria, f'{variable}_promedio')
+        cuadrados_horario = getattr(LecturaHoraria, f'{variable}_suma_cuadrados')
+        
+        if aire_id is not None:
+            clave = 'mes_año'
+            grupo = truncar_fecha(Lectura.fecha, 'month')
+            grupo_horario = truncar_fecha(LecturaHoraria.hora, 'month')
+        else:
+            clave = 'aire_id'
+            grupo = Lectura.aire_id
+            grupo_horario = LecturaHoraria.aire_id
+        
+        # Conteo, suma y suma de cuadrados por grupo: se pueden sumar entre lecturas
+        # crudas y compactadas y no dependen de un agregado stddev del motor
+        query = sesion.query(
+            grupo.label('grupo'),
+            func.count(columna),
+            func.sum(columna),
+            func.sum(columna * columna)
+        )
+        query_compactadas = sesion.query(
+            grupo_horario.label('grupo'),
+            func.sum(LecturaHoraria.cantidad),
+            func.sum(promedio_horario * LecturaHoraria.cantidad),
+            func.sum(cuadrados_horario)
+        )
+        
+        if aire_id is not None:
+            query = query.filter(Lectura.aire_id == aire_id)
+            query_compactadas = query_compactadas.filter(LecturaHoraria.aire_id == aire_id)
+        
+        filas = query.group_by(grupo).all() + query_compactadas.group_by(grupo_horario).all()
+        
+        if not filas:
+            return pd.DataFrame(columns=[clave, 'promedio', 'desviacion', 'lecturas'])
+        
+        variacion_df = pd.DataFrame(filas, columns=['grupo', 'n', 'suma', 'cuadrados'])
+        
+        if aire_id is not None:
+            # date_trunc devuelve un timestamp en PostgreSQL y un texto en SQLite
+            variacion_df['grupo'] = pd.to_datetime(variacion_df['grupo']).dt.strftime('%Y-%m')
+        
+        variacion_df = variacion_df.astype({'n': float, 'suma': float, 'cuadrados': float})
+        variacion_df = variacion_df.groupby('grupo', as_index=False).sum()
+        
+        n = variacion_df['n']
+        promedio = variacion_df['suma'] / n
+        varianza = ((variacion_df['cuadrados'] - n * promedio ** 2) / (n - 1)).clip(lower=0)
+        
+        return pd.DataFrame({
+            clave: variacion_df['grupo'],
+            'promedio': promedio,
+            'desviacion': np.sqrt(varianza).where(n > 1, 0.0),
+            'lecturas': n.astype(int)
+        }).sort_values(clave).reset_index(drop=True)
+    
+    def _invalidar_caches_lecturas(self):
+        # Las cachés se actualizan solas con las lecturas nuevas (por ID), pero no
+        # al eliminar, compactar o actualizar lecturas ya incluidas
+        self._cache_tendencias.clear()
+        self._cache_mapas_calor.clear()
+    
+    def _sumar_mapa_calor(self, eje, aire_id, ubicacion, desde, hasta, desde_id, hasta_id, compactadas=False):
+        # Lecturas, suma de temperatura y suma de humedad por (eje, hora) en la base de
+        # datos; las horas compactadas solo se incluyen en el cálculo completo
+        consultas = []
+        
+        for modelo, fecha, cantidad, temperatura, humedad in (
+            (Lectura, Lectura.fecha, func.count(Lectura.id),
+             func.sum(Lectura.temperatura), func.sum(Lectura.humedad)),
+            (LecturaHoraria, LecturaHoraria.hora, func.sum(LecturaHoraria.cantidad),
+             func.sum(LecturaHoraria.temperatura_promedio * LecturaHoraria.cantidad),
+             func.sum(LecturaHoraria.humedad_promedio * LecturaHoraria.cantidad))
+        ):
+            if modelo is LecturaHoraria and not compactadas:
+                continue
+            
+            grupo = extraer_fecha(fecha, 'dow') if eje == 'dia_semana' else truncar_fecha(fecha, 'day')
+            hora = extraer_fecha(fecha, 'hour')
+            
+            query = session.query(
+                grupo.label('grupo'),
+                hora.label('hora'),
+                cantidad,
+                temperatura,
+                humedad
+            ).filter(modelo.aire_id.isnot(None))
+            
+            if modelo is Lectura:
+                query = query.filter(Lectura.id > desde_id, Lectura.id <= hasta_id)
+            if aire_id is not None:
+                query = query.filter(modelo.aire_id == aire_id)
+            if ubicacion is not None:
+                query = query.filter(modelo.aire_id.in_(
+                    session.query(AireAcondicionado.id).filter(AireAcondicionado.ubicacion == ubicacion)
+                ))
+            if desde is not None:
+                query = query.filter(fecha >= datetime.combine(desde, datetime.min.time()))
+            if hasta is not None:
+                query = query.filter(fecha < datetime.combine(hasta + timedelta(days=1), datetime.min.time()))
+            
+            consultas += query.group_by(grupo, hora).all()
+        
+        sumas = pd.DataFrame(consultas, columns=['grupo', 'hora', 'lecturas', 'temperatura', 'humedad'])
+        
+        if eje == 'dia_semana':
+            # 0 = lunes, como en pandas
+            sumas['grupo'] = (sumas['grupo'].astype(int) + 6) % 7
+        else:
+            # date_trunc devuelve un timestamp en PostgreSQL y un texto en SQLite
+            sumas['grupo'] = pd.to_datetime(sumas['grupo']).dt.date
+        
+        return sumas.astype({'hora': int, 'lecturas': int, 'temperatura': float, 'humedad': float})
+    
+    def obtener_mapa_calor(self, eje='dia_semana', aire_id=None, ubicacion=None, desde=None, hasta=None):
+        """
+        Calcula en la base de datos la temperatura y la humedad promedio por hora
+        del día y día de la semana (o fecha), incluyendo las horas compactadas.
+        Solo se transfiere la rejilla agregada, que se guarda en caché hasta
+        MARGEN_IDS_TARDIOS IDs por debajo del último: las consultas siguientes
+        solo suman las lecturas posteriores a la caché, así que también
+        incluyen las que otro escritor confirmó tarde con un ID menor.
+        
+        Args:
+            eje: 'dia_semana' o 'fecha'
+            aire_id: Opcional, ID del aire acondicionado
+            ubicacion: Opcional, ubicación (si no se indica aire_id)
+            desde: Opcional, primer día (incluido)
+            hasta: Opcional, último día (incluido)
+            
+        Returns:
+            DataFrame con dia_semana (0 = lunes) o fecha, hora, lecturas,
+            temperatura y humedad (promedios)
+        """
+        clave = (eje, aire_id, ubicacion, desde, hasta)
+        ultimo_id = session.query(func.max(Lectura.id)).scalar() or 0
+        en_cache = self._cache_mapas_calor.get(clave)
+        
+        # La caché solo llega hasta el corte: las lecturas por encima se suman en
+        # cada consulta, porque todavía pueden aparecer otras con ID menor
+        corte = max(ultimo_id - MARGEN_IDS_TARDIOS, 0)
+        
+        if en_cache is None:
+            base = self._sumar_mapa_calor(eje, aire_id, ubicacion, desde, hasta, 0, corte, compactadas=True)
+        elif en_cache[0] < corte:
+            nuevas = self._sumar_mapa_calor(eje, aire_id, ubicacion, desde, hasta, en_cache[0], corte)
+            base = pd.concat([en_cache[1], nuevas], ignore_index=True) if not nuevas.empty else en_cache[1]
+        else:
+            base = en_cache[1]
+            corte = en_cache[0]
+        
+        # Unir las filas crudas, compactadas y nuevas de cada celda
+        base = base.groupby(['grupo', 'hora'], as_index=False).sum()
+        
+        # Limitar la caché si se consultan muchos rangos distintos
+        if len(self._cache_mapas_calor) >= 32 and clave not in self._cache_mapas_calor:
+            self._cache_mapas_calor.clear()
+        self._cache_mapas_calor[clave] = (corte, base)
+        
+        recientes = self._sumar_mapa_calor(eje, aire_id, ubicacion, desde, hasta, corte, ultimo_id)
+        sumas = base
+        if not recientes.empty:
+            sumas = pd.concat([base, recientes], ignore_index=True).groupby(['grupo', 'hora'], as_index=False).sum()
+        
+        mapa_df = sumas.rename(columns={'grupo': eje})
+        mapa_df['temperatura'] = mapa_df['temperatura'] / mapa_df['lecturas']
+        mapa_df['humedad'] = mapa_df['humedad'] / mapa_df['lecturas']
+        
+        return mapa_df.sort_values([eje, 'hora']).reset_index(drop=True)
+    
+    def compactar_lecturas(self, dias_retencion=None, horas_por_lote=24):
+        """
+        Compacta las lecturas más antiguas que el periodo de retención en
+        agregados por hora (mínimo, máximo, promedio y cantidad) y elimina las
+        lecturas originales.
+        
+        Se procesa una ventana de horas_por_lote horas por transacción: los
+        agregados de la ventana se guardan y sus lecturas se eliminan en el
+        mismo commit, así que el proceso puede interrumpirse y reanudarse.
+        
+        Args:
+            dias_retencion: Días de lecturas originales que se conservan
+                (por defecto RETENCION_LECTURAS_DIAS; sin valor no se compacta nada)
+            horas_por_lote: Horas de lecturas procesadas en cada transacción
+            
+        Returns:
+            Diccionario con el número de lecturas compactadas y de horas generadas
+        """
+        if dias_retencion is None:
+            dias_retencion = os.environ.get('RETENCION_LECTURAS_DIAS')
+            if not dias_retencion:
+                return {'lecturas_compactadas': 0, 'horas_generadas': 0}
+        
+        limite = datetime.now() - timedelta(days=int(dias_retencion))
+        limite = limite.replace(minute=0, second=0, microsecond=0)
+        
+        hora_expr = truncar_fecha(Lectura.fecha, 'hour')
+        total_lecturas = 0
+        total_horas = 0
+        
+        inicio = session.query(func.min(Lectura.fecha)).filter(Lectura.fecha < limite).scalar()
+        
+        while inicio is not None:
+            inicio = inicio.replace(minute=0, second=0, microsecond=0)
+            fin = min(inicio + timedelta(hours=horas_por_lote), limite)
+            
+            try:
+                agregados = session.query(
+                    Lectura.aire_id,
+                    hora_expr.label('hora'),
+                    func.count(Lectura.id).label('cantidad'),
+                    func.avg(Lectura.temperatura).label('temp_avg'),
+                    func.min(Lectura.temperatura).label('temp_min'),
+                    func.max(Lectura.temperatura).label('temp_max'),
+                    func.sum(Lectura.temperatura * Lectura.temperatura).label('temp_cuadrados'),
+                    func.avg(Lectura.humedad).label('hum_avg'),
+                    func.min(Lectura.humedad).label('hum_min'),
+                    func.max(Lectura.humedad).label('hum_max'),
+                    func.sum(Lectura.humedad * Lectura.humedad).label('hum_cuadrados')
+                ).filter(
+                    Lectura.fecha >= inicio,
+                    Lectura.fecha < fin,
+                    Lectura.aire_id.isnot(None)
+                ).group_by(Lectura.aire_id, hora_expr).all()
+                
+                # Horas ya compactadas en ejecuciones anteriores (lecturas tardías)
+                existentes = {
+                    (h.aire_id, h.hora): h
+                    for h in session.query(LecturaHoraria).filter(
+                        LecturaHoraria.hora >= inicio,
+                        LecturaHoraria.hora < fin
+                    ).all()
+                }
+                
+                for a in agregados:
+                    hora = pd.Timestamp(a.hora).to_pydatetime()
+                    horaria = existentes.get((a.aire_id, hora))
+                    
+                    if horaria is None:
+                        session.add(LecturaHoraria(
+                            aire_id=a.aire_id,
+                            hora=hora,
+                            cantidad=a.cantidad,
+                            temperatura_promedio=a.temp_avg,
+                            temperatura_min=a.temp_min,
+                            temperatura_max=a.temp_max,
+                            temperatura_suma_cuadrados=a.temp_cuadrados,
+                            humedad_promedio=a.hum_avg,
+                            humedad_min=a.hum_min,
+                            humedad_max=a.hum_max,
+                            humedad_suma_cuadrados=a.hum_cuadrados
+                        ))
+                        total_horas += 1
+                    else:
+                        cantidad = horaria.cantidad + a.cantidad
+                        horaria.temperatura_promedio = (horaria.temperatura_promedio * horaria.cantidad + a.temp_avg * a.cantidad) / cantidad
+                        horaria.temperatura_min = min(horaria.temperatura_min, a.temp_min)
+                        horaria.temperatura_max = max(horaria.temperatura_max, a.temp_max)
+                        horaria.temperatura_suma_cuadrados += a.temp_cuadrados
+                        horaria.humedad_promedio = (horaria.humedad_promedio * horaria.cantidad + a.hum_avg * a.cantidad) / cantidad
+                        horaria.humedad_min = min(horaria.humedad_min, a.hum_min)
+                        horaria.humedad_max = max(horaria.humedad_max, a.hum_max)
+                        horaria.humedad_suma_cuadrados += a.hum_cuadrados
+                        horaria.cantidad = cantidad
+                    
+                    total_lecturas += a.cantidad
+                
+                # Eliminar las lecturas originales de la ventana en una sola sentencia
+                session.query(Lectura).filter(
+                    Lectura.fecha >= inicio,
+                    Lectura.fecha < fin,
+                    Lectura.aire_id.isnot(None)
+                ).delete(synchronize_session=False)
+                incrementar_generacion_lecturas(session)
+                
+                session.commit()
+            except:
+                session.rollback()
+                raise
+            
+            # Saltar directamente a la siguiente lectura antigua
+            inicio = session.query(func.min(Lectura.fecha)).filter(
+                Lectura.fecha >= fin,
+                Lectura.fecha < limite
+            ).scalar()
+        
+        self._invalidar_caches_lecturas()
+        
+        return {'lecturas_compactadas': total_lecturas, 'horas_generadas': total_horas}
+    
+    def obtener_estadisticas_por_aire(self, aire_id):
+        # Consultar estadísticas de un aire específico desde la base de datos
+        result = self._estadisticas_lecturas(aires_ids=[aire_id])
         
         # Si no hay lecturas, devolver valores predeterminados
         if result.temp_avg is None:
@@ -244,15 +2067,7 @@ class DataManager:
     
     def obtener_estadisticas_generales(self):
         # Consultar estadísticas generales desde la base de datos
-        result = session.query(
-            func.avg(Lectura.temperatura).label('temp_avg'),
-            func.min(Lectura.temperatura).label('temp_min'),
-            func.max(Lectura.temperatura).label('temp_max'),
-            func.avg(Lectura.humedad).label('hum_avg'),
-            func.min(Lectura.humedad).label('hum_min'),
-            func.max(Lectura.humedad).label('hum_max'),
-            func.count(distinct(Lectura.id)).label('total_lecturas')
-        ).first()
+        result = self._estadisticas_lecturas()
         
         # Si no hay lecturas, devolver valores predeterminados
         if result.temp_avg is None:
@@ -292,8 +2107,7 @@ class DataManager:
         Returns:
             Lista de ubicaciones únicas
         """
-        ubicaciones = session.query(distinct(AireAcondicionado.ubicacion)).all()
-        return [ubicacion[0] for ubicacion in ubicaciones]
+        return list(self.obtener_catalogo_aires().aires_por_ubicacion)
     
     def obtener_aires_por_ubicacion(self, ubicacion):
         """
@@ -305,21 +2119,12 @@ class DataManager:
         Returns:
             DataFrame con los aires en esa ubicación
         """
-        aires = session.query(AireAcondicionado).filter(AireAcondicionado.ubicacion == ubicacion).all()
-        
-        # Convertir a DataFrame
-        aires_data = [
-            {
-                'id': aire.id,
-                'nombre': aire.nombre,
-                'ubicacion': aire.ubicacion,
-                'fecha_instalacion': aire.fecha_instalacion
-            }
-            for aire in aires
-        ]
-        
-        return pd.DataFrame(aires_data)
+        catalogo = self.obtener_catalogo_aires()
+        aires_df = catalogo.a_dataframe()
+        aires_ids = catalogo.aires_por_ubicacion.get(ubicacion, [])
+        return aires_df[aires_df['id'].isin(aires_ids)].reset_index(drop=True)
     
+    @solo_lectura
     def obtener_estadisticas_por_ubicacion(self, ubicacion=None):
         """
         Obtiene estadísticas agrupadas por ubicación.
@@ -330,9 +2135,10 @@ class DataManager:
         Returns:
             DataFrame con estadísticas por ubicación
         """
+        catalogo = self.obtener_catalogo_aires()
+        
         # Si no hay lecturas o aires, devolver DataFrame vacío
-        aires_count = session.query(AireAcondicionado).count()
-        if aires_count == 0:
+        if len(catalogo) == 0:
             return pd.DataFrame()
         
         # Obtener todas las ubicaciones o la ubicación específica
@@ -341,60 +2147,64 @@ class DataManager:
         else:
             ubicaciones = self.obtener_ubicaciones()
         
+        # Sumas por aire en dos consultas agrupadas (lecturas y horas compactadas),
+        # en lugar de dos consultas por ubicación
+        por_aire = self._sumas_por_aire()
+        
         # Lista para almacenar resultados
         resultados = []
         
-        # Para cada ubicación, obtener sus aires y estadísticas
         for ubicacion_actual in ubicaciones:
             # Obtener IDs de aires en esta ubicación
-            aires_ids = session.query(AireAcondicionado.id).filter(
-                AireAcondicionado.ubicacion == ubicacion_actual
-            ).all()
-            aires_ids = [aire_id[0] for aire_id in aires_ids]
+            aires_ids = catalogo.aires_por_ubicacion.get(ubicacion_actual, [])
+            
+            sumas = por_aire[por_aire['aire_id'].isin(aires_ids)]
+            n = sumas['cantidad'].sum()
             
-            if not aires_ids:
+            # Si hay lecturas para esta ubicación
+            if not aires_ids or not n:
                 continue
             
-            # Consultar estadísticas para estos aires
-            result = session.query(
-                func.avg(Lectura.temperatura).label('temp_avg'),
-                func.min(Lectura.temperatura).label('temp_min'),
-                func.max(Lectura.temperatura).label('temp_max'),
-                func.stddev(Lectura.temperatura).label('temp_std'),
-                func.avg(Lectura.humedad).label('hum_avg'),
-                func.min(Lectura.humedad).label('hum_min'),
-                func.max(Lectura.humedad).label('hum_max'),
-                func.stddev(Lectura.humedad).label('hum_std'),
-                func.count(distinct(Lectura.id)).label('total_lecturas')
-            ).filter(Lectura.aire_id.in_(aires_ids)).first()
+            resultado = {
+                'ubicacion': ubicacion_actual,
+                'num_aires': len(aires_ids)
+            }
+            
+            for prefijo, variable in (('temp', 'temperatura'), ('hum', 'humedad')):
+                media = sumas[f'{prefijo}_suma'].sum() / n
+                m2 = max(sumas[f'{prefijo}_cuadrados'].sum() - n * media ** 2, 0)
+                desviacion = (m2 / (n - 1)) ** 0.5 if n > 1 else 0
+                
+                resultado[f'{variable}_promedio'] = round(media, 2)
+                resultado[f'{variable}_min'] = round(sumas[f'{prefijo}_min'].min(), 2)
+                resultado[f'{variable}_max'] = round(sumas[f'{prefijo}_max'].max(), 2)
+                resultado[f'{variable}_std'] = round(desviacion, 2)
             
-            # Si hay lecturas para esta ubicación
-            if result.temp_avg is not None:
-                resultados.append({
-                    'ubicacion': ubicacion_actual,
-                    'num_aires': len(aires_ids),
-                    'temperatura_promedio': round(result.temp_avg, 2) if result.temp_avg else 0,
-                    'temperatura_min': round(result.temp_min, 2) if result.temp_min else 0,
-                    'temperatura_max': round(result.temp_max, 2) if result.temp_max else 0,
-                    'temperatura_std': round(result.temp_std, 2) if result.temp_std else 0,
-                    'humedad_promedio': round(result.hum_avg, 2) if result.hum_avg else 0,
-                    'humedad_min': round(result.hum_min, 2) if result.hum_min else 0,
-                    'humedad_max': round(result.hum_max, 2) if result.hum_max else 0,
-                    'humedad_std': round(result.hum_std, 2) if result.hum_std else 0,
-                    'lecturas_totales': result.total_lecturas or 0
-                })
+            resultado['lecturas_totales'] = int(n)
+            resultados.append(resultado)
         
         # Convertir resultados a DataFrame
         return pd.DataFrame(resultados)
     
     def eliminar_aire(self, aire_id):
-        # Obtener el aire a eliminar
-        aire = session.query(AireAcondicionado).filter(AireAcondicionado.id == aire_id).first()
-        
-        if aire:
-            # SQLAlchemy eliminará automáticamente las lecturas asociadas debido a la relación cascade
-            session.delete(aire)
+        # Una sola sentencia: la base de datos elimina en cascada (ON DELETE CASCADE)
+        # las lecturas, mantenimientos, umbrales y resúmenes del aire
+        try:
+            eliminado = session.execute(
+                delete(AireAcondicionado).where(AireAcondicionado.id == aire_id)
+            ).rowcount > 0
+            if eliminado:
+                incrementar_generacion_lecturas(session)
             session.commit()
+        except:
+            session.rollback()
+            raise
+        
+        if eliminado:
+            self._invalidar_catalogo_aires()
+            self._invalidar_caches_lecturas()
+        
+        return eliminado
     
     def agregar_mantenimiento(self, aire_id, tipo_mantenimiento, descripcion, tecnico, imagen_file=None):
         """
@@ -435,6 +2245,7 @@ class DataManager:
         
         return nuevo_mantenimiento.id
     
+    @solo_lectura
     def obtener_mantenimientos(self, aire_id=None):
         """
         Obtiene todos los mantenimientos, opcionalmente filtrados por aire_id.
@@ -445,8 +2256,10 @@ class DataManager:
         Returns:
             DataFrame con los mantenimientos
         """
+        sesion = self.consultas.sesion
+        
         # Construir la consulta
-        query = session.query(Mantenimiento)
+        query = sesion.query(Mantenimiento)
         
         # Filtrar por aire_id si se proporciona
         if aire_id is not None:
@@ -600,22 +2413,8 @@ class DataManager:
             umbrales_con_aire = umbral_df[umbral_df['aire_id'].notnull()]
             
             if not umbrales_con_aire.empty:
-                # Obtener todos los aires
-                aires_df = self.obtener_aires()
-                
-                # Mezclar para obtener los nombres
-                umbral_df = pd.merge(
-                    umbral_df,
-                    aires_df[['id', 'nombre']],
-                    how='left',
-                    left_on='aire_id',
-                    right_on='id',
-                    suffixes=('', '_aire')
-                )
-                
-                # Renombrar la columna
-                if 'nombre_aire' in umbral_df.columns:
-                    umbral_df.rename(columns={'nombre_aire': 'aire_nombre'}, inplace=True)
+                # Nombres de los aires desde el catálogo
+                umbral_df['aire_nombre'] = umbral_df['aire_id'].map(self.obtener_catalogo_aires().nombres)
         
         return umbral_df
     
@@ -655,6 +2454,11 @@ class DataManager:
         umbral = self.obtener_umbral_por_id(umbral_id)
         
         if umbral:
+            limites_cambiados = (
+                (umbral.temp_min, umbral.temp_max, umbral.hum_min, umbral.hum_max, umbral.notificar_activo)
+                != (temp_min, temp_max, hum_min, hum_max, notificar_activo)
+            )
+            
             # Actualizar campos
             umbral.nombre = nombre
             umbral.temp_min = temp_min
@@ -665,6 +2469,13 @@ class DataManager:
             
             # No se puede cambiar es_global o aire_id una vez creado
             
+            # Los estados de alerta se calcularon con los límites anteriores: se
+            # descartan y las lecturas siguientes los vuelven a crear
+            if limites_cambiados:
+                session.query(EstadoAlerta).filter(
+                    EstadoAlerta.umbral_id == umbral_id
+                ).delete(synchronize_session=False)
+            
             session.commit()
             return True
             
@@ -683,6 +2494,7 @@ class DataManager:
         umbral = self.obtener_umbral_por_id(umbral_id)
         
         if umbral:
+            # Sus estados de alerta se eliminan en cascada (ON DELETE CASCADE)
             session.delete(umbral)
             session.commit()
             return True
@@ -711,11 +2523,35 @@ class DataManager:
                 'alertas': []
             }
         
+        alertas = self._comprobar_umbrales(
+            (umbral for _, umbral in umbrales_df.iterrows()),
+            temperatura,
+            humedad
+        )
+        
+        # Devolver resultado
+        return {
+            'dentro_limite': len(alertas) == 0,
+            'alertas': alertas
+        }
+    
+    def _comprobar_umbrales(self, umbrales, temperatura, humedad):
+        """
+        Compara una lectura con una lista de umbrales.
+        
+        Args:
+            umbrales: Iterable de umbrales (filas o diccionarios)
+            temperatura: Temperatura a verificar
+            humedad: Humedad a verificar
+            
+        Returns:
+            Lista de alertas
+        """
         # Lista para almacenar alertas
         alertas = []
         
         # Verificar cada umbral
-        for _, umbral in umbrales_df.iterrows():
+        for umbral in umbrales:
             if not umbral['notificar_activo']:
                 continue
                 
@@ -759,12 +2595,9 @@ class DataManager:
                     'mensaje': f"Humedad ({humedad}%) por encima del máximo ({umbral['hum_max']}%)"
                 })
         
-        # Devolver resultado
-        return {
-            'dentro_limite': len(alertas) == 0,
-            'alertas': alertas
-        }
+        return alertas
     
+    @solo_lectura
     def exportar_datos(self, formato='csv'):
         # Asegurar que el directorio exista
         if not os.path.exists(self.data_dir):
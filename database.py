@@ -1,9 +1,13 @@
 import os
 import base64
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, ForeignKey, Text, LargeBinary, Boolean
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, LargeBinary, Boolean, UniqueConstraint, Index, func, cast, extract
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
-from datetime import datetime
+from datetime import date, datetime, time
+from particionado import preparar_particiones, indices_omitidos
+from migraciones import migrar_borrado_en_cascada, migrar_indices_unicos
+from instrumentacion import instrumentar_motor
 
 
 # Obtener la URL de conexión desde las variables de entorno
@@ -12,10 +16,65 @@ DATABASE_URL = os.environ.get('DATABASE_URL')
 # Crear el motor de la base de datos
 engine = create_engine(DATABASE_URL)
 
+# Duración de cada consulta (ver instrumentacion.py)
+instrumentar_motor(engine)
+
+class _DesviacionEstandar:
+    """Agregado stddev (desviación muestral, como en PostgreSQL) para SQLite."""
+    
+    def __init__(self):
+        self.n = 0
+        self.media = 0.0
+        self.m2 = 0.0
+    
+    def step(self, valor):
+        if valor is None:
+            return
+        
+        # Algoritmo de Welford: estable con valores grandes y varianzas pequeñas
+        self.n += 1
+        delta = valor - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (valor - self.media)
+    
+    def finalize(self):
+        return (self.m2 / (self.n - 1)) ** 0.5 if self.n > 1 else None
+
+
+def _preparar_conexion_sqlite(conexion_dbapi, registro):
+    # SQLite solo aplica las claves foráneas (y ON DELETE CASCADE) si se activan en cada conexión
+    cursor = conexion_dbapi.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+    
+    # Las estadísticas usan stddev, que SQLite no tiene
+    conexion_dbapi.create_aggregate('stddev', 1, _DesviacionEstandar)
+
+
+if engine.dialect.name == 'sqlite':
+    event.listen(engine, 'connect', _preparar_conexion_sqlite)
+
 # Crear una sesión
 Session = sessionmaker(bind=engine)
 session = Session()
 
+# Réplica opcional para las consultas de solo lectura (ver replica.py)
+DATABASE_READ_URL = os.environ.get('DATABASE_READ_URL')
+SessionReplica = None
+
+if DATABASE_READ_URL:
+    # pool_pre_ping descarta las conexiones que la réplica haya cerrado; el tiempo
+    # de conexión corto permite volver pronto a la principal si la réplica cae
+    engine_replica = create_engine(
+        DATABASE_READ_URL,
+        pool_pre_ping=True,
+        connect_args={'connect_timeout': 3} if DATABASE_READ_URL.startswith('postgresql') else {}
+    )
+    instrumentar_motor(engine_replica)
+    if engine_replica.dialect.name == 'sqlite':
+        event.listen(engine_replica, 'connect', _preparar_conexion_sqlite)
+    SessionReplica = sessionmaker(bind=engine_replica)
+
 # Crear la base declarativa
 Base = declarative_base()
 
@@ -28,11 +87,12 @@ class AireAcondicionado(Base):
     ubicacion = Column(String(200))
     fecha_instalacion = Column(String(10))
     
-    # Relación con las lecturas
-    lecturas = relationship("Lectura", back_populates="aire", cascade="all, delete-orphan")
+    # Relación con las lecturas; al eliminar el aire, la base de datos las borra
+    # (ON DELETE CASCADE) sin que SQLAlchemy las cargue
+    lecturas = relationship("Lectura", back_populates="aire", cascade="all, delete-orphan", passive_deletes=True)
     
     # Relación con los mantenimientos
-    mantenimientos = relationship("Mantenimiento", back_populates="aire", cascade="all, delete-orphan")
+    mantenimientos = relationship("Mantenimiento", back_populates="aire", cascade="all, delete-orphan", passive_deletes=True)
     
     def __repr__(self):
         return f"<AireAcondicionado(id={self.id}, nombre='{self.nombre}')>"
@@ -42,7 +102,7 @@ class Lectura(Base):
     __tablename__ = 'lecturas'
     
     id = Column(Integer, primary_key=True)
-    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id'))
+    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id', ondelete='CASCADE'))
     fecha = Column(DateTime, nullable=False)
     temperatura = Column(Float, nullable=False)
     humedad = Column(Float, nullable=False)
@@ -50,15 +110,105 @@ class Lectura(Base):
     # Relación con el aire acondicionado
     aire = relationship("AireAcondicionado", back_populates="lecturas")
     
+    # Índices para recorrer las lecturas por fecha (paginación por clave y rangos);
+    # (aire_id, fecha) es además la clave única de los upserts de lecturas
+    __table_args__ = (
+        Index('ix_lecturas_aire_fecha', 'aire_id', 'fecha', unique=True),
+        Index('ix_lecturas_fecha', 'fecha'),
+    )
+    
     def __repr__(self):
         return f"<Lectura(id={self.id}, aire_id={self.aire_id}, fecha='{self.fecha}')>"
 
+# Definir el modelo para lecturas compactadas por hora
+class LecturaHoraria(Base):
+    __tablename__ = 'lecturas_horarias'
+    
+    id = Column(Integer, primary_key=True)
+    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id', ondelete='CASCADE'), nullable=False)
+    hora = Column(DateTime, nullable=False)  # Inicio de la hora agregada
+    cantidad = Column(Integer, nullable=False)  # Número de lecturas originales
+    
+    # Agregados de temperatura
+    temperatura_promedio = Column(Float, nullable=False)
+    temperatura_min = Column(Float, nullable=False)
+    temperatura_max = Column(Float, nullable=False)
+    temperatura_suma_cuadrados = Column(Float, nullable=False)  # Para poder combinar desviaciones
+    
+    # Agregados de humedad
+    humedad_promedio = Column(Float, nullable=False)
+    humedad_min = Column(Float, nullable=False)
+    humedad_max = Column(Float, nullable=False)
+    humedad_suma_cuadrados = Column(Float, nullable=False)
+    
+    __table_args__ = (UniqueConstraint('aire_id', 'hora', name='uq_lecturas_horarias_aire_hora'),)
+    
+    def __repr__(self):
+        return f"<LecturaHoraria(aire_id={self.aire_id}, hora='{self.hora}', cantidad={self.cantidad})>"
+
+# Definir el modelo para el estado de detección de anomalías de cada aire
+class EstadoAnomalia(Base):
+    __tablename__ = 'estado_anomalias'
+    
+    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id', ondelete='CASCADE'), primary_key=True)
+    lecturas = Column(Integer, nullable=False, default=0)  # Lecturas procesadas
+    
+    # Media y varianza exponenciales (EWMA)
+    temperatura_media = Column(Float)
+    temperatura_varianza = Column(Float)
+    humedad_media = Column(Float)
+    humedad_varianza = Column(Float)
+    
+    # Última lectura evaluada y su puntuación z
+    ultima_lectura_id = Column(Integer)
+    ultima_fecha = Column(DateTime)
+    ultima_temperatura = Column(Float)
+    ultima_humedad = Column(Float)
+    temperatura_z = Column(Float)
+    humedad_z = Column(Float)
+    es_anomalia = Column(Boolean, nullable=False, default=False)
+    fecha_ultima_anomalia = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<EstadoAnomalia(aire_id={self.aire_id}, es_anomalia={self.es_anomalia})>"
+
+# Definir el modelo para los resúmenes de cuantiles (t-digest) diarios de cada aire
+class CuantilesDiarios(Base):
+    __tablename__ = 'cuantiles_diarios'
+    
+    id = Column(Integer, primary_key=True)
+    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id', ondelete='CASCADE'), nullable=False)
+    dia = Column(Date, nullable=False)
+    cantidad = Column(Integer, nullable=False, default=0)  # Lecturas resumidas
+    
+    # TDigest serializados (ver cuantiles.py)
+    temperatura_digest = Column(LargeBinary, nullable=False)
+    humedad_digest = Column(LargeBinary, nullable=False)
+    
+    __table_args__ = (UniqueConstraint('aire_id', 'dia', name='uq_cuantiles_diarios_aire_dia'),)
+    
+    def __repr__(self):
+        return f"<CuantilesDiarios(aire_id={self.aire_id}, dia='{self.dia}', cantidad={self.cantidad})>"
+
+# Definir el modelo del contador de modificaciones de lecturas: una sola fila cuya
+# generación aumenta en la misma transacción que elimina, compacta o actualiza
+# lecturas ya guardadas. Las copias de las lecturas (la instantánea en disco) se
+# validan con una consulta por clave primaria en lugar de contar la tabla
+class GeneracionLecturas(Base):
+    __tablename__ = 'generacion_lecturas'
+    
+    id = Column(Integer, primary_key=True)
+    generacion = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<GeneracionLecturas(generacion={self.generacion})>"
+
 # Definir el modelo para mantenimientos
 class Mantenimiento(Base):
     __tablename__ = 'mantenimientos'
     
     id = Column(Integer, primary_key=True)
-    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id'))
+    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id', ondelete='CASCADE'))
     fecha = Column(DateTime, nullable=False, default=datetime.now)
     tipo_mantenimiento = Column(String(100), nullable=False)
     descripcion = Column(Text)
@@ -87,7 +237,7 @@ class UmbralConfiguracion(Base):
     __tablename__ = 'umbrales_configuracion'
     
     id = Column(Integer, primary_key=True)
-    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id'), nullable=True)
+    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id', ondelete='CASCADE'), nullable=True)
     nombre = Column(String(100), nullable=False)
     es_global = Column(Boolean, default=False)  # True si el umbral aplica a todos los aires
     
@@ -115,6 +265,26 @@ class UmbralConfiguracion(Base):
         else:
             return f"<UmbralConfiguracion(id={self.id}, nombre='{self.nombre}', aire_id={self.aire_id})>"
 
+# Definir el modelo para el estado de las alertas de umbral (con histéresis)
+class EstadoAlerta(Base):
+    __tablename__ = 'estado_alertas'
+    
+    aire_id = Column(Integer, ForeignKey('aires_acondicionados.id', ondelete='CASCADE'), primary_key=True)
+    umbral_id = Column(Integer, ForeignKey('umbrales_configuracion.id', ondelete='CASCADE'), primary_key=True)
+    variable = Column(String(20), primary_key=True)  # 'temperatura' o 'humedad'
+    
+    # 'normal', 'pendiente' (fuera de límite, esperando la duración mínima),
+    # 'activa' o 'recuperando' (dentro de la banda de salida, esperando la duración mínima)
+    estado = Column(String(20), nullable=False, default='normal')
+    lado = Column(String(3))  # 'max' o 'min': límite superado
+    desde = Column(DateTime)  # Inicio de la fase pendiente o recuperando
+    fecha_activacion = Column(DateTime)
+    ultima_fecha = Column(DateTime)
+    ultimo_valor = Column(Float)
+    
+    def __repr__(self):
+        return f"<EstadoAlerta(aire_id={self.aire_id}, umbral_id={self.umbral_id}, variable='{self.variable}', estado='{self.estado}')>"
+
 # Definir el modelo para usuarios
 class Usuario(Base):
     __tablename__ = 'usuarios'
@@ -133,6 +303,92 @@ class Usuario(Base):
     def __repr__(self):
         return f"<Usuario(id={self.id}, username='{self.username}', rol='{self.rol}')>"
 
+# Fecha de una lectura tal como la guarda la columna fecha: datetime sin zona
+# horaria. Las fechas con zona se pasan a la hora local, un date es su medianoche
+# y una subclase (pandas.Timestamp) se convierte en datetime
+def normalizar_fecha(fecha):
+    if isinstance(fecha, datetime):
+        if fecha.tzinfo is not None:
+            fecha = fecha.astimezone().replace(tzinfo=None)
+        return fecha if type(fecha) is datetime else datetime.combine(fecha.date(), fecha.time())
+    
+    if isinstance(fecha, date):
+        return datetime.combine(fecha, time())
+    
+    raise TypeError(f"Fecha de lectura no válida: {fecha!r}")
+
+# Truncar una columna de fecha a hora, día o mes según el motor de base de datos
+def truncar_fecha(columna, unidad):
+    if engine.dialect.name == 'postgresql':
+        return func.date_trunc(unidad, columna)
+    
+    # SQLite no tiene date_trunc; devuelve el texto de la fecha truncada
+    formatos = {
+        'hour': '%Y-%m-%d %H:00:00',
+        'day': '%Y-%m-%d 00:00:00',
+        'month': '%Y-%m-01 00:00:00'
+    }
+    return func.strftime(formatos[unidad], columna)
+
+# Extraer la hora del día o el día de la semana (0 = domingo) de una columna de fecha
+def extraer_fecha(columna, parte):
+    if engine.dialect.name == 'postgresql':
+        return cast(extract(parte, columna), Integer)
+    
+    # En SQLite, strftime devuelve la parte como texto
+    formatos = {
+        'hour': '%H',
+        'dow': '%w'
+    }
+    return cast(func.strftime(formatos[parte], columna), Integer)
+
+# INSERT con cláusula ON CONFLICT (on_conflict_do_nothing / on_conflict_do_update)
+# según el motor de base de datos
+def insertar_con_conflicto(modelo):
+    if engine.dialect.name == 'postgresql':
+        return postgresql.insert(modelo)
+    return sqlite.insert(modelo)
+
+# Incrementar el contador de modificaciones de lecturas dentro de la transacción
+# de la sesión o conexión indicada
+def incrementar_generacion_lecturas(sesion):
+    sentencia = insertar_con_conflicto(GeneracionLecturas).values(id=1, generacion=1)
+    sesion.execute(sentencia.on_conflict_do_update(
+        index_elements=['id'],
+        set_={'generacion': GeneracionLecturas.generacion + 1}
+    ))
+
+# init_db se llama en cada ejecución de app.py: las tablas, la migración y los
+# índices solo se comprueban la primera vez en el proceso
+_esquema_preparado = False
+
 # Crear todas las tablas en la base de datos
 def init_db():
-    Base.metadata.create_all(engine)
\ No newline at end of file
+    global _esquema_preparado
+    
+    if not _esquema_preparado:
+        Base.metadata.create_all(engine)
+        
+        # Los índices declarados únicos después de crear la tabla, antes de
+        # reconstruir o particionar la tabla, que vuelven a crear el índice
+        # sobre las filas copiadas. Con filas duplicadas no arranca: se eliminan
+        # con la migración explícita de init_db.py
+        migrar_indices_unicos(engine, Base.metadata)
+        
+        # Las tablas creadas antes de declarar ON DELETE CASCADE se migran
+        migrar_borrado_en_cascada(engine, Base.metadata)
+        
+        # Particionado mensual de lecturas (solo PostgreSQL y si está activado).
+        # Las particiones de los meses nuevos se crean al arrancar el proceso
+        # siguiente o en la tarea programada de retencion.py; entretanto las
+        # lecturas caen en la partición por defecto
+        preparar_particiones(engine)
+        
+        # create_all no añade índices nuevos a tablas que ya existen. Con lecturas
+        # particionada, el B-tree sobre fecha no se crea: lo sustituye el BRIN
+        omitidos = indices_omitidos(engine)
+        for indice in Lectura.__table__.indexes:
+            if indice.name not in omitidos:
+                indice.create(engine, checkfirst=True)
+        
+        _esquema_preparado = True
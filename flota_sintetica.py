@@ -0,0 +1,268 @@
+"""
+Generador de flotas sintéticas para pruebas de rendimiento.
+
+Crea en una base de datos vacía N aires repartidos en M ubicaciones con
+años de lecturas en el horario de registro del formulario (2:00, 6:00,
+9:00, 12:00, 15:00, 18:00 y 22:00), mantenimientos con imágenes y
+umbrales globales y específicos.
+
+Las temperaturas siguen un modelo sencillo pero realista: una base propia
+de cada aire y de su ubicación, un ciclo diario con el máximo a media
+tarde, un ciclo anual, ruido y algunos episodios de falla en los que la
+temperatura sube durante unos días; al final de cada falla se registra un
+mantenimiento correctivo. La humedad baja cuando sube la temperatura. Con
+la misma semilla se genera siempre la misma flota.
+
+Las lecturas se insertan con DataManager.agregar_lecturas_lote en orden
+cronológico, así que las tablas derivadas (cuantiles, anomalías y estados
+de alerta) quedan como en una base de datos real.
+
+Uso:
+    DATABASE_URL=sqlite:///data/flota.db python flota_sintetica.py --aires 20 --ubicaciones 5 --anios 2
+"""
+import argparse
+import struct
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+# Cargar variables de entorno antes de importar la base de datos
+load_dotenv()
+
+from database import session, init_db, AireAcondicionado, Mantenimiento
+from data_manager import DataManager
+
+# Horas del formulario de registro de lecturas
+HORAS_LECTURA = [2, 6, 9, 12, 15, 18, 22]
+
+TIPOS_MANTENIMIENTO = [
+    "Preventivo programado",
+    "Limpieza de filtros",
+    "Recarga de refrigerante",
+    "Revisión eléctrica",
+    "Cambio de partes"
+]
+
+TECNICOS = ["Carlos Pérez", "María González", "José Rodríguez", "Ana Martínez"]
+
+# Días de lecturas insertados en cada lote
+DIAS_POR_LOTE = 7
+
+
+def imagen_png(tamano_kb, rng):
+    """
+    Imagen PNG de ruido del tamaño aproximado indicado (el ruido no se comprime).
+    
+    Args:
+        tamano_kb: Tamaño aproximado en KB
+        rng: numpy.random.Generator
+    
+    Returns:
+        Bytes del archivo PNG
+    """
+    lado = max(int((tamano_kb * 1024 / 3) ** 0.5), 1)
+    pixeles = rng.integers(0, 256, size=(lado, lado * 3), dtype=np.uint8)
+    crudo = b''.join(b'\x00' + fila.tobytes() for fila in pixeles)
+    
+    def bloque(tipo, datos):
+        return (struct.pack('>I', len(datos)) + tipo + datos
+                + struct.pack('>I', zlib.crc32(tipo + datos) & 0xffffffff))
+    
+    return (b'\x89PNG\r\n\x1a\n'
+            + bloque(b'IHDR', struct.pack('>IIBBBBB', lado, lado, 8, 2, 0, 0, 0))
+            + bloque(b'IDAT', zlib.compress(crudo))
+            + bloque(b'IEND', b''))
+
+
+def _fechas_lecturas(desde, dias):
+    """Fechas de las lecturas: cada día, a las horas del formulario."""
+    dias_index = pd.date_range(desde, periods=dias, freq='D')
+    horas = pd.to_timedelta(HORAS_LECTURA, unit='h')
+    return dias_index.repeat(len(HORAS_LECTURA)) + np.tile(horas, dias)
+
+
+def _fallas(dias, fallas_por_anio, rng):
+    """Episodios de falla de un aire: lista de (día de inicio, duración en días, aumento máximo)."""
+    episodios = []
+    for _ in range(rng.poisson(fallas_por_anio * dias / 365)):
+        duracion = int(rng.integers(2, 8))
+        inicio = int(rng.integers(0, max(dias - duracion, 1)))
+        episodios.append((inicio, duracion, float(rng.uniform(4, 9))))
+    return episodios
+
+
+def _serie_aire(fechas, base_temperatura, base_humedad, episodios, rng):
+    """Temperaturas y humedades de un aire en las fechas indicadas."""
+    horas = fechas.hour.to_numpy() + fechas.minute.to_numpy() / 60
+    dia_anio = fechas.dayofyear.to_numpy()
+    
+    # Ciclo diario con el máximo a las 15:00 y ciclo anual con el máximo a mediados de julio
+    temperatura = (base_temperatura
+                   + rng.uniform(1.0, 2.0) * np.cos(2 * np.pi * (horas - 15) / 24)
+                   + 1.5 * np.cos(2 * np.pi * (dia_anio - 196) / 365)
+                   + rng.normal(0, 0.4, len(fechas)))
+    
+    # Las fallas suben la temperatura hasta la mitad del episodio y la bajan después
+    dias = ((fechas - fechas[0].normalize()) / timedelta(days=1)).to_numpy()
+    for inicio, duracion, aumento in episodios:
+        progreso = (dias - inicio) / duracion
+        dentro = (progreso >= 0) & (progreso < 1)
+        temperatura[dentro] += aumento * (1 - np.abs(2 * progreso[dentro] - 1))
+    
+    humedad = base_humedad - 1.5 * (temperatura - base_temperatura) + rng.normal(0, 3, len(fechas))
+    
+    return (np.clip(np.round(temperatura, 1), -10, 50),
+            np.clip(np.round(humedad, 1), 0, 100))
+
+
+def generar_flota(aires=20, ubicaciones=5, dias=365, hasta=None, mantenimientos_por_anio=4,
+                  fallas_por_anio=2, proporcion_umbrales=0.25, proporcion_imagenes=0.5,
+                  tamano_imagen_kb=64, semilla=0):
+    """
+    Genera una flota sintética en la base de datos configurada, que debe estar vacía.
+    
+    Args:
+        aires: Número de aires
+        ubicaciones: Número de ubicaciones
+        dias: Días de lecturas
+        hasta: Fecha del último día de lecturas (por defecto, hoy)
+        mantenimientos_por_anio: Mantenimientos programados por aire y año
+        fallas_por_anio: Episodios de falla por aire y año (en promedio)
+        proporcion_umbrales: Proporción de aires con umbral específico
+        proporcion_imagenes: Proporción de mantenimientos con imagen
+        tamano_imagen_kb: Tamaño aproximado de cada imagen
+        semilla: Semilla del generador aleatorio
+    
+    Returns:
+        Tupla (DataManager, diccionario con el número de aires, lecturas,
+        mantenimientos y umbrales generados)
+    """
+    rng = np.random.default_rng(semilla)
+    
+    init_db()
+    if session.query(AireAcondicionado.id).first() is not None:
+        raise ValueError("La base de datos ya tiene aires; la flota sintética necesita una base vacía")
+    
+    hasta = (hasta or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    desde = hasta - timedelta(days=dias - 1)
+    
+    # Los aires se crean antes que DataManager para que no cargue los CSV de ejemplo
+    nombres_ubicaciones = [f"Sala {numero + 1}" for numero in range(ubicaciones)]
+    desfases_ubicaciones = rng.normal(0, 0.8, ubicaciones)
+    
+    nuevos = []
+    for numero in range(aires):
+        ubicacion = numero % ubicaciones
+        nuevos.append(AireAcondicionado(
+            nombre=f"Aire {numero + 1:03d}",
+            ubicacion=nombres_ubicaciones[ubicacion],
+            fecha_instalacion=(desde - timedelta(days=int(rng.integers(30, 2000)))).strftime('%Y-%m-%d')
+        ))
+    session.add_all(nuevos)
+    session.commit()
+    
+    data_manager = DataManager()
+    
+    # Umbral global y umbrales específicos de algunos aires, antes de las lecturas
+    # para que su inserción mantenga los estados de alerta como en producción
+    data_manager.crear_umbral_configuracion("Global", True, 18.0, 26.0, 30.0, 70.0)
+    con_umbral = rng.choice(len(nuevos), int(round(len(nuevos) * proporcion_umbrales)), replace=False)
+    for posicion in sorted(con_umbral):
+        aire = nuevos[posicion]
+        data_manager.crear_umbral_configuracion(
+            f"Específico {aire.nombre}", False,
+            round(float(rng.uniform(17, 19)), 1), round(float(rng.uniform(24, 27)), 1),
+            35.0, 65.0, aire_id=aire.id
+        )
+    
+    # Series de cada aire
+    fechas = _fechas_lecturas(desde, dias)
+    series = []
+    fallas = []
+    for numero, aire in enumerate(nuevos):
+        episodios = _fallas(dias, fallas_por_anio, rng)
+        fallas.append(episodios)
+        base_temperatura = rng.uniform(20.5, 23.5) + desfases_ubicaciones[numero % ubicaciones]
+        series.append(_serie_aire(fechas, base_temperatura, rng.uniform(45, 55), episodios, rng))
+    
+    # Lecturas en orden cronológico, por lotes de días
+    lecturas_por_lote = DIAS_POR_LOTE * len(HORAS_LECTURA)
+    total_lecturas = 0
+    for inicio in range(0, len(fechas), lecturas_por_lote):
+        lote = []
+        for posicion in range(inicio, min(inicio + lecturas_por_lote, len(fechas))):
+            fecha = fechas[posicion].to_pydatetime()
+            for aire, (temperaturas, humedades) in zip(nuevos, series):
+                lote.append({
+                    'aire_id': aire.id,
+                    'fecha': fecha,
+                    'temperatura': float(temperaturas[posicion]),
+                    'humedad': float(humedades[posicion])
+                })
+        data_manager.agregar_lecturas_lote(lote)
+        total_lecturas += len(lote)
+    
+    # Mantenimientos programados y correctivos al final de cada falla
+    mantenimientos = []
+    for aire, episodios in zip(nuevos, fallas):
+        programados = rng.poisson(mantenimientos_por_anio * dias / 365)
+        eventos = [(int(dia), str(rng.choice(TIPOS_MANTENIMIENTO)), "Mantenimiento de rutina.")
+                   for dia in rng.integers(0, dias, programados)]
+        eventos += [(min(inicio + duracion, dias - 1), "Correctivo",
+                     f"Temperatura elevada durante {duracion} días; se revisó y se corrigió la falla.")
+                    for inicio, duracion, _ in episodios]
+        
+        for dia, tipo, descripcion in eventos:
+            mantenimiento = Mantenimiento(
+                aire_id=aire.id,
+                fecha=desde + timedelta(days=dia, hours=int(rng.integers(8, 18))),
+                tipo_mantenimiento=tipo,
+                descripcion=descripcion,
+                tecnico=str(rng.choice(TECNICOS))
+            )
+            
+            if rng.random() < proporcion_imagenes:
+                mantenimiento.imagen_nombre = f"mantenimiento_{aire.id}_{dia}.png"
+                mantenimiento.imagen_tipo = "image/png"
+                mantenimiento.imagen_datos = imagen_png(tamano_imagen_kb, rng)
+            
+            mantenimientos.append(mantenimiento)
+    
+    session.add_all(mantenimientos)
+    session.commit()
+    
+    return data_manager, {
+        'aires': len(nuevos),
+        'ubicaciones': ubicaciones,
+        'lecturas': total_lecturas,
+        'mantenimientos': len(mantenimientos),
+        'umbrales': 1 + len(con_umbral)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera una flota sintética en una base de datos vacía")
+    parser.add_argument('--aires', type=int, default=20, help="Número de aires")
+    parser.add_argument('--ubicaciones', type=int, default=5, help="Número de ubicaciones")
+    parser.add_argument('--anios', type=float, default=1, help="Años de lecturas")
+    parser.add_argument('--imagen-kb', type=int, default=64, help="Tamaño aproximado de cada imagen de mantenimiento")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla del generador aleatorio")
+    args = parser.parse_args()
+    
+    data_manager, resumen = generar_flota(
+        aires=args.aires,
+        ubicaciones=args.ubicaciones,
+        dias=int(args.anios * 365),
+        tamano_imagen_kb=args.imagen_kb,
+        semilla=args.semilla
+    )
+    data_manager.cerrar()
+    
+    print(", ".join(f"{valor} {clave}" for clave, valor in resumen.items()))
+
+
+if __name__ == "__main__":
+    main()
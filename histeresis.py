@@ -0,0 +1,131 @@
+"""
+Máquina de estados de las alertas de umbral.
+
+Cada (aire, umbral, variable) pasa por cuatro estados:
+    
+    normal -> pendiente: la lectura supera un límite
+    pendiente -> activa: sigue fuera de límite durante la duración mínima de entrada
+    pendiente -> normal: vuelve dentro de límites antes de ese tiempo
+    activa -> recuperando: la lectura entra en la banda de salida (el límite
+        desplazado hacia dentro en la histéresis de la variable)
+    recuperando -> normal: sigue dentro de la banda durante la duración mínima de salida
+    recuperando -> activa: vuelve a salir de la banda antes de ese tiempo
+    activa o recuperando -> pendiente: la lectura supera el límite contrario
+
+Solo las transiciones a activa, a normal desde recuperando y al límite
+contrario desde una alerta activa o recuperando generan un evento, de modo
+que un valor que oscila alrededor del límite produce una única alerta. El
+salto al límite contrario resuelve la alerta anterior (evento 'resuelta');
+la nueva se activa, como cualquier otra, tras la duración mínima de entrada
+en las lecturas siguientes. Cada lectura actualiza el estado en tiempo
+constante.
+"""
+import os
+from datetime import timedelta
+
+# Distancia al límite que hay que recuperar para dar una alerta por resuelta
+HISTERESIS = {
+    'temperatura': float(os.environ.get('ALERTAS_HISTERESIS_TEMPERATURA', 0.5)),
+    'humedad': float(os.environ.get('ALERTAS_HISTERESIS_HUMEDAD', 2.0))
+}
+
+# Segundos que una condición debe mantenerse para activar o resolver una alerta
+DURACION_ENTRADA = timedelta(seconds=float(os.environ.get('ALERTAS_DURACION_ENTRADA', 300)))
+DURACION_SALIDA = timedelta(seconds=float(os.environ.get('ALERTAS_DURACION_SALIDA', 600)))
+
+# Columnas de UmbralConfiguracion con los límites de cada variable
+LIMITES = {
+    'temperatura': ('temp_min', 'temp_max'),
+    'humedad': ('hum_min', 'hum_max')
+}
+
+
+def lado_superado(valor, minimo, maximo):
+    """
+    Indica qué límite supera un valor.
+    
+    Returns:
+        'max', 'min' o None si está dentro de límites
+    """
+    if valor > maximo:
+        return 'max'
+    if valor < minimo:
+        return 'min'
+    return None
+
+
+def dentro_banda_salida(valor, lado, minimo, maximo, banda):
+    """Indica si un valor ha vuelto lo bastante lejos del límite que se superó."""
+    if lado == 'max':
+        return valor <= maximo - banda
+    return valor >= minimo + banda
+
+
+def evaluar_estado(estado, valor, fecha, minimo, maximo, banda, entrada=DURACION_ENTRADA, salida=DURACION_SALIDA):
+    """
+    Aplica una lectura a la máquina de estados de una alerta.
+    
+    Args:
+        estado: Objeto EstadoAlerta
+        valor: Valor de la variable en la lectura
+        fecha: Fecha de la lectura
+        minimo: Límite inferior del umbral
+        maximo: Límite superior del umbral
+        banda: Histéresis de la variable
+        entrada: Duración mínima fuera de límite para activar la alerta
+        salida: Duración mínima dentro de la banda de salida para resolverla
+    
+    Returns:
+        'activada', 'resuelta' o None si la lectura no produce un evento
+    """
+    lado = lado_superado(valor, minimo, maximo)
+    evento = None
+    actual = estado.estado or 'normal'
+    
+    estado.ultima_fecha = fecha
+    estado.ultimo_valor = valor
+    
+    if actual == 'normal':
+        if lado is not None:
+            estado.estado = 'pendiente'
+            estado.lado = lado
+            estado.desde = fecha
+            actual = 'pendiente'
+    
+    elif actual in ('activa', 'recuperando'):
+        if lado is not None and lado != estado.lado:
+            # Ha pasado directamente al límite contrario: la alerta activa se
+            # resuelve y empieza la fase pendiente del otro lado
+            estado.estado = 'pendiente'
+            estado.lado = lado
+            estado.desde = fecha
+            return 'resuelta'
+        else:
+            if dentro_banda_salida(valor, estado.lado, minimo, maximo, banda):
+                if actual == 'activa':
+                    estado.estado = 'recuperando'
+                    estado.desde = fecha
+                if fecha - estado.desde >= salida:
+                    estado.estado = 'normal'
+                    estado.lado = None
+                    estado.desde = None
+                    evento = 'resuelta'
+            else:
+                estado.estado = 'activa'
+                estado.desde = None
+            
+            return evento
+    
+    if actual == 'pendiente':
+        if lado != estado.lado:
+            # Volvió dentro de límites (o cambió de lado) antes de la duración mínima
+            estado.estado = 'pendiente' if lado is not None else 'normal'
+            estado.lado = lado
+            estado.desde = fecha if lado is not None else None
+        elif fecha - estado.desde >= entrada:
+            estado.estado = 'activa'
+            estado.desde = None
+            estado.fecha_activacion = fecha
+            evento = 'activada'
+    
+    return evento
@@ -1,5 +1,6 @@
 # c:\Users\AdminLocal\Documents\Github\TemperatureTracker\init_db.py
 from dotenv import load_dotenv
+import argparse
 import os
 
 # Cargar variables de entorno FIRST
@@ -12,11 +13,48 @@ if not database_url_env:
     exit(1)
 
 # Now that we know DATABASE_URL is likely set, import the database module
-from database import init_db
+from database import init_db, engine, Base, Lectura, incrementar_generacion_lecturas
+from migraciones import migrar_indices_unicos
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crea o migra las tablas de la base de datos")
+    parser.add_argument(
+        '--migrar-indices-unicos', action='store_true',
+        help="Elimina las filas duplicadas que impiden crear los índices únicos (se conserva la de "
+             "mayor id) y recalcula los cuantiles y los estados de los aires afectados"
+    )
+    args = parser.parse_args()
+    
     print("Inicializando base de datos...")
+    
+    # Antes de init_db, que no arranca mientras haya filas duplicadas
+    eliminadas = {}
+    if args.migrar_indices_unicos:
+        eliminadas = migrar_indices_unicos(engine, Base.metadata, eliminar_duplicados=True)
+        for nombre, claves in eliminadas.items():
+            print(f"Índice {nombre}: {len(claves)} filas duplicadas eliminadas")
+    
     # init_db() will use the engine created using the loaded DATABASE_URL
     init_db()
+    
+    # Las lecturas eliminadas (clave aire_id, fecha) estaban incluidas en los
+    # resúmenes y estados de su aire
+    aires_ids = sorted({
+        clave[0]
+        for indice in Lectura.__table__.indexes
+        for clave in eliminadas.get(indice.name, [])
+    })
+    if aires_ids:
+        from data_manager import DataManager
+        
+        # Las instantáneas de lecturas de otros procesos ya no son válidas
+        with engine.begin() as conexion:
+            incrementar_generacion_lecturas(conexion)
+        
+        data_manager = DataManager()
+        print(f"Recalculando cuantiles y estados de {len(aires_ids)} aires...")
+        data_manager.reconstruir_cuantiles(aires_ids)
+        data_manager.reconstruir_estados(aires_ids)
+    
     print("Base de datos inicializada correctamente.")
 
@@ -0,0 +1,310 @@
+"""
+Instantánea en disco de las lecturas, por columnas, para arrancar en caliente.
+
+Tras reiniciar la aplicación, el primer renderizado del dashboard tenía
+que cargar todas las lecturas de la base de datos. La instantánea guarda
+cada columna de la tabla lecturas (id, aire_id, fecha, temperatura y
+humedad) en un archivo binario plano que se abre con numpy.memmap: leerla
+no copia los datos, el sistema operativo carga las páginas al usarlas.
+DataManager.obtener_lecturas solo consulta a la base de datos las lecturas
+con id mayor que el último de la instantánea (la cola) y, cuando la cola
+es grande, la añade al final de los archivos.
+
+Los archivos contienen las filas en orden de id. Un archivo meta.json
+indica cuántas filas son válidas, el mayor id y la base de datos de
+origen; se reemplaza de forma atómica después de escribir las columnas,
+así que una escritura interrumpida no deja la instantánea inconsistente
+(los bytes de más se descartan en la siguiente escritura).
+
+La instantánea guarda también la generación de lecturas de la base de
+datos (database.GeneracionLecturas), que aumenta en cada transacción que
+elimina, compacta o actualiza lecturas ya guardadas, desde cualquier
+proceso. Antes de usarla se compara con la generación actual, una
+consulta por clave primaria; si no coinciden, la instantánea se vuelve a
+crear. En la misma consulta se cuentan las lecturas de los últimos
+MARGEN_IDS_TARDIOS IDs de la instantánea (ver data_manager.py): una
+transacción confirmada tarde con un id menor que el último ya guardado
+cambia ese recuento y también obliga a reconstruirla. Las modificaciones
+hechas fuera de DataManager (SQL directo) no cambian la generación; solo
+se detectan las lecturas eliminadas, con un recuento completo la primera
+vez que cada proceso usa la instantánea. Por eso está desactivada por
+defecto (INSTANTANEA_LECTURAS=True la activa). La comprobación y la cola
+se leen siempre de la base de datos principal, aunque haya una réplica de
+lectura.
+
+Cada mapa se abre en modo copia en escritura ('c'): si quien recibe el
+DataFrame lo modifica, los cambios quedan en su memoria y no llegan al
+archivo ni a otros DataFrames. Un solo proceso debe escribir en cada
+directorio (INSTANTANEA_LECTURAS_DIR).
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("instantanea")
+
+# Desactivada por defecto: las lecturas modificadas fuera de DataManager no
+# cambian la generación de lecturas con la que se valida
+HABILITADA = os.environ.get('INSTANTANEA_LECTURAS', 'False').lower() == 'true'
+
+# Lecturas de la cola a partir de las que se añaden a la instantánea
+MINIMO_ANEXAR = int(os.environ.get('INSTANTANEA_MINIMO_ANEXAR', 1000))
+
+# Columnas y tipo en disco; la fecha se guarda como nanosegundos (int64)
+COLUMNAS = {
+    'id': np.int64,
+    'aire_id': np.int64,
+    'fecha': np.int64,
+    'temperatura': np.float64,
+    'humedad': np.float64
+}
+
+# aire_id se guarda como int64: las lecturas sin aire (NULL) llevan este valor
+# y vuelven como NaN, igual que en un DataFrame creado desde la base de datos
+AIRE_NULO = -1
+
+VERSION = 2
+
+
+def identificar_base(url):
+    """
+    Identificador de una base de datos a partir de su URL (sin la contraseña).
+    
+    Args:
+        url: sqlalchemy.engine.URL
+    
+    Returns:
+        Hash corto de la URL
+    """
+    return hashlib.sha256(url.render_as_string(hide_password=True).encode()).hexdigest()[:16]
+
+
+def columnas_desde_filas(filas):
+    """
+    Convierte filas (id, aire_id, fecha, temperatura, humedad) en arrays por columna.
+    
+    Args:
+        filas: Lista de tuplas en orden de id
+    
+    Returns:
+        Diccionario columna → numpy.ndarray con los tipos de COLUMNAS
+    """
+    if not filas:
+        return {columna: np.empty(0, dtype=tipo) for columna, tipo in COLUMNAS.items()}
+    
+    ids, aires, fechas, temperaturas, humedades = zip(*filas)
+    return {
+        'id': np.asarray(ids, dtype=np.int64),
+        'aire_id': np.asarray([AIRE_NULO if aire is None else aire for aire in aires], dtype=np.int64),
+        'fecha': pd.to_datetime(list(fechas)).as_unit('ns').asi8,
+        'temperatura': np.asarray(temperaturas, dtype=np.float64),
+        'humedad': np.asarray(humedades, dtype=np.float64)
+    }
+
+
+def columnas_a_dataframe(columnas):
+    """
+    DataFrame de lecturas (id, aire_id, fecha, temperatura, humedad) sin copiar las columnas.
+    
+    Args:
+        columnas: Diccionario columna → array con los tipos de COLUMNAS
+    
+    Returns:
+        DataFrame con la fecha como datetime64[ns]
+    """
+    aires = columnas['aire_id']
+    nulos = aires == AIRE_NULO
+    if nulos.any():
+        aires = np.where(nulos, np.nan, aires)
+    
+    return pd.DataFrame({
+        'id': columnas['id'],
+        'aire_id': aires,
+        'fecha': columnas['fecha'].view('datetime64[ns]'),
+        'temperatura': columnas['temperatura'],
+        'humedad': columnas['humedad']
+    }, copy=False)
+
+
+class InstantaneaLecturas:
+    """
+    Columnas de la tabla lecturas en archivos mapeados en memoria.
+    
+    Args:
+        directorio: Directorio de los archivos
+        base: Identificador de la base de datos de origen (ver identificar_base)
+    """
+    
+    def __init__(self, directorio, base):
+        self.directorio = directorio
+        self.base = base
+        self.filas = 0
+        self.max_id = 0
+        self.generacion = None
+        self.disponible = False
+        self._lock = threading.Lock()
+    
+    def _ruta(self, columna):
+        return os.path.join(self.directorio, f"{columna}.bin")
+    
+    def _ruta_meta(self):
+        return os.path.join(self.directorio, "meta.json")
+    
+    def abrir(self):
+        """
+        Lee meta.json y comprueba que la instantánea es de esta base de datos.
+        
+        Returns:
+            True si hay una instantánea utilizable
+        """
+        with self._lock:
+            self.disponible = False
+            self.filas = 0
+            self.max_id = 0
+            self.generacion = None
+            
+            try:
+                with open(self._ruta_meta()) as archivo:
+                    meta = json.load(archivo)
+            except (OSError, ValueError):
+                return False
+            
+            if meta.get('version') != VERSION or meta.get('base') != self.base:
+                return False
+            
+            tamanos_ok = all(
+                os.path.exists(self._ruta(columna))
+                and os.path.getsize(self._ruta(columna)) >= meta['filas'] * np.dtype(tipo).itemsize
+                for columna, tipo in COLUMNAS.items()
+            )
+            if not tamanos_ok:
+                return False
+            
+            self.filas = meta['filas']
+            self.max_id = meta['max_id']
+            self.generacion = meta['generacion']
+            self.disponible = True
+            return True
+    
+    def leer(self):
+        """
+        Abre las columnas con numpy.memmap (sin copiar los datos).
+        
+        Returns:
+            Diccionario columna → array de solo las filas válidas
+        """
+        with self._lock:
+            if not self.disponible or self.filas == 0:
+                return {columna: np.empty(0, dtype=tipo) for columna, tipo in COLUMNAS.items()}
+            
+            # Un mapa nuevo por lectura: cada DataFrame tiene su propia copia en
+            # escritura. La vista como ndarray evita que pandas propague la subclase
+            return {
+                columna: np.memmap(self._ruta(columna), dtype=tipo, mode='c', shape=(self.filas,)).view(np.ndarray)
+                for columna, tipo in COLUMNAS.items()
+            }
+    
+    def escribir(self, columnas, generacion):
+        """
+        Sustituye la instantánea por las columnas indicadas.
+        
+        Args:
+            columnas: Diccionario columna → array, en orden de id
+            generacion: Generación de lecturas de la base de datos al leerlas
+        
+        Returns:
+            True si se guardó; si el disco falla la instantánea queda descartada
+        """
+        with self._lock:
+            try:
+                os.makedirs(self.directorio, exist_ok=True)
+                self._invalidar_meta()
+                
+                for columna, tipo in COLUMNAS.items():
+                    # Archivo nuevo y reemplazo atómico: los mapas abiertos siguen
+                    # apuntando al archivo anterior
+                    temporal = f"{self._ruta(columna)}.tmp"
+                    np.ascontiguousarray(columnas[columna], dtype=tipo).tofile(temporal)
+                    os.replace(temporal, self._ruta(columna))
+                
+                self._guardar_meta(
+                    len(columnas['id']), int(columnas['id'][-1]) if len(columnas['id']) else 0, generacion
+                )
+                return True
+            except OSError:
+                # Por ejemplo, en Windows no se puede reemplazar un archivo mapeado
+                logger.exception("No se pudo guardar la instantánea de lecturas en %s", self.directorio)
+                self._invalidar_meta()
+                return False
+    
+    def anexar(self, columnas):
+        """
+        Añade al final de la instantánea filas con id mayor que max_id.
+        
+        Args:
+            columnas: Diccionario columna → array, en orden de id
+        
+        Returns:
+            True si se añadieron; si el disco falla la instantánea queda descartada
+        """
+        nuevas = len(columnas['id'])
+        
+        with self._lock:
+            if not self.disponible:
+                return False
+            if nuevas == 0:
+                return True
+            
+            try:
+                for columna, tipo in COLUMNAS.items():
+                    with open(self._ruta(columna), 'r+b') as archivo:
+                        # Descartar lo que haya quedado de una escritura interrumpida
+                        archivo.truncate(self.filas * np.dtype(tipo).itemsize)
+                        archivo.seek(0, os.SEEK_END)
+                        archivo.write(np.ascontiguousarray(columnas[columna], dtype=tipo).tobytes())
+                
+                self._guardar_meta(self.filas + nuevas, int(columnas['id'][-1]), self.generacion)
+                return True
+            except OSError:
+                logger.exception("No se pudo ampliar la instantánea de lecturas en %s", self.directorio)
+                self._invalidar_meta()
+                return False
+    
+    def invalidar(self):
+        """Descarta la instantánea; la siguiente lectura la vuelve a crear."""
+        with self._lock:
+            self._invalidar_meta()
+    
+    def _invalidar_meta(self):
+        self.disponible = False
+        self.filas = 0
+        self.max_id = 0
+        self.generacion = None
+        try:
+            os.remove(self._ruta_meta())
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logger.exception("No se pudo descartar la instantánea de lecturas en %s", self.directorio)
+    
+    def _guardar_meta(self, filas, max_id, generacion):
+        temporal = f"{self._ruta_meta()}.tmp"
+        with open(temporal, 'w') as archivo:
+            json.dump({
+                'version': VERSION,
+                'base': self.base,
+                'filas': filas,
+                'max_id': max_id,
+                'generacion': generacion
+            }, archivo)
+        os.replace(temporal, self._ruta_meta())
+        
+        self.filas = filas
+        self.max_id = max_id
+        self.generacion = generacion
+        self.disponible = True
@@ -0,0 +1,357 @@
+"""
+Medición de tiempos de consultas, páginas y gráficos.
+
+Cada consulta SQL (eventos del motor de SQLAlchemy), cada renderizado de
+una página (las funciones mostrar_* de app.py) y cada gráfico de utils
+deja un registro con su duración en un búfer circular en memoria: solo se
+guardan los últimos INSTRUMENTACION_CAPACIDAD registros, así que el coste
+es fijo. Las consultas hechas durante el renderizado de una página llevan
+el identificador de esa ejecución, lo que permite contar las consultas de
+cada rerun de Streamlit. La página Rendimiento (solo administradores)
+muestra los percentiles, las consultas más lentas y las consultas por
+ejecución.
+
+Se desactiva con INSTRUMENTACION=False.
+
+Modo de depuración (DEBUG=True): además se cuentan las sentencias de cada
+ejecución de página. Si pasan de DEBUG_PRESUPUESTO_CONSULTAS, o una misma
+sentencia (con distintos parámetros) se repite DEBUG_REPETICIONES_CONSULTA
+veces o más, lo que suele indicar una consulta dentro de un bucle (N+1),
+la página muestra un aviso; con DEBUG_CONSULTAS_ESTRICTO=True la ejecución
+falla con PresupuestoConsultasExcedido. En pruebas se puede acotar
+cualquier bloque:
+    
+    with presupuesto_consultas(4):
+        data_manager.obtener_estadisticas_por_ubicacion()
+"""
+import functools
+import itertools
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import event
+
+logger = logging.getLogger("instrumentacion")
+
+HABILITADA = os.environ.get('INSTRUMENTACION', 'True').lower() == 'true'
+
+# Registros que se conservan (los más antiguos se descartan)
+CAPACIDAD = int(os.environ.get('INSTRUMENTACION_CAPACIDAD', 5000))
+
+# Longitud máxima del texto de las sentencias guardadas
+LONGITUD_SENTENCIA = 300
+
+COLUMNAS = ['fecha', 'tipo', 'nombre', 'duracion_ms', 'filas', 'ejecucion', 'pagina']
+
+# Modo de depuración: presupuesto de consultas por ejecución de página
+DEPURACION = os.environ.get('DEBUG', 'False').lower() == 'true'
+PRESUPUESTO_CONSULTAS = int(os.environ.get('DEBUG_PRESUPUESTO_CONSULTAS', 30))
+REPETICIONES_CONSULTA = int(os.environ.get('DEBUG_REPETICIONES_CONSULTA', 5))
+CONSULTAS_ESTRICTO = os.environ.get('DEBUG_CONSULTAS_ESTRICTO', 'False').lower() == 'true'
+
+# Lista de marcadores de parámetros, como la de un IN (...) expandido
+_LISTA_PARAMETROS = re.compile(r"\(\s*(?:%\(\w+\)s|\?)(?:\s*,\s*(?:%\(\w+\)s|\?))*\s*\)")
+
+
+class PresupuestoConsultasExcedido(AssertionError):
+    """Un bloque superó su presupuesto de consultas o repitió una sentencia."""
+
+
+class RegistroTiempos:
+    """
+    Búfer circular de mediciones, seguro entre hilos.
+    
+    Args:
+        capacidad: Número máximo de registros
+    """
+    
+    def __init__(self, capacidad=CAPACIDAD):
+        self._registros = deque(maxlen=capacidad)
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._registros)
+    
+    def registrar(self, tipo, nombre, duracion_ms, filas=None):
+        """
+        Guarda una medición.
+        
+        Args:
+            tipo: 'consulta', 'pagina' o 'grafico'
+            nombre: Sentencia SQL, página o función medida
+            duracion_ms: Duración en milisegundos
+            filas: Opcional, filas devueltas o modificadas
+        """
+        ejecucion = getattr(_local, 'ejecucion', None)
+        registro = (
+            datetime.now(), tipo, nombre, duracion_ms, filas,
+            ejecucion[0] if ejecucion else None,
+            ejecucion[1] if ejecucion else None
+        )
+        with self._lock:
+            self._registros.append(registro)
+    
+    def a_dataframe(self):
+        """
+        Returns:
+            DataFrame con fecha, tipo, nombre, duracion_ms, filas, ejecucion y pagina
+        """
+        with self._lock:
+            registros = list(self._registros)
+        return pd.DataFrame(registros, columns=COLUMNAS)
+    
+    def vaciar(self):
+        with self._lock:
+            self._registros.clear()
+
+
+registro = RegistroTiempos()
+
+# Ejecución (rerun) en curso en cada hilo: (identificador, página)
+_local = threading.local()
+_contador_ejecuciones = itertools.count(1)
+
+
+def normalizar_sentencia(sentencia):
+    """
+    Texto de una sentencia sin espacios repetidos y con las listas de
+    parámetros reducidas a uno, para agrupar las que solo cambian en los valores.
+    """
+    return _LISTA_PARAMETROS.sub('(?)', ' '.join(sentencia.split()))
+
+
+class ContadorConsultas:
+    """Sentencias ejecutadas en un bloque, agrupadas por sentencia normalizada."""
+    
+    def __init__(self):
+        self.total = 0
+        self.sentencias = Counter()
+    
+    def registrar(self, sentencia):
+        self.total += 1
+        self.sentencias[normalizar_sentencia(sentencia)] += 1
+    
+    def repetidas(self, minimo=REPETICIONES_CONSULTA):
+        """
+        Returns:
+            Lista de (sentencia, veces) de las sentencias ejecutadas al menos minimo veces
+        """
+        return [(sentencia, veces) for sentencia, veces in self.sentencias.most_common() if veces >= minimo]
+    
+    def problemas(self, maximo=PRESUPUESTO_CONSULTAS, repeticiones=REPETICIONES_CONSULTA):
+        """
+        Comprueba el presupuesto y las sentencias repetidas.
+        
+        Args:
+            maximo: Consultas permitidas, o None para no limitarlas
+            repeticiones: Veces a partir de las que una sentencia repetida se
+                considera un N+1, o None para no comprobarlo
+        
+        Returns:
+            Lista de mensajes (vacía si todo está bien)
+        """
+        mensajes = []
+        
+        if maximo is not None and self.total > maximo:
+            mensajes.append(f"{self.total} consultas (presupuesto: {maximo})")
+        
+        if repeticiones is not None:
+            for sentencia, veces in self.repetidas(repeticiones):
+                mensajes.append(f"Sentencia repetida {veces} veces (posible N+1): {sentencia[:LONGITUD_SENTENCIA]}")
+        
+        return mensajes
+
+
+@contextmanager
+def contar_consultas():
+    """Cuenta las sentencias ejecutadas en este hilo dentro del bloque."""
+    contador = ContadorConsultas()
+    contadores = _local.__dict__.setdefault('contadores', [])
+    contadores.append(contador)
+    try:
+        yield contador
+    finally:
+        contadores.remove(contador)
+
+
+@contextmanager
+def presupuesto_consultas(maximo=PRESUPUESTO_CONSULTAS, repeticiones=REPETICIONES_CONSULTA):
+    """
+    Falla con PresupuestoConsultasExcedido si el bloque ejecuta más de maximo
+    sentencias o repite una sentencia repeticiones veces o más.
+    
+    Args:
+        maximo: Consultas permitidas, o None para no limitarlas
+        repeticiones: Repeticiones de una sentencia consideradas un N+1, o None
+    """
+    with contar_consultas() as contador:
+        yield contador
+    
+    problemas = contador.problemas(maximo, repeticiones)
+    if problemas:
+        raise PresupuestoConsultasExcedido("; ".join(problemas))
+
+
+def instrumentar_motor(engine):
+    """
+    Registra la duración y las filas de cada sentencia ejecutada por un motor
+    y la cuenta en los contadores activos del hilo.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+    """
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _antes(conexion, cursor, sentencia, parametros, contexto, executemany):
+        conexion.info.setdefault('instrumentacion_inicio', []).append(time.perf_counter())
+    
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _despues(conexion, cursor, sentencia, parametros, contexto, executemany):
+        inicio = conexion.info['instrumentacion_inicio'].pop()
+        
+        for contador in getattr(_local, 'contadores', ()):
+            contador.registrar(sentencia)
+        
+        if HABILITADA:
+            # SQLite devuelve -1 en las consultas SELECT
+            filas = cursor.rowcount if cursor.rowcount >= 0 else None
+            registro.registrar(
+                'consulta',
+                ' '.join(sentencia.split())[:LONGITUD_SENTENCIA],
+                (time.perf_counter() - inicio) * 1000,
+                filas
+            )
+    
+    @event.listens_for(engine, 'handle_error')
+    def _error(contexto):
+        inicios = contexto.connection.info.get('instrumentacion_inicio') if contexto.connection else None
+        if inicios:
+            inicios.pop()
+
+
+@contextmanager
+def medir(tipo, nombre):
+    """Registra la duración del bloque."""
+    if not HABILITADA:
+        yield
+        return
+    
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registro.registrar(tipo, nombre, (time.perf_counter() - inicio) * 1000)
+
+
+@contextmanager
+def ejecucion(pagina):
+    """
+    Mide el renderizado de una página; las consultas hechas dentro del bloque
+    en este hilo quedan asociadas a esta ejecución.
+    
+    Args:
+        pagina: Nombre de la página
+    
+    Returns:
+        En modo de depuración, el ContadorConsultas de la ejecución; si no, None
+    """
+    _local.ejecucion = (next(_contador_ejecuciones), pagina)
+    try:
+        with medir('pagina', pagina):
+            if not DEPURACION:
+                yield None
+                return
+            
+            with contar_consultas() as contador:
+                yield contador
+            
+            problemas = contador.problemas()
+            for problema in problemas:
+                logger.warning("%s: %s", pagina, problema)
+            if problemas and CONSULTAS_ESTRICTO:
+                raise PresupuestoConsultasExcedido(f"{pagina}: " + "; ".join(problemas))
+    finally:
+        _local.ejecucion = None
+
+
+def cronometrar(tipo):
+    """Decorador que registra la duración de cada llamada a la función."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            with medir(tipo, funcion.__name__):
+                return funcion(*args, **kwargs)
+        
+        return envoltura
+    
+    return decorador
+
+
+def resumen_percentiles(registros_df, tipo):
+    """
+    Resume las duraciones de un tipo de medición por nombre.
+    
+    Args:
+        registros_df: DataFrame de RegistroTiempos.a_dataframe
+        tipo: 'consulta', 'pagina' o 'grafico'
+    
+    Returns:
+        DataFrame con nombre, veces, p50, p95, p99, maximo y total (ms),
+        ordenado por tiempo total
+    """
+    df = registros_df[registros_df['tipo'] == tipo]
+    columnas = ['nombre', 'veces', 'p50', 'p95', 'p99', 'maximo', 'total']
+    
+    if df.empty:
+        return pd.DataFrame(columns=columnas)
+    
+    resumen = df.groupby('nombre')['duracion_ms'].agg(
+        veces='count',
+        p50=lambda d: np.percentile(d, 50),
+        p95=lambda d: np.percentile(d, 95),
+        p99=lambda d: np.percentile(d, 99),
+        maximo='max',
+        total='sum'
+    ).reset_index()
+    
+    return resumen[columnas].sort_values('total', ascending=False).reset_index(drop=True)
+
+
+def consultas_por_ejecucion(registros_df):
+    """
+    Cuenta las consultas y su tiempo en cada renderizado de página.
+    
+    Args:
+        registros_df: DataFrame de RegistroTiempos.a_dataframe
+    
+    Returns:
+        DataFrame con ejecucion, pagina, fecha, consultas, tiempo_consultas y
+        tiempo_pagina (ms), de la más reciente a la más antigua
+    """
+    columnas = ['ejecucion', 'pagina', 'fecha', 'consultas', 'tiempo_consultas', 'tiempo_pagina']
+    # Las mediciones fuera de una ejecución de página no tienen identificador
+    registros_df = registros_df.dropna(subset=['ejecucion']).astype({'ejecucion': int})
+    paginas = registros_df[registros_df['tipo'] == 'pagina']
+    
+    if paginas.empty:
+        return pd.DataFrame(columns=columnas)
+    
+    consultas = registros_df[registros_df['tipo'] == 'consulta'].groupby('ejecucion')['duracion_ms'].agg(
+        consultas='count',
+        tiempo_consultas='sum'
+    )
+    
+    resultado = paginas.set_index('ejecucion')[['pagina', 'fecha', 'duracion_ms']].rename(
+        columns={'duracion_ms': 'tiempo_pagina'}
+    ).join(consultas)
+    resultado[['consultas', 'tiempo_consultas']] = resultado[['consultas', 'tiempo_consultas']].fillna(0)
+    resultado['consultas'] = resultado['consultas'].astype(int)
+    
+    return resultado.reset_index()[columnas].sort_values('ejecucion', ascending=False).reset_index(drop=True)
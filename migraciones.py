@@ -0,0 +1,275 @@
+"""
+Migraciones del esquema de bases de datos ya existentes.
+
+create_all solo crea las tablas que faltan; no modifica las que ya existen.
+Aquí se aplican los cambios de esquema que las bases antiguas necesitan.
+
+Borrado en cascada: las claves foráneas hacia aires_acondicionados se
+declaran con ON DELETE CASCADE para que eliminar un aire sea una sola
+sentencia y la base de datos borre sus lecturas, mantenimientos y demás
+filas dependientes sin cargarlas en memoria. En PostgreSQL la restricción se
+sustituye con ALTER TABLE. SQLite no permite modificar restricciones, así
+que la tabla se reconstruye (crear la tabla nueva, copiar las filas,
+eliminar la antigua y renombrar la nueva) con las claves foráneas
+desactivadas; antes se eliminan las filas huérfanas que dejaron los
+borrados hechos mientras SQLite no aplicaba las claves foráneas.
+
+Índices únicos: create_all tampoco convierte en único un índice que ya
+existe. Si no hay filas duplicadas se vuelve a crear como único al
+arrancar; si las hay, el arranque se detiene hasta ejecutar la migración
+explícita (python init_db.py --migrar-indices-unicos), que elimina las
+duplicadas, conserva la de mayor id (la última registrada, igual que haría
+un upsert), informa de cuántas ha eliminado y recalcula los resúmenes
+derivados de las lecturas. Funciona igual en SQLite, en PostgreSQL y sobre la tabla
+de lecturas particionada, cuyo índice se crea en la tabla padre y
+PostgreSQL lo propaga a las particiones.
+"""
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.schema import CreateTable
+
+from particionado import TIEMPO_ESPERA_BLOQUEO
+
+
+def _en_cascada(regla):
+    return (regla or '').upper() == 'CASCADE'
+
+
+def claves_sin_cascada(engine, metadata):
+    """
+    Busca las claves foráneas declaradas con ON DELETE CASCADE que la base de
+    datos todavía tiene sin esa regla.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+        metadata: MetaData con los modelos
+    
+    Returns:
+        Lista de tuplas (tabla, ForeignKeyConstraint del modelo, nombre en la base de datos)
+    """
+    inspector = inspect(engine)
+    pendientes = []
+    
+    for tabla in metadata.sorted_tables:
+        if not inspector.has_table(tabla.name):
+            continue
+        
+        existentes = inspector.get_foreign_keys(tabla.name)
+        
+        for clave in tabla.foreign_key_constraints:
+            if not _en_cascada(clave.ondelete):
+                continue
+            
+            for existente in existentes:
+                if (existente['referred_table'] == clave.referred_table.name
+                        and existente['constrained_columns'] == list(clave.column_keys)
+                        and not _en_cascada(existente.get('options', {}).get('ondelete'))):
+                    pendientes.append((tabla, clave, existente['name']))
+    
+    return pendientes
+
+
+def migrar_borrado_en_cascada(engine, metadata):
+    """
+    Añade ON DELETE CASCADE a las claves foráneas de las tablas existentes
+    que se crearon sin esa regla.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+        metadata: MetaData con los modelos
+    
+    Returns:
+        Lista con los nombres de las tablas migradas
+    """
+    pendientes = claves_sin_cascada(engine, metadata)
+    if not pendientes:
+        return []
+    
+    if engine.dialect.name == 'sqlite':
+        tablas = []
+        for tabla, _, _ in pendientes:
+            if tabla not in tablas:
+                tablas.append(tabla)
+        _reconstruir_tablas_sqlite(engine, metadata, tablas)
+        return [tabla.name for tabla in tablas]
+    
+    with engine.begin() as conexion:
+        conexion.execute(text(f"SET LOCAL lock_timeout = '{TIEMPO_ESPERA_BLOQUEO}'"))
+        
+        for tabla, clave, nombre in pendientes:
+            columnas = ', '.join(clave.column_keys)
+            referidas = ', '.join(elemento.column.name for elemento in clave.elements)
+            conexion.execute(text(
+                f"ALTER TABLE {tabla.name} DROP CONSTRAINT {nombre}, "
+                f"ADD CONSTRAINT {nombre} FOREIGN KEY ({columnas}) "
+                f"REFERENCES {clave.referred_table.name} ({referidas}) ON DELETE CASCADE"
+            ))
+    
+    return sorted({tabla.name for tabla, _, _ in pendientes})
+
+
+def indices_no_unicos(engine, metadata):
+    """
+    Busca los índices declarados como únicos que la base de datos no tiene
+    o tiene sin la restricción de unicidad.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+        metadata: MetaData con los modelos
+    
+    Returns:
+        Lista de tuplas (Index del modelo, True si ya existe en la base de datos)
+    """
+    inspector = inspect(engine)
+    pendientes = []
+    
+    for tabla in metadata.sorted_tables:
+        if not inspector.has_table(tabla.name):
+            continue
+        
+        existentes = {indice['name']: indice for indice in inspector.get_indexes(tabla.name)}
+        
+        for indice in tabla.indexes:
+            if not indice.unique:
+                continue
+            
+            existente = existentes.get(indice.name)
+            if existente is None or not existente['unique']:
+                pendientes.append((indice, existente is not None))
+    
+    return pendientes
+
+
+def _consulta_duplicadas(indice):
+    # Claves primarias de las filas repetidas salvo la de mayor id; las filas
+    # con algún NULL en la clave no entran en conflicto
+    tabla = indice.table.name
+    clave = ', '.join(columna.name for columna in indice.columns)
+    primaria = ', '.join(columna.name for columna in indice.table.primary_key.columns)
+    no_nulas = ' AND '.join(f"{columna.name} IS NOT NULL" for columna in indice.columns)
+    
+    return (
+        f"SELECT {primaria} FROM ("
+        f"SELECT {primaria}, row_number() OVER (PARTITION BY {clave} ORDER BY {primaria} DESC) AS orden "
+        f"FROM {tabla} WHERE {no_nulas}"
+        f") duplicadas WHERE orden > 1"
+    )
+
+
+def migrar_indices_unicos(engine, metadata, eliminar_duplicados=False):
+    """
+    Crea como únicos los índices que la base de datos tiene sin unicidad (o
+    no tiene).
+    
+    Si alguno tiene filas duplicadas, solo se eliminan con eliminar_duplicados
+    (se conserva la de mayor id); sin él se lanza RuntimeError sin modificar
+    nada. Los resúmenes calculados con las filas eliminadas no se modifican:
+    los recalcula init_db.py --migrar-indices-unicos.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+        metadata: MetaData con los modelos
+        eliminar_duplicados: Si se eliminan las filas duplicadas
+    
+    Returns:
+        Diccionario nombre del índice → lista con la clave del índice (tupla)
+        de cada fila duplicada eliminada
+    """
+    pendientes = indices_no_unicos(engine, metadata)
+    if not pendientes:
+        return {}
+    
+    eliminadas = {}
+    
+    with engine.begin() as conexion:
+        if engine.dialect.name == 'postgresql':
+            conexion.execute(text(f"SET LOCAL lock_timeout = '{TIEMPO_ESPERA_BLOQUEO}'"))
+        
+        duplicadas = {
+            indice.name: conexion.execute(text(
+                f"SELECT count(*) FROM ({_consulta_duplicadas(indice)}) repetidas"
+            )).scalar()
+            for indice, _ in pendientes
+        }
+        
+        if not eliminar_duplicados and any(duplicadas.values()):
+            raise RuntimeError(
+                "Hay filas duplicadas que impiden crear índices únicos ("
+                + ", ".join(f"{nombre}: {cantidad}" for nombre, cantidad in duplicadas.items() if cantidad)
+                + "). Ejecuta python init_db.py --migrar-indices-unicos para eliminarlas "
+                "(se conserva la de mayor id) y recalcular los resúmenes."
+            )
+        
+        for indice, existe in pendientes:
+            eliminadas[indice.name] = []
+            if duplicadas[indice.name]:
+                tabla = indice.table.name
+                clave = ', '.join(columna.name for columna in indice.columns)
+                primaria = ', '.join(columna.name for columna in indice.table.primary_key.columns)
+                eliminadas[indice.name] = [tuple(fila) for fila in conexion.execute(text(
+                    f"DELETE FROM {tabla} WHERE ({primaria}) IN ({_consulta_duplicadas(indice)}) "
+                    f"RETURNING {clave}"
+                ))]
+            
+            if existe:
+                conexion.execute(text(f"DROP INDEX {indice.name}"))
+            indice.create(conexion)
+    
+    return eliminadas
+
+
+def _reconstruir_tablas_sqlite(engine, metadata, tablas):
+    inspector = inspect(engine)
+    
+    # PRAGMA foreign_keys no tiene efecto dentro de una transacción: se desactiva
+    # en modo autocommit y la transacción se abre y se cierra a mano
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+        conexion.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        try:
+            conexion.exec_driver_sql("BEGIN")
+            
+            # Filas de aires ya eliminados que se habrían borrado en cascada
+            for tabla in metadata.sorted_tables:
+                if not inspector.has_table(tabla.name):
+                    continue
+                for clave in tabla.foreign_key_constraints:
+                    if _en_cascada(clave.ondelete) and len(clave.elements) == 1:
+                        elemento = clave.elements[0]
+                        conexion.execute(text(
+                            f"DELETE FROM {tabla.name} "
+                            f"WHERE {elemento.parent.name} IS NOT NULL "
+                            f"AND {elemento.parent.name} NOT IN "
+                            f"(SELECT {elemento.column.name} FROM {clave.referred_table.name})"
+                        ))
+            
+            for tabla in tablas:
+                _reconstruir_tabla_sqlite(conexion, tabla)
+            
+            conexion.exec_driver_sql("COMMIT")
+        except:
+            conexion.exec_driver_sql("ROLLBACK")
+            raise
+        finally:
+            conexion.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+
+def _reconstruir_tabla_sqlite(conexion, tabla):
+    # Copia de la definición del modelo con otro nombre; las tablas referidas se
+    # copian también para poder generar las cláusulas REFERENCES
+    copia = MetaData()
+    for clave in tabla.foreign_key_constraints:
+        if clave.referred_table.name not in copia.tables:
+            clave.referred_table.to_metadata(copia)
+    nueva = tabla.to_metadata(copia, name=f"{tabla.name}_nueva")
+    
+    columnas = ', '.join(columna.name for columna in tabla.columns)
+    
+    conexion.execute(CreateTable(nueva))
+    conexion.execute(text(
+        f"INSERT INTO {nueva.name} ({columnas}) SELECT {columnas} FROM {tabla.name}"
+    ))
+    conexion.execute(text(f"DROP TABLE {tabla.name}"))
+    conexion.execute(text(f"ALTER TABLE {nueva.name} RENAME TO {tabla.name}"))
+    
+    # Los índices se eliminaron con la tabla antigua
+    for indice in tabla.indexes:
+        indice.create(conexion)
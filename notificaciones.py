@@ -0,0 +1,329 @@
+"""
+Envío de alertas de umbrales.
+
+Las alertas que se activan al insertar lecturas (ver histeresis.py) se
+encolan en memoria sin bloquear a quien inserta. Un hilo propio descarta
+las repetidas de un mismo (aire, umbral, variable) dentro de una ventana y
+las agrupa en resúmenes periódicos. Cada destinatario recibe como
+máximo un número de resúmenes por hora; lo que no se puede enviar se
+acumula para el siguiente resumen.
+
+Salidas disponibles (se activan desde el entorno):
+    SMTP: NOTIFICATION_EMAIL y SMTP_HOST (SMTP_PORT, SMTP_USER, SMTP_PASSWORD,
+        SMTP_FROM, SMTP_STARTTLS)
+    Webhook: ALERTAS_WEBHOOK_URL, recibe un POST con JSON
+    Archivo: ALERTAS_ARCHIVO, una línea JSON por resumen
+
+Para probar el correo en local sin un servidor real:
+    python -m aiosmtpd -n -l localhost:1025
+    SMTP_HOST=localhost SMTP_PORT=1025 SMTP_STARTTLS=False NOTIFICATION_EMAIL=yo@example.com
+"""
+import json
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+import urllib.request
+from collections import deque
+from datetime import datetime
+from email.message import EmailMessage
+
+logger = logging.getLogger("notificaciones")
+
+
+class SalidaArchivo:
+    """Escribe cada resumen como una línea JSON en un archivo."""
+    
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self.destinatarios = [ruta]
+    
+    def enviar(self, destinatario, asunto, cuerpo, alertas):
+        directorio = os.path.dirname(destinatario)
+        if directorio and not os.path.exists(directorio):
+            os.makedirs(directorio)
+        
+        with open(destinatario, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'fecha': datetime.now(),
+                'asunto': asunto,
+                'alertas': alertas
+            }, default=str, ensure_ascii=False) + '\n')
+
+
+class SalidaWebhook:
+    """Envía cada resumen como un POST JSON a una URL."""
+    
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+        self.destinatarios = [url]
+    
+    def enviar(self, destinatario, asunto, cuerpo, alertas):
+        datos = json.dumps({
+            'asunto': asunto,
+            'resumen': cuerpo,
+            'alertas': alertas
+        }, default=str).encode('utf-8')
+        
+        peticion = urllib.request.Request(
+            destinatario,
+            data=datos,
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+        with urllib.request.urlopen(peticion, timeout=self.timeout) as respuesta:
+            respuesta.read()
+
+
+class SalidaSMTP:
+    """Envía cada resumen por correo electrónico."""
+    
+    def __init__(self, host, port, destinatarios, usuario=None, contrasena=None,
+                 remitente=None, starttls=True, timeout=10):
+        self.host = host
+        self.port = port
+        self.destinatarios = list(destinatarios)
+        self.usuario = usuario
+        self.contrasena = contrasena
+        self.remitente = remitente or usuario or self.destinatarios[0]
+        self.starttls = starttls
+        self.timeout = timeout
+    
+    def enviar(self, destinatario, asunto, cuerpo, alertas):
+        mensaje = EmailMessage()
+        mensaje['Subject'] = asunto
+        mensaje['From'] = self.remitente
+        mensaje['To'] = destinatario
+        mensaje.set_content(cuerpo)
+        
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.usuario:
+                smtp.login(self.usuario, self.contrasena)
+            smtp.send_message(mensaje)
+
+
+def crear_salidas_desde_entorno():
+    """
+    Crea las salidas de alertas configuradas en las variables de entorno.
+    
+    Returns:
+        Lista de salidas (vacía si no hay ninguna configurada)
+    """
+    salidas = []
+    
+    correos = [c.strip() for c in os.environ.get('NOTIFICATION_EMAIL', '').split(',') if c.strip()]
+    if correos and os.environ.get('SMTP_HOST'):
+        salidas.append(SalidaSMTP(
+            os.environ['SMTP_HOST'],
+            int(os.environ.get('SMTP_PORT', 587)),
+            correos,
+            usuario=os.environ.get('SMTP_USER') or None,
+            contrasena=os.environ.get('SMTP_PASSWORD'),
+            remitente=os.environ.get('SMTP_FROM') or None,
+            starttls=os.environ.get('SMTP_STARTTLS', 'True').lower() == 'true'
+        ))
+    
+    if os.environ.get('ALERTAS_WEBHOOK_URL'):
+        salidas.append(SalidaWebhook(os.environ['ALERTAS_WEBHOOK_URL']))
+    
+    if os.environ.get('ALERTAS_ARCHIVO'):
+        salidas.append(SalidaArchivo(os.environ['ALERTAS_ARCHIVO']))
+    
+    return salidas
+
+
+class DespachadorAlertas:
+    """
+    Cola de alertas con deduplicación, límite por destinatario y resúmenes.
+    
+    Args:
+        salidas: Lista de salidas con atributo destinatarios y método enviar
+        intervalo_resumen: Segundos entre resúmenes
+        ventana_deduplicacion: Segundos durante los que una alerta repetida del
+            mismo (aire, umbral, variable) solo incrementa su contador
+        max_envios_hora: Resúmenes máximos por destinatario y hora
+        max_cola: Lotes de alertas en cola a partir de los cuales se descartan
+    """
+    
+    def __init__(self, salidas, intervalo_resumen=300, ventana_deduplicacion=3600,
+                 max_envios_hora=4, max_cola=10000):
+        self.salidas = salidas
+        self.intervalo_resumen = intervalo_resumen
+        self.ventana_deduplicacion = ventana_deduplicacion
+        self.max_envios_hora = max_envios_hora
+        
+        self.descartadas = 0
+        self.suprimidas = 0
+        self.enviados = 0
+        
+        # Momento en que se aceptó por última vez cada (aire, umbral, variable)
+        self._ultimo_aviso = {}
+        # Alertas pendientes y envíos recientes de cada destinatario
+        self._pendientes = {}
+        self._envios = {}
+        for salida in salidas:
+            for destinatario in salida.destinatarios:
+                self._pendientes[(salida, destinatario)] = {}
+                self._envios[(salida, destinatario)] = deque()
+        
+        self._cola = queue.Queue(maxsize=max_cola)
+        self._cerrado = False
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._bucle, name="despachador-alertas", daemon=True)
+        self._hilo.start()
+    
+    def encolar(self, alertas):
+        """
+        Encola alertas para el próximo resumen. Nunca bloquea: si la cola está
+        llena, las alertas se descartan.
+        
+        Args:
+            alertas: Lista de diccionarios con aire_id, umbral_id, tipo, valor y mensaje
+        """
+        if self._cerrado:
+            return
+        
+        try:
+            self._cola.put_nowait(alertas)
+        except queue.Full:
+            self.descartadas += len(alertas)
+    
+    def vaciar(self):
+        """Procesa lo encolado hasta ahora y envía los resúmenes pendientes."""
+        marca = threading.Event()
+        
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cola.put(marca)
+        
+        marca.wait()
+    
+    def cerrar(self):
+        """Envía los resúmenes pendientes y detiene el hilo."""
+        with self._lock:
+            if self._cerrado:
+                return
+            self._cerrado = True
+            self._cola.put(None)
+        
+        self._hilo.join()
+    
+    def _bucle(self):
+        proximo_resumen = time.monotonic() + self.intervalo_resumen
+        
+        while True:
+            lotes = []
+            control = False
+            
+            # Esperar hasta el próximo resumen y recoger todo lo que haya en la cola;
+            # None (cerrar) y las marcas de vaciar() cortan la recogida
+            try:
+                elemento = self._cola.get(timeout=max(proximo_resumen - time.monotonic(), 0))
+                while True:
+                    if elemento is None or isinstance(elemento, threading.Event):
+                        control = True
+                        break
+                    lotes.append(elemento)
+                    elemento = self._cola.get_nowait()
+            except queue.Empty:
+                pass
+            
+            ahora = time.monotonic()
+            for lote in lotes:
+                for alerta in lote:
+                    self._registrar(alerta, ahora)
+            
+            if control or time.monotonic() >= proximo_resumen:
+                self._enviar_resumenes()
+                proximo_resumen = time.monotonic() + self.intervalo_resumen
+            
+            if control:
+                if elemento is None:
+                    return
+                elemento.set()
+    
+    def _registrar(self, alerta, ahora):
+        clave = (alerta['aire_id'], alerta['umbral_id'], alerta['tipo'])
+        ultimo = self._ultimo_aviso.get(clave)
+        
+        if ultimo is not None and ahora - ultimo < self.ventana_deduplicacion:
+            # Repetición: solo se actualiza la alerta si aún no se ha enviado
+            for pendientes in self._pendientes.values():
+                if clave in pendientes:
+                    pendientes[clave]['repeticiones'] += 1
+                    pendientes[clave]['valor'] = alerta['valor']
+                    pendientes[clave]['ultima_fecha'] = alerta.get('fecha')
+            self.suprimidas += 1
+            return
+        
+        self._ultimo_aviso[clave] = ahora
+        for pendientes in self._pendientes.values():
+            pendientes[clave] = dict(
+                alerta,
+                repeticiones=1,
+                primera_fecha=alerta.get('fecha'),
+                ultima_fecha=alerta.get('fecha')
+            )
+    
+    def _enviar_resumenes(self):
+        ahora = time.monotonic()
+        
+        for (salida, destinatario), pendientes in self._pendientes.items():
+            if not pendientes:
+                continue
+            
+            envios = self._envios[(salida, destinatario)]
+            while envios and ahora - envios[0] >= 3600:
+                envios.popleft()
+            
+            # Sin cupo este periodo: las alertas esperan al siguiente resumen
+            if len(envios) >= self.max_envios_hora:
+                continue
+            
+            alertas = list(pendientes.values())
+            asunto, cuerpo = formatear_resumen(alertas)
+            
+            try:
+                salida.enviar(destinatario, asunto, cuerpo, alertas)
+            except Exception:
+                logger.exception("Error al enviar el resumen de alertas a %s", destinatario)
+                continue
+            
+            envios.append(ahora)
+            pendientes.clear()
+            self.enviados += 1
+        
+        # Olvidar las claves cuya ventana de deduplicación ya pasó
+        self._ultimo_aviso = {
+            clave: momento for clave, momento in self._ultimo_aviso.items()
+            if ahora - momento < self.ventana_deduplicacion
+        }
+
+
+def formatear_resumen(alertas):
+    """
+    Compone el asunto y el texto de un resumen de alertas.
+    
+    Args:
+        alertas: Lista de alertas acumuladas
+    
+    Returns:
+        Tupla (asunto, cuerpo)
+    """
+    aires = {alerta['aire_id'] for alerta in alertas}
+    asunto = f"Alertas de umbrales: {len(alertas)} alerta(s) en {len(aires)} aire(s)"
+    
+    lineas = []
+    for alerta in sorted(alertas, key=lambda a: (str(a.get('aire_nombre')), a['tipo'])):
+        linea = f"- {alerta.get('aire_nombre', alerta['aire_id'])} [{alerta['umbral_nombre']}]: {alerta['mensaje']}"
+        if alerta['repeticiones'] > 1:
+            linea += f" (repetida {alerta['repeticiones']} veces hasta {alerta['ultima_fecha']}, último valor {alerta['valor']})"
+        lineas.append(linea)
+    
+    return asunto, "\n".join(lineas)
@@ -0,0 +1,319 @@
+"""
+Particionado mensual de la tabla de lecturas en PostgreSQL.
+
+Se activa con LECTURAS_PARTICIONADAS=True. La tabla lecturas pasa a ser una
+tabla particionada por rango de fecha, con una partición por mes
+(lecturas_AAAA_MM), una partición por defecto para fechas sin partición
+propia y un índice BRIN sobre fecha. El modelo Lectura no cambia: las
+consultas del ORM se hacen sobre la tabla padre y PostgreSQL descarta las
+particiones que no intersectan el rango de fechas pedido.
+"""
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import text
+
+logger = logging.getLogger("particionado")
+
+TABLA = "lecturas"
+PARTICION_DEFECTO = "lecturas_default"
+
+# Índices del modelo Lectura que la tabla particionada no tiene: el índice
+# BRIN sobre fecha sustituye al B-tree, que se repetiría en cada partición
+INDICES_SUSTITUIDOS = (f"ix_{TABLA}_fecha",)
+
+# Las operaciones de mantenimiento esperan como máximo este tiempo por los
+# bloqueos; una sesión con una transacción abierta sobre lecturas no debe
+# dejar colgado el arranque de la aplicación
+TIEMPO_ESPERA_BLOQUEO = "5s"
+
+
+def particionado_activo(engine):
+    """
+    Indica si el particionado está activado y el motor lo admite.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+    
+    Returns:
+        True si LECTURAS_PARTICIONADAS está activo y la base es PostgreSQL
+    """
+    activado = os.environ.get('LECTURAS_PARTICIONADAS', 'False').lower() == 'true'
+    return activado and engine.dialect.name == 'postgresql'
+
+
+def _inicio_mes(fecha):
+    return date(fecha.year, fecha.month, 1)
+
+
+def _sumar_meses(fecha, meses):
+    total = fecha.year * 12 + fecha.month - 1 + meses
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _nombre_particion(mes):
+    return f"{TABLA}_{mes.year:04d}_{mes.month:02d}"
+
+
+def esta_particionada(conexion):
+    """
+    Indica si la tabla lecturas ya es una tabla particionada.
+    
+    Args:
+        conexion: Conexión abierta de SQLAlchemy
+    
+    Returns:
+        True si lecturas está particionada
+    """
+    resultado = conexion.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p "
+        "JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relname = :tabla AND pg_table_is_visible(c.oid)"
+    ), {'tabla': TABLA}).first()
+    
+    return resultado is not None
+
+
+def indices_omitidos(engine):
+    """
+    Nombres de los índices del modelo Lectura que no deben crearse porque la
+    tabla lecturas está particionada.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+    
+    Returns:
+        Conjunto de nombres (vacío si lecturas no está particionada)
+    """
+    if engine.dialect.name != 'postgresql':
+        return set()
+    
+    with engine.connect() as conexion:
+        return set(INDICES_SUSTITUIDOS) if esta_particionada(conexion) else set()
+
+
+def particionar_lecturas(engine):
+    """
+    Convierte la tabla lecturas existente en una tabla particionada por mes.
+    
+    Copia las lecturas existentes a las nuevas particiones dentro de una
+    única transacción y conserva la secuencia de IDs. Las particiones de los
+    meses futuros se crean con crear_particiones_futuras.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+    """
+    with engine.begin() as conexion:
+        _limitar_espera_bloqueos(conexion)
+        
+        if esta_particionada(conexion):
+            # Bases particionadas cuando init_db volvía a crear los índices
+            # sustituidos sobre la tabla particionada
+            conexion.execute(text(f"DROP INDEX IF EXISTS {', '.join(INDICES_SUSTITUIDOS)}"))
+            return
+        
+        secuencia = conexion.execute(
+            text("SELECT pg_get_serial_sequence(:tabla, 'id')"), {'tabla': TABLA}
+        ).scalar()
+        
+        rango = conexion.execute(text(f"SELECT min(fecha), max(fecha) FROM {TABLA}")).first()
+        
+        conexion.execute(text(f"ALTER TABLE {TABLA} RENAME TO {TABLA}_sin_particionar"))
+        
+        # Los índices de la tabla antigua conservan su nombre; se eliminan con ella
+        # para poder crearlos en la tabla particionada
+        conexion.execute(text(f"DROP INDEX IF EXISTS ix_{TABLA}_aire_fecha, {', '.join(INDICES_SUSTITUIDOS)}"))
+        
+        # La clave primaria de una tabla particionada debe incluir la columna de partición
+        conexion.execute(text(f"""
+            CREATE TABLE {TABLA} (
+                id INTEGER NOT NULL DEFAULT nextval('{secuencia}'::regclass),
+                aire_id INTEGER REFERENCES aires_acondicionados (id) ON DELETE CASCADE,
+                fecha TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                temperatura DOUBLE PRECISION NOT NULL,
+                humedad DOUBLE PRECISION NOT NULL,
+                PRIMARY KEY (id, fecha)
+            ) PARTITION BY RANGE (fecha)
+        """))
+        conexion.execute(text(f"ALTER SEQUENCE {secuencia} OWNED BY {TABLA}.id"))
+        
+        # BRIN es muy pequeño y suficiente para datos que llegan en orden de fecha
+        conexion.execute(text(f"CREATE INDEX ix_{TABLA}_fecha_brin ON {TABLA} USING brin (fecha)"))
+        # Clave única de una lectura; incluye la columna de partición, como exige PostgreSQL
+        conexion.execute(text(f"CREATE UNIQUE INDEX ix_{TABLA}_aire_fecha ON {TABLA} (aire_id, fecha)"))
+        
+        conexion.execute(text(f"CREATE TABLE {PARTICION_DEFECTO} PARTITION OF {TABLA} DEFAULT"))
+        
+        # Particiones para el histórico existente
+        if rango.min is not None:
+            mes = _inicio_mes(rango.min)
+            while mes <= _inicio_mes(rango.max):
+                _crear_particion(conexion, mes)
+                mes = _sumar_meses(mes, 1)
+        
+        conexion.execute(text(
+            f"INSERT INTO {TABLA} (id, aire_id, fecha, temperatura, humedad) "
+            f"SELECT id, aire_id, fecha, temperatura, humedad FROM {TABLA}_sin_particionar"
+        ))
+        conexion.execute(text(f"DROP TABLE {TABLA}_sin_particionar"))
+
+
+def _limitar_espera_bloqueos(conexion):
+    conexion.execute(text(f"SET LOCAL lock_timeout = '{TIEMPO_ESPERA_BLOQUEO}'"))
+
+
+def _crear_particion(conexion, mes):
+    nombre = _nombre_particion(mes)
+    desde = mes.isoformat()
+    hasta = _sumar_meses(mes, 1).isoformat()
+    
+    existe = conexion.execute(text("SELECT to_regclass(:nombre)"), {'nombre': nombre}).scalar()
+    if existe is not None:
+        return False
+    
+    # Crear la tabla suelta, mover a ella las filas del mes que hubieran caído en la
+    # partición por defecto y después adjuntarla; así no falla si la partición por
+    # defecto ya contiene lecturas de ese mes
+    conexion.execute(text(f"CREATE TABLE {nombre} (LIKE {TABLA} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conexion.execute(text(f"""
+        WITH movidas AS (
+            DELETE FROM {PARTICION_DEFECTO}
+            WHERE fecha >= :desde AND fecha < :hasta
+            RETURNING id, aire_id, fecha, temperatura, humedad
+        )
+        INSERT INTO {nombre} (id, aire_id, fecha, temperatura, humedad)
+        SELECT id, aire_id, fecha, temperatura, humedad FROM movidas
+    """), {'desde': desde, 'hasta': hasta})
+    conexion.execute(text(
+        f"ALTER TABLE {TABLA} ATTACH PARTITION {nombre} "
+        f"FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+    ))
+    
+    return True
+
+
+def crear_particiones_futuras(engine, meses=3, desde=None):
+    """
+    Crea las particiones del mes actual y de los próximos meses si no existen.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+        meses: Número de meses futuros a preparar
+        desde: Fecha de referencia (por defecto hoy)
+    
+    Returns:
+        Lista con los nombres de las particiones creadas
+    """
+    mes = _inicio_mes(desde or date.today())
+    creadas = []
+    
+    with engine.begin() as conexion:
+        _limitar_espera_bloqueos(conexion)
+        
+        for i in range(meses + 1):
+            mes_particion = _sumar_meses(mes, i)
+            if _crear_particion(conexion, mes_particion):
+                creadas.append(_nombre_particion(mes_particion))
+    
+    return creadas
+
+
+def obtener_particiones(conexion):
+    """
+    Lista las particiones mensuales adjuntas a la tabla lecturas.
+    
+    Args:
+        conexion: Conexión abierta de SQLAlchemy
+    
+    Returns:
+        Lista de tuplas (nombre, primer día del mes) ordenada por mes
+    """
+    filas = conexion.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :tabla"
+    ), {'tabla': TABLA}).scalars().all()
+    
+    particiones = []
+    for nombre in filas:
+        partes = nombre[len(TABLA) + 1:].split('_')
+        if len(partes) == 2 and all(p.isdigit() for p in partes):
+            particiones.append((nombre, date(int(partes[0]), int(partes[1]), 1)))
+    
+    return sorted(particiones, key=lambda p: p[1])
+
+
+def desasociar_particiones_antiguas(engine, meses_retencion, eliminar=False, desde=None):
+    """
+    Separa de la tabla lecturas las particiones más antiguas que el periodo de retención.
+    
+    Solo se separan las particiones vacías, es decir, las que compactar_lecturas
+    ya ha resumido en agregados por hora: los cuantiles diarios, los estados
+    de anomalías y alertas y las cachés de DataManager se calculan con las
+    lecturas y las horas compactadas, así que separar una partición con
+    lecturas los dejaría contando datos que ya no existen. Las particiones
+    con lecturas se conservan hasta que la retención de retencion.py
+    (RETENCION_LECTURAS_DIAS, menor que LECTURAS_MESES_RETENCION) las compacte.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+        meses_retencion: Meses completos que se conservan en la tabla lecturas
+        eliminar: Si es True, elimina las particiones separadas
+        desde: Fecha de referencia (por defecto hoy)
+    
+    Returns:
+        Lista con los nombres de las particiones separadas
+    """
+    limite = _sumar_meses(_inicio_mes(desde or date.today()), -meses_retencion)
+    separadas = []
+    
+    with engine.begin() as conexion:
+        _limitar_espera_bloqueos(conexion)
+        
+        for nombre, mes in obtener_particiones(conexion):
+            if mes >= limite:
+                break
+            
+            # SHARE impide nuevas inserciones en la partición hasta separarla
+            conexion.execute(text(f"LOCK TABLE {nombre} IN SHARE MODE"))
+            if conexion.execute(text(f"SELECT 1 FROM {nombre} LIMIT 1")).first() is not None:
+                logger.warning(
+                    "La partición %s tiene lecturas sin compactar; no se separa hasta que "
+                    "compactar_lecturas la vacíe", nombre
+                )
+                continue
+            
+            conexion.execute(text(f"ALTER TABLE {TABLA} DETACH PARTITION {nombre}"))
+            if eliminar:
+                conexion.execute(text(f"DROP TABLE {nombre}"))
+            separadas.append(nombre)
+    
+    return separadas
+
+
+def preparar_particiones(engine):
+    """
+    Aplica el particionado si está activado: migra la tabla si hace falta,
+    crea las particiones futuras y separa las antiguas ya compactadas si hay
+    retención configurada.
+    
+    Args:
+        engine: Motor de SQLAlchemy
+    """
+    if not particionado_activo(engine):
+        return
+    
+    meses_futuros = int(os.environ.get('LECTURAS_MESES_FUTUROS', 3))
+    
+    particionar_lecturas(engine)
+    crear_particiones_futuras(engine, meses_futuros)
+    
+    meses_retencion = os.environ.get('LECTURAS_MESES_RETENCION')
+    if meses_retencion:
+        desasociar_particiones_antiguas(
+            engine,
+            int(meses_retencion),
+            eliminar=os.environ.get('LECTURAS_ELIMINAR_PARTICIONES', 'False').lower() == 'true'
+        )
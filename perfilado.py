@@ -0,0 +1,157 @@
+"""
+Capturas de perfil (cProfile) de ejecuciones reales de una página.
+
+Los tiempos de instrumentacion.py dicen qué página o consulta es lenta; un
+perfil dice en qué funciones de DataManager, utils o las librerías se va el
+tiempo. Un administrador activa "Perfilar página" en la barra lateral (o se
+activan todas las ejecuciones con PERFILAR_PAGINAS=True) y el renderizado de
+la página se ejecuta dentro de cProfile. Cada captura se guarda en
+PERFILES_DIR (por defecto data/perfiles) como
+<pagina>_<AAAAMMDD_HHMMSS_microsegundos>.prof, que también se puede abrir con pstats,
+snakeviz o similares, y la aplicación muestra las funciones que más tiempo
+consumen.
+
+cProfile es determinista y ralentiza la página mientras está activo, así
+que los tiempos de una ejecución perfilada son mayores que los normales.
+Solo se perfila una ejecución a la vez: si otra sesión ya está perfilando,
+la página se ejecuta sin perfil.
+"""
+import cProfile
+import os
+import pstats
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+PERFILAR_SIEMPRE = os.environ.get('PERFILAR_PAGINAS', 'False').lower() == 'true'
+DIRECTORIO = os.environ.get('PERFILES_DIR', os.path.join('data', 'perfiles'))
+
+# Directorio de la aplicación, para distinguir sus funciones de las de las librerías
+DIRECTORIO_APLICACION = os.path.dirname(os.path.abspath(__file__))
+
+COLUMNAS_RESUMEN = ['funcion', 'archivo', 'linea', 'llamadas', 'tiempo_propio_ms', 'tiempo_acumulado_ms']
+
+_perfilando = threading.Lock()
+
+
+class Captura:
+    """
+    Resultado de perfilar una ejecución; ruta es None mientras dura o si no se perfiló.
+    
+    Args:
+        pagina: Nombre de la página
+    """
+    
+    def __init__(self, pagina):
+        self.pagina = pagina
+        self.ruta = None
+
+
+def _nombre_archivo(pagina, fecha):
+    nombre = unicodedata.normalize('NFKD', pagina).encode('ascii', 'ignore').decode()
+    nombre = re.sub(r'\W+', '_', nombre.lower()).strip('_') or 'pagina'
+    return f"{nombre}_{fecha.strftime('%Y%m%d_%H%M%S_%f')}.prof"
+
+
+@contextmanager
+def perfilar(pagina, directorio=DIRECTORIO):
+    """
+    Ejecuta el bloque con cProfile y guarda la captura al terminar, también
+    si el bloque lanza una excepción.
+    
+    Args:
+        pagina: Nombre de la página, para el nombre del archivo
+        directorio: Directorio donde se guardan las capturas
+    
+    Returns:
+        Captura con la ruta del archivo una vez terminado el bloque
+    """
+    captura = Captura(pagina)
+    
+    if not _perfilando.acquire(blocking=False):
+        yield captura
+        return
+    
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+        try:
+            yield captura
+        finally:
+            perfil.disable()
+            os.makedirs(directorio, exist_ok=True)
+            ruta = os.path.join(directorio, _nombre_archivo(pagina, datetime.now()))
+            perfil.dump_stats(ruta)
+            captura.ruta = ruta
+    finally:
+        _perfilando.release()
+
+
+def resumen_funciones(ruta, limite=25, orden='tiempo_acumulado_ms', solo_aplicacion=False):
+    """
+    Funciones que más tiempo consumen en una captura.
+    
+    Args:
+        ruta: Archivo .prof
+        limite: Número de funciones a devolver
+        orden: Columna por la que ordenar (tiempo_acumulado_ms, tiempo_propio_ms o llamadas)
+        solo_aplicacion: Si es True, solo las funciones de los módulos de la aplicación
+    
+    Returns:
+        DataFrame con funcion, archivo, linea, llamadas, tiempo_propio_ms y tiempo_acumulado_ms
+    """
+    estadisticas = pstats.Stats(ruta).stats
+    
+    filas = []
+    for (archivo, linea, funcion), (_, llamadas, propio, acumulado, _) in estadisticas.items():
+        if solo_aplicacion and not archivo.startswith(DIRECTORIO_APLICACION):
+            continue
+        
+        filas.append({
+            'funcion': funcion,
+            'archivo': os.path.relpath(archivo, DIRECTORIO_APLICACION) if archivo.startswith(DIRECTORIO_APLICACION) else archivo,
+            'linea': linea,
+            'llamadas': llamadas,
+            'tiempo_propio_ms': propio * 1000,
+            'tiempo_acumulado_ms': acumulado * 1000
+        })
+    
+    if not filas:
+        return pd.DataFrame(columns=COLUMNAS_RESUMEN)
+    
+    return pd.DataFrame(filas, columns=COLUMNAS_RESUMEN).nlargest(limite, orden).reset_index(drop=True)
+
+
+def listar_capturas(directorio=DIRECTORIO):
+    """
+    Capturas guardadas, de la más reciente a la más antigua.
+    
+    Args:
+        directorio: Directorio de las capturas
+    
+    Returns:
+        DataFrame con archivo, ruta, fecha y tamano_kb
+    """
+    capturas = []
+    
+    if os.path.isdir(directorio):
+        for archivo in os.listdir(directorio):
+            if not archivo.endswith('.prof'):
+                continue
+            
+            ruta = os.path.join(directorio, archivo)
+            capturas.append({
+                'archivo': archivo,
+                'ruta': ruta,
+                'fecha': datetime.fromtimestamp(os.path.getmtime(ruta)),
+                'tamano_kb': os.path.getsize(ruta) / 1024
+            })
+    
+    if not capturas:
+        return pd.DataFrame(columns=['archivo', 'ruta', 'fecha', 'tamano_kb'])
+    
+    return pd.DataFrame(capturas).sort_values('fecha', ascending=False).reset_index(drop=True)
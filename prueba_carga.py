@@ -0,0 +1,330 @@
+"""
+Prueba de carga con muchas sesiones de usuario concurrentes.
+
+Streamlit atiende cada pestaña del navegador en su propio hilo y todas
+comparten el DataManager de st.cache_resource, y con él la sesión global de
+SQLAlchemy y el pool de conexiones del motor. Esta herramienta reproduce
+esa situación sin navegador contra la base de datos de DATABASE_URL: crea
+un DataManager, como la aplicación, y lanza un hilo por usuario que simula
+un turno de operadores. Cada usuario inicia sesión con
+verificar_credenciales y después, con pausas entre acciones, visita
+páginas (llamando a los mismos métodos de DataManager que app.py),
+registra lecturas y, de vez en cuando, exporta los datos.
+
+La carga se aplica por escalones de concurrencia (--usuarios 1 5 10 20):
+cada escalón dura --duracion segundos y muestra operaciones por segundo,
+latencias p50/p95/p99 y tasa de errores, en total y por acción, además del
+máximo de conexiones del pool en uso. El escalón a partir del cual las
+operaciones por segundo dejan de crecer mientras la latencia sigue subiendo
+es el punto de saturación; los errores indican dónde la sesión compartida
+deja de soportar el uso concurrente. Tras cada error se hace rollback de la
+sesión compartida para que la prueba pueda continuar.
+
+La prueba crea usuarios carga_NN y registra lecturas: úsese con una copia de
+la base de datos o con una flota sintética (ver flota_sintetica.py).
+
+Uso:
+    DATABASE_URL=sqlite:///data/flota.db python prueba_carga.py --usuarios 1 5 10 20 --duracion 30
+"""
+import argparse
+import os
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+# Cargar variables de entorno antes de importar la base de datos
+load_dotenv()
+
+from database import engine, session
+from data_manager import DataManager
+from benchmark import DIRECTORIO, obtener_commit
+
+PASSWORD = "carga-1234"
+
+# Pausa media entre dos acciones de un usuario (segundos)
+PAUSA = 0.5
+
+# Un escalón satura si las operaciones por segundo crecen menos que esto
+# respecto al anterior mientras el p95 crece más que UMBRAL_LATENCIA
+UMBRAL_CRECIMIENTO = 0.1
+UMBRAL_LATENCIA = 0.5
+
+
+def _pagina_dashboard(data_manager, rng):
+    data_manager.obtener_catalogo_aires()
+    data_manager.obtener_estadisticas_generales()
+    data_manager.obtener_lecturas()
+    data_manager.obtener_alertas_activas()
+    data_manager.obtener_anomalias_activas()
+    data_manager.obtener_tendencias()
+
+
+def _pagina_registro_lecturas(data_manager, rng):
+    catalogo = data_manager.obtener_catalogo_aires()
+    data_manager.obtener_pagina_lecturas(aire_id=rng.choice(catalogo.ids))
+
+
+def _registrar_lectura(data_manager, rng):
+    catalogo = data_manager.obtener_catalogo_aires()
+    data_manager.agregar_lectura(
+        rng.choice(catalogo.ids),
+        datetime.now(),
+        round(rng.uniform(19, 26), 1),
+        round(rng.uniform(35, 65), 1)
+    )
+
+
+def _pagina_analisis(data_manager, rng):
+    catalogo = data_manager.obtener_catalogo_aires()
+    aire_id = rng.choice(catalogo.ids)
+    data_manager.obtener_estadisticas_por_ubicacion()
+    data_manager.obtener_estadisticas_por_aire(aire_id)
+    data_manager.obtener_variacion('temperatura', aire_id=aire_id)
+    data_manager.obtener_mapa_calor()
+    data_manager.obtener_cuantiles()
+
+
+def _pagina_mantenimientos(data_manager, rng):
+    data_manager.obtener_catalogo_aires()
+    data_manager.obtener_mantenimientos()
+
+
+def _exportar(data_manager, rng):
+    for ruta in data_manager.exportar_datos('csv'):
+        if os.path.exists(ruta):
+            os.remove(ruta)
+
+
+# Acciones de un usuario y su peso relativo en el turno
+ACCIONES = {
+    'dashboard': (_pagina_dashboard, 3),
+    'registro_lecturas': (_pagina_registro_lecturas, 2),
+    'registrar_lectura': (_registrar_lectura, 3),
+    'analisis': (_pagina_analisis, 1),
+    'mantenimientos': (_pagina_mantenimientos, 1),
+    'exportar': (_exportar, 0.2)
+}
+
+
+def preparar_usuarios(data_manager, cantidad):
+    """
+    Crea los usuarios operadores carga_NN que falten.
+    
+    Returns:
+        Lista de nombres de usuario
+    """
+    usuarios = [f"carga_{numero:02d}" for numero in range(1, cantidad + 1)]
+    for username in usuarios:
+        data_manager.crear_usuario("Carga", username, f"{username}@carga.local", username, PASSWORD)
+    return usuarios
+
+
+class Mediciones:
+    """Latencias y errores de un escalón, compartidos por los hilos de usuario."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.errores = Counter()
+        self.mensajes = Counter()
+    
+    def registrar(self, accion, duracion_ms, error=None):
+        with self._lock:
+            if error is None:
+                self.latencias[accion].append(duracion_ms)
+            else:
+                self.errores[accion] += 1
+                self.mensajes[f"{type(error).__name__}: {str(error).splitlines()[0][:150]}"] += 1
+
+
+def _usuario(data_manager, username, fin, mediciones, pausa, semilla):
+    rng = random.Random(semilla)
+    nombres = list(ACCIONES)
+    pesos = [ACCIONES[nombre][1] for nombre in nombres]
+    
+    def ejecutar(accion, funcion):
+        inicio = time.perf_counter()
+        try:
+            funcion()
+        except Exception as error:
+            mediciones.registrar(accion, None, error)
+            try:
+                session.rollback()
+            except Exception:
+                pass
+            return False
+        mediciones.registrar(accion, (time.perf_counter() - inicio) * 1000)
+        return True
+    
+    # Inicio de sesión; si falla, el usuario lo vuelve a intentar tras una pausa
+    while not ejecutar('login', lambda: data_manager.verificar_credenciales(username, PASSWORD)):
+        if time.monotonic() >= fin:
+            return
+        time.sleep(pausa)
+    
+    while time.monotonic() < fin:
+        time.sleep(rng.expovariate(1 / pausa) if pausa else 0)
+        if time.monotonic() >= fin:
+            break
+        
+        accion = rng.choices(nombres, pesos)[0]
+        ejecutar(accion, lambda: ACCIONES[accion][0](data_manager, rng))
+
+
+def _muestrear_pool(fin, muestras):
+    while time.monotonic() < fin:
+        try:
+            muestras.append(engine.pool.checkedout())
+        except AttributeError:
+            # Pools sin contador (por ejemplo, SQLite en memoria)
+            return
+        time.sleep(0.1)
+
+
+def _percentiles(latencias):
+    if not latencias:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None}
+    p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+    return {'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+
+
+def ejecutar_escalon(data_manager, usuarios, duracion, pausa=PAUSA):
+    """
+    Ejecuta un escalón de carga con un hilo por usuario.
+    
+    Args:
+        data_manager: DataManager compartido por todos los usuarios
+        usuarios: Lista de nombres de usuario
+        duracion: Segundos de carga
+        pausa: Pausa media entre acciones de un usuario
+    
+    Returns:
+        Tupla (diccionario con el resumen del escalón, DataFrame por acción,
+        Counter con los mensajes de error)
+    """
+    mediciones = Mediciones()
+    muestras_pool = []
+    inicio = time.monotonic()
+    fin = inicio + duracion
+    
+    hilos = [
+        threading.Thread(target=_usuario, args=(data_manager, username, fin, mediciones, pausa, numero), daemon=True)
+        for numero, username in enumerate(usuarios)
+    ]
+    hilos.append(threading.Thread(target=_muestrear_pool, args=(fin, muestras_pool), daemon=True))
+    
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    
+    transcurrido = time.monotonic() - inicio
+    
+    por_accion = []
+    for accion in ['login', *ACCIONES]:
+        latencias = mediciones.latencias.get(accion, [])
+        errores = mediciones.errores.get(accion, 0)
+        if not latencias and not errores:
+            continue
+        por_accion.append({
+            'accion': accion,
+            'operaciones': len(latencias) + errores,
+            'errores': errores,
+            **_percentiles(latencias)
+        })
+    
+    todas = [latencia for latencias in mediciones.latencias.values() for latencia in latencias]
+    errores = sum(mediciones.errores.values())
+    operaciones = len(todas) + errores
+    
+    resumen = {
+        'usuarios': len(usuarios),
+        'operaciones': operaciones,
+        'ops_segundo': operaciones / transcurrido,
+        **_percentiles(todas),
+        'errores': errores,
+        'tasa_error': errores / operaciones if operaciones else 0.0,
+        'conexiones_max': max(muestras_pool) if muestras_pool else None
+    }
+    
+    return resumen, pd.DataFrame(por_accion), mediciones.mensajes
+
+
+def detectar_saturacion(escalones_df):
+    """
+    Primer escalón en el que las operaciones por segundo dejan de crecer
+    mientras el p95 sigue subiendo.
+    
+    Returns:
+        Número de usuarios de ese escalón, o None si no satura
+    """
+    anterior = None
+    for _, escalon in escalones_df.iterrows():
+        if anterior is not None and anterior['ops_segundo'] and anterior['p95_ms']:
+            crecimiento = escalon['ops_segundo'] / anterior['ops_segundo'] - 1
+            latencia = escalon['p95_ms'] / anterior['p95_ms'] - 1
+            if crecimiento < UMBRAL_CRECIMIENTO and latencia > UMBRAL_LATENCIA:
+                return int(escalon['usuarios'])
+        anterior = escalon
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga con sesiones de usuario concurrentes")
+    parser.add_argument('--usuarios', type=int, nargs='+', default=[1, 5, 10, 20], help="Usuarios concurrentes de cada escalón")
+    parser.add_argument('--duracion', type=float, default=30, help="Segundos de cada escalón")
+    parser.add_argument('--pausa', type=float, default=PAUSA, help="Pausa media entre acciones de un usuario (segundos)")
+    args = parser.parse_args()
+    
+    data_manager = DataManager()
+    if len(data_manager.obtener_catalogo_aires()) == 0:
+        parser.error("La base de datos no tiene aires; genera una flota con flota_sintetica.py")
+    
+    usuarios = preparar_usuarios(data_manager, max(args.usuarios))
+    pool = engine.pool
+    limite = pool.size() + pool._max_overflow if hasattr(pool, 'size') and hasattr(pool, '_max_overflow') else None
+    print(f"Pool de conexiones: {pool.status()} (límite {limite})", flush=True)
+    
+    escalones = []
+    for cantidad in args.usuarios:
+        print(f"\n=== {cantidad} usuarios durante {args.duracion:g} s ===", flush=True)
+        resumen, por_accion_df, mensajes = ejecutar_escalon(data_manager, usuarios[:cantidad], args.duracion, args.pausa)
+        escalones.append(resumen)
+        
+        print(por_accion_df.round(1).to_string(index=False))
+        for mensaje, veces in mensajes.most_common(5):
+            print(f"  {veces} x {mensaje}")
+    
+    data_manager.cerrar()
+    
+    escalones_df = pd.DataFrame(escalones)
+    print("\n=== Resumen por escalón ===")
+    print(escalones_df.round(3).to_string(index=False))
+    
+    saturacion = detectar_saturacion(escalones_df)
+    if saturacion:
+        print(f"\nSaturación: a partir de {saturacion} usuarios las operaciones por segundo dejan de crecer y la latencia sigue subiendo.")
+    concurrentes = escalones_df[escalones_df['usuarios'] > 1]
+    if not concurrentes.empty and concurrentes['conexiones_max'].max() == 1:
+        print("Todas las sesiones usaron una sola conexión: la sesión global compartida serializa las consultas "
+              "y el pool no se aprovecha.")
+    if limite is not None and escalones_df['conexiones_max'].max() >= limite:
+        print(f"El pool de conexiones llegó a su límite ({limite}); las siguientes peticiones esperan una conexión libre.")
+    
+    # Resultados para comparar entre versiones
+    escalones_df.insert(0, 'ejecucion', datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    escalones_df.insert(1, 'commit', obtener_commit())
+    escalones_df.insert(2, 'motor', engine.dialect.name)
+    os.makedirs(DIRECTORIO, exist_ok=True)
+    archivo = os.path.join(DIRECTORIO, 'carga.csv')
+    escalones_df.to_csv(archivo, mode='a', header=not os.path.exists(archivo), index=False)
+
+
+if __name__ == "__main__":
+    main()
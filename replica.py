@@ -0,0 +1,136 @@
+"""
+Envío de las consultas de solo lectura a una réplica de la base de datos.
+
+Si DATABASE_READ_URL está configurada, los métodos de DataManager marcados
+con @solo_lectura (análisis, estadísticas y exportación) se ejecutan en
+una sesión de la réplica; las escrituras y el resto de consultas siguen en
+la base de datos principal. Así las consultas pesadas no compiten con las
+inserciones de los operadores.
+
+La réplica puede ir algo retrasada respecto a la principal. Para que quien
+acaba de escribir vea su cambio, durante REPLICA_VENTANA_ESCRITURA segundos
+después de cada commit en la principal las consultas de solo lectura
+también van a la principal. Si la réplica no responde, la consulta se
+repite en la principal y la réplica no se vuelve a usar hasta pasados
+REPLICA_REINTENTO segundos.
+
+Para probarlo en local basta con dos bases de datos, por ejemplo una copia
+del archivo SQLite de la principal:
+    DATABASE_URL=sqlite:///principal.db DATABASE_READ_URL=sqlite:///replica.db
+"""
+import functools
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+logger = logging.getLogger("replica")
+
+# Segundos tras una escritura durante los que las lecturas van a la principal
+VENTANA_ESCRITURA = float(os.environ.get('REPLICA_VENTANA_ESCRITURA', 5))
+
+# Segundos sin usar la réplica después de un fallo
+REINTENTO = float(os.environ.get('REPLICA_REINTENTO', 30))
+
+
+class EnrutadorConsultas:
+    """
+    Decide en qué base de datos se ejecuta cada consulta de solo lectura.
+    
+    Args:
+        sesion_principal: Sesión de la base de datos principal
+        fabrica_replica: sessionmaker de la réplica, o None si no hay réplica
+        ventana_escritura: Segundos tras una escritura con lecturas en la principal
+        reintento: Segundos sin usar la réplica después de un fallo
+    """
+    
+    def __init__(self, sesion_principal, fabrica_replica=None, ventana_escritura=VENTANA_ESCRITURA,
+                 reintento=REINTENTO):
+        self.sesion_principal = sesion_principal
+        self.fabrica_replica = fabrica_replica
+        self.ventana_escritura = ventana_escritura
+        self.reintento = reintento
+        
+        self.consultas_replica = 0
+        self.consultas_principal = 0
+        self.fallos_replica = 0
+        
+        self._ultima_escritura = float('-inf')
+        self._replica_caida_hasta = float('-inf')
+        
+        # La instancia de DataManager es compartida entre las sesiones de Streamlit:
+        # la sesión de la consulta en curso es propia de cada hilo
+        self._local = threading.local()
+    
+    @property
+    def sesion(self):
+        """Sesión de la consulta de solo lectura en curso, o la principal fuera de una."""
+        return getattr(self._local, 'sesion', None) or self.sesion_principal
+    
+    def registrar_escritura(self):
+        """Envía las lecturas a la principal durante la ventana de escritura."""
+        self._ultima_escritura = time.monotonic()
+    
+    def usar_replica(self):
+        """
+        Indica si las consultas de solo lectura deben ir ahora a la réplica.
+        
+        Returns:
+            False si no hay réplica, hubo una escritura reciente o la réplica falló hace poco
+        """
+        if self.fabrica_replica is None:
+            return False
+        
+        ahora = time.monotonic()
+        return (ahora - self._ultima_escritura >= self.ventana_escritura
+                and ahora >= self._replica_caida_hasta)
+    
+    def ejecutar(self, funcion, *args, **kwargs):
+        """
+        Ejecuta una consulta de solo lectura en la réplica si procede y, si la
+        réplica falla, de nuevo en la principal.
+        
+        Args:
+            funcion: Función que consulta a través de self.sesion
+        
+        Returns:
+            Lo que devuelva la función
+        """
+        # Una consulta anidada usa la sesión de la que la contiene
+        if getattr(self._local, 'sesion', None) is not None:
+            return funcion(*args, **kwargs)
+        
+        if self.usar_replica():
+            try:
+                with self.fabrica_replica() as sesion:
+                    resultado = self._con_sesion(sesion, funcion, *args, **kwargs)
+                
+                self.consultas_replica += 1
+                return resultado
+            except (OperationalError, InterfaceError):
+                logger.exception("La réplica de lectura no responde; se usa la base de datos principal")
+                self.fallos_replica += 1
+                self._replica_caida_hasta = time.monotonic() + self.reintento
+        
+        self.consultas_principal += 1
+        return self._con_sesion(self.sesion_principal, funcion, *args, **kwargs)
+    
+    def _con_sesion(self, sesion, funcion, *args, **kwargs):
+        self._local.sesion = sesion
+        try:
+            return funcion(*args, **kwargs)
+        finally:
+            self._local.sesion = None
+
+def solo_lectura(metodo):
+    """
+    Marca un método de DataManager como consulta de solo lectura: se ejecuta
+    con self.consultas.sesion apuntando a la réplica cuando procede.
+    """
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        return self.consultas.ejecutar(metodo, self, *args, **kwargs)
+    
+    return envoltura
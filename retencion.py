@@ -0,0 +1,47 @@
+from dotenv import load_dotenv
+import os
+import argparse
+
+# Cargar variables de entorno antes de importar la base de datos
+load_dotenv()
+
+if not os.environ.get('DATABASE_URL'):
+    print("Error: DATABASE_URL no está configurada en el archivo .env o en el entorno del sistema.")
+    exit(1)
+
+from data_manager import DataManager
+from database import engine, session
+from particionado import particionado_activo, preparar_particiones
+
+if __name__ == "__main__":
+    # Pensado como tarea programada (por ejemplo, diaria): al crear DataManager
+    # también se mantienen las particiones mensuales de lecturas si están
+    # activadas (LECTURAS_PARTICIONADAS), incluidas las de los meses nuevos
+    parser = argparse.ArgumentParser(
+        description="Compacta en agregados por hora las lecturas más antiguas que el periodo de retención."
+    )
+    parser.add_argument("--dias", type=int, default=None,
+                        help="Días de lecturas originales a conservar (por defecto RETENCION_LECTURAS_DIAS)")
+    parser.add_argument("--horas-por-lote", type=int, default=24,
+                        help="Horas de lecturas procesadas en cada transacción")
+    args = parser.parse_args()
+    
+    dias = args.dias or os.environ.get('RETENCION_LECTURAS_DIAS')
+    if not dias:
+        if particionado_activo(engine):
+            DataManager()
+            print("Particiones de lecturas actualizadas. Sin retención configurada, no se compacta nada.")
+            exit(0)
+        print("Error: indica --dias o configura RETENCION_LECTURAS_DIAS.")
+        exit(1)
+    
+    print(f"Compactando lecturas con más de {dias} días...")
+    resultado = DataManager().compactar_lecturas(dias_retencion=int(dias), horas_por_lote=args.horas_por_lote)
+    print(f"Lecturas compactadas: {resultado['lecturas_compactadas']}. Horas generadas: {resultado['horas_generadas']}.")
+    
+    # Las particiones que la compactación ha vaciado ya se pueden separar
+    # (LECTURAS_MESES_RETENCION); las que aún tienen lecturas se conservan
+    if particionado_activo(engine):
+        # Sin la transacción de lectura de la sesión, que bloquearía el DETACH
+        session.close()
+        preparar_particiones(engine)
@@ -0,0 +1,323 @@
+"""
+Servidor de ingesta de lecturas para sensores automáticos.
+
+Recibe lecturas por TCP con un protocolo de líneas JSON: cada línea es un
+objeto (o una lista de objetos) con aire_id, fecha (ISO 8601 o epoch en
+segundos), temperatura y humedad. La fecha es obligatoria: la pone el
+sensor al medir, así que reenviar una lectura produce exactamente la misma.
+Por cada línea responde otra línea JSON con el número de lecturas aceptadas
+o el error.
+
+Las lecturas válidas se acumulan en memoria y se escriben en bloque en la
+tabla de lecturas cuando el búfer alcanza un tamaño o pasa un intervalo.
+Una lectura con el mismo aire y fecha que otra ya guardada se descarta, así
+que los reintentos de los sensores no crean duplicados.
+
+Si escribir un lote falla por un error de la base de datos que un
+reintento no arregla (IntegrityError o DataError, por ejemplo una lectura
+de un aire recién eliminado), el lote se divide en mitades hasta aislar las
+lecturas que fallan; éstas se registran en el log y se guardan en
+ServidorIngesta.descartadas. Los demás errores (conexión perdida, base de
+datos caída) devuelven el lote a la cola para reintentarlo.
+
+Uso:
+    python servidor_ingesta.py --host 0.0.0.0 --port 9100
+
+Para probarlo en local sin PostgreSQL basta con una base SQLite:
+    DATABASE_URL=sqlite:///data/ingesta.db python servidor_ingesta.py
+    echo '{"aire_id": 1, "fecha": "2025-06-30T12:00:00", "temperatura": 22.5, "humedad": 48}' | nc localhost 9100
+"""
+import argparse
+import asyncio
+import json
+import logging
+import signal
+from collections import deque
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+# Cargar variables de entorno antes de importar la base de datos
+load_dotenv()
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from data_manager import DataManager
+from database import normalizar_fecha
+
+logger = logging.getLogger("servidor_ingesta")
+
+# Mismos límites que el formulario de registro de lecturas
+TEMPERATURA_MIN = -10.0
+TEMPERATURA_MAX = 50.0
+HUMEDAD_MIN = 0.0
+HUMEDAD_MAX = 100.0
+
+# Tamaño máximo de una línea del protocolo
+LIMITE_LINEA = 1024 * 1024
+
+# Lecturas descartadas por errores de datos que se conservan en memoria
+MAX_DESCARTADAS = 10000
+
+
+class ErrorValidacion(ValueError):
+    """Error en el contenido de una lectura recibida."""
+
+
+def validar_lectura(datos, aires_validos):
+    """
+    Valida una lectura recibida y la convierte al formato de inserción.
+    
+    Args:
+        datos: Diccionario decodificado del JSON recibido
+        aires_validos: Conjunto de IDs de aires existentes
+    
+    Returns:
+        Diccionario con aire_id, fecha, temperatura y humedad
+    """
+    if not isinstance(datos, dict):
+        raise ErrorValidacion("cada lectura debe ser un objeto JSON")
+    
+    try:
+        aire_id = int(datos['aire_id'])
+        temperatura = float(datos['temperatura'])
+        humedad = float(datos['humedad'])
+    except KeyError as e:
+        raise ErrorValidacion(f"falta el campo {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ErrorValidacion("aire_id, temperatura y humedad deben ser numéricos")
+    
+    if aire_id not in aires_validos:
+        raise ErrorValidacion(f"no existe el aire con ID {aire_id}")
+    
+    if not TEMPERATURA_MIN <= temperatura <= TEMPERATURA_MAX:
+        raise ErrorValidacion(f"temperatura fuera de rango ({temperatura})")
+    
+    if not HUMEDAD_MIN <= humedad <= HUMEDAD_MAX:
+        raise ErrorValidacion(f"humedad fuera de rango ({humedad})")
+    
+    fecha = datos.get('fecha')
+    if fecha is None:
+        # Sin fecha del sensor, un reintento de la misma lectura no sería idempotente
+        raise ErrorValidacion("falta el campo fecha")
+    
+    try:
+        if isinstance(fecha, (int, float)):
+            fecha = datetime.fromtimestamp(fecha)
+        else:
+            fecha = datetime.fromisoformat(str(fecha))
+    except (TypeError, ValueError, OverflowError, OSError):
+        raise ErrorValidacion(f"fecha no válida ({fecha})")
+    
+    return {
+        'aire_id': aire_id,
+        # La columna fecha no guarda zona horaria
+        'fecha': normalizar_fecha(fecha),
+        'temperatura': temperatura,
+        'humedad': humedad
+    }
+
+
+class ServidorIngesta:
+    """
+    Servidor asyncio que acumula lecturas y las escribe en bloque.
+    
+    Args:
+        data_manager: Instancia de DataManager usada para escribir
+        tamano_lote: Número de lecturas que dispara una escritura
+        intervalo: Segundos máximos que una lectura espera en el búfer
+        max_pendientes: Lecturas en memoria a partir de las cuales se frena a los clientes
+    """
+    
+    def __init__(self, data_manager, tamano_lote=1000, intervalo=1.0, max_pendientes=None):
+        self.data_manager = data_manager
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.max_pendientes = max_pendientes or tamano_lote * 10
+        
+        self.pendientes = []
+        self.aires_validos = set()
+        self.total_escritas = 0
+        
+        # Lecturas que la base de datos rechazó (las más recientes)
+        self.descartadas = deque(maxlen=MAX_DESCARTADAS)
+        self.total_descartadas = 0
+        
+        self._lock_escritura = asyncio.Lock()
+        self._hay_espacio = asyncio.Event()
+        self._hay_espacio.set()
+        self._servidor = None
+        self._tarea_periodica = None
+    
+    def cargar_aires(self):
+        """Recarga el conjunto de IDs de aires existentes."""
+        aires_df = self.data_manager.obtener_aires()
+        self.aires_validos = set(aires_df['id'].tolist()) if not aires_df.empty else set()
+    
+    async def iniciar(self, host, port):
+        await asyncio.to_thread(self.cargar_aires)
+        self._servidor = await asyncio.start_server(
+            self._atender_cliente, host, port, limit=LIMITE_LINEA
+        )
+        self._tarea_periodica = asyncio.create_task(self._escritura_periodica())
+        logger.info("Escuchando en %s", ", ".join(str(s.getsockname()) for s in self._servidor.sockets))
+    
+    async def detener(self):
+        """Cierra el servidor y escribe las lecturas que queden en memoria."""
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+        if self._tarea_periodica is not None:
+            self._tarea_periodica.cancel()
+        await self.escribir_pendientes()
+        logger.info("Servidor detenido. Lecturas escritas: %d, descartadas: %d",
+                    self.total_escritas, self.total_descartadas)
+    
+    async def _atender_cliente(self, reader, writer):
+        try:
+            while True:
+                try:
+                    linea = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b'{"ok": false, "error": "linea demasiado larga"}\n')
+                    break
+                
+                if not linea:
+                    break
+                
+                linea = linea.strip()
+                if not linea:
+                    continue
+                
+                respuesta = await self._procesar_linea(linea)
+                writer.write(respuesta)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+    
+    async def _procesar_linea(self, linea):
+        try:
+            datos = json.loads(linea)
+        except ValueError:
+            return b'{"ok": false, "error": "JSON no valido"}\n'
+        
+        if not isinstance(datos, list):
+            datos = [datos]
+        
+        try:
+            lecturas = [validar_lectura(d, self.aires_validos) for d in datos]
+        except ErrorValidacion as e:
+            # Un aire desconocido puede haberse dado de alta tras el arranque
+            if "no existe el aire" in str(e):
+                await asyncio.to_thread(self.cargar_aires)
+                try:
+                    lecturas = [validar_lectura(d, self.aires_validos) for d in datos]
+                except ErrorValidacion as e2:
+                    return self._respuesta_error(e2)
+            else:
+                return self._respuesta_error(e)
+        
+        await self._hay_espacio.wait()
+        self.pendientes.extend(lecturas)
+        
+        if len(self.pendientes) >= self.tamano_lote and not self._lock_escritura.locked():
+            asyncio.create_task(self.escribir_pendientes())
+        
+        if len(self.pendientes) >= self.max_pendientes:
+            self._hay_espacio.clear()
+        
+        return json.dumps({'ok': True, 'aceptadas': len(lecturas)}).encode() + b'\n'
+    
+    def _respuesta_error(self, error):
+        return json.dumps({'ok': False, 'error': str(error)}).encode() + b'\n'
+    
+    async def _escritura_periodica(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            await self.escribir_pendientes()
+    
+    async def escribir_pendientes(self):
+        """Escribe en la base de datos todas las lecturas acumuladas."""
+        async with self._lock_escritura:
+            while self.pendientes:
+                lote = self.pendientes[:self.tamano_lote]
+                del self.pendientes[:self.tamano_lote]
+                
+                try:
+                    # La sesión de la base de datos solo se usa desde este hilo,
+                    # una escritura cada vez
+                    escritas = await asyncio.to_thread(self._escribir_lote, lote)
+                except Exception:
+                    # Error transitorio: el lote vuelve a la cola. Las partes ya
+                    # confirmadas no se duplican al reintentar (modo 'ignorar')
+                    logger.exception("Error al escribir %d lecturas, se reintentará", len(lote))
+                    self.pendientes[:0] = lote
+                    break
+                finally:
+                    if len(self.pendientes) < self.max_pendientes:
+                        self._hay_espacio.set()
+                
+                self.total_escritas += escritas
+    
+    def _escribir_lote(self, lote):
+        # Se ejecuta en el hilo de escritura; devuelve las lecturas escritas.
+        # Modo 'ignorar': reintentar un lote (o recibir dos veces la misma
+        # lectura de un sensor) no crea lecturas duplicadas
+        try:
+            self.data_manager.agregar_lecturas_lote(lote, 'ignorar')
+            return len(lote)
+        except (IntegrityError, DataError):
+            if len(lote) == 1:
+                logger.exception("Lectura descartada por la base de datos: %s", lote[0])
+                self.descartadas.append(lote[0])
+                self.total_descartadas += 1
+                return 0
+        
+        # Reintentar reintentaría siempre el mismo error: se divide el lote
+        # para aislar las lecturas que lo provocan
+        mitad = len(lote) // 2
+        return self._escribir_lote(lote[:mitad]) + self._escribir_lote(lote[mitad:])
+
+
+async def ejecutar(host, port, tamano_lote, intervalo):
+    data_manager = await asyncio.to_thread(DataManager)
+    servidor = ServidorIngesta(data_manager, tamano_lote=tamano_lote, intervalo=intervalo)
+    await servidor.iniciar(host, port)
+    
+    detener = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, detener.set)
+        except NotImplementedError:
+            # Windows no admite manejadores de señales en el bucle
+            pass
+    
+    try:
+        await detener.wait()
+    finally:
+        await servidor.detener()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de ingesta de lecturas de sensores")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--tamano-lote", type=int, default=1000,
+                        help="Lecturas acumuladas que disparan una escritura")
+    parser.add_argument("--intervalo", type=float, default=1.0,
+                        help="Segundos máximos entre escrituras")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    
+    try:
+        asyncio.run(ejecutar(args.host, args.port, args.tamano_lote, args.intervalo))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Motor de tendencias para alertas predictivas de temperatura.
+
+Ajusta un modelo por aire sobre la ventana reciente de lecturas y proyecta
+cuándo alcanzará su umbral efectivo de temperatura máxima. Todos los aires
+se ajustan a la vez: las ecuaciones normales de mínimos cuadrados de cada
+aire se acumulan con np.bincount y se resuelven como una pila de matrices,
+sin un bucle de Python por aire.
+
+Modelos:
+    lineal: temperatura = a + b·t
+    estacional: temperatura = a + b·t + c·sen(2πh/24) + d·cos(2πh/24), con
+        un ciclo diario; la proyección usa la tendencia más la amplitud del
+        ciclo, es decir, el pico diario esperado
+"""
+import os
+
+import numpy as np
+
+# Días de lecturas recientes usados en el ajuste
+VENTANA_DIAS = float(os.environ.get('TENDENCIAS_VENTANA_DIAS', 7))
+
+# 'lineal' o 'estacional'
+MODELO = os.environ.get('TENDENCIAS_MODELO', 'lineal')
+
+# Lecturas mínimas en la ventana para ajustar un aire
+LECTURAS_MINIMAS = int(os.environ.get('TENDENCIAS_LECTURAS_MINIMAS', 10))
+
+MODELOS = ('lineal', 'estacional')
+
+HORAS_DIA = 24.0
+
+# Proyecciones más lejanas que esto (una pendiente casi nula) se tratan como
+# que el umbral no se alcanza
+HORIZONTE_MAXIMO_HORAS = 100 * 365 * HORAS_DIA
+
+
+def _angulo_diario(horas_absolutas):
+    return 2 * np.pi * (horas_absolutas % HORAS_DIA) / HORAS_DIA
+
+
+def ajustar_tendencias(grupos, horas, valores, referencias, modelo=MODELO):
+    """
+    Ajusta por mínimos cuadrados un modelo por grupo, todos a la vez.
+    
+    Args:
+        grupos: Array de enteros 0..n-1 con el grupo de cada lectura
+        horas: Array con el tiempo de cada lectura en horas, relativo a la
+            última lectura de su grupo (valores <= 0)
+        valores: Array con la temperatura de cada lectura
+        referencias: Array de longitud n con la hora absoluta (horas desde
+            epoch) de la última lectura de cada grupo
+        modelo: 'lineal' o 'estacional'
+    
+    Returns:
+        Diccionario con arrays de longitud n: lecturas, nivel (valor ajustado
+        en la última lectura), tendencia (componente sin ciclo diario en la
+        última lectura), pendiente (unidades por hora), amplitud (del ciclo
+        diario, 0 en el modelo lineal) y residuo (desviación estándar de los
+        residuos)
+    """
+    if modelo not in MODELOS:
+        raise ValueError(f"Modelo de tendencia desconocido: {modelo}")
+    
+    n_grupos = len(referencias)
+    columnas = [np.ones_like(horas), horas]
+    
+    if modelo == 'estacional':
+        angulo = _angulo_diario(horas + referencias[grupos])
+        columnas += [np.sin(angulo), np.cos(angulo)]
+    
+    X = np.column_stack(columnas)
+    p = X.shape[1]
+    
+    # Ecuaciones normales de cada grupo: XᵀX (n×p×p) y Xᵀy (n×p)
+    XtX = np.empty((n_grupos, p, p))
+    Xty = np.empty((n_grupos, p))
+    for i in range(p):
+        Xty[:, i] = np.bincount(grupos, weights=X[:, i] * valores, minlength=n_grupos)
+        for j in range(i, p):
+            suma = np.bincount(grupos, weights=X[:, i] * X[:, j], minlength=n_grupos)
+            XtX[:, i, j] = suma
+            XtX[:, j, i] = suma
+    
+    lecturas = np.rint(XtX[:, 0, 0]).astype(int)
+    
+    # La pseudoinversa resuelve también los grupos degenerados (todas las
+    # lecturas en el mismo instante) sin abortar el lote
+    coeficientes = np.einsum('gij,gj->gi', np.linalg.pinv(XtX), Xty)
+    
+    # Suma de cuadrados de los residuos sin volver a recorrer las lecturas:
+    # yᵀy - 2βᵀXᵀy + βᵀXᵀXβ
+    yty = np.bincount(grupos, weights=valores * valores, minlength=n_grupos)
+    sse = (
+        yty
+        - 2 * np.einsum('gi,gi->g', coeficientes, Xty)
+        + np.einsum('gi,gij,gj->g', coeficientes, XtX, coeficientes)
+    )
+    residuo = np.sqrt(np.clip(sse, 0, None) / np.maximum(lecturas - p, 1))
+    
+    tendencia = coeficientes[:, 0]
+    
+    if modelo == 'estacional':
+        angulo = _angulo_diario(referencias)
+        amplitud = np.hypot(coeficientes[:, 2], coeficientes[:, 3])
+        nivel = tendencia + coeficientes[:, 2] * np.sin(angulo) + coeficientes[:, 3] * np.cos(angulo)
+    else:
+        amplitud = np.zeros(n_grupos)
+        nivel = tendencia
+    
+    return {
+        'lecturas': lecturas,
+        'nivel': nivel,
+        'tendencia': tendencia,
+        'pendiente': coeficientes[:, 1],
+        'amplitud': amplitud,
+        'residuo': residuo
+    }
+
+
+def horas_hasta_umbral(ajuste, umbrales):
+    """
+    Proyecta cuántas horas faltan para que cada grupo alcance su umbral.
+    
+    Args:
+        ajuste: Resultado de ajustar_tendencias
+        umbrales: Array con el umbral efectivo de cada grupo (NaN si no tiene)
+    
+    Returns:
+        Array de horas desde la última lectura: 0 si el pico esperado ya
+        supera el umbral, inf si la tendencia no es creciente (o tardaría
+        más de HORIZONTE_MAXIMO_HORAS) y NaN si el grupo no tiene umbral
+    """
+    pico = ajuste['tendencia'] + ajuste['amplitud']
+    margen = umbrales - pico
+    pendiente = ajuste['pendiente']
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        horas = np.where(pendiente > 0, margen / pendiente, np.inf)
+    
+    horas = np.where(horas > HORIZONTE_MAXIMO_HORAS, np.inf, horas)
+    horas = np.where(margen <= 0, 0.0, horas)
+    return np.where(np.isnan(umbrales), np.nan, horas)
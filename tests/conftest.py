@@ -0,0 +1,46 @@
+"""
+Configuración común de las pruebas.
+
+database crea el motor al importarse con DATABASE_URL, así que antes de
+importar cualquier módulo de la aplicación se apunta a una base SQLite
+temporal y se quitan del entorno la réplica, la instantánea y las salidas
+de alertas.
+"""
+import os
+import sys
+import tempfile
+
+_directorio = tempfile.mkdtemp(prefix='pruebas_temperatura_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_directorio, 'pruebas.db')}"
+os.environ['INSTANTANEA_LECTURAS'] = 'False'
+os.environ['INSTRUMENTACION'] = 'True'
+for variable in ('DATABASE_READ_URL', 'NOTIFICATION_EMAIL', 'SMTP_HOST', 'ALERTAS_WEBHOOK_URL',
+                 'ALERTAS_ARCHIVO', 'BUFFER_LECTURAS'):
+    os.environ.pop(variable, None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def data_manager(tmp_path, monkeypatch):
+    """
+    DataManager sobre una base de datos vacía, con los siete aires
+    predeterminados (el directorio data/ de la prueba no tiene CSV).
+    """
+    from data_manager import DataManager
+    
+    monkeypatch.chdir(tmp_path)
+    
+    database.session.close()
+    database.Base.metadata.drop_all(database.engine)
+    monkeypatch.setattr(database, '_esquema_preparado', False)
+    
+    data_manager = DataManager(buffer_escritura=False)
+    yield data_manager
+    
+    data_manager.cerrar()
+    database.session.rollback()
@@ -0,0 +1,124 @@
+"""
+Pruebas de la detección incremental de anomalías con media y varianza
+exponenciales (EWMA).
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import anomalias
+from database import EstadoAnomalia, session
+
+INICIO = datetime(2025, 3, 1)
+
+
+def _estado():
+    campos = ['temperatura_media', 'temperatura_varianza', 'humedad_media', 'humedad_varianza', 'ultima_fecha']
+    return SimpleNamespace(lecturas=0, **dict.fromkeys(campos))
+
+
+def _serie(pasos, aire_id=1, desde=0):
+    generador = np.random.default_rng(desde)
+    return [
+        {
+            'aire_id': aire_id,
+            'fecha': INICIO + timedelta(minutes=10 * paso),
+            'temperatura': float(22 + generador.normal(0, 0.5)),
+            'humedad': float(50 + generador.normal(0, 2))
+        }
+        for paso in range(desde, desde + pasos)
+    ]
+
+
+def test_ewma_igual_que_pandas():
+    valores = np.random.default_rng(0).normal(22, 1, 200)
+    
+    media, varianza = None, 0.0
+    medias, varianzas = [], []
+    for valor in valores:
+        media, varianza = anomalias.actualizar_ewma(media, varianza, valor, alfa=0.1)
+        medias.append(media)
+        varianzas.append(varianza)
+    
+    serie = pd.Series(valores)
+    np.testing.assert_allclose(medias, serie.ewm(alpha=0.1, adjust=False).mean())
+    # La varianza exponencial converge a la de la serie
+    assert varianzas[-1] == pytest.approx(1.0, rel=0.5)
+    assert varianzas[0] == 0.0
+
+
+def test_puntuacion_z():
+    assert anomalias.puntuacion_z(None, 0.0, 25.0, 'temperatura') is None
+    assert anomalias.puntuacion_z(20.0, 4.0, 25.0, 'temperatura') == 2.5
+    # Una serie constante usa la desviación mínima
+    assert anomalias.puntuacion_z(20.0, 0.0, 21.0, 'temperatura') == pytest.approx(1 / anomalias.DESVIACION_MINIMA['temperatura'])
+
+
+def test_sin_anomalias_hasta_tener_lecturas_minimas():
+    estado = _estado()
+    lecturas = _serie(anomalias.LECTURAS_MINIMAS)
+    
+    # Un pico antes de completar las lecturas mínimas no es anomalía
+    lecturas[5]['temperatura'] = 40.0
+    resultados = [
+        anomalias.evaluar_lectura(estado, numero, l['fecha'], l['temperatura'], l['humedad'])
+        for numero, l in enumerate(lecturas)
+    ]
+    assert not any(resultados)
+    
+    es_anomalia = anomalias.evaluar_lectura(estado, 99, INICIO + timedelta(days=1), 22.0, 80.0)
+    
+    assert es_anomalia and estado.es_anomalia
+    assert estado.humedad_z > anomalias.K_SIGMA
+    assert estado.fecha_ultima_anomalia == INICIO + timedelta(days=1)
+    assert estado.lecturas == anomalias.LECTURAS_MINIMAS + 1 and estado.ultima_lectura_id == 99
+
+
+def _estado_guardado(aire_id=1):
+    session.expire_all()
+    estado = session.query(EstadoAnomalia).filter_by(aire_id=aire_id).one()
+    columnas = ['lecturas', 'ultima_lectura_id', 'temperatura_media', 'temperatura_varianza', 'humedad_media', 'es_anomalia']
+    return {columna: getattr(estado, columna) for columna in columnas}
+
+
+def test_pico_al_insertar_lecturas(data_manager):
+    data_manager.agregar_lecturas_lote(_serie(40))
+    assert data_manager.obtener_anomalias_activas().empty
+    
+    data_manager.agregar_lecturas_lote([dict(_serie(1, desde=40)[0], temperatura=35.0)])
+    
+    anomalas = data_manager.obtener_anomalias_activas()
+    assert anomalas['aire_id'].tolist() == [1]
+    assert anomalas['temperatura'].iloc[0] == 35.0
+    assert anomalas['temperatura_esperada'].iloc[0] == pytest.approx(22, abs=1)
+    assert anomalas['temperatura_z'].iloc[0] > anomalias.K_SIGMA
+    
+    # La siguiente lectura normal la desactiva
+    data_manager.agregar_lecturas_lote(_serie(1, desde=41))
+    assert data_manager.obtener_anomalias_activas().empty
+
+
+def test_estado_incremental_igual_que_reconstruido(data_manager):
+    lecturas = _serie(60)
+    for inicio in range(0, 60, 7):
+        data_manager.agregar_lecturas_lote(lecturas[inicio:inicio + 7])
+    incremental = _estado_guardado()
+    
+    data_manager.reconstruir_estados([1])
+    
+    reconstruido = _estado_guardado()
+    assert reconstruido == pytest.approx(incremental)
+    assert incremental['lecturas'] == 60
+
+
+def test_lecturas_atrasadas_no_alteran_el_estado(data_manager):
+    data_manager.agregar_lecturas_lote(_serie(30, desde=10))
+    antes = _estado_guardado()
+    
+    # Anteriores a la última lectura del aire: se guardan, pero el estado no cambia
+    data_manager.agregar_lecturas_lote([dict(lectura, temperatura=40.0) for lectura in _serie(10)])
+    
+    assert _estado_guardado() == antes
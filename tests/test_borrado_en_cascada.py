@@ -0,0 +1,122 @@
+"""
+Pruebas de la eliminación de aires con ON DELETE CASCADE y de la migración
+de las tablas creadas sin esa regla (reconstrucción de tablas en SQLite).
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import MetaData, create_engine, event, inspect, text
+
+import database
+from database import (AireAcondicionado, CuantilesDiarios, EstadoAlerta, EstadoAnomalia, Lectura,
+                      LecturaHoraria, Mantenimiento, UmbralConfiguracion, session)
+from migraciones import claves_sin_cascada, migrar_borrado_en_cascada
+
+INICIO = datetime(2025, 5, 1)
+
+DEPENDIENTES = (Lectura, LecturaHoraria, EstadoAnomalia, CuantilesDiarios, Mantenimiento, UmbralConfiguracion, EstadoAlerta)
+
+
+def _lecturas(aire_id, cantidad=30):
+    return [
+        {'aire_id': aire_id, 'fecha': INICIO + timedelta(minutes=10 * paso), 'temperatura': 22.0 + paso % 4, 'humedad': 50.0}
+        for paso in range(cantidad)
+    ]
+
+
+def _filas_por_modelo(aire_id):
+    session.expire_all()
+    return {modelo.__name__: session.query(modelo).filter(modelo.aire_id == aire_id).count() for modelo in DEPENDIENTES}
+
+
+def test_eliminar_aire_borra_sus_filas_dependientes(data_manager):
+    for aire_id in (1, 2):
+        data_manager.crear_umbral_configuracion(f"Aire {aire_id}", False, 18.0, 26.0, 30.0, 70.0, aire_id=aire_id)
+        data_manager.agregar_lecturas_lote(_lecturas(aire_id))
+        data_manager.agregar_mantenimiento(aire_id, "Preventivo", "Limpieza de filtros", "Técnico")
+    session.add(LecturaHoraria(
+        aire_id=1, hora=INICIO - timedelta(days=30), cantidad=1,
+        temperatura_promedio=22.0, temperatura_min=22.0, temperatura_max=22.0, temperatura_suma_cuadrados=484.0,
+        humedad_promedio=50.0, humedad_min=50.0, humedad_max=50.0, humedad_suma_cuadrados=2500.0
+    ))
+    session.commit()
+    
+    antes = _filas_por_modelo(1)
+    assert all(antes.values()), antes
+    
+    assert data_manager.eliminar_aire(1) is True
+    
+    assert not any(_filas_por_modelo(1).values())
+    assert _filas_por_modelo(2) == dict(antes, LecturaHoraria=0)
+    assert session.get(AireAcondicionado, 1) is None
+    assert data_manager.eliminar_aire(1) is False
+
+
+def test_eliminar_aire_es_una_sola_sentencia(data_manager):
+    from instrumentacion import contar_consultas
+    
+    data_manager.agregar_lecturas_lote(_lecturas(1, 200))
+    
+    with contar_consultas() as contador:
+        data_manager.eliminar_aire(1)
+    
+    # DELETE del aire y aumento de la generación de lecturas; sin cargar sus filas
+    assert not [sentencia for sentencia in contador.sentencias if sentencia.lstrip().upper().startswith('SELECT')]
+    assert session.query(Lectura).count() == 0
+
+
+@pytest.fixture
+def engine_antiguo(tmp_path):
+    # Base SQLite con el esquema de antes de ON DELETE CASCADE
+    engine = create_engine(f"sqlite:///{tmp_path / 'antigua.db'}")
+    event.listen(engine, 'connect', database._preparar_conexion_sqlite)
+    
+    antiguo = MetaData()
+    for tabla in database.Base.metadata.sorted_tables:
+        tabla.to_metadata(antiguo)
+    for tabla in antiguo.tables.values():
+        for clave in tabla.foreign_key_constraints:
+            clave.ondelete = None
+    antiguo.create_all(engine)
+    
+    with engine.begin() as conexion:
+        conexion.execute(text("INSERT INTO aires_acondicionados (id, nombre, ubicacion) VALUES (1, 'Aire 1', 'Sala'), (2, 'Aire 2', 'Sala')"))
+        conexion.execute(
+            text("INSERT INTO lecturas (aire_id, fecha, temperatura, humedad) VALUES (:aire_id, :fecha, :temperatura, :humedad)"),
+            _lecturas(1, 5) + _lecturas(2, 5)
+        )
+        conexion.execute(text("INSERT INTO cuantiles_diarios (aire_id, dia, cantidad, temperatura_digest, humedad_digest) VALUES (1, :dia, 5, x'00', x'00')"), {'dia': date(2025, 5, 1)})
+    
+    # Huérfanas de un aire borrado cuando SQLite no aplicaba las claves foráneas
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexion:
+        conexion.exec_driver_sql("PRAGMA foreign_keys=OFF")
+        conexion.execute(text("INSERT INTO lecturas (aire_id, fecha, temperatura, humedad) VALUES (9, '2025-05-01 00:00:00', 22.0, 50.0)"))
+        conexion.exec_driver_sql("PRAGMA foreign_keys=ON")
+    
+    yield engine
+    engine.dispose()
+
+
+def test_migracion_reconstruye_las_tablas_sqlite(engine_antiguo):
+    metadata = database.Base.metadata
+    pendientes = {tabla.name for tabla, _, _ in claves_sin_cascada(engine_antiguo, metadata)}
+    assert {'lecturas', 'mantenimientos', 'cuantiles_diarios', 'estado_alertas'} <= pendientes
+    
+    migradas = migrar_borrado_en_cascada(engine_antiguo, metadata)
+    
+    assert set(migradas) == pendientes
+    assert claves_sin_cascada(engine_antiguo, metadata) == []
+    assert migrar_borrado_en_cascada(engine_antiguo, metadata) == []
+    
+    inspector = inspect(engine_antiguo)
+    indices = {indice['name']: indice['unique'] for indice in inspector.get_indexes('lecturas')}
+    assert indices['ix_lecturas_aire_fecha']
+    
+    with engine_antiguo.begin() as conexion:
+        # Se conservan las filas salvo las huérfanas
+        assert conexion.execute(text("SELECT count(*) FROM lecturas")).scalar() == 10
+        assert conexion.execute(text("PRAGMA foreign_key_check")).all() == []
+        
+        conexion.execute(text("DELETE FROM aires_acondicionados WHERE id = 1"))
+        assert conexion.execute(text("SELECT DISTINCT aire_id FROM lecturas")).scalars().all() == [2]
+        assert conexion.execute(text("SELECT count(*) FROM cuantiles_diarios")).scalar() == 0
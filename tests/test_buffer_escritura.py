@@ -0,0 +1,111 @@
+"""
+Pruebas del buffer de escritura agrupada: lotes, resolución de los Future
+cuando el commit de un lote falla, vaciado y cierre.
+"""
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from buffer_escritura import BufferEscritura
+from database import Lectura, session
+
+INICIO = datetime(2025, 6, 1, 12)
+
+
+class Escritor:
+    """Función escribir_lote de prueba que recuerda los lotes y falla con las lecturas negativas."""
+    
+    def __init__(self):
+        self.lotes = []
+        self.liberar = threading.Event()
+        self.liberar.set()
+    
+    def __call__(self, lecturas):
+        self.liberar.wait(5)
+        self.lotes.append(list(lecturas))
+        if any(lectura < 0 for lectura in lecturas):
+            raise ValueError(f"lectura no válida en {lecturas}")
+        return [lectura * 10 for lectura in lecturas]
+
+
+@pytest.fixture
+def escritor():
+    return Escritor()
+
+
+def test_agrupa_las_lecturas_en_un_commit(escritor):
+    escritor.liberar.clear()
+    buffer = BufferEscritura(escritor, max_lote=4, max_espera=0.05)
+    
+    # La primera lectura ocupa al hilo; las siguientes se reúnen en lotes de 4
+    futuros = [buffer.encolar(lectura) for lectura in range(1, 10)]
+    escritor.liberar.set()
+    
+    assert [futuro.result(5) for futuro in futuros] == [lectura * 10 for lectura in range(1, 10)]
+    assert all(len(lote) <= 4 for lote in escritor.lotes)
+    assert len(escritor.lotes) < 9
+    buffer.cerrar()
+
+
+def test_lote_fallido_solo_falla_la_lectura_no_valida(escritor):
+    buffer = BufferEscritura(escritor, max_lote=3, max_espera=1.0)
+    futuros = [buffer.encolar(lectura) for lectura in (2, -3, 4)]
+    
+    assert futuros[0].result(5) == 20
+    assert futuros[2].result(5) == 40
+    with pytest.raises(ValueError, match="no válida"):
+        futuros[1].result(5)
+    
+    # El lote completo y después cada lectura por separado
+    assert escritor.lotes == [[2, -3, 4], [2], [-3], [4]]
+    buffer.cerrar()
+
+
+def test_vaciar_espera_los_commits_anteriores(escritor):
+    buffer = BufferEscritura(escritor, max_lote=100, max_espera=10.0)
+    futuros = [buffer.encolar(lectura) for lectura in range(5)]
+    
+    # Sin la marca de vaciar, el lote esperaría max_espera segundos
+    buffer.vaciar()
+    
+    assert all(futuro.done() for futuro in futuros)
+    buffer.cerrar()
+
+
+def test_cerrar_confirma_las_pendientes(escritor):
+    buffer = BufferEscritura(escritor, max_lote=100, max_espera=10.0)
+    futuros = [buffer.encolar(lectura) for lectura in range(5)]
+    
+    buffer.cerrar()
+    
+    assert [futuro.result(0) for futuro in futuros] == [0, 10, 20, 30, 40]
+    with pytest.raises(RuntimeError):
+        buffer.encolar(6)
+    # Cerrar y vaciar un buffer cerrado no hace nada
+    buffer.cerrar()
+    buffer.vaciar()
+
+
+def test_agregar_lectura_con_buffer(data_manager):
+    data_manager.activar_buffer_escritura(max_lote=50, max_espera=0.5)
+    
+    futuros = [
+        data_manager.agregar_lectura(1, INICIO + timedelta(minutes=paso), 22.0, 50.0, esperar=False)
+        for paso in range(5)
+    ]
+    # Un aire que no existe hace fallar el commit del lote, no el de las demás
+    erronea = data_manager.agregar_lectura(99, INICIO, 22.0, 50.0, esperar=False)
+    # Repetida: se sustituye, como sin buffer
+    repetida = data_manager.agregar_lectura(1, INICIO, 25.0, 55.0, esperar=False)
+    data_manager.vaciar_buffer_escritura()
+    
+    ids = [futuro.result(0) for futuro in futuros]
+    with pytest.raises(IntegrityError):
+        erronea.result(0)
+    assert repetida.result(0) == ids[0]
+    
+    session.expire_all()
+    assert sorted(fila.id for fila in session.query(Lectura.id)) == sorted(ids)
+    assert session.get(Lectura, ids[0]).temperatura == 25.0
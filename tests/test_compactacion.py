@@ -0,0 +1,114 @@
+"""
+Pruebas de la compactación de lecturas antiguas en agregados por hora y de
+las estadísticas ponderadas que combinan lecturas y horas compactadas.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from database import Lectura, LecturaHoraria, session
+from utils import calcular_estadisticas_por_grupo
+
+# Tres días atrás, fuera de una retención de un día
+INICIO = (datetime.now() - timedelta(days=3)).replace(minute=0, second=0, microsecond=0)
+
+
+def _lecturas(aire_id, horas=3, por_hora=6, desde=INICIO):
+    generador = np.random.default_rng(aire_id)
+    return [
+        {
+            'aire_id': aire_id,
+            'fecha': desde + timedelta(minutes=60 * hora + 60 // por_hora * paso),
+            'temperatura': float(round(generador.normal(22, 2), 2)),
+            'humedad': float(round(generador.normal(50, 5), 2))
+        }
+        for hora in range(horas) for paso in range(por_hora)
+    ]
+
+
+def _compactada(grupo):
+    # Una hora compactada a mano, con las columnas de DataManager.obtener_lecturas
+    fila = {'aire_id': grupo['aire_id'].iloc[0], 'cantidad': len(grupo)}
+    for variable in ('temperatura', 'humedad'):
+        fila[variable] = grupo[variable].mean()
+        fila[f'{variable}_min'] = grupo[variable].min()
+        fila[f'{variable}_max'] = grupo[variable].max()
+        fila[f'{variable}_suma_cuadrados'] = (grupo[variable] ** 2).sum()
+    return fila
+
+
+@pytest.mark.parametrize('variable', ['temperatura', 'humedad'])
+def test_estadisticas_ponderadas_igual_que_sin_compactar(variable):
+    originales = pd.DataFrame(_lecturas(1) + _lecturas(2, horas=2))
+    hora = originales['fecha'].dt.floor('h')
+    
+    # Compactar la primera hora de cada aire; el resto quedan como lecturas
+    primera = hora == INICIO
+    compactadas = pd.DataFrame([_compactada(grupo) for _, grupo in originales[primera].groupby('aire_id')])
+    mezcla = pd.concat([originales[~primera], compactadas], ignore_index=True)
+    
+    esperado = originales.groupby('aire_id')[variable].agg(['mean', 'min', 'max', 'std', 'count'])
+    resultado = calcular_estadisticas_por_grupo(mezcla, 'aire_id', variable)
+    
+    pd.testing.assert_frame_equal(resultado, esperado, check_dtype=False)
+
+
+def test_estadisticas_de_una_sola_lectura():
+    compactadas = pd.DataFrame([_compactada(pd.DataFrame(_lecturas(1, horas=1, por_hora=1)))])
+    
+    resultado = calcular_estadisticas_por_grupo(compactadas, ['aire_id'], 'temperatura')
+    
+    assert resultado['count'].tolist() == [1]
+    assert np.isnan(resultado['std'].iloc[0])
+
+
+def test_compactar_conserva_las_estadisticas(data_manager):
+    recientes = _lecturas(1, horas=2, desde=datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3))
+    data_manager.agregar_lecturas_lote(_lecturas(1) + _lecturas(2, horas=2) + recientes)
+    antes = data_manager.obtener_lecturas()
+    estadisticas = data_manager.obtener_estadisticas_por_aire(1)
+    
+    resultado = data_manager.compactar_lecturas(dias_retencion=1, horas_por_lote=2)
+    
+    assert resultado == {'lecturas_compactadas': 30, 'horas_generadas': 5}
+    assert session.query(Lectura).count() == len(recientes)
+    assert data_manager.obtener_estadisticas_por_aire(1) == estadisticas
+    
+    # Las horas compactadas guardan los extremos y la suma de cuadrados reales
+    horaria = session.query(LecturaHoraria).filter_by(aire_id=2, hora=INICIO).one()
+    hora = antes[(antes['aire_id'] == 2) & (antes['fecha'] < INICIO + timedelta(hours=1))]
+    assert horaria.cantidad == 6
+    assert horaria.temperatura_min == hora['temperatura'].min()
+    assert horaria.temperatura_max == hora['temperatura'].max()
+    assert horaria.humedad_suma_cuadrados == pytest.approx((hora['humedad'] ** 2).sum())
+    
+    despues = calcular_estadisticas_por_grupo(data_manager.obtener_lecturas(incluir_compactadas=True), 'aire_id', 'temperatura')
+    pd.testing.assert_frame_equal(
+        despues, antes.groupby('aire_id')['temperatura'].agg(['mean', 'min', 'max', 'std', 'count']), check_dtype=False
+    )
+
+
+def test_lecturas_tardias_se_suman_a_la_hora_compactada(data_manager):
+    lecturas = _lecturas(1, horas=1)
+    data_manager.agregar_lecturas_lote(lecturas[:4])
+    data_manager.compactar_lecturas(dias_retencion=1)
+    
+    data_manager.agregar_lecturas_lote(lecturas[4:])
+    resultado = data_manager.compactar_lecturas(dias_retencion=1)
+    
+    assert resultado == {'lecturas_compactadas': 2, 'horas_generadas': 0}
+    horaria = session.query(LecturaHoraria).one()
+    temperaturas = [lectura['temperatura'] for lectura in lecturas]
+    assert horaria.cantidad == 6
+    assert horaria.temperatura_promedio == pytest.approx(np.mean(temperaturas))
+    assert horaria.temperatura_max == max(temperaturas)
+
+
+def test_sin_retencion_no_compacta(data_manager, monkeypatch):
+    monkeypatch.delenv('RETENCION_LECTURAS_DIAS', raising=False)
+    data_manager.agregar_lecturas_lote(_lecturas(1, horas=1))
+    
+    assert data_manager.compactar_lecturas() == {'lecturas_compactadas': 0, 'horas_generadas': 0}
+    assert session.query(Lectura).count() == 6
@@ -0,0 +1,143 @@
+"""
+Pruebas del t-digest: precisión de los cuantiles, fusión y serialización.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from cuantiles import TDigest, PERCENTILES
+
+
+def _error_rango(ordenados, valor, q):
+    # Distancia entre q y la proporción real de valores por debajo del estimado
+    return abs(np.searchsorted(ordenados, valor) / len(ordenados) - q)
+
+
+@pytest.fixture(params=['normal', 'exponencial'])
+def valores(request):
+    rng = np.random.default_rng(7)
+    if request.param == 'normal':
+        return rng.normal(22, 2, 100_000)
+    return rng.exponential(3, 100_000)
+
+
+@pytest.mark.parametrize('q, tolerancia', [(0.01, 0.003), (0.5, 0.005), (0.95, 0.003), (0.99, 0.002), (0.999, 0.001)])
+def test_precision_de_los_cuantiles(valores, q, tolerancia):
+    digest = TDigest()
+    digest.agregar(valores)
+    
+    assert _error_rango(np.sort(valores), digest.cuantil(q), q) < tolerancia
+
+
+def test_fusion_equivale_a_un_solo_resumen(valores):
+    ordenados = np.sort(valores)
+    partes = []
+    for trozo in np.array_split(np.random.default_rng(1).permutation(valores), 60):
+        parte = TDigest()
+        parte.agregar(trozo)
+        partes.append(parte)
+    
+    fusionado = TDigest()
+    fusionado.fusionar(*partes, TDigest())
+    
+    assert fusionado.total == len(valores)
+    assert fusionado.minimo == valores.min() and fusionado.maximo == valores.max()
+    assert fusionado.pesos.size <= fusionado.compresion
+    for q in PERCENTILES:
+        assert _error_rango(ordenados, fusionado.cuantil(q), q) < 0.003
+
+
+def test_fusion_en_cadena_y_agregado_incremental(valores):
+    ordenados = np.sort(valores)
+    
+    # Como los resúmenes diarios: cada lote se añade al resumen ya comprimido
+    incremental = TDigest()
+    for trozo in np.array_split(valores, 300):
+        incremental.agregar(trozo)
+    
+    # Y como un rango de fechas: fusiones sucesivas de dos en dos
+    encadenado = TDigest()
+    for trozo in np.array_split(valores, 30):
+        parte = TDigest()
+        parte.agregar(trozo)
+        encadenado.fusionar(parte)
+    
+    for digest in (incremental, encadenado):
+        assert digest.total == len(valores)
+        for q in PERCENTILES:
+            assert _error_rango(ordenados, digest.cuantil(q), q) < 0.003
+
+
+def test_pesos_equivalen_a_valores_repetidos():
+    # Como las horas compactadas: un promedio con el peso de su cantidad
+    rng = np.random.default_rng(5)
+    medias = rng.normal(22, 2, 20_000)
+    cantidades = rng.integers(1, 6, medias.size)
+    
+    digest = TDigest()
+    digest.agregar(medias, cantidades)
+    
+    repetidos = np.sort(np.repeat(medias, cantidades))
+    assert digest.total == repetidos.size
+    for q in PERCENTILES:
+        assert _error_rango(repetidos, digest.cuantil(q), q) < 0.003
+
+
+def test_serializacion():
+    digest = TDigest(compresion=50)
+    digest.agregar(np.random.default_rng(3).normal(50, 10, 5000))
+    
+    copia = TDigest.desde_bytes(digest.a_bytes())
+    
+    assert copia.compresion == 50
+    assert (copia.minimo, copia.maximo) == (digest.minimo, digest.maximo)
+    np.testing.assert_array_equal(copia.medias, digest.medias)
+    np.testing.assert_array_equal(copia.pesos, digest.pesos)
+
+
+def test_resumen_vacio_y_de_un_valor():
+    vacio = TDigest()
+    assert vacio.cuantil(0.5) is None
+    assert TDigest.desde_bytes(vacio.a_bytes()).cuantil(0.5) is None
+    
+    vacio.fusionar(TDigest())
+    assert vacio.total == 0
+    
+    uno = TDigest()
+    uno.agregar([21.5])
+    assert uno.cuantil(0.01) == uno.cuantil(0.99) == 21.5
+
+
+def test_cuantiles_de_data_manager(data_manager):
+    rng = np.random.default_rng(11)
+    inicio = datetime(2025, 3, 1)
+    lecturas = [
+        {
+            'aire_id': aire_id,
+            'fecha': inicio + timedelta(minutes=10 * paso),
+            'temperatura': float(rng.normal(20 + aire_id, 1.5)),
+            'humedad': float(rng.normal(50, 5))
+        }
+        for paso in range(3 * 144)
+        for aire_id in (1, 2)
+    ]
+    
+    # Varios lotes: los resúmenes diarios se actualizan por fusión
+    for posicion in range(0, len(lecturas), 100):
+        data_manager.agregar_lecturas_lote(lecturas[posicion:posicion + 100])
+    
+    def comprobar():
+        cuantiles = data_manager.obtener_cuantiles().set_index('aire_id')
+        for aire_id in (1, 2):
+            for variable in ('temperatura', 'humedad'):
+                ordenados = np.sort([l[variable] for l in lecturas if l['aire_id'] == aire_id])
+                assert cuantiles.loc[aire_id, 'lecturas'] == len(ordenados)
+                for q in PERCENTILES:
+                    assert _error_rango(ordenados, cuantiles.loc[aire_id, f'{variable}_p{int(q * 100)}'], q) < 0.01
+    
+    comprobar()
+    
+    # Reconstruidos desde las lecturas dan el mismo resultado
+    data_manager.reconstruir_cuantiles()
+    comprobar()
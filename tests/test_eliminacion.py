@@ -0,0 +1,101 @@
+"""
+Pruebas de la eliminación de lecturas por ID y por rango de fechas, y de la
+reconstrucción de los cuantiles y estados que las incluían.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import EstadoAlerta, EstadoAnomalia, Lectura, LecturaHoraria, session
+
+INICIO = datetime(2025, 7, 1, 8)
+
+
+def _serie(data_manager, aire_id=1, pasos=30, pico=3):
+    # Lecturas estables cada 5 minutos y al final un pico por encima del umbral
+    lecturas = [
+        {
+            'aire_id': aire_id,
+            'fecha': INICIO + timedelta(minutes=5 * paso),
+            'temperatura': 35.0 if paso >= pasos else 22.0 + 0.3 * (paso % 3),
+            'humedad': 50.0 + paso % 2
+        }
+        for paso in range(pasos + pico)
+    ]
+    ids = data_manager.agregar_lecturas_lote(lecturas)
+    return ids[:pasos], ids[pasos:]
+
+
+def _estados(aire_id=1):
+    session.expire_all()
+    anomalia = session.query(EstadoAnomalia).filter_by(aire_id=aire_id).one()
+    alerta = session.query(EstadoAlerta).filter_by(aire_id=aire_id, variable='temperatura').one()
+    return anomalia, alerta
+
+
+@pytest.fixture
+def umbral(data_manager):
+    return data_manager.crear_umbral_configuracion("Global", True, 18.0, 26.0, 30.0, 70.0)
+
+
+@pytest.mark.parametrize('forma', ['ids', 'rango'])
+def test_eliminar_un_pico_limpia_anomalia_y_alerta(data_manager, umbral, forma):
+    normales, pico = _serie(data_manager)
+    anomalia, alerta = _estados()
+    assert anomalia.es_anomalia and alerta.estado == 'activa'
+    
+    if forma == 'ids':
+        assert data_manager.eliminar_lecturas(pico) == len(pico)
+    else:
+        desde = INICIO + timedelta(minutes=5 * len(normales))
+        assert data_manager.eliminar_lecturas_rango(1, desde, desde + timedelta(hours=1), tamano_lote=2) == len(pico)
+    
+    anomalia, alerta = _estados()
+    assert not anomalia.es_anomalia
+    assert anomalia.lecturas == len(normales) and anomalia.ultima_lectura_id == normales[-1]
+    assert alerta.estado == 'normal' and alerta.lado is None
+    assert data_manager.obtener_alertas_activas().empty
+
+
+def test_eliminar_por_ids_devuelve_las_eliminadas_y_rehace_cuantiles(data_manager):
+    normales, pico = _serie(data_manager)
+    _serie(data_manager, aire_id=2)
+    
+    # Los IDs que no existen no cuentan
+    assert data_manager.eliminar_lecturas(pico + [10 ** 6], tamano_lote=2) == len(pico)
+    assert data_manager.eliminar_lectura(pico[0]) is False
+    
+    cuantiles = data_manager.obtener_cuantiles().set_index('aire_id')
+    assert cuantiles.loc[1, 'lecturas'] == len(normales)
+    assert cuantiles.loc[1, 'temperatura_p99'] < 26.0
+    # El otro aire no cambia
+    assert cuantiles.loc[2, 'lecturas'] == len(normales) + len(pico)
+
+
+def test_eliminar_rango_incluye_horas_compactadas(data_manager):
+    _serie(data_manager, pasos=36, pico=0)
+    data_manager.compactar_lecturas(dias_retencion=1)
+    assert session.query(Lectura).count() == 0
+    
+    # 36 lecturas cada 5 minutos: tres horas compactadas de 12 lecturas. Solo se
+    # eliminan las que caen por completo dentro del rango
+    eliminadas = data_manager.eliminar_lecturas_rango(1, INICIO, INICIO + timedelta(hours=2, minutes=30))
+    
+    assert eliminadas == 24
+    assert [h.hora for h in session.query(LecturaHoraria)] == [INICIO + timedelta(hours=2)]
+    assert data_manager.obtener_cuantiles().set_index('aire_id').loc[1, 'lecturas'] == 12
+
+
+def test_eliminar_rango_en_lotes(data_manager):
+    normales, _ = _serie(data_manager, pasos=20, pico=0)
+    _serie(data_manager, aire_id=2, pasos=20, pico=0)
+    
+    eliminadas = data_manager.eliminar_lecturas_rango(
+        1, INICIO + timedelta(minutes=25), INICIO + timedelta(minutes=75), tamano_lote=3
+    )
+    
+    assert eliminadas == 10
+    restantes = [fila.id for fila in session.query(Lectura.id).filter_by(aire_id=1).order_by(Lectura.id)]
+    assert restantes == normales[:5] + normales[15:]
+    assert session.query(Lectura).filter_by(aire_id=2).count() == 20
+    assert session.query(EstadoAnomalia.lecturas).filter_by(aire_id=1).scalar() == 10
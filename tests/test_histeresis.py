@@ -0,0 +1,122 @@
+"""
+Pruebas de la máquina de estados de las alertas de umbral.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from database import EstadoAlerta, session
+from histeresis import evaluar_estado
+
+MINIMO, MAXIMO, BANDA = 18.0, 26.0, 0.5
+ENTRADA, SALIDA = timedelta(minutes=5), timedelta(minutes=10)
+INICIO = datetime(2025, 1, 1, 12)
+
+
+def _aplicar(estado, lecturas):
+    # lecturas: [(minutos desde INICIO, valor)] → eventos de cada una
+    return [
+        evaluar_estado(estado, valor, INICIO + timedelta(minutes=minutos), MINIMO, MAXIMO, BANDA,
+                       entrada=ENTRADA, salida=SALIDA)
+        for minutos, valor in lecturas
+    ]
+
+
+def _activa(lado='max'):
+    estado = EstadoAlerta()
+    valor = 27.0 if lado == 'max' else 17.0
+    assert _aplicar(estado, [(0, valor), (5, valor)]) == [None, 'activada']
+    return estado
+
+
+def test_activa_tras_la_duracion_de_entrada():
+    estado = EstadoAlerta()
+    
+    assert _aplicar(estado, [(0, 27.0), (4, 27.5)]) == [None, None]
+    assert estado.estado == 'pendiente' and estado.lado == 'max'
+    
+    assert _aplicar(estado, [(5, 27.0)]) == ['activada']
+    assert estado.estado == 'activa'
+    assert estado.fecha_activacion == INICIO + timedelta(minutes=5)
+
+
+def test_pendiente_vuelve_a_normal_sin_evento():
+    estado = EstadoAlerta()
+    
+    assert _aplicar(estado, [(0, 27.0), (2, 25.0), (10, 25.0)]) == [None, None, None]
+    assert estado.estado == 'normal' and estado.lado is None
+
+
+def test_oscilacion_alrededor_del_limite_no_resuelve():
+    estado = _activa()
+    
+    # 25.8 está dentro de límites pero no de la banda de salida (26.0 - 0.5)
+    assert _aplicar(estado, [(6, 25.8), (7, 26.2), (30, 25.8), (60, 26.1)]) == [None] * 4
+    assert estado.estado == 'activa'
+
+
+def test_resuelve_tras_la_duracion_de_salida():
+    estado = _activa()
+    
+    assert _aplicar(estado, [(6, 25.0), (15, 25.2)]) == [None, None]
+    assert estado.estado == 'recuperando'
+    
+    assert _aplicar(estado, [(16, 25.4)]) == ['resuelta']
+    assert estado.estado == 'normal' and estado.lado is None and estado.desde is None
+
+
+def test_recuperando_vuelve_a_activa_al_salir_de_la_banda():
+    estado = _activa()
+    
+    assert _aplicar(estado, [(6, 25.0), (8, 25.9)]) == [None, None]
+    assert estado.estado == 'activa'
+    
+    # La duración de salida vuelve a contar desde la siguiente entrada en la banda
+    assert _aplicar(estado, [(9, 25.0), (18, 25.0), (19, 25.0)]) == [None, None, 'resuelta']
+
+
+@pytest.mark.parametrize('estado_previo', ['activa', 'recuperando'])
+def test_salto_al_limite_contrario_resuelve_y_reinicia(estado_previo):
+    estado = _activa('max')
+    if estado_previo == 'recuperando':
+        _aplicar(estado, [(6, 25.0)])
+    assert estado.estado == estado_previo
+    
+    assert _aplicar(estado, [(7, 17.0)]) == ['resuelta']
+    assert estado.estado == 'pendiente' and estado.lado == 'min'
+    
+    # El lado contrario se activa como cualquier otra alerta
+    assert _aplicar(estado, [(10, 17.0), (12, 16.5)]) == [None, 'activada']
+    assert estado.lado == 'min'
+
+
+def _temperaturas(data_manager, aire_id, valores):
+    data_manager.agregar_lecturas_lote([
+        {'aire_id': aire_id, 'fecha': INICIO + timedelta(minutes=minutos), 'temperatura': valor, 'humedad': 50.0}
+        for minutos, valor in valores
+    ])
+
+
+def test_data_manager_salto_de_limite_y_edicion_de_umbral(data_manager):
+    umbral_id = data_manager.crear_umbral_configuracion("Global", True, MINIMO, MAXIMO, 30.0, 70.0)
+    
+    _temperaturas(data_manager, 1, [(0, 27.0), (10, 27.0)])
+    estado = session.query(EstadoAlerta).filter_by(aire_id=1, umbral_id=umbral_id, variable='temperatura').one()
+    assert estado.estado == 'activa' and estado.lado == 'max'
+    
+    # Salto al límite contrario: se resuelve y empieza la fase pendiente del otro lado
+    _temperaturas(data_manager, 1, [(11, 17.0)])
+    session.refresh(estado)
+    assert estado.estado == 'pendiente' and estado.lado == 'min'
+    
+    # Otro nombre con los mismos límites: los estados se conservan
+    data_manager.actualizar_umbral_configuracion(umbral_id, "General", MINIMO, MAXIMO, 30.0, 70.0)
+    assert session.query(EstadoAlerta).filter_by(umbral_id=umbral_id).count() == 2
+    
+    # Límites nuevos: los estados calculados con los anteriores se descartan
+    data_manager.actualizar_umbral_configuracion(umbral_id, "Global", MINIMO, 28.0, 30.0, 70.0)
+    assert session.query(EstadoAlerta).filter_by(umbral_id=umbral_id).count() == 0
+    
+    _temperaturas(data_manager, 1, [(20, 27.0)])
+    estado = session.query(EstadoAlerta).filter_by(aire_id=1, umbral_id=umbral_id, variable='temperatura').one()
+    assert estado.estado == 'normal'
@@ -0,0 +1,187 @@
+"""
+Pruebas de los modos de inserción de lecturas (insertar, ignorar y
+actualizar) y de la migración a índices únicos.
+"""
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import data_manager as modulo_data_manager
+import database
+from database import Lectura, session
+from migraciones import migrar_indices_unicos
+
+INICIO = datetime(2025, 6, 2, 8)
+
+
+def _lectura(aire_id=1, horas=0, temperatura=22.0, humedad=50.0):
+    return {'aire_id': aire_id, 'fecha': INICIO + timedelta(hours=horas), 'temperatura': temperatura, 'humedad': humedad}
+
+
+def _temperaturas():
+    return {
+        (fila.aire_id, fila.fecha): fila.temperatura
+        for fila in session.query(Lectura.aire_id, Lectura.fecha, Lectura.temperatura)
+    }
+
+
+def test_insertar_falla_con_una_lectura_repetida(data_manager):
+    data_manager.agregar_lecturas_lote([_lectura()])
+    
+    with pytest.raises(IntegrityError):
+        data_manager.agregar_lecturas_lote([_lectura(horas=1), _lectura(temperatura=30.0)])
+    
+    # El lote entero se deshace
+    assert _temperaturas() == {(1, INICIO): 22.0}
+
+
+def test_ignorar_conserva_la_guardada(data_manager):
+    (existente,) = data_manager.agregar_lecturas_lote([_lectura()])
+    
+    ids = data_manager.agregar_lecturas_lote(
+        [_lectura(temperatura=30.0), _lectura(horas=1), _lectura(horas=1, temperatura=31.0)], modo='ignorar'
+    )
+    
+    # La primera del lote gana dentro del lote; las que ya existían devuelven None
+    assert ids[0] is None and ids[1] == ids[2] and ids[1] > existente
+    assert _temperaturas() == {(1, INICIO): 22.0, (1, INICIO + timedelta(hours=1)): 22.0}
+    
+    # Reintentar el mismo lote no cambia nada
+    assert data_manager.agregar_lecturas_lote([_lectura(horas=1)], modo='ignorar') == [None]
+    assert session.query(Lectura).count() == 2
+
+
+def test_actualizar_sustituye_y_devuelve_el_id_existente(data_manager):
+    (existente,) = data_manager.agregar_lecturas_lote([_lectura()])
+    
+    ids = data_manager.agregar_lecturas_lote(
+        [_lectura(temperatura=25.0, humedad=55.0), _lectura(horas=1), _lectura(temperatura=26.0, humedad=56.0)],
+        modo='actualizar'
+    )
+    
+    # La última del lote gana; el ID de la lectura existente se conserva
+    assert ids[0] == ids[2] == existente
+    assert _temperaturas() == {(1, INICIO): 26.0, (1, INICIO + timedelta(hours=1)): 22.0}
+    assert session.query(Lectura.humedad).filter(Lectura.id == existente).scalar() == 56.0
+    
+    # Los cuantiles del día se rehacen con el valor nuevo
+    cuantiles = data_manager.obtener_cuantiles().set_index('aire_id')
+    assert cuantiles.loc[1, 'lecturas'] == 2
+    assert cuantiles.loc[1, 'temperatura_p99'] > 25.0
+
+
+def test_modo_desconocido(data_manager):
+    with pytest.raises(ValueError):
+        data_manager.agregar_lecturas_lote([_lectura()], modo='sustituir')
+
+
+def test_actualizar_invalida_las_caches_de_lecturas(data_manager, monkeypatch):
+    # Sin margen de IDs tardíos, la caché del mapa de calor llega hasta el último ID
+    monkeypatch.setattr(modulo_data_manager, 'MARGEN_IDS_TARDIOS', 0)
+    
+    data_manager.agregar_lecturas_lote([
+        _lectura(aire_id, horas, temperatura=20.0 + aire_id + horas % 3)
+        for aire_id in (1, 2) for horas in range(48)
+    ])
+    
+    mapa = data_manager.obtener_mapa_calor()
+    tendencias = data_manager.obtener_tendencias()
+    
+    # Actualizar lecturas ya incluidas no cambia el último ID
+    data_manager.agregar_lecturas_lote([_lectura(1, horas, temperatura=35.0) for horas in range(24, 48)], modo='actualizar')
+    
+    mapa_nuevo = data_manager.obtener_mapa_calor()
+    tendencias_nuevas = data_manager.obtener_tendencias()
+    assert not mapa_nuevo.equals(mapa)
+    assert not tendencias_nuevas.equals(tendencias)
+    
+    data_manager._cache_mapas_calor.clear()
+    data_manager._cache_tendencias.clear()
+    pd.testing.assert_frame_equal(mapa_nuevo, data_manager.obtener_mapa_calor())
+    pd.testing.assert_frame_equal(tendencias_nuevas, data_manager.obtener_tendencias())
+
+
+def _indice_sin_unicidad():
+    # Como una base creada antes de declarar único (aire_id, fecha)
+    with database.engine.begin() as conexion:
+        conexion.execute(text("DROP INDEX ix_lecturas_aire_fecha"))
+        conexion.execute(text("CREATE INDEX ix_lecturas_aire_fecha ON lecturas (aire_id, fecha)"))
+
+
+def test_arranque_con_duplicados_exige_la_migracion_explicita(data_manager, monkeypatch):
+    data_manager.agregar_lecturas_lote([_lectura(horas=horas) for horas in range(3)])
+    _indice_sin_unicidad()
+    with database.engine.begin() as conexion:
+        conexion.execute(text(
+            "INSERT INTO lecturas (aire_id, fecha, temperatura, humedad) "
+            "SELECT aire_id, fecha, temperatura + 10, humedad FROM lecturas WHERE fecha < :limite"
+        ), {'limite': INICIO + timedelta(hours=2)})
+    
+    monkeypatch.setattr(database, '_esquema_preparado', False)
+    with pytest.raises(RuntimeError, match='ix_lecturas_aire_fecha: 2'):
+        database.init_db()
+    assert session.query(Lectura).count() == 5
+    
+    eliminadas = migrar_indices_unicos(database.engine, database.Base.metadata, eliminar_duplicados=True)
+    
+    assert [clave[0] for clave in eliminadas['ix_lecturas_aire_fecha']] == [1, 1]
+    # Se conserva la de mayor ID, la última registrada
+    session.expire_all()
+    assert sorted(_temperaturas().values()) == [22.0, 32.0, 32.0]
+    
+    database.init_db()
+    with pytest.raises(IntegrityError):
+        data_manager.agregar_lecturas_lote([_lectura()])
+
+
+def test_arranque_sin_duplicados_crea_el_indice_unico(data_manager, monkeypatch):
+    data_manager.agregar_lecturas_lote([_lectura(horas=horas) for horas in range(3)])
+    _indice_sin_unicidad()
+    
+    monkeypatch.setattr(database, '_esquema_preparado', False)
+    database.init_db()
+    
+    assert data_manager.agregar_lecturas_lote([_lectura()], modo='ignorar') == [None]
+
+
+def test_reconstruir_estados(data_manager):
+    data_manager.agregar_lecturas_lote([_lectura(horas=horas, temperatura=22.0 + horas % 2) for horas in range(20)])
+    antes = session.query(database.EstadoAnomalia).filter_by(aire_id=1).one()
+    lecturas, media = antes.lecturas, antes.temperatura_media
+    
+    assert data_manager.reconstruir_estados([1]) == 20
+    
+    despues = session.query(database.EstadoAnomalia).filter_by(aire_id=1).one()
+    assert despues.lecturas == lecturas
+    assert despues.temperatura_media == pytest.approx(media)
+
+
+@pytest.mark.parametrize('fecha, guardada', [
+    (date(2024, 1, 2), datetime(2024, 1, 2)),
+    (pd.Timestamp('2024-01-02 08:30'), datetime(2024, 1, 2, 8, 30)),
+    (datetime(2024, 1, 2, 8, 30, tzinfo=timezone.utc),
+     datetime(2024, 1, 2, 8, 30, tzinfo=timezone.utc).astimezone().replace(tzinfo=None)),
+])
+def test_agregar_lectura_normaliza_la_fecha(data_manager, fecha, guardada):
+    lectura_id = data_manager.agregar_lectura(1, fecha, 22.0, 50.0)
+    
+    assert lectura_id is not None
+    assert session.get(Lectura, lectura_id).fecha == guardada
+    
+    # La lectura llega a las estructuras derivadas
+    assert session.query(database.EstadoAnomalia.ultima_lectura_id).filter_by(aire_id=1).scalar() == lectura_id
+    assert data_manager.obtener_cuantiles().set_index('aire_id').loc[1, 'lecturas'] == 1
+    
+    # Repetida con la misma fecha, se actualiza y devuelve el mismo ID
+    assert data_manager.agregar_lectura(1, fecha, 23.0, 50.0) == lectura_id
+    assert session.query(Lectura).count() == 1
+
+
+def test_fecha_no_valida(data_manager):
+    with pytest.raises(TypeError):
+        data_manager.agregar_lecturas_lote([dict(_lectura(), fecha='2024-01-02')], modo='ignorar')
+    
+    assert session.query(Lectura).count() == 0
@@ -0,0 +1,178 @@
+"""
+Pruebas de la instantánea en disco de las lecturas: cola, anexado y
+validación por generación de lecturas y por el margen de IDs tardíos.
+"""
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import insert
+
+import instantanea
+from database import Lectura, session
+from instrumentacion import contar_consultas
+
+INICIO = datetime(2025, 4, 1)
+
+
+def _lecturas(desde, cantidad, aire_id=1):
+    return [
+        {'aire_id': aire_id, 'fecha': INICIO + timedelta(minutes=paso), 'temperatura': 20.0 + paso % 5, 'humedad': 50.0}
+        for paso in range(desde, desde + cantidad)
+    ]
+
+
+def _en_base():
+    filas = session.query(Lectura.id, Lectura.aire_id, Lectura.fecha, Lectura.temperatura, Lectura.humedad)
+    return pd.DataFrame(filas.order_by(Lectura.id).all(), columns=['id', 'aire_id', 'fecha', 'temperatura', 'humedad'])
+
+
+def _comprobar(lector):
+    session.commit()
+    lecturas_df, en_base = lector.obtener_lecturas(), _en_base()
+    if en_base.empty:
+        assert lecturas_df.empty
+    else:
+        pd.testing.assert_frame_equal(lecturas_df, en_base, check_dtype=False)
+
+
+@pytest.fixture
+def lector(data_manager, monkeypatch):
+    # Otra instancia, como otro proceso de Streamlit, con la instantánea activada;
+    # data_manager escribe sin instantánea
+    from data_manager import DataManager
+    
+    monkeypatch.setattr(instantanea, 'HABILITADA', True)
+    monkeypatch.setattr(instantanea, 'MINIMO_ANEXAR', 5)
+    lector = DataManager(buffer_escritura=False)
+    yield lector
+    lector.cerrar()
+
+
+def test_cola_y_anexado(data_manager, lector):
+    data_manager.agregar_lecturas_lote(_lecturas(0, 10))
+    _comprobar(lector)
+    assert lector.instantanea_lecturas.filas == 10
+    
+    # Una cola corta se suma en memoria; una larga se añade a los archivos
+    data_manager.agregar_lecturas_lote(_lecturas(10, 3))
+    _comprobar(lector)
+    assert lector.instantanea_lecturas.filas == 10
+    
+    data_manager.agregar_lecturas_lote(_lecturas(13, 5))
+    _comprobar(lector)
+    assert lector.instantanea_lecturas.filas == 18
+
+
+def test_comprobacion_sin_recorrer_la_tabla(data_manager, lector):
+    data_manager.agregar_lecturas_lote(_lecturas(0, 10))
+    lector.obtener_lecturas()
+    data_manager.agregar_lecturas_lote(_lecturas(10, 2))
+    session.commit()
+    
+    # Generación y recuento del margen en una consulta, y la cola
+    with contar_consultas() as contador:
+        lecturas_df = lector.obtener_lecturas()
+    
+    assert contador.total == 2
+    # Ningún recuento de todas las lecturas hasta el último ID de la instantánea
+    assert all('lecturas.id >' in sentencia for sentencia in contador.sentencias if 'count' in sentencia.lower())
+    assert len(lecturas_df) == 12
+
+
+@pytest.mark.parametrize('modificacion', ['eliminar', 'eliminar_rango', 'actualizar', 'compactar', 'eliminar_aire'])
+def test_modificaciones_desde_otra_instancia_invalidan(data_manager, lector, modificacion):
+    ids = data_manager.agregar_lecturas_lote(_lecturas(0, 10) + _lecturas(0, 10, aire_id=2))
+    _comprobar(lector)
+    generacion = lector.instantanea_lecturas.generacion
+    
+    if modificacion == 'eliminar':
+        data_manager.eliminar_lecturas(ids[2:4])
+    elif modificacion == 'eliminar_rango':
+        data_manager.eliminar_lecturas_rango(1, INICIO, INICIO + timedelta(minutes=3))
+    elif modificacion == 'actualizar':
+        data_manager.agregar_lecturas_lote([dict(_lecturas(4, 1)[0], temperatura=35.0)], modo='actualizar')
+    elif modificacion == 'compactar':
+        data_manager.compactar_lecturas(dias_retencion=1)
+    else:
+        data_manager.eliminar_aire(2)
+    
+    _comprobar(lector)
+    assert lector.instantanea_lecturas.generacion == generacion + 1
+
+
+def test_lectura_confirmada_tarde_con_id_menor(data_manager, lector):
+    # Los IDs 1-5 y 7-10 confirmados; el 6 se confirma después de crear la instantánea
+    filas = [dict(lectura, id=paso + 1) for paso, lectura in enumerate(_lecturas(0, 10))]
+    session.execute(insert(Lectura), filas[:5] + filas[6:])
+    session.commit()
+    _comprobar(lector)
+    
+    session.execute(insert(Lectura), [filas[5]])
+    session.commit()
+    
+    _comprobar(lector)
+    assert 6 in lector.obtener_lecturas()['id'].tolist()
+
+
+def test_lecturas_eliminadas_fuera_de_data_manager(data_manager, lector):
+    from data_manager import DataManager
+    
+    data_manager.agregar_lecturas_lote(_lecturas(0, 10))
+    _comprobar(lector)
+    
+    # Sin cambiar la generación: solo lo detecta el recuento completo del
+    # primer uso de la instantánea en cada proceso
+    session.query(Lectura).filter(Lectura.id == 1).delete()
+    session.commit()
+    
+    reiniciado = DataManager(buffer_escritura=False)
+    _comprobar(reiniciado)
+    assert reiniciado.instantanea_lecturas.filas == 9
+
+
+def _columnas(desde, cantidad):
+    filas = [(numero, None if numero % 4 == 0 else 1, INICIO + timedelta(minutes=numero), 20.0, 50.0)
+             for numero in range(desde, desde + cantidad)]
+    return instantanea.columnas_desde_filas(filas)
+
+
+def test_archivos_aires_nulos_y_escritura_interrumpida(tmp_path):
+    archivos = instantanea.InstantaneaLecturas(str(tmp_path), 'base')
+    assert not archivos.abrir()
+    
+    assert archivos.escribir(_columnas(1, 8), generacion=3)
+    assert archivos.anexar(_columnas(9, 4))
+    
+    # Bytes de más de una escritura interrumpida: meta.json manda
+    with open(tmp_path / 'id.bin', 'ab') as archivo:
+        archivo.write(b'\0' * 24)
+    
+    reabierta = instantanea.InstantaneaLecturas(str(tmp_path), 'base')
+    assert reabierta.abrir()
+    assert (reabierta.filas, reabierta.max_id, reabierta.generacion) == (12, 12, 3)
+    
+    lecturas_df = instantanea.columnas_a_dataframe(reabierta.leer())
+    assert lecturas_df['id'].tolist() == list(range(1, 13))
+    # Las lecturas sin aire vuelven como NaN
+    assert lecturas_df['aire_id'].isna().tolist() == [numero % 4 == 0 for numero in range(1, 13)]
+    
+    assert reabierta.anexar(_columnas(13, 1))
+    assert instantanea.InstantaneaLecturas(str(tmp_path), 'base').abrir()
+    assert len(reabierta.leer()['id']) == 13
+
+
+def test_instantanea_de_otra_base_o_version(tmp_path, monkeypatch):
+    archivos = instantanea.InstantaneaLecturas(str(tmp_path), 'base')
+    archivos.escribir(_columnas(1, 3), generacion=1)
+    
+    assert not instantanea.InstantaneaLecturas(str(tmp_path), 'otra').abrir()
+    
+    monkeypatch.setattr(instantanea, 'VERSION', instantanea.VERSION + 1)
+    assert not instantanea.InstantaneaLecturas(str(tmp_path), 'base').abrir()
+    
+    # Invalidada, no se puede anexar hasta volver a escribirla
+    archivos.invalidar()
+    assert not archivos.anexar(_columnas(4, 1))
+    assert not os.path.exists(tmp_path / 'meta.json')
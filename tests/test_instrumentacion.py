@@ -0,0 +1,107 @@
+"""
+Pruebas de la medición de tiempos: búfer circular, consultas asociadas a
+cada ejecución de página y resúmenes de la página Rendimiento.
+"""
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+import instrumentacion
+from database import engine, session
+from instrumentacion import RegistroTiempos
+
+
+@pytest.fixture
+def registro(monkeypatch):
+    registro = RegistroTiempos(capacidad=100)
+    monkeypatch.setattr(instrumentacion, 'registro', registro)
+    return registro
+
+
+def test_bufer_circular_conserva_los_ultimos():
+    registro = RegistroTiempos(capacidad=3)
+    for numero in range(5):
+        registro.registrar('grafico', f"grafico_{numero}", float(numero))
+    
+    registros_df = registro.a_dataframe()
+    
+    assert len(registro) == 3
+    assert registros_df['nombre'].tolist() == ['grafico_2', 'grafico_3', 'grafico_4']
+    assert list(registros_df.columns) == instrumentacion.COLUMNAS
+    
+    registro.vaciar()
+    assert registro.a_dataframe().empty
+
+
+def test_consultas_asociadas_a_la_ejecucion(registro):
+    session.execute(text("SELECT 1")).all()
+    
+    with instrumentacion.ejecucion('Dashboard'):
+        session.execute(text("SELECT 2")).all()
+        session.execute(text("SELECT 3")).all()
+    
+    registros_df = registro.a_dataframe()
+    consultas = registros_df[registros_df['tipo'] == 'consulta']
+    assert consultas['nombre'].tolist() == ['SELECT 1', 'SELECT 2', 'SELECT 3']
+    assert consultas['ejecucion'].isna().tolist() == [True, False, False]
+    assert (consultas['duracion_ms'] >= 0).all()
+    
+    por_ejecucion = instrumentacion.consultas_por_ejecucion(registros_df)
+    assert por_ejecucion[['pagina', 'consultas']].values.tolist() == [['Dashboard', 2]]
+    assert por_ejecucion['tiempo_pagina'].iloc[0] >= por_ejecucion['tiempo_consultas'].iloc[0]
+
+
+def test_consulta_fallida_no_desplaza_los_tiempos(registro):
+    with engine.connect() as conexion:
+        with pytest.raises(Exception):
+            conexion.execute(text("SELECT * FROM tabla_que_no_existe"))
+        conexion.rollback()
+        conexion.execute(text("SELECT 4")).all()
+        
+        # El inicio de la sentencia fallida no queda en la pila de la conexión
+        assert conexion.info.get('instrumentacion_inicio') == []
+    
+    assert registro.a_dataframe()['nombre'].tolist() == ['SELECT 4']
+
+
+def test_cronometrar_y_medir(registro):
+    @instrumentacion.cronometrar('grafico')
+    def crear_grafico(valor):
+        return valor * 2
+    
+    assert crear_grafico(21) == 42
+    with pytest.raises(ValueError):
+        with instrumentacion.medir('pagina', 'Con error'):
+            raise ValueError
+    
+    registros_df = registro.a_dataframe()
+    # También se mide un bloque que falla
+    assert registros_df[['tipo', 'nombre']].values.tolist() == [['grafico', 'crear_grafico'], ['pagina', 'Con error']]
+
+
+def test_desactivada_no_registra(registro, monkeypatch):
+    monkeypatch.setattr(instrumentacion, 'HABILITADA', False)
+    
+    with instrumentacion.ejecucion('Dashboard'):
+        session.execute(text("SELECT 5")).all()
+    
+    assert len(registro) == 0
+
+
+def test_resumen_percentiles():
+    registros_df = pd.DataFrame([
+        (None, 'consulta', 'SELECT lenta', duracion, None, None, None) for duracion in (10.0, 20.0, 30.0, 400.0)
+    ] + [
+        (None, 'consulta', 'SELECT rapida', 1.0, None, None, None),
+        (None, 'pagina', 'Dashboard', 500.0, None, None, None)
+    ], columns=instrumentacion.COLUMNAS)
+    
+    resumen = instrumentacion.resumen_percentiles(registros_df, 'consulta')
+    
+    assert resumen['nombre'].tolist() == ['SELECT lenta', 'SELECT rapida']
+    lenta = resumen.iloc[0]
+    assert (lenta['veces'], lenta['p50'], lenta['maximo'], lenta['total']) == (4, 25.0, 400.0, 460.0)
+    assert 30.0 < lenta['p95'] <= 400.0
+    
+    assert instrumentacion.resumen_percentiles(registros_df, 'grafico').empty
+    assert instrumentacion.consultas_por_ejecucion(registros_df).empty
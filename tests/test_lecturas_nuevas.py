@@ -0,0 +1,111 @@
+"""
+Pruebas de la carga incremental del modo de actualización automática: las
+lecturas nuevas por ID, las confirmadas tarde dentro del margen y los
+acumulados de partida de las estadísticas incrementales.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from database import Lectura, session
+from utils import actualizar_estadisticas_incrementales, resumir_estadisticas_incrementales
+
+INICIO = datetime(2025, 10, 1)
+
+
+def _fila(numero, aire_id=1, **cambios):
+    fila = {'id': numero, 'aire_id': aire_id, 'fecha': INICIO + timedelta(minutes=numero), 'temperatura': 20.0 + numero % 7, 'humedad': 40.0 + numero % 11}
+    return dict(fila, **cambios)
+
+
+def _insertar(filas):
+    session.execute(insert(Lectura), filas)
+    session.commit()
+
+
+def test_lecturas_nuevas_por_id(data_manager):
+    _insertar([_fila(numero) for numero in range(1, 11)])
+    
+    nuevas = data_manager.obtener_lecturas_nuevas(6)
+    assert nuevas['id'].tolist() == [7, 8, 9, 10]
+    
+    assert data_manager.obtener_lecturas_nuevas(6, hasta_id=8)['id'].tolist() == [7, 8]
+    assert data_manager.obtener_lecturas_nuevas(0, desde=INICIO + timedelta(minutes=9))['id'].tolist() == [9, 10]
+    
+    # Sin filas, la fecha conserva su tipo para concatenar con lo ya cargado
+    vacio = data_manager.obtener_lecturas_nuevas(10)
+    assert vacio.empty and str(vacio['fecha'].dtype).startswith('datetime64')
+
+
+def test_lecturas_confirmadas_tarde_en_el_margen(data_manager):
+    # Los IDs 4 y 7 se confirman después de que el cliente haya visto el 10
+    _insertar([_fila(numero) for numero in range(1, 11) if numero not in (4, 7)])
+    vistas = data_manager.obtener_ids_lecturas(0, 10)
+    assert vistas == {1, 2, 3, 5, 6, 8, 9, 10}
+    
+    _insertar([_fila(4), _fila(7), _fila(11)])
+    
+    # Sin vistas solo llegan los IDs mayores
+    assert data_manager.obtener_lecturas_nuevas(10)['id'].tolist() == [11]
+    assert data_manager.obtener_lecturas_nuevas(10, vistas=vistas)['id'].tolist() == [4, 7, 11]
+
+
+def test_sin_tardias_no_se_excluyen_las_vistas(data_manager):
+    _insertar([_fila(numero) for numero in range(1, 13)])
+    vistas = data_manager.obtener_ids_lecturas(0, 10)
+    
+    nuevas = data_manager.obtener_lecturas_nuevas(10, vistas=vistas)
+    
+    assert nuevas['id'].tolist() == [11, 12]
+
+
+def test_fuera_del_margen_no_se_recuperan(data_manager, monkeypatch):
+    import data_manager as modulo
+    
+    monkeypatch.setattr(modulo, 'MARGEN_IDS_TARDIOS', 3)
+    _insertar([_fila(numero) for numero in range(1, 11) if numero not in (2, 9)])
+    vistas = data_manager.obtener_ids_lecturas(7, 10)
+    
+    _insertar([_fila(2), _fila(9)])
+    
+    assert data_manager.obtener_lecturas_nuevas(10, vistas=vistas)['id'].tolist() == [9]
+
+
+def test_acumulados_incluyen_horas_compactadas(data_manager):
+    antiguas = [_fila(numero, fecha=datetime.now() - timedelta(days=3, minutes=numero)) for numero in range(1, 7)]
+    _insertar(antiguas)
+    data_manager.compactar_lecturas(dias_retencion=1)
+    _insertar([_fila(numero) for numero in range(7, 11)])
+    
+    acumulados, ultimo_id = data_manager.obtener_acumulados_lecturas()
+    
+    filas = antiguas + [_fila(numero) for numero in range(7, 11)]
+    assert ultimo_id == 10
+    assert acumulados['total_lecturas'] == 10
+    assert acumulados['temperatura']['suma'] == pytest.approx(sum(f['temperatura'] for f in filas))
+    assert acumulados['humedad']['minimo'] == min(f['humedad'] for f in filas)
+    assert acumulados['humedad']['maximo'] == max(f['humedad'] for f in filas)
+
+
+def test_acumulados_incrementales_igual_que_generales(data_manager):
+    _insertar([_fila(numero, aire_id=numero % 3 + 1) for numero in range(1, 21)])
+    acumulados, ultimo_id = data_manager.obtener_acumulados_lecturas()
+    
+    _insertar([_fila(numero, temperatura=35.0 + numero) for numero in range(21, 26)])
+    acumulados = actualizar_estadisticas_incrementales(acumulados, data_manager.obtener_lecturas_nuevas(ultimo_id))
+    
+    resumen = resumir_estadisticas_incrementales(acumulados)
+    generales = data_manager.obtener_estadisticas_generales()
+    assert resumen['total_lecturas'] == 25
+    for variable in ('temperatura', 'humedad'):
+        for medida in ('promedio', 'minimo', 'maximo'):
+            assert resumen[variable][medida] == pytest.approx(generales[variable][medida])
+
+
+def test_acumulados_sin_lecturas(data_manager):
+    acumulados, ultimo_id = data_manager.obtener_acumulados_lecturas()
+    
+    assert ultimo_id == 0 and acumulados['total_lecturas'] == 0
+    assert acumulados['temperatura'] == {'suma': 0.0, 'minimo': None, 'maximo': None}
+    assert resumir_estadisticas_incrementales(acumulados)['temperatura']['promedio'] == 0
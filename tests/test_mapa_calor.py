@@ -0,0 +1,117 @@
+"""
+Pruebas del mapa de calor agregado en la base de datos y de su caché, que
+solo llega hasta MARGEN_IDS_TARDIOS IDs por debajo del último.
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import insert
+
+from database import Lectura, session
+
+# Lunes; fuera de una retención de un día
+INICIO = datetime(2025, 6, 2)
+
+
+def _fila(numero, aire_id=1, **cambios):
+    fila = {
+        'id': numero,
+        'aire_id': aire_id,
+        'fecha': INICIO + timedelta(hours=5 * numero),
+        'temperatura': 18.0 + numero % 9,
+        'humedad': 40.0 + numero % 13
+    }
+    return dict(fila, **cambios)
+
+
+def _insertar(filas):
+    session.execute(insert(Lectura), filas)
+    session.commit()
+
+
+def _esperado(filas, eje='dia_semana'):
+    df = pd.DataFrame(filas)
+    df['hora'] = df['fecha'].dt.hour
+    df[eje] = df['fecha'].dt.dayofweek if eje == 'dia_semana' else df['fecha'].dt.date
+    return df.groupby([eje, 'hora'], as_index=False).agg(
+        lecturas=('id', 'count'), temperatura=('temperatura', 'mean'), humedad=('humedad', 'mean')
+    )
+
+
+def _comparar(mapa_df, filas, eje='dia_semana'):
+    esperado = _esperado(filas, eje)
+    if eje == 'fecha':
+        mapa_df = mapa_df.assign(fecha=pd.to_datetime(mapa_df['fecha']).dt.date)
+    pd.testing.assert_frame_equal(mapa_df[esperado.columns], esperado, check_dtype=False)
+
+
+@pytest.fixture
+def margen(monkeypatch):
+    import data_manager
+    
+    monkeypatch.setattr(data_manager, 'MARGEN_IDS_TARDIOS', 5)
+    return 5
+
+
+def test_mapa_calor_incluye_horas_compactadas(data_manager):
+    filas = [_fila(numero, aire_id=numero % 2 + 1) for numero in range(1, 80)]
+    _insertar(filas)
+    data_manager.compactar_lecturas(dias_retencion=1)
+    
+    _comparar(data_manager.obtener_mapa_calor(), filas)
+    _comparar(data_manager.obtener_mapa_calor(aire_id=2), [f for f in filas if f['aire_id'] == 2])
+
+
+def test_mapa_calor_por_fecha_en_un_rango(data_manager):
+    filas = [_fila(numero) for numero in range(1, 40)]
+    _insertar(filas)
+    desde, hasta = INICIO.date() + timedelta(days=2), INICIO.date() + timedelta(days=4)
+    
+    mapa_df = data_manager.obtener_mapa_calor(eje='fecha', desde=desde, hasta=hasta)
+    
+    _comparar(mapa_df, [f for f in filas if desde <= f['fecha'].date() <= hasta], eje='fecha')
+
+
+def test_cache_incluye_lecturas_nuevas(data_manager, margen):
+    _insertar([_fila(numero) for numero in range(1, 21)])
+    data_manager.obtener_mapa_calor()
+    assert data_manager._cache_mapas_calor
+    
+    _insertar([_fila(numero) for numero in range(21, 41)])
+    
+    _comparar(data_manager.obtener_mapa_calor(), [_fila(numero) for numero in range(1, 41)])
+
+
+def test_cache_incluye_lecturas_confirmadas_tarde(data_manager, margen):
+    # El ID 18 se confirma después de calcular el mapa, dentro del margen
+    filas = [_fila(numero, temperatura=20.0) for numero in range(1, 21)]
+    tardia = filas.pop(17)
+    _insertar(filas)
+    data_manager.obtener_mapa_calor()
+    
+    _insertar([dict(tardia, temperatura=40.0)])
+    
+    con_cache = data_manager.obtener_mapa_calor()
+    data_manager._cache_mapas_calor.clear()
+    sin_cache = data_manager.obtener_mapa_calor()
+    
+    pd.testing.assert_frame_equal(con_cache, sin_cache)
+    assert con_cache['lecturas'].sum() == 20
+    assert con_cache['temperatura'].max() == 40.0
+
+
+def test_modificaciones_invalidan_la_cache(data_manager, margen):
+    ids = data_manager.agregar_lecturas_lote([
+        {k: v for k, v in _fila(numero).items() if k != 'id'} for numero in range(1, 31)
+    ])
+    data_manager.obtener_mapa_calor()
+    
+    # Lecturas por debajo del corte de la caché
+    data_manager.eliminar_lecturas(ids[:10])
+    data_manager.agregar_lecturas_lote([dict(_fila(15), temperatura=45.0)], modo='actualizar')
+    
+    mapa_df = data_manager.obtener_mapa_calor()
+    
+    assert mapa_df['lecturas'].sum() == 20
+    assert mapa_df['temperatura'].max() == 45.0
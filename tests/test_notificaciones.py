@@ -0,0 +1,153 @@
+"""
+Pruebas del despachador de alertas contra un servidor SMTP local mínimo.
+"""
+import email
+import socketserver
+import threading
+
+import pytest
+
+from notificaciones import DespachadorAlertas, SalidaSMTP
+
+
+class _ManejadorSMTP(socketserver.StreamRequestHandler):
+    # Lo justo del protocolo para smtplib sin STARTTLS ni autenticación
+    def responder(self, linea):
+        self.wfile.write(linea.encode() + b'\r\n')
+    
+    def handle(self):
+        self.responder('220 localhost')
+        remitente, destinatarios = None, []
+        
+        for linea in self.rfile:
+            orden = linea.decode().strip()
+            verbo = orden.split(' ', 1)[0].upper()
+            
+            if verbo in ('EHLO', 'HELO'):
+                self.responder('250 localhost')
+            elif verbo == 'MAIL':
+                remitente, destinatarios = orden.split(':', 1)[1].strip(' <>'), []
+                self.responder('250 OK')
+            elif verbo == 'RCPT':
+                destinatarios.append(orden.split(':', 1)[1].strip(' <>'))
+                self.responder('250 OK')
+            elif verbo == 'DATA':
+                self.responder('354 Fin con <CRLF>.<CRLF>')
+                datos = b''.join(iter(self.rfile.readline, b'.\r\n'))
+                self.server.mensajes.append((remitente, destinatarios, email.message_from_bytes(datos)))
+                self.responder('250 OK')
+            elif verbo == 'QUIT':
+                self.responder('221 Adiós')
+                return
+            else:
+                self.responder('250 OK')
+
+
+@pytest.fixture
+def servidor_smtp():
+    servidor = socketserver.ThreadingTCPServer(('127.0.0.1', 0), _ManejadorSMTP)
+    servidor.daemon_threads = True
+    servidor.mensajes = []
+    
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def _salida(servidor, destinatarios=('operaciones@example.com',)):
+    return SalidaSMTP('127.0.0.1', servidor.server_address[1], destinatarios,
+                      remitente='alertas@example.com', starttls=False, timeout=5)
+
+
+def _alerta(aire_id=1, umbral_id=1, tipo='temperatura', valor=30.0):
+    return {
+        'aire_id': aire_id,
+        'aire_nombre': f"Aire {aire_id}",
+        'umbral_id': umbral_id,
+        'umbral_nombre': 'Global',
+        'tipo': tipo,
+        'valor': valor,
+        'mensaje': f"{tipo} fuera de límite ({valor})"
+    }
+
+
+def test_resumen_agrupa_y_deduplica(servidor_smtp):
+    despachador = DespachadorAlertas([_salida(servidor_smtp)], intervalo_resumen=3600)
+    try:
+        despachador.encolar([_alerta(valor=30.0), _alerta(tipo='humedad', valor=80.0)])
+        despachador.encolar([_alerta(valor=31.0), _alerta(aire_id=2)])
+        despachador.vaciar()
+    finally:
+        despachador.cerrar()
+    
+    assert len(servidor_smtp.mensajes) == 1
+    remitente, destinatarios, mensaje = servidor_smtp.mensajes[0]
+    assert remitente == 'alertas@example.com'
+    assert destinatarios == ['operaciones@example.com']
+    assert mensaje['Subject'] == "Alertas de umbrales: 3 alerta(s) en 2 aire(s)"
+    
+    cuerpo = mensaje.get_payload(decode=True).decode()
+    assert "repetida 2 veces" in cuerpo and "último valor 31.0" in cuerpo
+    assert despachador.enviados == 1
+    assert despachador.suprimidas == 1
+
+
+def test_cada_destinatario_recibe_su_correo(servidor_smtp):
+    salida = _salida(servidor_smtp, ['a@example.com', 'b@example.com'])
+    despachador = DespachadorAlertas([salida], intervalo_resumen=3600)
+    try:
+        despachador.encolar([_alerta()])
+        despachador.vaciar()
+    finally:
+        despachador.cerrar()
+    
+    assert sorted(destinatarios[0] for _, destinatarios, _ in servidor_smtp.mensajes) == [
+        'a@example.com', 'b@example.com'
+    ]
+
+
+def test_limite_por_hora_acumula_para_el_siguiente_resumen(servidor_smtp):
+    despachador = DespachadorAlertas([_salida(servidor_smtp)], intervalo_resumen=3600, max_envios_hora=1)
+    try:
+        despachador.encolar([_alerta(aire_id=1)])
+        despachador.vaciar()
+        despachador.encolar([_alerta(aire_id=2)])
+        despachador.vaciar()
+        
+        assert len(servidor_smtp.mensajes) == 1
+        
+        # Se libera el cupo como si hubiera pasado una hora
+        for envios in despachador._envios.values():
+            envios.clear()
+        despachador.vaciar()
+    finally:
+        despachador.cerrar()
+    
+    assert len(servidor_smtp.mensajes) == 2
+    assert "Aire 2" in servidor_smtp.mensajes[1][2].get_payload(decode=True).decode()
+
+
+def test_fallo_de_envio_conserva_las_alertas(servidor_smtp):
+    salida = _salida(servidor_smtp)
+    puerto = salida.port
+    
+    # Un puerto sin servidor: la conexión se rechaza
+    with socketserver.TCPServer(('127.0.0.1', 0), socketserver.BaseRequestHandler) as cerrado:
+        salida.port = cerrado.server_address[1]
+    
+    despachador = DespachadorAlertas([salida], intervalo_resumen=3600)
+    try:
+        despachador.encolar([_alerta()])
+        despachador.vaciar()
+        assert despachador.enviados == 0
+        
+        salida.port = puerto
+        despachador.vaciar()
+    finally:
+        despachador.cerrar()
+    
+    assert despachador.enviados == 1
+    assert len(servidor_smtp.mensajes) == 1
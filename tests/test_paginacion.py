@@ -0,0 +1,111 @@
+"""
+Pruebas de la paginación por clave de las lecturas, con empates en la
+columna de orden.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+INICIO = datetime(2025, 5, 1)
+
+
+@pytest.fixture
+def lecturas(data_manager):
+    # 7 aires con la misma fecha en cada paso (empates en fecha) y solo tres
+    # temperaturas y dos humedades distintas (grupos de empates grandes)
+    filas = [
+        {
+            'aire_id': aire_id,
+            'fecha': INICIO + timedelta(hours=paso),
+            'temperatura': 20.0 + (aire_id + paso) % 3,
+            'humedad': 50.0 + 5 * (paso % 2)
+        }
+        for paso in range(9)
+        for aire_id in range(1, 8)
+    ]
+    ids = data_manager.agregar_lecturas_lote(filas)
+    return [dict(fila, id=lectura_id) for fila, lectura_id in zip(filas, ids)]
+
+
+def _recorrer(data_manager, tamano, **filtros):
+    ids, paginas, cursor = [], 0, None
+    while True:
+        pagina, cursor = data_manager.obtener_pagina_lecturas(tamano=tamano, despues_de=cursor, **filtros)
+        assert len(pagina) <= tamano
+        assert cursor is None or len(pagina) == tamano
+        ids += pagina['id'].tolist()
+        paginas += 1
+        if cursor is None:
+            return ids, paginas
+
+
+def _esperado(lecturas, orden, descendente):
+    ordenadas = sorted(lecturas, key=lambda l: (l[orden], l['id']), reverse=descendente)
+    return [l['id'] for l in ordenadas]
+
+
+@pytest.mark.parametrize('orden', ['fecha', 'id', 'temperatura', 'humedad'])
+@pytest.mark.parametrize('descendente', [True, False])
+@pytest.mark.parametrize('tamano', [1, 5, 7, 10])
+def test_recorrido_completo_sin_saltos_ni_repeticiones(data_manager, lecturas, orden, descendente, tamano):
+    ids, _ = _recorrer(data_manager, tamano, orden=orden, descendente=descendente)
+    
+    assert ids == _esperado(lecturas, orden, descendente)
+
+
+@pytest.mark.parametrize('tamano, paginas', [(63, 1), (21, 3), (64, 1), (62, 2)])
+def test_ultima_pagina_sin_pagina_vacia(data_manager, lecturas, tamano, paginas):
+    # 63 lecturas: un tamaño divisor del total no deja una página vacía al final
+    ids, recorridas = _recorrer(data_manager, tamano, orden='temperatura')
+    
+    assert len(ids) == len(lecturas) == 63
+    assert recorridas == paginas
+
+
+def test_cursor_en_mitad_de_un_grupo_de_empates(data_manager, lecturas):
+    # Todas las lecturas de la misma fecha en una página de 3: el cursor cae
+    # entre lecturas con la misma fecha y continúa por el ID
+    pagina, cursor = data_manager.obtener_pagina_lecturas(orden='fecha', descendente=False, tamano=3)
+    assert pagina['fecha'].nunique() == 1
+    assert cursor == (INICIO, pagina['id'].iloc[-1])
+    
+    siguiente, _ = data_manager.obtener_pagina_lecturas(orden='fecha', descendente=False, tamano=4, despues_de=cursor)
+    assert (siguiente['fecha'] == INICIO).all()
+    assert siguiente['id'].tolist() == _esperado(lecturas, 'fecha', False)[3:7]
+
+
+def test_filtros_con_cursor(data_manager, lecturas):
+    filtros = dict(aire_id=3, desde=INICIO + timedelta(hours=2), hasta=INICIO + timedelta(hours=7))
+    ids, _ = _recorrer(data_manager, 2, orden='temperatura', descendente=True, **filtros)
+    
+    filtradas = [
+        l for l in lecturas
+        if l['aire_id'] == 3 and filtros['desde'] <= l['fecha'] < filtros['hasta']
+    ]
+    assert ids == _esperado(filtradas, 'temperatura', True)
+
+
+def test_lecturas_nuevas_no_desplazan_las_paginas(data_manager, lecturas):
+    primera, cursor = data_manager.obtener_pagina_lecturas(orden='fecha', descendente=True, tamano=10)
+    
+    # Una lectura más reciente que el cursor no aparece ni repite filas en la
+    # página siguiente, como ocurriría con OFFSET
+    data_manager.agregar_lecturas_lote([
+        {'aire_id': 1, 'fecha': INICIO + timedelta(days=1), 'temperatura': 21.0, 'humedad': 50.0}
+    ])
+    segunda, _ = data_manager.obtener_pagina_lecturas(orden='fecha', descendente=True, tamano=10, despues_de=cursor)
+    
+    assert segunda['id'].tolist() == _esperado(lecturas, 'fecha', True)[10:20]
+    assert not set(primera['id']) & set(segunda['id'])
+
+
+def test_pagina_incluye_el_nombre_del_aire(data_manager, lecturas):
+    pagina, _ = data_manager.obtener_pagina_lecturas(aire_id=2, tamano=3)
+    
+    assert list(pagina.columns) == ['id', 'aire_id', 'nombre', 'fecha', 'temperatura', 'humedad']
+    assert (pagina['nombre'] == 'Aire 2').all()
+
+
+def test_orden_desconocido(data_manager):
+    with pytest.raises(ValueError):
+        data_manager.obtener_pagina_lecturas(orden='aire_id')
@@ -0,0 +1,126 @@
+"""
+Pruebas del particionado mensual de lecturas en PostgreSQL.
+
+Necesitan una base PostgreSQL de pruebas en PRUEBAS_POSTGRES_URL; sin ella
+se omiten. Cada prueba trabaja en un esquema propio que se elimina al final.
+"""
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import database
+import particionado
+
+URL = os.environ.get('PRUEBAS_POSTGRES_URL')
+ESQUEMA = 'pruebas_particionado'
+
+pytestmark = pytest.mark.skipif(not URL, reason="sin PRUEBAS_POSTGRES_URL")
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(URL, connect_args={'options': f'-csearch_path={ESQUEMA}'})
+    with engine.begin() as conexion:
+        conexion.execute(text(f"DROP SCHEMA IF EXISTS {ESQUEMA} CASCADE"))
+        conexion.execute(text(f"CREATE SCHEMA {ESQUEMA}"))
+    
+    # init_db sobre este motor, con el particionado activado y sin retención
+    monkeypatch.setenv('LECTURAS_PARTICIONADAS', 'True')
+    monkeypatch.setenv('LECTURAS_MESES_FUTUROS', '0')
+    monkeypatch.delenv('LECTURAS_MESES_RETENCION', raising=False)
+    monkeypatch.setattr(database, 'engine', engine)
+    monkeypatch.setattr(database, '_esquema_preparado', False)
+    
+    yield engine
+    
+    with engine.begin() as conexion:
+        conexion.execute(text(f"DROP SCHEMA {ESQUEMA} CASCADE"))
+    engine.dispose()
+
+
+def _indices(engine):
+    with engine.connect() as conexion:
+        filas = conexion.execute(text(
+            "SELECT tablename, indexname, indexdef FROM pg_indexes WHERE schemaname = :esquema"
+        ), {'esquema': ESQUEMA})
+        return {(fila.tablename, fila.indexname): fila.indexdef for fila in filas}
+
+
+def _insertar(engine, *fechas):
+    with engine.begin() as conexion:
+        conexion.execute(text("INSERT INTO aires_acondicionados (id, nombre, ubicacion) VALUES (1, 'Aire 1', 'Sala') ON CONFLICT DO NOTHING"))
+        conexion.execute(
+            text("INSERT INTO lecturas (aire_id, fecha, temperatura, humedad) VALUES (1, :fecha, 22.0, 50.0)"),
+            [{'fecha': fecha} for fecha in fechas]
+        )
+
+
+def test_init_db_particiona_sin_btree_sobre_fecha(engine, monkeypatch):
+    database.init_db()
+    _insertar(engine, datetime(2024, 1, 10))
+    particionado.crear_particiones_futuras(engine, 0, desde=date(2024, 1, 1))
+    
+    # Un segundo arranque no vuelve a crear el índice sustituido
+    monkeypatch.setattr(database, '_esquema_preparado', False)
+    database.init_db()
+    
+    indices = _indices(engine)
+    assert not [nombre for _, nombre in indices if nombre.startswith('ix_lecturas_fecha') and 'brin' not in nombre]
+    assert 'USING brin' in indices[('lecturas', 'ix_lecturas_fecha_brin')]
+    
+    # Por partición, solo el BRIN, el índice único y la clave primaria
+    metodos = sorted(
+        definicion.split(' USING ')[1].split(' ')[0]
+        for (tabla, _), definicion in indices.items() if tabla == 'lecturas_2024_01'
+    )
+    assert metodos == ['brin', 'btree', 'btree']
+
+
+def test_particionar_elimina_el_btree_de_versiones_anteriores(engine):
+    database.init_db()
+    with engine.begin() as conexion:
+        conexion.execute(text("CREATE INDEX ix_lecturas_fecha ON lecturas (fecha)"))
+    
+    particionado.particionar_lecturas(engine)
+    
+    assert ('lecturas', 'ix_lecturas_fecha') not in _indices(engine)
+
+
+def test_migracion_conserva_lecturas_y_secuencia(engine, monkeypatch):
+    monkeypatch.setenv('LECTURAS_PARTICIONADAS', 'False')
+    database.init_db()
+    _insertar(engine, datetime(2024, 1, 10), datetime(2024, 3, 5))
+    
+    particionado.particionar_lecturas(engine)
+    _insertar(engine, datetime(2024, 3, 6))
+    
+    with engine.connect() as conexion:
+        assert particionado.esta_particionada(conexion)
+        assert [nombre for nombre, _ in particionado.obtener_particiones(conexion)] == [
+            'lecturas_2024_01', 'lecturas_2024_02', 'lecturas_2024_03'
+        ]
+        assert conexion.execute(text("SELECT array_agg(id ORDER BY id) FROM lecturas")).scalar() == [1, 2, 3]
+
+
+def test_solo_se_separan_las_particiones_vacias(engine):
+    database.init_db()
+    _insertar(engine, datetime(2024, 1, 10), datetime(2024, 2, 10))
+    particionado.crear_particiones_futuras(engine, 2, desde=date(2024, 1, 1))
+    
+    # Enero y febrero tienen lecturas sin compactar: no se separan
+    assert particionado.desasociar_particiones_antiguas(engine, 6, desde=date(2024, 10, 1)) == ['lecturas_2024_03']
+    
+    with engine.begin() as conexion:
+        conexion.execute(text("DELETE FROM lecturas WHERE fecha < '2024-02-01'"))
+    
+    separadas = particionado.desasociar_particiones_antiguas(engine, 6, eliminar=True, desde=date(2024, 10, 1))
+    
+    assert separadas == ['lecturas_2024_01']
+    with engine.connect() as conexion:
+        # La del mes actual la crea init_db
+        antiguas = [nombre for nombre, mes in particionado.obtener_particiones(conexion) if mes.year == 2024]
+        assert antiguas == ['lecturas_2024_02']
+        assert conexion.execute(text("SELECT to_regclass('lecturas_2024_01')")).scalar() is None
+        assert conexion.execute(text("SELECT count(*) FROM lecturas")).scalar() == 1
@@ -0,0 +1,122 @@
+"""
+Pruebas de las capturas de perfil de una página y del listener de commits
+que abre la ventana de escritura de los enrutadores de consultas.
+"""
+import gc
+import os
+import threading
+
+import pytest
+
+import data_manager as modulo_data_manager
+import perfilado
+from database import Session, session
+
+
+def _calcular():
+    return sum(numero * numero for numero in range(20000))
+
+
+def test_perfilar_guarda_la_captura(tmp_path):
+    with perfilado.perfilar('Análisis de tendencias', directorio=tmp_path) as captura:
+        assert captura.ruta is None
+        _calcular()
+    
+    assert os.path.basename(captura.ruta).startswith('analisis_de_tendencias_')
+    assert captura.ruta.endswith('.prof') and os.path.exists(captura.ruta)
+    
+    resumen = perfilado.resumen_funciones(captura.ruta, solo_aplicacion=True)
+    assert list(resumen.columns) == perfilado.COLUMNAS_RESUMEN
+    assert '_calcular' in resumen['funcion'].tolist()
+    assert set(resumen['archivo']) <= {os.path.join('tests', 'test_perfilado.py'), 'perfilado.py'}
+    
+    assert len(perfilado.resumen_funciones(captura.ruta, limite=3)) == 3
+
+
+def test_perfilar_guarda_la_captura_si_la_pagina_falla(tmp_path):
+    with pytest.raises(ZeroDivisionError):
+        with perfilado.perfilar('Dashboard', directorio=tmp_path) as captura:
+            1 / 0
+    
+    assert os.path.exists(captura.ruta)
+    # El bloqueo se libera: la siguiente ejecución también se perfila
+    with perfilado.perfilar('Dashboard', directorio=tmp_path) as siguiente:
+        pass
+    assert siguiente.ruta is not None
+
+
+def test_una_sola_captura_a_la_vez(tmp_path):
+    dentro, salir = threading.Event(), threading.Event()
+    
+    def otra_sesion():
+        with perfilado.perfilar('Dashboard', directorio=tmp_path):
+            dentro.set()
+            salir.wait(5)
+    
+    hilo = threading.Thread(target=otra_sesion)
+    hilo.start()
+    dentro.wait(5)
+    try:
+        with perfilado.perfilar('Reportes', directorio=tmp_path) as captura:
+            _calcular()
+    finally:
+        salir.set()
+        hilo.join()
+    
+    assert captura.ruta is None
+    assert perfilado.listar_capturas(tmp_path)['archivo'].str.startswith('dashboard_').tolist() == [True]
+
+
+def test_listar_capturas(tmp_path):
+    assert perfilado.listar_capturas(tmp_path / 'no_existe').empty
+    
+    rutas = []
+    for pagina in ('Dashboard', 'Reportes'):
+        with perfilado.perfilar(pagina, directorio=tmp_path) as captura:
+            pass
+        rutas.append(captura.ruta)
+    os.utime(rutas[0], (1, 1))
+    (tmp_path / 'notas.txt').write_text('no es una captura')
+    
+    capturas = perfilado.listar_capturas(tmp_path)
+    
+    assert capturas['ruta'].tolist() == [rutas[1], rutas[0]]
+    assert (capturas['tamano_kb'] > 0).all()
+
+
+def test_un_solo_listener_de_commit_para_todas_las_instancias(data_manager):
+    listeners = list(Session().dispatch.after_commit)
+    otras = [modulo_data_manager.DataManager(buffer_escritura=False) for _ in range(3)]
+    enrutadores = [data_manager.consultas] + [otra.consultas for otra in otras]
+    
+    assert list(Session().dispatch.after_commit) == listeners
+    assert modulo_data_manager._registrar_escritura in listeners
+    assert all(enrutador in modulo_data_manager._enrutadores_consultas for enrutador in enrutadores)
+    
+    # Cada commit abre la ventana de escritura de todas las instancias vivas
+    antes = [enrutador._ultima_escritura for enrutador in enrutadores]
+    session.commit()
+    assert all(enrutador._ultima_escritura > previa for enrutador, previa in zip(enrutadores, antes))
+    
+    # Las instancias eliminadas no quedan retenidas por el listener
+    vivos = len(modulo_data_manager._enrutadores_consultas)
+    del otras, enrutadores
+    gc.collect()
+    assert len(modulo_data_manager._enrutadores_consultas) == vivos - 3
+
+
+def test_mantenimientos_en_la_replica_fuera_de_la_ventana(data_manager, monkeypatch):
+    data_manager.agregar_mantenimiento(1, "Preventivo", "Limpieza de filtros", "Técnico")
+    
+    # La propia base de pruebas hace de réplica
+    consultas = data_manager.consultas
+    monkeypatch.setattr(consultas, 'fabrica_replica', Session)
+    monkeypatch.setattr(consultas, 'ventana_escritura', 60)
+    
+    # Justo después de una escritura se lee de la principal
+    assert len(data_manager.obtener_mantenimientos(1)) == 1
+    assert (consultas.consultas_replica, consultas.consultas_principal) == (0, 1)
+    
+    monkeypatch.setattr(consultas, 'ventana_escritura', 0)
+    assert len(data_manager.obtener_mantenimientos(1)) == 1
+    assert consultas.consultas_replica == 1
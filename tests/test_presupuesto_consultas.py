@@ -0,0 +1,116 @@
+"""
+Presupuestos de consultas de las funciones de DataManager que usa el
+dashboard: un número fijo de sentencias, sin repeticiones (N+1) e
+independiente del número de aires.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from database import AireAcondicionado, session
+from instrumentacion import (
+    ContadorConsultas, PresupuestoConsultasExcedido, contar_consultas, normalizar_sentencia,
+    presupuesto_consultas
+)
+
+# (nombre, función, presupuesto) en el orden en que las llama el dashboard
+CONSULTAS_DASHBOARD = [
+    ('obtener_aires', lambda dm: dm.obtener_aires(), 1),
+    ('obtener_lecturas', lambda dm: dm.obtener_lecturas(incluir_compactadas=True), 2),
+    ('obtener_estadisticas_generales', lambda dm: dm.obtener_estadisticas_generales(), 2),
+    ('obtener_alertas_activas', lambda dm: dm.obtener_alertas_activas(), 1),
+    ('obtener_anomalias_activas', lambda dm: dm.obtener_anomalias_activas(), 1),
+    # Incluye cargar el catálogo de aires si nadie lo ha cargado antes
+    ('obtener_tendencias', lambda dm: dm.obtener_tendencias(), 5),
+    ('obtener_catalogo_aires', lambda dm: dm.obtener_catalogo_aires().opciones_con_todos(), 1),
+    # Panel en vivo: carga inicial y un refresco
+    ('obtener_acumulados_lecturas', lambda dm: dm.obtener_acumulados_lecturas(), 3),
+    ('obtener_lecturas_nuevas', lambda dm: dm.obtener_lecturas_nuevas(10, vistas=set()), 2),
+]
+
+
+def _flota(data_manager, aires_extra=0):
+    # Los siete aires predeterminados más aires_extra, con tres días de lecturas,
+    # umbrales global y específico, una alerta activa y una anomalía
+    session.add_all([
+        AireAcondicionado(nombre=f"Extra {numero}", ubicacion=f"Sala {numero % 3}", fecha_instalacion='2024-01-01')
+        for numero in range(aires_extra)
+    ])
+    session.commit()
+    data_manager._invalidar_catalogo_aires()
+    aires_ids = data_manager.obtener_catalogo_aires().ids
+    
+    data_manager.crear_umbral_configuracion("Global", True, 18.0, 26.0, 30.0, 70.0)
+    data_manager.crear_umbral_configuracion("Específico", False, 18.0, 24.0, 30.0, 70.0, aire_id=aires_ids[1])
+    
+    rng = np.random.default_rng(0)
+    inicio = datetime.now() - timedelta(days=3)
+    data_manager.agregar_lecturas_lote([
+        {
+            'aire_id': aire_id,
+            'fecha': inicio + timedelta(minutes=30 * paso),
+            'temperatura': float(22 + rng.normal() + (6 if aire_id == aires_ids[2] and paso > 100 else 0)),
+            'humedad': float(50 + rng.normal())
+        }
+        for paso in range(144)
+        for aire_id in aires_ids
+    ])
+    
+    # Sin cachés en memoria: se mide la primera carga de la página
+    data_manager._invalidar_catalogo_aires()
+    data_manager._invalidar_caches_lecturas()
+
+
+@pytest.mark.parametrize('nombre, funcion, maximo', CONSULTAS_DASHBOARD, ids=[c[0] for c in CONSULTAS_DASHBOARD])
+def test_consultas_del_dashboard_dentro_del_presupuesto(data_manager, nombre, funcion, maximo):
+    _flota(data_manager)
+    
+    with presupuesto_consultas(maximo, repeticiones=2):
+        funcion(data_manager)
+
+
+def test_dashboard_completo_dentro_del_presupuesto(data_manager):
+    _flota(data_manager)
+    
+    with presupuesto_consultas(sum(maximo for _, _, maximo in CONSULTAS_DASHBOARD)) as contador:
+        for _, funcion, _ in CONSULTAS_DASHBOARD:
+            funcion(data_manager)
+    
+    assert contador.total > 0
+
+
+def test_consultas_no_crecen_con_el_numero_de_aires(data_manager):
+    _flota(data_manager, aires_extra=14)
+    
+    for nombre, funcion, maximo in CONSULTAS_DASHBOARD:
+        with contar_consultas() as contador:
+            funcion(data_manager)
+        assert contador.total <= maximo, nombre
+        assert not contador.repetidas(2), nombre
+
+
+def test_presupuesto_excedido():
+    with pytest.raises(PresupuestoConsultasExcedido, match='3 consultas'):
+        with presupuesto_consultas(2, repeticiones=None) as contador:
+            for numero in range(3):
+                session.execute(text(f"SELECT {numero}"))
+    
+    assert contador.total == 3
+
+
+def test_sentencia_repetida_se_detecta_como_n_mas_1():
+    with pytest.raises(PresupuestoConsultasExcedido, match='posible N\\+1'):
+        with presupuesto_consultas(None, repeticiones=3):
+            for numero in range(3):
+                session.execute(text("SELECT :valor"), {'valor': numero})
+
+
+def test_listas_in_se_agrupan_como_una_sentencia():
+    contador = ContadorConsultas()
+    contador.registrar("SELECT * FROM lecturas WHERE aire_id IN (?, ?, ?)")
+    contador.registrar("SELECT *  FROM lecturas\n WHERE aire_id IN (?)")
+    
+    assert contador.repetidas(2) == [(normalizar_sentencia("SELECT * FROM lecturas WHERE aire_id IN (?)"), 2)]
+
@@ -0,0 +1,165 @@
+"""
+Pruebas del servidor de ingesta: validación, división de los lotes que la
+base de datos rechaza, reintento de los errores transitorios y contrapresión.
+"""
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.exc import DataError, OperationalError
+
+from database import Lectura, session
+from servidor_ingesta import ErrorValidacion, ServidorIngesta, validar_lectura
+
+INICIO = datetime(2025, 9, 1, 10)
+
+
+def _datos(paso=0, aire_id=1, **cambios):
+    datos = {'aire_id': aire_id, 'fecha': (INICIO + timedelta(minutes=paso)).isoformat(), 'temperatura': 22.0, 'humedad': 50.0}
+    return dict(datos, **cambios)
+
+
+def test_validar_lectura():
+    lectura = validar_lectura(_datos(aire_id='2', temperatura='21.5'), {1, 2})
+    assert lectura == {'aire_id': 2, 'fecha': INICIO, 'temperatura': 21.5, 'humedad': 50.0}
+    
+    # Las fechas con zona horaria se guardan en la hora local, sin zona
+    con_zona = datetime(2025, 9, 1, 10, tzinfo=timezone.utc)
+    lectura = validar_lectura(_datos(fecha=con_zona.isoformat()), {1})
+    assert lectura['fecha'] == con_zona.astimezone().replace(tzinfo=None)
+
+
+@pytest.mark.parametrize('datos, mensaje', [
+    ([1, 2], 'objeto JSON'),
+    ({'aire_id': 1, 'temperatura': 22.0, 'humedad': 50.0}, 'falta el campo fecha'),
+    ({'aire_id': 1, 'fecha': '2025-09-01', 'humedad': 50.0}, 'falta el campo temperatura'),
+    (_datos(aire_id=9), 'no existe el aire'),
+    (_datos(temperatura=80.0), 'temperatura fuera de rango'),
+    (_datos(humedad='mucha'), 'numéricos'),
+    (_datos(fecha='ayer'), 'fecha no válida'),
+])
+def test_validar_lectura_rechaza(datos, mensaje):
+    with pytest.raises(ErrorValidacion, match=mensaje):
+        validar_lectura(datos, {1})
+
+
+def _lote(cantidad, aire_id=1):
+    return [validar_lectura(_datos(paso, aire_id), {aire_id}) for paso in range(cantidad)]
+
+
+def test_lote_con_lecturas_rechazadas_se_divide(data_manager):
+    servidor = ServidorIngesta(data_manager, tamano_lote=10)
+    
+    # Dos lecturas de un aire que no existe (clave foránea) entre ocho válidas
+    lote = _lote(8)
+    lote[2:2] = _lote(2, aire_id=99)
+    
+    assert servidor._escribir_lote(lote) == 8
+    assert [lectura['aire_id'] for lectura in servidor.descartadas] == [99, 99]
+    assert servidor.total_descartadas == 2
+    assert session.query(Lectura).count() == 8
+
+
+def test_error_de_datos_se_aisla(data_manager, monkeypatch):
+    servidor = ServidorIngesta(data_manager)
+    original = data_manager.agregar_lecturas_lote
+    llamadas = []
+    
+    def agregar(lecturas, modo):
+        llamadas.append(len(lecturas))
+        if any(lectura['humedad'] < 0 for lectura in lecturas):
+            raise DataError("INSERT", {}, Exception("valor fuera de rango"))
+        return original(lecturas, modo)
+    
+    monkeypatch.setattr(data_manager, 'agregar_lecturas_lote', agregar)
+    lote = _lote(16)
+    lote[5]['humedad'] = -1.0
+    
+    assert servidor._escribir_lote(lote) == 15
+    # Bisección: log2(16) divisiones hasta la lectura que falla, no una por lectura
+    assert len(llamadas) < 16
+    assert list(servidor.descartadas) == [lote[5]]
+
+
+def test_error_transitorio_devuelve_el_lote_a_la_cola(data_manager, monkeypatch):
+    servidor = ServidorIngesta(data_manager, tamano_lote=4)
+    original = data_manager.agregar_lecturas_lote
+    fallos = [OperationalError("INSERT", {}, Exception("conexión perdida"))]
+    
+    def agregar(lecturas, modo):
+        if fallos:
+            raise fallos.pop()
+        return original(lecturas, modo)
+    
+    monkeypatch.setattr(data_manager, 'agregar_lecturas_lote', agregar)
+    servidor.pendientes = _lote(10)
+    
+    asyncio.run(servidor.escribir_pendientes())
+    assert len(servidor.pendientes) == 10 and servidor.total_escritas == 0
+    
+    asyncio.run(servidor.escribir_pendientes())
+    assert servidor.pendientes == [] and servidor.total_escritas == 10
+    assert session.query(Lectura).count() == 10
+
+
+def test_contrapresion(data_manager, monkeypatch):
+    servidor = ServidorIngesta(data_manager, tamano_lote=2, max_pendientes=4)
+    servidor.aires_validos = {1}
+    liberar = threading.Event()
+    
+    def escribir_lote(lote):
+        liberar.wait(5)
+        return len(lote)
+    
+    monkeypatch.setattr(servidor, '_escribir_lote', escribir_lote)
+    
+    async def escenario():
+        # Cuatro lecturas llenan el búfer: se empieza a escribir y se frena a los clientes
+        respuesta = await servidor._procesar_linea(json.dumps([_datos(paso) for paso in range(4)]).encode())
+        assert json.loads(respuesta) == {'ok': True, 'aceptadas': 4}
+        assert not servidor._hay_espacio.is_set()
+        
+        siguiente = asyncio.create_task(servidor._procesar_linea(json.dumps(_datos(4)).encode()))
+        await asyncio.sleep(0.1)
+        assert not siguiente.done()
+        
+        # Al terminar la escritura en curso hay espacio y el cliente continúa
+        liberar.set()
+        assert json.loads(await asyncio.wait_for(siguiente, 5)) == {'ok': True, 'aceptadas': 1}
+        
+        await servidor.escribir_pendientes()
+    
+    asyncio.run(escenario())
+    assert servidor.total_escritas == 5
+
+
+def test_protocolo_tcp(data_manager):
+    servidor = ServidorIngesta(data_manager, tamano_lote=100, intervalo=60)
+    
+    async def escenario():
+        await servidor.iniciar('127.0.0.1', 0)
+        puerto = servidor._servidor.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', puerto)
+        
+        respuestas = []
+        for linea in (json.dumps([_datos(0), _datos(1)]), 'no es JSON', json.dumps(_datos(0))):
+            writer.write(linea.encode() + b'\n')
+            await writer.drain()
+            respuestas.append(json.loads(await reader.readline()))
+        
+        writer.close()
+        await servidor.detener()
+        return respuestas
+    
+    respuestas = asyncio.run(escenario())
+    
+    assert respuestas == [
+        {'ok': True, 'aceptadas': 2},
+        {'ok': False, 'error': 'JSON no valido'},
+        {'ok': True, 'aceptadas': 1}
+    ]
+    # La lectura repetida se descarta al escribir (modo 'ignorar')
+    assert servidor.total_escritas == 3
+    assert session.query(Lectura).count() == 2
@@ -0,0 +1,103 @@
+"""
+Pruebas del ajuste vectorizado de tendencias, de la proyección hasta el
+umbral y de la caché de ajustes de DataManager.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import insert
+
+import tendencias
+from database import Lectura, session
+
+INICIO = datetime(2025, 8, 1)
+
+
+def _ajustar(series, modelo='lineal'):
+    # series: lista de (horas, valores) por grupo, con horas absolutas
+    grupos = np.concatenate([np.full(len(horas), grupo) for grupo, (horas, _) in enumerate(series)])
+    absolutas = np.concatenate([horas for horas, _ in series])
+    valores = np.concatenate([valores for _, valores in series])
+    referencias = np.array([horas.max() for horas, _ in series])
+    return tendencias.ajustar_tendencias(grupos, absolutas - referencias[grupos], valores, referencias, modelo)
+
+
+def test_ajuste_lineal_por_grupo():
+    horas = np.arange(0.0, 48.0)
+    ajuste = _ajustar([(horas, 20 + 0.1 * horas), (horas[:10], np.full(10, 25.0))])
+    
+    np.testing.assert_allclose(ajuste['pendiente'], [0.1, 0.0], atol=1e-9)
+    np.testing.assert_allclose(ajuste['nivel'], [20 + 0.1 * 47, 25.0])
+    np.testing.assert_array_equal(ajuste['lecturas'], [48, 10])
+    np.testing.assert_allclose(ajuste['residuo'], 0.0, atol=1e-6)
+
+
+def test_ajuste_estacional_separa_el_ciclo_diario():
+    horas = np.arange(1000.0, 1000.0 + 24 * 7)
+    angulo = 2 * np.pi * horas / 24
+    valores = 22 + 0.01 * (horas - horas[0]) + 2 * np.sin(angulo)
+    
+    ajuste = _ajustar([(horas, valores)], modelo='estacional')
+    
+    np.testing.assert_allclose(ajuste['pendiente'], [0.01], atol=1e-6)
+    np.testing.assert_allclose(ajuste['amplitud'], [2.0], atol=1e-6)
+    np.testing.assert_allclose(ajuste['nivel'], [valores[-1]], atol=1e-6)
+
+
+def test_modelo_desconocido():
+    with pytest.raises(ValueError):
+        _ajustar([(np.arange(5.0), np.ones(5))], modelo='cuadratico')
+
+
+def test_horas_hasta_umbral():
+    ajuste = {
+        'tendencia': np.array([20.0, 20.0, 27.0, 20.0, 20.0]),
+        'amplitud': np.zeros(5),
+        'pendiente': np.array([0.5, -0.1, 0.5, 1e-12, 0.5])
+    }
+    
+    horas = tendencias.horas_hasta_umbral(ajuste, np.array([26.0, 26.0, 26.0, 26.0, np.nan]))
+    
+    # Creciente, decreciente, ya superado, fuera del horizonte y sin umbral
+    np.testing.assert_array_equal(horas[:4], [12.0, np.inf, 0.0, np.inf])
+    assert np.isnan(horas[4])
+
+
+def _lecturas(aire_id, pendiente, pasos=24):
+    return [
+        {'aire_id': aire_id, 'fecha': INICIO + timedelta(hours=paso), 'temperatura': 20 + pendiente * paso, 'humedad': 50.0}
+        for paso in range(pasos)
+    ]
+
+
+def test_ranking_por_horas_hasta_el_umbral(data_manager):
+    data_manager.crear_umbral_configuracion("Global", True, 18.0, 30.0, 30.0, 70.0)
+    data_manager.agregar_lecturas_lote(_lecturas(1, 0.1) + _lecturas(2, 0.3) + _lecturas(3, -0.1))
+    
+    tendencias_df = data_manager.obtener_tendencias()
+    
+    assert tendencias_df['aire_id'].tolist() == [2, 1, 3]
+    np.testing.assert_allclose(tendencias_df['pendiente_dia'], [7.2, 2.4, -2.4])
+    assert tendencias_df['horas_hasta_umbral'].iloc[2] == np.inf
+    assert tendencias_df['nombre'].tolist() == ['Aire 2', 'Aire 1', 'Aire 3']
+
+
+def test_cache_incluye_lecturas_confirmadas_tarde(data_manager):
+    # Los IDs 1-23 y 25-48 confirmados; el 24, del aire 1, se confirma después
+    filas = [dict(lectura, id=numero + 1) for numero, lectura in enumerate(_lecturas(1, 0.1, 25) + _lecturas(2, 0.2, 23))]
+    tardia = filas.pop(23)
+    session.execute(insert(Lectura), filas)
+    session.commit()
+    
+    antes = data_manager.obtener_tendencias().set_index('aire_id')
+    assert antes.loc[1, 'lecturas'] == 24
+    
+    # Con un ID menor que el último, la última lectura no cambia
+    tardia['temperatura'] = 40.0
+    session.execute(insert(Lectura), [tardia])
+    session.commit()
+    
+    despues = data_manager.obtener_tendencias().set_index('aire_id')
+    assert despues.loc[1, 'lecturas'] == 25
+    assert despues.loc[1, 'temperatura_actual'] > antes.loc[1, 'temperatura_actual']
@@ -0,0 +1,82 @@
+"""
+Pruebas del cálculo en la base de datos de la variabilidad por mes y por
+aire, comparado con el cálculo en pandas de utils.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utils
+
+# Fuera de una retención de un día, para compactar parte de las lecturas
+INICIO = (datetime.now() - timedelta(days=70)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _lecturas(aire_id, dias=60, por_dia=4):
+    generador = np.random.default_rng(aire_id)
+    return [
+        {
+            'aire_id': aire_id,
+            'fecha': INICIO + timedelta(days=dia, hours=6 * paso),
+            'temperatura': float(round(generador.normal(20 + aire_id, 1.5), 2)),
+            'humedad': float(round(generador.normal(50, 4), 2))
+        }
+        for dia in range(dias) for paso in range(por_dia)
+    ]
+
+
+def _esperado(lecturas, variable, clave):
+    df = pd.DataFrame(lecturas)
+    if clave == 'mes_año':
+        df['mes_año'] = df['fecha'].dt.strftime('%Y-%m')
+    esperado = df.groupby(clave)[variable].agg(['mean', 'std', 'count']).reset_index()
+    esperado.columns = [clave, 'promedio', 'desviacion', 'lecturas']
+    return esperado
+
+
+@pytest.mark.parametrize('variable', ['temperatura', 'humedad'])
+@pytest.mark.parametrize('compactar', [False, True])
+def test_variacion_por_mes_de_un_aire(data_manager, variable, compactar):
+    lecturas = _lecturas(1) + _lecturas(2, dias=10)
+    data_manager.agregar_lecturas_lote(lecturas)
+    if compactar:
+        # Las lecturas de los primeros días pasan a horas compactadas
+        data_manager.compactar_lecturas(dias_retencion=40)
+    
+    variacion = data_manager.obtener_variacion(variable, aire_id=1)
+    
+    esperado = _esperado([l for l in lecturas if l['aire_id'] == 1], variable, 'mes_año')
+    pd.testing.assert_frame_equal(variacion, esperado, check_dtype=False)
+
+
+def test_variacion_por_aire(data_manager):
+    lecturas = _lecturas(1, dias=5) + _lecturas(3, dias=8) + _lecturas(4, dias=1, por_dia=1)
+    data_manager.agregar_lecturas_lote(lecturas)
+    
+    variacion = data_manager.obtener_variacion('temperatura')
+    
+    esperado = _esperado(lecturas, 'temperatura', 'aire_id')
+    # Con una sola lectura la desviación es 0, no NaN
+    esperado['desviacion'] = esperado['desviacion'].fillna(0.0)
+    pd.testing.assert_frame_equal(variacion, esperado, check_dtype=False)
+
+
+def test_variacion_sin_lecturas(data_manager):
+    variacion = data_manager.obtener_variacion('humedad', aire_id=1)
+    
+    assert variacion.empty
+    assert list(variacion.columns) == ['mes_año', 'promedio', 'desviacion', 'lecturas']
+
+
+def test_grafico_con_variacion_precalculada(data_manager):
+    lecturas = _lecturas(1, dias=40)
+    data_manager.agregar_lecturas_lote(lecturas)
+    
+    precalculada = utils.crear_grafico_variacion(None, aire_id=1, variacion_df=data_manager.obtener_variacion('temperatura', aire_id=1))
+    desde_lecturas = utils.crear_grafico_variacion(pd.DataFrame(lecturas), aire_id=1)
+    
+    assert len(precalculada.data) == len(desde_lecturas.data) > 0
+    for traza_sql, traza_pandas in zip(precalculada.data, desde_lecturas.data):
+        np.testing.assert_allclose(traza_sql.y, traza_pandas.y)
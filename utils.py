@@ -3,7 +3,109 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
+from instrumentacion import cronometrar
 
+def calcular_estadisticas_por_grupo(df, claves, variable):
+    """
+    Calcula promedio, mínimo, máximo, desviación estándar y número de lecturas
+    de una variable por grupo, ponderando las horas compactadas
+    
+    Args:
+        df: DataFrame con las lecturas (puede incluir filas compactadas por hora)
+        claves: Columna o lista de columnas por las que agrupar
+        variable: 'temperatura' o 'humedad'
+    
+    Returns:
+        DataFrame indexado por las claves con columnas mean, min, max, std y count
+    """
+    # Sin horas compactadas basta con la agregación directa
+    if 'cantidad' not in df.columns:
+        return df.groupby(claves)[variable].agg(['mean', 'min', 'max', 'std', 'count'])
+    
+    claves = [claves] if isinstance(claves, str) else list(claves)
+    
+    # Cada lectura original cuenta como una hora compactada con una sola lectura
+    valores = df[variable]
+    cantidad = df['cantidad'].fillna(1)
+    
+    parcial = df[claves].copy()
+    parcial['n'] = cantidad
+    parcial['suma'] = valores * cantidad
+    parcial['cuadrados'] = df[f'{variable}_suma_cuadrados'].fillna(valores * valores)
+    parcial['min'] = df[f'{variable}_min'].fillna(valores)
+    parcial['max'] = df[f'{variable}_max'].fillna(valores)
+    
+    grupos = parcial.groupby(claves).agg(
+        n=('n', 'sum'),
+        suma=('suma', 'sum'),
+        cuadrados=('cuadrados', 'sum'),
+        min=('min', 'min'),
+        max=('max', 'max')
+    )
+    
+    media = grupos['suma'] / grupos['n']
+    varianza = ((grupos['cuadrados'] - grupos['n'] * media ** 2) / (grupos['n'] - 1)).clip(lower=0)
+    
+    return pd.DataFrame({
+        'mean': media,
+        'min': grupos['min'],
+        'max': grupos['max'],
+        'std': np.sqrt(varianza).where(grupos['n'] > 1),
+        'count': grupos['n'].astype(int)
+    })
+
+def actualizar_estadisticas_incrementales(acumulados, lecturas_df):
+    """
+    Añade lecturas nuevas a unos acumulados sin volver a recorrer las anteriores.
+    
+    Args:
+        acumulados: Diccionario con total_lecturas y, para temperatura y humedad,
+            suma, minimo y maximo (ver DataManager.obtener_acumulados_lecturas)
+        lecturas_df: DataFrame con las lecturas nuevas
+        
+    Returns:
+        Diccionario de acumulados actualizado
+    """
+    if lecturas_df.empty:
+        return acumulados
+    
+    nuevos = {'total_lecturas': acumulados['total_lecturas'] + len(lecturas_df)}
+    
+    for variable in ['temperatura', 'humedad']:
+        anterior = acumulados[variable]
+        valores = lecturas_df[variable]
+        nuevos[variable] = {
+            'suma': anterior['suma'] + valores.sum(),
+            'minimo': valores.min() if anterior['minimo'] is None else min(anterior['minimo'], valores.min()),
+            'maximo': valores.max() if anterior['maximo'] is None else max(anterior['maximo'], valores.max())
+        }
+    
+    return nuevos
+
+def resumir_estadisticas_incrementales(acumulados):
+    """
+    Convierte unos acumulados al formato de DataManager.obtener_estadisticas_generales.
+    
+    Args:
+        acumulados: Diccionario de acumulados
+        
+    Returns:
+        Diccionario con promedio, mínimo y máximo de temperatura y humedad y el total de lecturas
+    """
+    total = acumulados['total_lecturas']
+    resumen = {'total_lecturas': total}
+    
+    for variable in ['temperatura', 'humedad']:
+        datos = acumulados[variable]
+        resumen[variable] = {
+            'promedio': round(datos['suma'] / total, 2) if total else 0,
+            'minimo': round(datos['minimo'], 2) if datos['minimo'] is not None else 0,
+            'maximo': round(datos['maximo'], 2) if datos['maximo'] is not None else 0
+        }
+    
+    return resumen
+
+@cronometrar('grafico')
 def crear_grafico_temperatura_humedad(lecturas_df, aire_id=None, periodo='todo'):
     """
     Crea gráficos de línea para temperatura y humedad
@@ -105,6 +207,7 @@ def crear_grafico_temperatura_humedad(lecturas_df, aire_id=None, periodo='todo')
     
     return fig_temp, fig_hum
 
+@cronometrar('grafico')
 def crear_grafico_comparativo(lecturas_df, variable='temperatura'):
     """
     Crea un gráfico de barras para comparar temperatura o humedad entre aires acondicionados
@@ -122,7 +225,7 @@ def crear_grafico_comparativo(lecturas_df, variable='temperatura'):
         return fig
     
     # Agrupar por aire_id y calcular estadísticas
-    df_agrupado = lecturas_df.groupby('aire_id')[variable].agg(['mean', 'min', 'max']).reset_index()
+    df_agrupado = calcular_estadisticas_por_grupo(lecturas_df, 'aire_id', variable)[['mean', 'min', 'max']].reset_index()
     df_agrupado.columns = ['aire_id', 'promedio', 'minimo', 'maximo']
     
     # Crear gráfico
@@ -166,18 +269,29 @@ def crear_grafico_comparativo(lecturas_df, variable='temperatura'):
     
     return fig
 
-def crear_grafico_variacion(lecturas_df, aire_id=None, variable='temperatura'):
+@cronometrar('grafico')
+def crear_grafico_variacion(lecturas_df, aire_id=None, variable='temperatura', variacion_df=None):
     """
     Crea un gráfico de variación (desviación estándar) para temperatura o humedad
     
     Args:
-        lecturas_df: DataFrame con las lecturas
+        lecturas_df: DataFrame con las lecturas (no se usa si se pasa variacion_df)
         aire_id: ID del aire acondicionado (None para todos)
         variable: 'temperatura' o 'humedad'
+        variacion_df: Variación ya agregada en la base de datos
+            (ver DataManager.obtener_variacion)
     
     Returns:
         Objeto de gráfico
     """
+    if variacion_df is not None:
+        if variacion_df.empty:
+            fig = go.Figure()
+            fig.update_layout(title=f"No hay datos de variación de {variable}")
+            return fig
+        
+        return _graficar_variacion(variacion_df, aire_id, variable)
+    
     if lecturas_df.empty:
         fig = go.Figure()
         fig.update_layout(title=f"No hay datos de variación de {variable}")
@@ -198,17 +312,26 @@ def crear_grafico_variacion(lecturas_df, aire_id=None, variable='temperatura'):
     if not pd.api.types.is_datetime64_any_dtype(df['fecha']):
         df['fecha'] = pd.to_datetime(df['fecha'])
     
-    # Crear columna de mes-año para agrupar
-    df['mes_año'] = df['fecha'].dt.strftime('%Y-%m')
-    
     if aire_id is not None:
+        # Crear columna de mes-año para agrupar
+        df['mes_año'] = df['fecha'].dt.strftime('%Y-%m')
+        
         # Calcular variación por mes para un solo aire
-        df_variacion = df.groupby('mes_año')[variable].agg(['mean', 'std']).reset_index()
+        df_variacion = calcular_estadisticas_por_grupo(df, 'mes_año', variable)[['mean', 'std']].reset_index()
         df_variacion.columns = ['mes_año', 'promedio', 'desviacion']
-        
-        # Evitar NaN en desviación
-        df_variacion['desviacion'] = df_variacion['desviacion'].fillna(0)
-        
+    else:
+        # Calcular variación por aire acondicionado
+        df_variacion = calcular_estadisticas_por_grupo(df, 'aire_id', variable)[['mean', 'std']].reset_index()
+        df_variacion.columns = ['aire_id', 'promedio', 'desviacion']
+    
+    return _graficar_variacion(df_variacion, aire_id, variable)
+
+def _graficar_variacion(df_variacion, aire_id, variable):
+    # Evitar NaN en desviación
+    df_variacion = df_variacion.copy()
+    df_variacion['desviacion'] = df_variacion['desviacion'].fillna(0)
+    
+    if aire_id is not None:
         # Ordenar por mes-año
         df_variacion = df_variacion.sort_values('mes_año')
         
@@ -242,13 +365,6 @@ def crear_grafico_variacion(lecturas_df, aire_id=None, variable='temperatura'):
             hovermode='x unified'
         )
     else:
-        # Calcular variación por aire acondicionado
-        df_variacion = df.groupby('aire_id')[variable].agg(['mean', 'std']).reset_index()
-        df_variacion.columns = ['aire_id', 'promedio', 'desviacion']
-        
-        # Evitar NaN en desviación
-        df_variacion['desviacion'] = df_variacion['desviacion'].fillna(0)
-        
         # Ordenar por aire_id
         df_variacion = df_variacion.sort_values('aire_id')
         
@@ -284,12 +400,67 @@ def crear_grafico_variacion(lecturas_df, aire_id=None, variable='temperatura'):
     
     return fig
 
-def generar_reporte_estadistico(lecturas_df):
+DIAS_SEMANA = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+@cronometrar('grafico')
+def crear_mapa_calor(mapa_df, variable='temperatura', eje='dia_semana'):
+    """
+    Crea un mapa de calor del promedio de una variable por hora del día
+    
+    Args:
+        mapa_df: Rejilla agregada (ver DataManager.obtener_mapa_calor)
+        variable: 'temperatura' o 'humedad'
+        eje: 'dia_semana' o 'fecha', columnas del mapa
+    
+    Returns:
+        Objeto de gráfico
+    """
+    if mapa_df.empty:
+        fig = go.Figure()
+        fig.update_layout(title=f"No hay datos de {variable} para el mapa de calor")
+        return fig
+    
+    valores = mapa_df.pivot(index='hora', columns=eje, values=variable)
+    lecturas = mapa_df.pivot(index='hora', columns=eje, values='lecturas')
+    
+    if eje == 'dia_semana':
+        columnas = [DIAS_SEMANA[dia] for dia in valores.columns]
+        titulo_eje = 'Día de la semana'
+    else:
+        columnas = [str(fecha) for fecha in valores.columns]
+        titulo_eje = 'Fecha'
+    
+    unidad = '°C' if variable == 'temperatura' else '%'
+    
+    fig = go.Figure(go.Heatmap(
+        z=valores.values,
+        x=columnas,
+        y=[f"{hora:02d}:00" for hora in valores.index],
+        customdata=lecturas.values,
+        colorscale='RdYlBu_r' if variable == 'temperatura' else 'Blues',
+        colorbar=dict(title=unidad),
+        hovertemplate=f"%{{x}} %{{y}}<br>{variable.capitalize()}: %{{z:.2f}} {unidad}<br>Lecturas: %{{customdata}}<extra></extra>"
+    ))
+    
+    fig.update_layout(
+        title=f'{variable.capitalize()} promedio por hora y {titulo_eje.lower()}',
+        xaxis_title=titulo_eje,
+        yaxis_title='Hora',
+        yaxis=dict(type='category', autorange='reversed'),
+        xaxis=dict(type='category'),
+        height=500
+    )
+    
+    return fig
+
+def generar_reporte_estadistico(lecturas_df, cuantiles_df=None):
     """
     Genera un reporte estadístico completo de las lecturas
     
     Args:
         lecturas_df: DataFrame con las lecturas
+        cuantiles_df: Opcional, DataFrame de DataManager.obtener_cuantiles por aire;
+            sus percentiles se añaden como columnas
     
     Returns:
         DataFrame con las estadísticas
@@ -309,11 +480,14 @@ def generar_reporte_estadistico(lecturas_df):
         })
     
     # Agrupar por aire_id y calcular estadísticas
-    stats = lecturas_df.groupby('aire_id').agg({
-        'temperatura': ['mean', 'min', 'max', 'std'],
-        'humedad': ['mean', 'min', 'max', 'std'],
-        'id': 'count'
-    }).reset_index()
+    stats_temp = calcular_estadisticas_por_grupo(lecturas_df, 'aire_id', 'temperatura')
+    stats_hum = calcular_estadisticas_por_grupo(lecturas_df, 'aire_id', 'humedad')
+    
+    stats = pd.concat([
+        stats_temp[['mean', 'min', 'max', 'std']],
+        stats_hum[['mean', 'min', 'max', 'std']],
+        stats_temp['count']
+    ], axis=1).reset_index()
     
     # Aplanar columnas multiíndice
     stats.columns = [
@@ -334,4 +508,11 @@ def generar_reporte_estadistico(lecturas_df):
         if col != 'aire_id' and col != 'lecturas_totales':
             stats[col] = stats[col].round(2)
     
+    if cuantiles_df is not None:
+        stats = stats.merge(
+            cuantiles_df.drop(columns=['lecturas']),
+            on='aire_id',
+            how='left'
+        )
+    
     return stats